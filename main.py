@@ -1,6 +1,7 @@
 """应用入口文件 - 微信公众号海外文章自动化搬运工"""
 import asyncio
 import sys
+from typing import Optional
 from loguru import logger
 from pathlib import Path
 
@@ -36,8 +37,8 @@ def setup_logging():
     logger.info(f"日志系统初始化完成 - 日志级别: {settings.app_log_level}")
 
 
-async def test_article_fetch(url: str):
-    """测试文章抓取功能"""
+async def test_article_fetch(url: str, force: bool = False):
+    """测试文章抓取功能（force=True 时重新抓取已处理过的URL）"""
     from src.article_fetcher.fetcher import ArticleFetcher
     import json
 
@@ -50,10 +51,12 @@ async def test_article_fetch(url: str):
         await fetcher.start()
 
         # 抓取文章
-        result = await fetcher.fetch(url)
+        result = await fetcher.fetch(url, dedupe=not force)
 
         # 输出结果
-        if result.success:
+        if result.duplicate:
+            logger.warning(f"URL已处理过，跳过（使用 --force 重新抓取）: {url}")
+        elif result.success:
             logger.success("[SUCCESS] 文章抓取成功！")
             logger.info(f"标题: {result.article.title}")
             logger.info(f"作者: {result.article.author or '未知'}")
@@ -92,8 +95,8 @@ async def test_article_fetch(url: str):
         await fetcher.close()
 
 
-async def test_article_rewrite(url: str, style_name: str = None, publish: bool = False):
-    """测试AI改写功能"""
+async def test_article_rewrite(url: str, style_name: str = None, publish: bool = False, force: bool = False):
+    """测试AI改写功能（已处理过的URL默认跳过，force=True 时重新处理）"""
     from src.article_fetcher.fetcher import ArticleFetcher
     from src.content_rewriter.rewriter import ContentRewriter
     from src.content_rewriter.style_learning import StyleManager
@@ -126,16 +129,21 @@ async def test_article_rewrite(url: str, style_name: str = None, publish: bool =
         await fetcher.start()
         await rewriter.start()
 
-        # 1. 抓取文章
+        # 1. 抓取文章（改写、发布都成功后才记为已处理）
         logger.info("步骤1: 抓取文章")
-        fetch_result = await fetcher.fetch(url)
+        fetch_result = await fetcher.fetch(url, dedupe=not force, record=False)
 
+        if fetch_result.duplicate:
+            logger.warning(f"URL已处理过，跳过（使用 --force 重新处理）: {url}")
+            return
         if not fetch_result.success:
             logger.error(f"抓取失败: {fetch_result.error_message}")
             return
 
         article = fetch_result.article
         logger.info(f"抓取成功: {article.title}")
+        if article.duplicate_of:
+            logger.warning(f"内容与已处理的文章近似重复: {article.duplicate_of}")
         logger.info(f"字数: {article.word_count}")
 
         # 2. AI改写
@@ -189,6 +197,9 @@ async def test_article_rewrite(url: str, style_name: str = None, publish: bool =
             except Exception as e:
                 logger.error(f"发布草稿失败: {e}")
                 logger.info("文章改写已完成，但未发布到微信草稿")
+                return
+
+        await fetcher.mark_processed(fetch_result)
 
     except Exception as e:
         logger.exception(f"测试过程出错: {e}")
@@ -199,6 +210,203 @@ async def test_article_rewrite(url: str, style_name: str = None, publish: bool =
             draft_manager.close()
 
 
+async def benchmark_http(urls: list[str]):
+    """对比HTTP/1.1与HTTP/2抓取同一批URL的耗时和连接池统计"""
+    from src.utils.http_client import HTTPClient
+    import json
+    import time
+
+    logger.info("=" * 60)
+    logger.info(f"HTTP/1.1 vs HTTP/2 基准测试 ({len(urls)} 个URL)")
+    logger.info("=" * 60)
+
+    for http2 in (False, True):
+        label = "HTTP/2" if http2 else "HTTP/1.1"
+        client = HTTPClient(http2=http2)
+        if http2 and not client.http2:
+            logger.warning(f"跳过 {label}: 未安装h2")
+            continue
+
+        try:
+            await client.start()
+            start_time = time.time()
+            results = await asyncio.gather(*(client.get(url) for url in urls), return_exceptions=True)
+            elapsed = time.time() - start_time
+
+            failed = sum(1 for r in results if isinstance(r, Exception))
+            stats = client.pool_stats()
+            logger.info(f"{label}: 耗时 {elapsed:.2f}秒, 失败 {failed}/{len(urls)}")
+            logger.info(json.dumps(stats["total"], ensure_ascii=False))
+            for host, host_stats in stats["hosts"].items():
+                logger.info(f"  {host}: {json.dumps(host_stats, ensure_ascii=False)}")
+        finally:
+            await client.close()
+
+
+async def benchmark_fetch(urls: list[str], rounds: int = 3):
+    """
+    端到端抓取基准测试（下载 + 解析 + 校验）
+
+    配合 HTTP_CASSETTE_MODE=replay 可在无网络环境下对固定语料重复测量。
+    """
+    from src.article_fetcher.fetcher import ArticleFetcher
+    from src.utils.cassette import get_cassette
+    import time
+
+    logger.info("=" * 60)
+    logger.info(f"抓取流水线基准测试 ({len(urls)} 个URL x {rounds} 轮, 磁带模式: {settings.http_cassette_mode})")
+    logger.info("=" * 60)
+
+    fetcher = ArticleFetcher()
+    try:
+        await fetcher.start()
+        for round_no in range(1, rounds + 1):
+            start_time = time.time()
+            results = await fetcher.fetch_batch(urls, dedupe=False)
+            elapsed = time.time() - start_time
+
+            success = sum(1 for r in results if r.success)
+            logger.info(
+                f"第 {round_no} 轮: 耗时 {elapsed:.2f}秒, 成功 {success}/{len(urls)}, "
+                f"{len(urls) / elapsed:.1f} 篇/秒"
+            )
+    finally:
+        await fetcher.close()
+
+    cassette = get_cassette()
+    if cassette:
+        logger.info(f"磁带统计: {cassette.stats()}")
+
+
+async def fetch_to_jsonl(output: str, sources: list[str]):
+    """
+    批量抓取并逐条写入JSONL文件
+
+    结果按完成顺序写入，抓取过程中即可读取已完成的文章。
+
+    Args:
+        output: 输出的JSONL文件路径（追加写入）
+        sources: URL，或每行一个URL的文本文件路径
+    """
+    from src.article_fetcher.fetcher import ArticleFetcher
+    from src.utils.storage import JSONLSink
+    import time
+
+    def iter_urls():
+        for source in sources:
+            path = Path(source)
+            if path.is_file():
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if line and not line.startswith("#"):
+                            yield line
+            else:
+                yield source
+
+    logger.info(f"批量抓取 -> {output}")
+    start_time = time.time()
+    success = 0
+    skipped = 0
+    fetcher = ArticleFetcher()
+    try:
+        await fetcher.start()
+        async with JSONLSink(output) as sink:
+            async for result in fetcher.fetch_iter(iter_urls()):
+                # 已处理过的URL不写入输出
+                if result.duplicate:
+                    skipped += 1
+                    continue
+                await sink.write(result)
+                if result.success:
+                    success += 1
+                    logger.info(f"[{sink.count}] 成功: {result.article.title[:50]}")
+                else:
+                    logger.warning(f"[{sink.count}] 失败: {result.url} - {result.error_message}")
+        logger.info(
+            f"批量抓取完成: 成功 {success}/{sink.count}, 跳过已处理 {skipped}, "
+            f"耗时 {time.time() - start_time:.2f}秒, 输出 {output}"
+        )
+    finally:
+        await fetcher.close()
+
+
+async def ingest(once: bool = False, output: Optional[str] = None):
+    """
+    轮询配置的来源，抓取新增或更新的文章并逐条写入JSONL
+
+    Args:
+        once: 只轮询一次全部来源后结束，否则按轮询间隔持续运行
+        output: 输出的JSONL文件路径，默认写到日志目录
+    """
+    from src.article_fetcher.fetcher import ArticleFetcher
+    from src.source_ingestion.poller import IngestionService
+    from src.utils.storage import JSONLSink
+    import time
+
+    output = output or str(Path(settings.log_dir) / f"ingest_{time.strftime('%Y%m%d')}.jsonl")
+    service = IngestionService.from_settings()
+    logger.info(f"来源采集: {len(service.sources)} 个来源 -> {output}")
+
+    fetcher = ArticleFetcher()
+    try:
+        await fetcher.start()
+        async with JSONLSink(output) as sink:
+            urls = (entry.url async for entry in service.run(once=once))
+            async for result in fetcher.fetch_iter(urls):
+                if result.duplicate:
+                    continue
+                await sink.write(result)
+                if result.success:
+                    logger.info(f"[{sink.count}] 成功: {result.article.title[:50]}")
+                else:
+                    logger.warning(f"[{sink.count}] 失败: {result.url} - {result.error_message}")
+        logger.info(f"来源采集完成: {service.stats()}")
+    finally:
+        await fetcher.close()
+
+
+async def refresh_threads(urls: list):
+    """增量刷新论坛帖子，只输出上次抓取之后的新评论"""
+    from src.article_fetcher.fetcher import ArticleFetcher
+
+    fetcher = ArticleFetcher()
+    try:
+        await fetcher.start()
+        results = await asyncio.gather(*(fetcher.refresh_thread(url) for url in urls))
+        for url, comments in zip(urls, results):
+            logger.info(f"{url}: {len(comments)} 条新评论")
+            for comment in comments[:5]:
+                logger.info(f"  [{comment.author}] {comment.content[:80]}")
+            if len(comments) > 5:
+                logger.info(f"  ... 还有 {len(comments) - 5} 条")
+    finally:
+        await fetcher.close()
+
+
+async def crawl_boards(board_urls: list, output: Optional[str] = None):
+    """
+    爬取论坛版块列表页，发现活跃或有新回复的帖子并逐条写入JSONL
+
+    Args:
+        board_urls: 版块URL列表
+        output: 输出的JSONL文件路径，默认写到日志目录
+    """
+    from src.source_ingestion.boards import BoardCrawler
+    from src.utils.storage import JSONLSink
+    import time
+
+    output = output or str(Path(settings.log_dir) / f"boards_{time.strftime('%Y%m%d')}.jsonl")
+    logger.info(f"版块爬取: {len(board_urls)} 个版块 -> {output}")
+
+    crawler = BoardCrawler()
+    async with JSONLSink(output) as sink:
+        async for topic in crawler.crawl_many(board_urls):
+            await sink.write(topic)
+            logger.info(f"[{sink.count}] {topic.reason}: {(topic.title or topic.url)[:60]} (回复 {topic.replies})")
+    logger.info(f"版块爬取完成: {crawler.stats()}")
+
+
 async def list_styles():
     """列出所有可用的风格"""
     from src.content_rewriter.style_learning import StyleManager
@@ -238,7 +446,7 @@ async def interactive_mode():
 
     logger.info("=" * 60)
     logger.info("交互模式 - 输入文章URL进行抓取")
-    logger.info("输入 'quit' 或 'exit' 退出")
+    logger.info("输入 'quit' 或 'exit' 退出，URL前加 '--force ' 重新抓取已处理过的URL")
     logger.info("=" * 60)
 
     fetcher = ArticleFetcher()
@@ -253,14 +461,20 @@ async def interactive_mode():
                     logger.info("退出交互模式")
                     break
 
+                force = url.startswith("--force ")
+                if force:
+                    url = url[len("--force "):].strip()
+
                 if not url:
                     logger.warning("URL不能为空")
                     continue
 
                 # 抓取文章
-                result = await fetcher.fetch(url)
+                result = await fetcher.fetch(url, dedupe=not force)
 
-                if result.success:
+                if result.duplicate:
+                    logger.warning("URL已处理过，跳过（输入 '--force <URL>' 重新抓取）")
+                elif result.success:
                     logger.success(f"[SUCCESS] 抓取成功: {result.article.title}")
                     logger.info(f"   字数: {result.article.word_count}, 图片: {result.article.image_count}")
                 else:
@@ -276,6 +490,33 @@ async def interactive_mode():
         await fetcher.close()
 
 
+def dump_http_metrics():
+    """导出本次运行的HTTP指标到日志目录"""
+    from src.utils.http_metrics import get_http_metrics
+    from src.utils.dns_cache import get_dns_cache
+    from src.utils.http_cache import get_http_cache
+    import time
+
+    metrics = get_http_metrics()
+    if not metrics.has_data():
+        return
+
+    extra = {}
+    dns_cache = get_dns_cache()
+    if dns_cache:
+        extra["dns"] = dns_cache.stats()
+    http_cache = get_http_cache()
+    if http_cache:
+        extra["cache"] = http_cache.stats()
+
+    output_file = metrics.dump_json(Path(settings.log_dir) / f"http_metrics_{int(time.time())}.json", extra)
+    summary = metrics.snapshot()["summary"]
+    logger.info(
+        f"HTTP指标已保存到: {output_file} "
+        f"(请求 {summary['requests']}, 重试 {summary['retries']}, 接收 {summary['bytes_received'] / 1024:.1f} KB)"
+    )
+
+
 async def main():
     """主函数"""
     setup_logging()
@@ -298,6 +539,7 @@ async def main():
             url = None
             style_name = None
             publish = False
+            force = False
 
             # 解析参数
             i = 2
@@ -308,6 +550,9 @@ async def main():
                 elif sys.argv[i] == "--publish":
                     publish = True
                     i += 1
+                elif sys.argv[i] == "--force":
+                    force = True
+                    i += 1
                 elif url is None:
                     url = sys.argv[i]
                     i += 1
@@ -320,29 +565,92 @@ async def main():
                     logger.info(f"使用风格: {style_name}")
                 if publish:
                     logger.info("将发布到微信草稿箱")
-                await test_article_rewrite(url, style_name, publish)
+                await test_article_rewrite(url, style_name, publish, force)
             else:
                 logger.error("错误: 改写模式需要提供URL")
-                logger.info("用法: python main.py --rewrite <URL> [--style <风格名>] [--publish]")
+                logger.info("用法: python main.py --rewrite <URL> [--style <风格名>] [--publish] [--force]")
+
+        elif command == "--bench-http":
+            # HTTP/1.1 vs HTTP/2 基准测试
+            urls = sys.argv[2:]
+            if urls:
+                await benchmark_http(urls)
+            else:
+                logger.error("错误: 基准测试需要提供URL")
+                logger.info("用法: python main.py --bench-http <URL> [URL ...]")
+
+        elif command == "--bench-fetch":
+            # 抓取流水线基准测试（可配合HTTP磁带离线回放）
+            urls = sys.argv[2:]
+            if urls:
+                await benchmark_fetch(urls)
+            else:
+                logger.error("错误: 基准测试需要提供URL")
+                logger.info("用法: python main.py --bench-fetch <URL> [URL ...]")
+
+        elif command == "--fetch-batch":
+            # 批量抓取，结果逐条写入JSONL
+            if len(sys.argv) > 3:
+                await fetch_to_jsonl(sys.argv[2], sys.argv[3:])
+            else:
+                logger.error("错误: 批量抓取需要提供输出文件和URL")
+                logger.info("用法: python main.py --fetch-batch <输出.jsonl> <URL或URL列表文件> [...]")
+
+        elif command == "--ingest":
+            # 轮询RSS/站点地图/论坛来源并抓取新文章
+            args = sys.argv[2:]
+            output = None
+            if "--output" in args:
+                index = args.index("--output")
+                output = args[index + 1] if index + 1 < len(args) else None
+            await ingest(once="--once" in args, output=output)
+
+        elif command == "--refresh-thread":
+            # 增量刷新论坛帖子的新评论
+            urls = sys.argv[2:]
+            if urls:
+                await refresh_threads(urls)
+            else:
+                logger.error("错误: 刷新帖子需要提供URL")
+                logger.info("用法: python main.py --refresh-thread <帖子URL> [URL ...]")
+
+        elif command == "--crawl-boards":
+            # 爬取论坛版块，发现待抓取的帖子
+            args = sys.argv[2:]
+            output = None
+            if "--output" in args:
+                index = args.index("--output")
+                output = args[index + 1] if index + 1 < len(args) else None
+                del args[index:index + 2]
+            if args:
+                await crawl_boards(args, output=output)
+            else:
+                logger.error("错误: 版块爬取需要提供版块URL")
+                logger.info("用法: python main.py --crawl-boards <版块URL> [URL ...] [--output <输出.jsonl>]")
 
         elif command == "--fetch" or command == "-f":
             # 抓取模式
-            if len(sys.argv) > 2:
-                url = sys.argv[2]
+            args = [arg for arg in sys.argv[2:] if arg != "--force"]
+            if args:
+                url = args[0]
                 logger.info(f"抓取模式: 抓取URL -> {url}")
-                await test_article_fetch(url)
+                await test_article_fetch(url, force="--force" in sys.argv)
             else:
                 logger.error("错误: 抓取模式需要提供URL")
-                logger.info("用法: python main.py --fetch <URL>")
+                logger.info("用法: python main.py --fetch <URL> [--force]")
         else:
             # 默认抓取模式（向后兼容）
             url = command
             logger.info(f"抓取模式: 抓取URL -> {url}")
-            await test_article_fetch(url)
+            await test_article_fetch(url, force="--force" in sys.argv)
     else:
         logger.info("交互模式: 请输入文章URL")
         await interactive_mode()
 
+    from src.utils.resources import close_resources
+    await close_resources()
+    dump_http_metrics()
+
 
 if __name__ == "__main__":
     try:
@@ -1,48 +1,83 @@
 """文章抓取器 - 核心抓取逻辑"""
+import asyncio
 import time
-from typing import Optional
+from typing import Optional, Tuple, Union, Iterable, AsyncIterable, AsyncIterator, List
 from urllib.parse import urlparse
 from loguru import logger
 
-from src.models.article import Article, ArticleFetchResult, ArticleStatus
-from src.article_fetcher.parsers import ArticleParser
+from config import settings
+from src.models.article import Article, ArticleFetchResult, ArticleStatus, Comment
+from src.article_fetcher.parsers import ArticleParser, ForumCommentParser
 from src.article_fetcher.validators import ArticleValidator
-from src.utils.http_client import HTTPClient
+from src.article_fetcher.near_duplicates import get_near_duplicate_index
+from src.article_fetcher.thread_state import get_thread_state
+from src.utils.http_client import HTTPClient, ResponseRejectedError
+from src.utils.resources import get_resources, CRAWL_POOL
+from src.utils.rate_limiter import LANE_INTERACTIVE, LANE_CRAWL
+from src.utils.seen_set import get_seen_set
+from src.utils.url_canon import canonicalize_url
 
 
 class ArticleFetcher:
     """文章抓取器 - 负责从URL抓取文章内容"""
 
-    def __init__(self):
-        """初始化抓取器"""
+    def __init__(self, http_client: Optional[HTTPClient] = None):
+        """
+        初始化抓取器
+
+        Args:
+            http_client: HTTP客户端，默认使用共享资源容器中的抓取连接池
+        """
         self.parser = ArticleParser()
         self.validator = ArticleValidator()
-        self.http_client: Optional[HTTPClient] = None
+        self.http_client: Optional[HTTPClient] = http_client
+        self._shared_client = http_client is None
+        # 已处理过的URL集合（规范化后判断），未启用时为None
+        self.seen_set = get_seen_set()
+        # 正在抓取的规范化URL，并发抓取同一篇文章时只保留一个
+        self._in_flight: set = set()
+        # 正文近似重复索引，未启用时为None
+        self.near_duplicates = get_near_duplicate_index()
+        # 论坛帖子的评论高水位（增量刷新用）
+        self.thread_state = get_thread_state()
 
     async def start(self):
         """启动抓取器"""
         if self.http_client is None:
-            self.http_client = HTTPClient()
-            await self.http_client.start()
+            self.http_client = await get_resources().http_client(CRAWL_POOL)
             logger.debug("文章抓取器已启动")
 
     async def close(self):
-        """关闭抓取器"""
-        if self.http_client:
-            await self.http_client.close()
-            logger.debug("文章抓取器已关闭")
-
-    async def fetch(self, url: str) -> ArticleFetchResult:
+        """关闭抓取器（连接池由资源容器或传入方负责关闭）"""
+        if self.http_client and self._shared_client:
+            self.http_client = None
+        if self.seen_set is not None:
+            await self.seen_set.save()
+        await self.thread_state.save()
+        logger.debug("文章抓取器已关闭")
+
+    async def fetch(
+        self,
+        url: str,
+        priority: str = LANE_INTERACTIVE,
+        dedupe: bool = True,
+        record: bool = True
+    ) -> ArticleFetchResult:
         """
         抓取单篇文章
 
         Args:
             url: 文章URL
+            priority: 请求优先级通道，单篇抓取默认为交互式
+            dedupe: 是否跳过已处理过的URL（规范化后判断，跳过时不发出任何请求）
+            record: 抓取成功后是否立即记为已处理；抓取后还要改写、发布的调用方传False，
+                    处理成功后再调用 mark_processed()
 
         Returns:
-            ArticleFetchResult对象
+            ArticleFetchResult对象，跳过时 duplicate 为True
         """
         start_time = time.time()
+        canonical = None
 
         try:
             # 1. 验证URL
@@ -50,167 +85,625 @@ class ArticleFetcher:
             if not is_valid:
                 return ArticleFetchResult(
                     success=False,
+                    url=url,
                     article=None,
                     error_message=f"URL验证失败: {error_msg}",
                     fetch_time=time.time() - start_time
                 )
 
-            logger.info(f"开始抓取文章: {url}")
+            # 已处理过的URL直接跳过，不发出任何请求（包括robots.txt）
+            if self.seen_set is not None and dedupe:
+                key = self.seen_set.canonical(url)
+                if key in self._in_flight:
+                    logger.info(f"跳过正在抓取的URL: {url}")
+                    return self._duplicate_result(url, start_time)
+                # 先占位再查询，查询期间同一URL的并发抓取会被跳过
+                canonical = key
+                self._in_flight.add(canonical)
+                if (await self.seen_set.lookup([key], canonical=True))[0]:
+                    logger.info(f"跳过已处理过的URL: {url}")
+                    return self._duplicate_result(url, start_time)
+
+            result = await self._fetch_article(url, priority, start_time, dedupe)
+
+            # 只有抓取成功（通过质量验证）的文章记为已处理，失败的下次仍会重试。
+            # dedupe=False 的抓取（基准测试、帖子刷新、--force）不影响已处理集合和近似重复索引
+            if dedupe and record and result.success:
+                await self.mark_processed(result)
+            return result
 
-            # 2. 下载HTML内容
-            html = await self._download_html(url)
-            if not html:
-                return ArticleFetchResult(
-                    success=False,
-                    article=None,
-                    error_message="无法下载HTML内容",
-                    fetch_time=time.time() - start_time
-                )
+        except Exception as e:
+            logger.exception(f"抓取文章时发生异常: {url}")
+            return ArticleFetchResult(
+                success=False,
+                url=url,
+                article=None,
+                error_message=f"抓取异常: {str(e)}",
+                fetch_time=time.time() - start_time
+            )
+        finally:
+            if canonical is not None:
+                self._in_flight.discard(canonical)
+
+    async def mark_processed(self, result: ArticleFetchResult):
+        """
+        把抓取结果记为已处理（改写、发布等后续处理成功后调用，配合 fetch(record=False)）
 
-            # 3. 解析文章内容和评论
-            title, content, author, images, comments_data = await self.parser.parse(html, url)
+        记录URL，并把正文指纹加入近似重复索引。
 
-            if not title or not content:
-                return ArticleFetchResult(
-                    success=False,
-                    article=None,
-                    error_message="无法解析文章内容（标题或正文为空）",
-                    fetch_time=time.time() - start_time
-                )
+        Args:
+            result: 处理成功的文章的抓取结果
+        """
+        if self.seen_set is not None:
+            await self.seen_set.record([result.url])
+        if self.near_duplicates is not None and result.article is not None:
+            await self.near_duplicates.add_async(result.article)
+
+    @staticmethod
+    def _duplicate_result(url: str, start_time: float) -> ArticleFetchResult:
+        """已处理过的URL的跳过结果"""
+        return ArticleFetchResult(
+            success=False,
+            url=url,
+            article=None,
+            duplicate=True,
+            error_message="URL已处理过，跳过",
+            fetch_time=time.time() - start_time
+        )
+
+    async def _fetch_article(self, url: str, priority: str, start_time: float, dedupe: bool = True) -> ArticleFetchResult:
+        """
+        下载、解析并验证一篇文章（URL已通过验证和去重）
 
-            # 4. 创建文章对象
-            article = Article(
+        Args:
+            url: 文章URL
+            priority: 请求优先级通道
+            start_time: 抓取开始时间
+            dedupe: 是否按 settings.near_dup_action 跳过近似重复的文章（False时只标记）
+
+        Returns:
+            ArticleFetchResult对象
+        """
+        # 遵守robots.txt，禁止抓取的URL不发出页面请求
+        if self.http_client is None:
+            await self.start()
+        if not await self.http_client.check_robots(url, priority):
+            return ArticleFetchResult(
+                success=False,
                 url=url,
-                title=title,
-                author=author,
-                content=content,
-                source_domain=urlparse(url).netloc,
-                language='en'  # 默认英文，后续可以添加自动检测
+                article=None,
+                error_message="robots.txt禁止抓取该URL",
+                fetch_time=time.time() - start_time
             )
 
-            # 添加图片
-            for img_url in images:
-                article.add_image(url=img_url)
-
-            # 添加评论
-            for comment_data in comments_data:
-                article.add_comment(
-                    author=comment_data.get('author', 'Anonymous'),
-                    content=comment_data.get('content', ''),
-                    publish_date=comment_data.get('publish_date'),
-                    likes=comment_data.get('likes', 0)
-                )
+        logger.info(f"开始抓取文章: {url}")
 
-            # 5. 验证文章质量
-            is_valid, errors = self.validator.validate(article)
-            if not is_valid:
-                article.status = ArticleStatus.FAILED
-                article.error_message = "; ".join(errors)
+        # 2. 下载HTML内容（原始字节 + 声明的编码），页面开头明显不相关时中止下载
+        try:
+            downloaded = await self._download_html(url, priority, relevance_gate=settings.relevance_gate_enabled)
+        except ResponseRejectedError:
+            logger.info(f"页面开头预检不相关，已跳过: {url}")
+            return ArticleFetchResult(
+                success=False,
+                url=url,
+                article=None,
+                rejected=True,
+                error_message="文章内容与越野摩托车主题不相关（页面开头预检）",
+                fetch_time=time.time() - start_time
+            )
+        if not downloaded:
+            return ArticleFetchResult(
+                success=False,
+                url=url,
+                article=None,
+                error_message="无法下载HTML内容",
+                fetch_time=time.time() - start_time
+            )
+        html, encoding = downloaded
+
+        # 3. 解析文章内容和评论
+        title, content, author, images, comments_data = await self.parser.parse(html, url, encoding)
+
+        # 论坛帖子：并发抓取其余分页，按页码顺序合并评论
+        if comments_data:
+            comments_data = await self._collect_thread_comments(html, url, encoding, comments_data, priority)
 
+        if not title or not content:
+            return ArticleFetchResult(
+                success=False,
+                url=url,
+                article=None,
+                error_message="无法解析文章内容（标题或正文为空）",
+                fetch_time=time.time() - start_time
+            )
+
+        # 4. 创建文章对象
+        article = Article(
+            url=url,
+            title=title,
+            author=author,
+            content=content,
+            source_domain=urlparse(url).netloc,
+            language='en'  # 默认英文，后续可以添加自动检测
+        )
+
+        # 添加图片
+        for img_url in images:
+            article.add_image(url=img_url)
+
+        # 添加评论
+        for comment_data in comments_data:
+            article.add_comment(
+                author=comment_data.get('author', 'Anonymous'),
+                content=comment_data.get('content', ''),
+                publish_date=comment_data.get('publish_date'),
+                likes=comment_data.get('likes', 0),
+                comment_id=comment_data.get('comment_id')
+            )
+
+        # 5. 验证文章质量
+        is_valid, errors = self.validator.validate(article)
+        if not is_valid:
+            article.status = ArticleStatus.FAILED
+            article.error_message = "; ".join(errors)
+
+            return ArticleFetchResult(
+                success=False,
+                url=url,
+                article=article,
+                error_message=f"文章验证失败: {'; '.join(errors)}",
+                fetch_time=time.time() - start_time
+            )
+
+        # 6. 近似重复检测（转载、跨站重复发布的同一篇内容）
+        if self.near_duplicates is not None:
+            article.duplicate_of = await self.near_duplicates.lookup_async(article)
+            if article.duplicate_of and dedupe and settings.near_dup_action == "skip":
                 return ArticleFetchResult(
                     success=False,
+                    url=url,
                     article=article,
-                    error_message=f"文章验证失败: {'; '.join(errors)}",
+                    duplicate=True,
+                    error_message=f"与已处理的文章内容重复: {article.duplicate_of}",
                     fetch_time=time.time() - start_time
                 )
 
-            # 6. 标记为已抓取
-            article.status = ArticleStatus.FETCHED
+        # 7. 标记为已抓取
+        article.status = ArticleStatus.FETCHED
+
+        fetch_time = time.time() - start_time
+        logger.info(
+            f"文章抓取成功: {title[:50]}... "
+            f"({article.word_count} 字, {len(images)} 图, {article.comment_count} 评论, {fetch_time:.2f}秒)"
+        )
+
+        return ArticleFetchResult(
+            success=True,
+            url=url,
+            article=article,
+            error_message=None,
+            fetch_time=fetch_time
+        )
+
+    async def _collect_thread_comments(
+        self,
+        html: bytes,
+        url: str,
+        encoding: Optional[str],
+        comments: list[dict],
+        priority: str
+    ) -> list[dict]:
+        """
+        抓取论坛帖子的其余分页并合并评论，同时记录帖子的评论高水位
 
-            fetch_time = time.time() - start_time
-            logger.info(
-                f"文章抓取成功: {title[:50]}... "
-                f"({article.word_count} 字, {len(images)} 图, {article.comment_count} 评论, {fetch_time:.2f}秒)"
-            )
+        所有分页同时发出请求（每个站点的并发和间隔仍由HTTPClient的域名调度器控制），
+        整个帖子的耗时接近一次页面往返。某一页失败时跳过该页。
 
-            return ArticleFetchResult(
-                success=True,
-                article=article,
-                error_message=None,
-                fetch_time=fetch_time
+        Args:
+            html: 当前页HTML原始字节
+            url: 当前页URL
+            encoding: 声明的编码
+            comments: 当前页解析出的评论
+            priority: 请求优先级通道
+
+        Returns:
+            按页码顺序合并后的评论（不超过 settings.forum_max_comments 条）
+        """
+        max_comments = settings.forum_max_comments
+        current, pages = self.parser.comment_parser.find_thread_pages(html, url, encoding)
+        pages[current] = url
+        numbers = [page for page in sorted(pages) if page != current and page <= settings.forum_max_pages]
+
+        by_page: dict = {current: comments}
+        if numbers and len(comments) < max_comments:
+            logger.info(f"帖子共 {max(pages)} 页，并发抓取其余 {len(numbers)} 页: {url}")
+            start_time = time.time()
+            results = await asyncio.gather(*(self._fetch_thread_page(pages[page], priority) for page in numbers))
+            by_page.update(zip(numbers, results))
+            logger.info(f"帖子分页抓取完成: {len(numbers)} 页, 耗时 {time.time() - start_time:.2f}秒")
+
+        merged, mark_page, mark_count, mark_comment = self._merge_pages(by_page, max_comments)
+        if len(merged) >= max_comments:
+            logger.info(f"评论数达到上限 {max_comments}")
+        if mark_page is not None:
+            self.thread_state.mark(self._thread_key(url)).update(
+                mark_page, pages[mark_page], mark_count, self._to_comment(mark_comment) if mark_comment else None
             )
+        return merged
 
-        except Exception as e:
-            logger.exception(f"抓取文章时发生异常: {url}")
-            return ArticleFetchResult(
-                success=False,
-                article=None,
-                error_message=f"抓取异常: {str(e)}",
-                fetch_time=time.time() - start_time
+    @staticmethod
+    def _merge_pages(by_page: dict, limit: Optional[int] = None) -> Tuple[list, Optional[int], int, Optional[dict]]:
+        """
+        按页码顺序合并各页评论
+
+        Args:
+            by_page: {页码: 评论列表}，下载失败的页为None
+            limit: 最多保留的评论数
+
+        Returns:
+            (合并后的评论, 高水位页码, 该页已读评论数, 高水位评论)；
+            高水位停在第一个失败页之前，失败页之后的评论下次刷新时重新读取
+        """
+        merged: list = []
+        mark_page, mark_count, mark_comment = None, 0, None
+        contiguous = True
+        for page in sorted(by_page):
+            page_comments = by_page[page]
+            if page_comments is None:
+                contiguous = False
+                continue
+            taken = page_comments if limit is None else page_comments[:max(0, limit - len(merged))]
+            merged.extend(taken)
+            if contiguous:
+                mark_page, mark_count = page, len(taken)
+                if taken:
+                    mark_comment = taken[-1]
+            if limit is not None and len(merged) >= limit:
+                break
+        return merged, mark_page, mark_count, mark_comment
+
+    @staticmethod
+    def _thread_key(url: str) -> str:
+        """帖子状态的键（规范化的第一页URL）"""
+        return canonicalize_url(ForumCommentParser.first_page_url(url), settings.url_tracking_params)
+
+    @staticmethod
+    def _to_comment(data: dict) -> Comment:
+        """评论字典转为Comment对象"""
+        return Comment(
+            comment_id=data.get('comment_id'),
+            author=data.get('author', 'Anonymous'),
+            content=data.get('content', ''),
+            publish_date=data.get('publish_date'),
+            likes=data.get('likes', 0)
+        )
+
+    async def refresh_thread(self, url: str, priority: str = LANE_CRAWL) -> List[Comment]:
+        """
+        增量刷新论坛帖子，只返回上次抓取之后的新评论
+
+        从记录的最后一页开始抓取（更新的分页并发抓取），按高水位筛出新评论并推进高水位。
+        帖子没有抓取记录时完整抓取一次，返回全部评论。
+
+        Args:
+            url: 帖子任意一页的URL
+            priority: 请求优先级通道
+
+        Returns:
+            新评论列表（按页码顺序）
+        """
+        if self.http_client is None:
+            await self.start()
+        key = self._thread_key(url)
+        mark = self.thread_state.get(key)
+        if mark is None or not mark.last_page_url:
+            logger.info(f"帖子没有抓取记录，完整抓取: {url}")
+            result = await self.fetch(url, priority=priority, dedupe=False)
+            await self.thread_state.save()
+            return list(result.article.comments) if result.article else []
+
+        start_time = time.time()
+        page_url = mark.last_page_url
+        if not await self.http_client.check_robots(page_url, priority):
+            logger.warning(f"robots.txt禁止抓取帖子: {page_url}")
+            return []
+        # 最后一页很可能还在HTTP缓存的新鲜期内，强制重新验证
+        downloaded = await self._download_html(page_url, priority, revalidate=True)
+        if not downloaded:
+            logger.warning(f"帖子刷新失败: {page_url}")
+            return []
+        html, encoding = downloaded
+
+        comment_parser = self.parser.comment_parser
+        by_page: dict = {mark.last_page: await comment_parser.parse_comments(html, page_url, encoding)}
+        _, pages = comment_parser.find_thread_pages(html, page_url, encoding)
+        pages[mark.last_page] = page_url
+        newer = [page for page in sorted(pages) if page > mark.last_page][:settings.forum_max_pages]
+        if newer:
+            results = await asyncio.gather(*(
+                self._fetch_thread_page(pages[page], priority, revalidate=True) for page in newer
+            ))
+            by_page.update(zip(newer, results))
+
+        merged, mark_page, mark_count, mark_comment = self._merge_pages(by_page)
+        new_comments = mark.new_comments([self._to_comment(c) for c in merged], len(by_page[mark.last_page]))
+        if mark_page is not None:
+            self.thread_state.mark(key).update(
+                mark_page, pages[mark_page], mark_count, self._to_comment(mark_comment) if mark_comment else None
             )
+            await self.thread_state.save()
+
+        logger.info(
+            f"帖子刷新完成: {len(new_comments)} 条新评论 "
+            f"(抓取 {len(by_page)} 页, 耗时 {time.time() - start_time:.2f}秒): {url}"
+        )
+        return new_comments
+
+    async def _fetch_thread_page(self, url: str, priority: str, revalidate: bool = False) -> Optional[list[dict]]:
+        """
+        抓取并解析帖子的一个分页
 
-    async def _download_html(self, url: str) -> Optional[str]:
+        Args:
+            url: 分页URL
+            priority: 请求优先级通道
+            revalidate: 是否绕过HTTP缓存的新鲜期（刷新帖子时使用）
+
+        Returns:
+            该页的评论，失败时为None
+        """
+        if not await self.http_client.check_robots(url, priority):
+            logger.debug(f"robots.txt禁止抓取分页: {url}")
+            return None
+        downloaded = await self._download_html(url, priority, revalidate)
+        if not downloaded:
+            logger.warning(f"帖子分页下载失败: {url}")
+            return None
+        page_html, page_encoding = downloaded
+        return await self.parser.comment_parser.parse_comments(page_html, url, page_encoding)
+
+    async def _download_html(
+        self,
+        url: str,
+        priority: str = LANE_INTERACTIVE,
+        revalidate: bool = False,
+        relevance_gate: bool = False
+    ) -> Optional[Tuple[bytes, Optional[str]]]:
         """
         下载HTML内容
 
+        以流式读取响应体，超过 settings.fetch_max_html_mb 立即中止；
+        不在此处解码，原始字节和响应头声明的编码直接交给解析器。
+
         Args:
             url: 文章URL
+            priority: 请求优先级通道
+            revalidate: 是否绕过HTTP缓存的新鲜期，向源站重新验证
+            relevance_gate: 是否在收到页面开头时预检相关性，明显不相关即中止下载
 
         Returns:
-            HTML内容字符串，失败返回None
+            (HTML原始字节, 声明的编码) 元组，失败返回None
+
+        Raises:
+            ResponseRejectedError: 页面开头预检不相关（仅 relevance_gate=True 时）
         """
         try:
             if self.http_client is None:
                 await self.start()
 
-            response = await self.http_client.get(url, timeout=30.0)
-            html = response.text
+            # 超时由HTTPClient按域名的历史延迟自适应确定
+            response = await self.http_client.get(
+                url,
+                headers={"Cache-Control": "no-cache"} if revalidate else None,
+                max_bytes=settings.fetch_max_html_mb * 1024 * 1024,
+                priority=priority,
+                head_check=self.validator.is_relevant_head if relevance_gate else None,
+                head_bytes=settings.relevance_gate_head_kb * 1024
+            )
+            html = response.content
 
             # 检查内容长度
             if len(html) < 100:
-                logger.warning(f"HTML内容过短: {len(html)} 字符")
+                logger.warning(f"HTML内容过短: {len(html)} 字节")
                 return None
 
-            logger.debug(f"成功下载HTML: {len(html)} 字符")
-            return html
+            logger.debug(f"成功下载HTML: {len(html)} 字节")
+            return html, response.charset_encoding
 
+        except ResponseRejectedError:
+            raise
         except Exception as e:
             logger.error(f"下载HTML失败: {e}")
             return None
 
-    async def fetch_batch(self, urls: list[str]) -> list[ArticleFetchResult]:
+    async def fetch_batch(
+        self,
+        urls: list[str],
+        concurrency: Optional[int] = None,
+        deadline: Optional[float] = None,
+        dedupe: bool = True
+    ) -> list[ArticleFetchResult]:
         """
-        批量抓取文章
+        批量并发抓取文章
+
+        同时抓取的URL数不超过concurrency；同一站点的请求间隔、并发和
+        robots.txt的Crawl-delay由HTTPClient的域名调度器控制，这里不再额外等待。
+        单个URL失败或超时只影响它自己的结果。已处理过的URL和批次内
+        规范化后重复的URL先批量剔除，直接返回跳过结果。
 
         Args:
             urls: 文章URL列表
+            concurrency: 最大并发抓取数，默认 settings.fetch_batch_concurrency
+            deadline: 单个URL的抓取时限（秒），默认 settings.fetch_url_deadline
+            dedupe: 是否跳过已处理过的URL
 
         Returns:
-            ArticleFetchResult列表
+            ArticleFetchResult列表（与输入顺序一致）
         """
-        logger.info(f"开始批量抓取 {len(urls)} 篇文章")
+        concurrency = max(1, concurrency or settings.fetch_batch_concurrency)
+        deadline = deadline if deadline is not None else settings.fetch_url_deadline
+        logger.info(f"开始批量抓取 {len(urls)} 篇文章 (并发 {concurrency})")
+        start_time = time.time()
+
+        duplicates = await self._duplicate_indexes(urls) if dedupe else set()
+        if duplicates:
+            logger.info(f"跳过 {len(duplicates)} 个已处理过或重复的URL")
+
+        # 预解析批次中的所有域名
+        if self.http_client is None:
+            await self.start()
+        await self.http_client.prefetch_dns([url for i, url in enumerate(urls) if i not in duplicates])
+
+        semaphore = asyncio.Semaphore(concurrency)
 
-        results = []
-        for i, url in enumerate(urls, 1):
-            logger.info(f"正在抓取 [{i}/{len(urls)}]: {url}")
-            result = await self.fetch(url)
-            results.append(result)
+        async def run(index: int, url: str) -> ArticleFetchResult:
+            if index - 1 in duplicates:
+                return self._duplicate_result(url, time.time())
+            async with semaphore:
+                logger.info(f"正在抓取 [{index}/{len(urls)}]: {url}")
+                return await self._fetch_with_deadline(url, deadline, dedupe)
 
-            # 短暂延迟，避免请求过快
-            if i < len(urls):
-                await self._delay(1)
+        results = await asyncio.gather(*(run(i, url) for i, url in enumerate(urls, 1)))
 
         success_count = sum(1 for r in results if r.success)
-        logger.info(f"批量抓取完成: 成功 {success_count}/{len(urls)}")
+        logger.info(f"批量抓取完成: 成功 {success_count}/{len(urls)}, 耗时 {time.time() - start_time:.2f}秒")
 
-        return results
+        return list(results)
 
-    async def _delay(self, seconds: float):
-        """延迟执行"""
-        import asyncio
-        await asyncio.sleep(seconds)
+    async def fetch_iter(
+        self,
+        urls: Union[Iterable[str], AsyncIterable[str]],
+        concurrency: Optional[int] = None,
+        deadline: Optional[float] = None,
+        dedupe: bool = True
+    ) -> AsyncIterator[ArticleFetchResult]:
+        """
+        并发抓取文章，按完成顺序逐个产出结果
+
+        URL按需从输入中取出，同时在途的抓取不超过concurrency，
+        内存占用与批次大小无关，下游可以在第一篇文章完成后立即开始处理。
+        提前退出迭代时会取消尚未完成的抓取。
+
+        Args:
+            urls: 文章URL（列表、生成器或异步迭代器）
+            concurrency: 最大并发抓取数，默认 settings.fetch_batch_concurrency
+            deadline: 单个URL的抓取时限（秒），默认 settings.fetch_url_deadline
+            dedupe: 是否跳过已处理过的URL（跳过的URL立即产出 duplicate 结果）
+
+        Yields:
+            ArticleFetchResult对象（result.url 为对应的URL）
+        """
+        concurrency = max(1, concurrency or settings.fetch_batch_concurrency)
+        deadline = deadline if deadline is not None else settings.fetch_url_deadline
+
+        if self.http_client is None:
+            await self.start()
+        # 已知全部URL时预解析域名
+        if isinstance(urls, (list, tuple)):
+            await self.http_client.prefetch_dns(urls)
+
+        pending: set = set()
+        try:
+            async for url in self._aiter_urls(urls):
+                if len(pending) >= concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+                pending.add(asyncio.ensure_future(self._fetch_with_deadline(url, deadline, dedupe)))
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            # 提前退出时取消未完成的抓取，并等待它们释放调度槽位和连接
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    @staticmethod
+    async def _aiter_urls(urls: Union[Iterable[str], AsyncIterable[str]]) -> AsyncIterator[str]:
+        """把同步或异步的URL来源统一为异步迭代"""
+        if hasattr(urls, "__aiter__"):
+            async for url in urls:
+                yield url
+        else:
+            for url in urls:
+                yield url
+
+    async def _duplicate_indexes(self, urls: list[str]) -> set:
+        """
+        批量找出已处理过的URL，以及批次内规范化后与前面重复的URL
+
+        Args:
+            urls: 文章URL列表
+
+        Returns:
+            应跳过的URL下标集合
+        """
+        if self.seen_set is None or not urls:
+            return set()
+        keys = [self.seen_set.canonical(url) for url in urls]
+        seen = await self.seen_set.lookup(keys, canonical=True)
+        duplicates = set()
+        batch = set()
+        for index, (key, is_seen) in enumerate(zip(keys, seen)):
+            if is_seen or key in batch or key in self._in_flight:
+                duplicates.add(index)
+            batch.add(key)
+        return duplicates
+
+    async def _fetch_with_deadline(self, url: str, deadline: Optional[float], dedupe: bool = True) -> ArticleFetchResult:
+        """
+        在时限内抓取单篇文章（批量抓取使用crawl通道）
+
+        Args:
+            url: 文章URL
+            deadline: 抓取时限（秒），None或<=0表示不限制
+            dedupe: 是否跳过已处理过的URL
+
+        Returns:
+            ArticleFetchResult对象，超时或异常时为失败结果
+        """
+        start_time = time.time()
+        try:
+            if deadline and deadline > 0:
+                return await asyncio.wait_for(self.fetch(url, priority=LANE_CRAWL, dedupe=dedupe), deadline)
+            return await self.fetch(url, priority=LANE_CRAWL, dedupe=dedupe)
+        except asyncio.TimeoutError:
+            logger.warning(f"抓取超时 ({deadline:g}秒): {url}")
+            return ArticleFetchResult(
+                success=False,
+                url=url,
+                article=None,
+                error_message=f"抓取超时（{deadline:g}秒）",
+                fetch_time=time.time() - start_time
+            )
+        except Exception as e:
+            logger.exception(f"抓取文章时发生异常: {url}")
+            return ArticleFetchResult(
+                success=False,
+                url=url,
+                article=None,
+                error_message=f"抓取异常: {str(e)}",
+                fetch_time=time.time() - start_time
+            )
 
 
 # 全局抓取器实例
 _fetcher: Optional[ArticleFetcher] = None
+_fetcher_lock = asyncio.Lock()
 
 
 async def get_fetcher() -> ArticleFetcher:
     """获取全局抓取器实例"""
     global _fetcher
     if _fetcher is None:
-        _fetcher = ArticleFetcher()
-        await _fetcher.start()
+        async with _fetcher_lock:
+            if _fetcher is None:
+                fetcher = ArticleFetcher()
+                await fetcher.start()
+                _fetcher = fetcher
     return _fetcher
 
 
@@ -0,0 +1,257 @@
+"""近似重复检测 - 正文SimHash指纹与分段LSH索引"""
+import asyncio
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from hashlib import blake2b
+from pathlib import Path
+from typing import Optional, List, Dict, Tuple, Any
+from loguru import logger
+
+from config import settings
+from src.models.article import Article
+
+
+FINGERPRINT_BITS = 64
+# 词级shingle长度
+SHINGLE_SIZE = 3
+# shingle太少时指纹不可靠，不参与检测
+MIN_SHINGLES = 20
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _to_signed(value: int) -> int:
+    """64位无符号整数转为SQLite可存储的有符号整数"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _to_unsigned(value: int) -> int:
+    """SQLite中的有符号整数还原为64位无符号整数"""
+    return value + (1 << 64) if value < 0 else value
+
+
+def simhash(text: str) -> Optional[int]:
+    """
+    计算正文的64位SimHash指纹
+
+    特征为小写单词的3-shingle，按出现次数加权。措辞、标点、
+    少量段落增删只会翻转少数几位，可用汉明距离衡量相似度。
+
+    Args:
+        text: 正文文本
+
+    Returns:
+        64位指纹，文本太短时返回None
+    """
+    tokens = _TOKEN_RE.findall(text.lower())
+    if len(tokens) < SHINGLE_SIZE + MIN_SHINGLES - 1:
+        return None
+
+    shingles = Counter(
+        " ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)
+    )
+    weighted = [
+        (int.from_bytes(blake2b(shingle.encode(), digest_size=8).digest(), "little"), weight)
+        for shingle, weight in shingles.items()
+    ]
+    half = sum(weight for _, weight in weighted) / 2
+
+    fingerprint = 0
+    for bit in range(FINGERPRINT_BITS):
+        # 该位为1的特征权重超过一半则指纹该位为1
+        if sum(weight for h, weight in weighted if h >> bit & 1) > half:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+class NearDuplicateIndex:
+    """持久化的SimHash近似重复索引
+
+    64位指纹切成 max_distance+1 段：两个指纹的汉明距离不超过 max_distance 时，
+    按抽屉原理至少有一段完全相同。每段各建一个哈希表，查询时只比较
+    任一段相同的候选指纹，几十万条指纹下单次查询仍在亚毫秒级。
+
+    抓取时用 lookup() 查询，文章处理成功后再用 add() 记录，处理失败或被拒绝的
+    文章不会让之后的转载被误判为重复。指纹保存在SQLite中，启动时载入内存索引。
+    异步代码使用 lookup_async() / add_async()，指纹计算和SQLite提交在线程中执行。
+    """
+
+    def __init__(self, db_file: str, max_distance: int = 3):
+        """
+        初始化索引
+
+        Args:
+            db_file: SQLite数据库文件路径
+            max_distance: 汉明距离不超过该值视为近似重复
+        """
+        self.db_file = Path(db_file)
+        self.max_distance = max(0, min(max_distance, FINGERPRINT_BITS // 2 - 1))
+        self._lock = threading.Lock()
+
+        # 各段的 (位移, 掩码)
+        bands = self.max_distance + 1
+        width = FINGERPRINT_BITS // bands
+        self._bands: List[Tuple[int, int]] = []
+        for i in range(bands):
+            bits = width if i < bands - 1 else FINGERPRINT_BITS - width * (bands - 1)
+            self._bands.append((i * width, (1 << bits) - 1))
+        # 段号 -> 段值 -> 条目下标列表
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in self._bands]
+        self._fingerprints: List[int] = []
+        self._urls: List[str] = []
+
+        self.lookups = 0
+        self.candidates_compared = 0
+        self.duplicates_found = 0
+
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.db_file), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            "url TEXT PRIMARY KEY, simhash INTEGER NOT NULL, title TEXT, added_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self._db.commit()
+        self._load()
+
+    def _load(self):
+        """载入已保存的指纹"""
+        for url, value in self._db.execute("SELECT url, simhash FROM fingerprints"):
+            self._insert(url, _to_unsigned(value))
+        if self._urls:
+            logger.debug(f"已加载近似重复索引: {len(self._urls)} 条指纹")
+
+    def _insert(self, url: str, fingerprint: int):
+        """加入内存索引"""
+        index = len(self._fingerprints)
+        self._fingerprints.append(fingerprint)
+        self._urls.append(url)
+        for table, (shift, mask) in zip(self._tables, self._bands):
+            table.setdefault(fingerprint >> shift & mask, []).append(index)
+
+    def find(self, fingerprint: int, exclude_url: Optional[str] = None) -> Optional[Tuple[str, int]]:
+        """
+        查找最相近的已知指纹
+
+        Args:
+            fingerprint: 64位指纹
+            exclude_url: 排除的URL（同一篇文章重新抓取时不与自己比较）
+
+        Returns:
+            (已处理文章的URL, 汉明距离)，没有近似重复时返回None
+        """
+        self.lookups += 1
+        best: Optional[Tuple[str, int]] = None
+        checked = set()
+        for table, (shift, mask) in zip(self._tables, self._bands):
+            for index in table.get(fingerprint >> shift & mask, ()):
+                if index in checked:
+                    continue
+                checked.add(index)
+                distance = (fingerprint ^ self._fingerprints[index]).bit_count()
+                if distance <= self.max_distance and self._urls[index] != exclude_url:
+                    if best is None or distance < best[1]:
+                        best = (self._urls[index], distance)
+        self.candidates_compared += len(checked)
+        return best
+
+    def lookup(self, article: Article) -> Optional[str]:
+        """
+        检查文章是否与已处理的文章近似重复（只查询，不记录）
+
+        Args:
+            article: 已解析的文章
+
+        Returns:
+            重复时返回最相近的已处理文章URL，否则返回None
+        """
+        fingerprint = simhash(article.content)
+        if fingerprint is None:
+            return None
+
+        url = str(article.url)
+        with self._lock:
+            match = self.find(fingerprint, exclude_url=url)
+            if match is None:
+                return None
+            self.duplicates_found += 1
+
+        logger.info(f"发现近似重复文章: {url} ≈ {match[0]} (汉明距离 {match[1]})")
+        return match[0]
+
+    def add(self, article: Article) -> bool:
+        """
+        记录一篇处理成功的文章的指纹
+
+        查找和写入在同一把锁内完成：并发处理的两篇近似相同的文章只记录先完成的一篇。
+
+        Args:
+            article: 处理成功的文章
+
+        Returns:
+            是否记录（正文太短或已有近似重复的指纹时不记录）
+        """
+        fingerprint = simhash(article.content)
+        if fingerprint is None:
+            return False
+
+        url = str(article.url)
+        with self._lock:
+            if self.find(fingerprint, exclude_url=url) is not None:
+                return False
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO fingerprints (url, simhash, title, added_at) VALUES (?, ?, ?, ?)",
+                (url, _to_signed(fingerprint), article.title, time.time())
+            )
+            self._db.commit()
+            if cursor.rowcount > 0:
+                self._insert(url, fingerprint)
+        return cursor.rowcount > 0
+
+    async def lookup_async(self, article: Article) -> Optional[str]:
+        """lookup() 的异步版本，SimHash计算在线程中执行"""
+        return await asyncio.to_thread(self.lookup, article)
+
+    async def add_async(self, article: Article) -> bool:
+        """add() 的异步版本，SimHash计算和SQLite提交在线程中执行"""
+        return await asyncio.to_thread(self.add, article)
+
+    def __len__(self) -> int:
+        return len(self._fingerprints)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取统计信息
+
+        Returns:
+            {fingerprints, bands, lookups, candidates_compared, duplicates_found}
+        """
+        return {
+            "fingerprints": len(self._fingerprints),
+            "bands": len(self._bands),
+            "lookups": self.lookups,
+            "candidates_compared": self.candidates_compared,
+            "duplicates_found": self.duplicates_found,
+        }
+
+
+# 全局近似重复索引
+_near_duplicate_index: Optional[NearDuplicateIndex] = None
+
+
+def get_near_duplicate_index() -> Optional[NearDuplicateIndex]:
+    """获取全局近似重复索引，未启用时返回None"""
+    global _near_duplicate_index
+    if not settings.near_dup_enabled:
+        return None
+    if _near_duplicate_index is None:
+        _near_duplicate_index = NearDuplicateIndex(
+            db_file=settings.near_dup_db_file,
+            max_distance=settings.near_dup_max_distance,
+        )
+    return _near_duplicate_index
@@ -1,13 +1,63 @@
 """HTML解析器 - 使用BeautifulSoup4和trafilatura提取文章内容"""
-from typing import Optional, Dict, List, Tuple
-from urllib.parse import urljoin, urlparse
+from typing import Optional, Dict, List, Tuple, Union
+from urllib.parse import urljoin, urlparse, urlsplit, urlunsplit, parse_qsl, urlencode
 from loguru import logger
 from bs4 import BeautifulSoup
+from lxml.html import HtmlElement, HTMLParser, document_fromstring
 import trafilatura
+from trafilatura.utils import load_html
 import re
 from datetime import datetime
 
 
+def _build_tree(html: Union[str, bytes], encoding: Optional[str] = None) -> Optional[HtmlElement]:
+    """
+    构建lxml文档树（整个解析流程只构建一次）
+
+    已知编码的字节直接交给lxml解码，跳过 bytes -> str -> bytes 的多次拷贝；
+    编码未知或是字符串时交给trafilatura的load_html处理编码探测和容错。
+
+    Args:
+        html: HTML原始字节或字符串
+        encoding: 响应头声明的编码
+
+    Returns:
+        lxml文档树，解析失败返回None
+    """
+    if isinstance(html, bytes) and encoding:
+        try:
+            # 与trafilatura内部使用的解析器选项保持一致
+            parser = HTMLParser(
+                encoding=encoding,
+                collect_ids=False,
+                default_doctype=False,
+                remove_comments=True,
+                remove_pis=True,
+            )
+            tree = document_fromstring(html, parser=parser)
+            if len(tree) > 0:
+                return tree
+        except (LookupError, ValueError) as e:
+            logger.debug(f"按声明编码 {encoding} 解析失败，改为自动探测: {e}")
+    return load_html(html)
+
+
+def _make_soup(html: Union[str, bytes], encoding: Optional[str] = None) -> BeautifulSoup:
+    """
+    构建BeautifulSoup对象
+
+    Args:
+        html: HTML原始字节或字符串
+        encoding: 响应头声明的编码（仅对字节有效）
+
+    Returns:
+        BeautifulSoup对象
+    """
+    if isinstance(html, bytes):
+        return BeautifulSoup(html, 'lxml', from_encoding=encoding)
+    return BeautifulSoup(html, 'lxml')
+
+
 class ArticleParser:
     """文章内容解析器"""
 
@@ -19,29 +69,35 @@ class ArticleParser:
 
     async def parse(
         self,
-        html: str,
-        url: str
+        html: Union[str, bytes],
+        url: str,
+        encoding: Optional[str] = None
     ) -> Tuple[Optional[str], Optional[str], Optional[str], List[str], List[Dict]]:
         """
         解析HTML，提取文章内容和评论
 
         Args:
-            html: HTML内容
+            html: HTML原始字节或字符串
             url: 文章URL
+            encoding: 响应头声明的编码，html为字节时使用
 
         Returns:
             (标题, 内容, 作者, 图片URL列表, 评论列表) 的元组
         """
-        # 首先尝试使用trafilatura
-        title, content, author, images = await self.trafilatura_parser.parse(html, url)
+        # 首先尝试使用trafilatura（共用同一棵lxml树提取正文和图片）
+        tree = _build_tree(html, encoding)
+        if tree is not None:
+            title, content, author, images = await self.trafilatura_parser.parse(tree, url)
+        else:
+            title, content, author, images = None, None, None, []
 
         # 如果trafilatura失败，使用BeautifulSoup fallback
         if not title or not content:
             logger.info("Trafilatura解析失败，使用BeautifulSoup fallback")
-            title, content, author, images = await self.fallback_parser.parse(html, url)
+            title, content, author, images = await self.fallback_parser.parse(html, url, encoding)
 
         # 提取评论（论坛类型网站）
-        comments = await self.comment_parser.parse_comments(html, url)
+        comments = await self.comment_parser.parse_comments(html, url, encoding)
 
         return title, content, author, images, comments
 
@@ -51,21 +107,26 @@ class TrafilaturaParser:
 
     async def parse(
         self,
-        html: str,
+        html: Union[str, bytes, HtmlElement],
         url: str
     ) -> Tuple[Optional[str], Optional[str], Optional[str], List[str]]:
         """
         使用Trafilatura解析文章
 
         Args:
-            html: HTML内容
+            html: HTML内容，或已构建好的lxml文档树
             url: 文章URL
 
         Returns:
             (标题, 内容, 作者, 图片URL列表) 的元组
         """
         try:
-            # 使用trafilatura提取内容
+            if not isinstance(html, HtmlElement):
+                html = _build_tree(html)
+                if html is None:
+                    return None, None, None, []
+
+            # 使用trafilatura提取内容（内部对树做拷贝后清理，不修改传入的树）
             extracted = trafilatura.extract(
                 html,
                 include_comments=False,
@@ -98,12 +159,11 @@ class TrafilaturaParser:
             logger.warning(f"Trafilatura解析失败: {e}")
             return None, None, None, []
 
-    def _extract_images(self, html: str, base_url: str) -> List[str]:
-        """从HTML中提取图片URL"""
-        soup = BeautifulSoup(html, 'lxml')
+    def _extract_images(self, tree: HtmlElement, base_url: str) -> List[str]:
+        """从lxml文档树中提取图片URL"""
         images = []
 
-        for img in soup.find_all('img'):
+        for img in tree.iter('img'):
             src = img.get('src') or img.get('data-src')
             if src:
                 # 转换为绝对URL
@@ -132,21 +192,23 @@ class BeautifulSoupParser:
 
     async def parse(
         self,
-        html: str,
-        url: str
+        html: Union[str, bytes],
+        url: str,
+        encoding: Optional[str] = None
     ) -> Tuple[Optional[str], Optional[str], Optional[str], List[str]]:
         """
         使用BeautifulSoup解析文章
 
         Args:
-            html: HTML内容
+            html: HTML原始字节或字符串
             url: 文章URL
+            encoding: 响应头声明的编码，html为字节时使用
 
         Returns:
             (标题, 内容, 作者, 图片URL列表) 的元组
         """
         try:
-            soup = BeautifulSoup(html, 'lxml')
+            soup = _make_soup(html, encoding)
 
             # 提取标题
             title = self._extract_title(soup)
@@ -323,37 +385,71 @@ class BeautifulSoupParser:
         return any(path.endswith(ext) for ext in image_extensions)
 
 
-async def parse_html(html: str, url: str) -> Tuple[Optional[str], Optional[str], Optional[str], List[str], List[Dict]]:
+async def parse_html(
+    html: Union[str, bytes],
+    url: str,
+    encoding: Optional[str] = None
+) -> Tuple[Optional[str], Optional[str], Optional[str], List[str], List[Dict]]:
     """
     便捷函数：解析HTML内容
 
     Args:
-        html: HTML内容
+        html: HTML原始字节或字符串
         url: 文章URL
+        encoding: 响应头声明的编码，html为字节时使用
 
     Returns:
         (标题, 内容, 作者, 图片URL列表, 评论列表) 的元组
     """
     parser = ArticleParser()
-    return await parser.parse(html, url)
+    return await parser.parse(html, url, encoding)
+
+
+def ips_page_url(base_url: str, page: int) -> str:
+    """
+    IPS论坛分页的页面URL
+
+    Args:
+        base_url: ul.ipsPagination 的 data-baseurl（帖子或版块地址）
+        page: 页码
+
+    Returns:
+        第1页为 base_url，其余为 base_url/page/N/（非友好URL时为 page=N 参数）
+    """
+    if page == 1:
+        return base_url
+    if "?" in base_url:
+        separator = "" if base_url.endswith(("?", "&")) else "&"
+        return f"{base_url}{separator}page={page}"
+    return f"{base_url.rstrip('/')}/page/{page}/"
 
 
 class ForumCommentParser:
     """论坛评论解析器"""
 
-    async def parse_comments(self, html: str, url: str) -> List[Dict]:
+    # 分页链接中的页码：/page/N/ 或 ?page=N
+    _PAGE_PATH_RE = re.compile(r"/page/(\d+)(?=/|$)")
+    _PAGE_PARAM = "page"
+
+    async def parse_comments(
+        self,
+        html: Union[str, bytes],
+        url: str,
+        encoding: Optional[str] = None
+    ) -> List[Dict]:
         """
         解析HTML中的论坛评论
 
         Args:
-            html: HTML内容
+            html: HTML原始字节或字符串
             url: 页面URL
+            encoding: 响应头声明的编码，html为字节时使用
 
         Returns:
-            评论列表，每个评论包含author, content, publish_date, likes
+            评论列表，每个评论包含author, content, publish_date, likes, comment_id
         """
         try:
-            soup = BeautifulSoup(html, 'lxml')
+            soup = _make_soup(html, encoding)
             comments = []
 
             # ThumperTalk论坛特定的评论选择器
@@ -375,6 +471,133 @@ class ForumCommentParser:
             logger.warning(f"评论解析失败: {e}")
             return []
 
+    @classmethod
+    def _page_number(cls, url: str) -> Optional[int]:
+        """从URL中取出页码，没有页码返回None"""
+        parts = urlsplit(url)
+        match = cls._PAGE_PATH_RE.search(parts.path)
+        if match:
+            return int(match.group(1))
+        for key, value in parse_qsl(parts.query):
+            if key == cls._PAGE_PARAM and value.isdigit():
+                return int(value)
+        return None
+
+    @classmethod
+    def _thread_key(cls, url: str) -> Tuple[str, str, str]:
+        """去掉页码和锚点后的帖子标识，用于判断分页链接是否属于同一帖子"""
+        parts = urlsplit(url)
+        path = cls._PAGE_PATH_RE.sub("", parts.path).rstrip("/")
+        query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query) if k != cls._PAGE_PARAM))
+        return parts.netloc.lower(), path, query
+
+    @classmethod
+    def first_page_url(cls, url: str) -> str:
+        """
+        帖子第一页的URL（去掉页码和锚点），用作帖子的标识
+
+        Args:
+            url: 帖子任意一页的URL
+
+        Returns:
+            第一页URL
+        """
+        parts = urlsplit(url)
+        path = cls._PAGE_PATH_RE.sub("", parts.path) or "/"
+        query = urlencode([(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != cls._PAGE_PARAM])
+        return urlunsplit((parts.scheme, parts.netloc, path, query, ""))
+
+    @classmethod
+    def _with_page(cls, template: str, page: int) -> str:
+        """把分页链接模板中的页码替换为指定页"""
+        parts = urlsplit(template)
+        if cls._PAGE_PATH_RE.search(parts.path):
+            path = cls._PAGE_PATH_RE.sub(f"/page/{page}", parts.path, count=1)
+            return urlunsplit((parts.scheme, parts.netloc, path, parts.query, ""))
+        query = urlencode([
+            (k, str(page) if k == cls._PAGE_PARAM else v)
+            for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        ])
+        return urlunsplit((parts.scheme, parts.netloc, parts.path, query, ""))
+
+    def find_thread_pages(
+        self,
+        html: Union[str, bytes],
+        url: str,
+        encoding: Optional[str] = None
+    ) -> Tuple[int, Dict[int, str]]:
+        """
+        查找帖子的全部分页
+
+        优先使用IPS的 ul.ipsPagination（data-pages 给出总页数，data-baseurl 给出帖子地址），
+        否则收集同一帖子的 ?page=N 和 /page/N/ 链接，被省略号折叠的中间页按链接模板补全。
+        只用lxml解析，不构建BeautifulSoup。
+
+        Args:
+            html: 当前页HTML原始字节或字符串
+            url: 当前页URL
+            encoding: 响应头声明的编码，html为字节时使用
+
+        Returns:
+            (当前页码, {页码: 页面URL})，字典包含当前页；没有分页时只有当前页
+        """
+        try:
+            tree = _build_tree(html, encoding)
+        except Exception as e:
+            logger.debug(f"分页解析失败: {e}")
+            tree = None
+        if tree is None:
+            current = self._page_number(url) or 1
+            return current, {current: url}
+        return self.pages_from_tree(tree, url)
+
+    def pages_from_tree(self, tree: HtmlElement, url: str) -> Tuple[int, Dict[int, str]]:
+        """
+        从已构建的lxml文档树中查找分页（帖子和论坛版块列表页通用）
+
+        Args:
+            tree: lxml文档树
+            url: 当前页URL
+
+        Returns:
+            (当前页码, {页码: 页面URL})，字典包含当前页
+        """
+        current = self._page_number(url) or 1
+        pages = {current: url}
+
+        # IPS论坛（ThumperTalk）：<ul class="ipsPagination" data-pages="12" data-baseurl="...">
+        for pagination in tree.xpath('//ul[contains(concat(" ", normalize-space(@class), " "), " ipsPagination ")]'):
+            total = pagination.get("data-pages", "")
+            base_url = pagination.get("data-baseurl")
+            if not total.isdigit() or int(total) < 2 or not base_url:
+                continue
+            active = pagination.xpath('.//li[contains(@class, "ipsPagination_active")]//a/@data-page')
+            if active and active[0].isdigit():
+                current = int(active[0])
+                pages = {current: url}
+            base_url = urljoin(url, base_url)
+            for page in range(1, int(total) + 1):
+                pages.setdefault(page, ips_page_url(base_url, page))
+            return current, pages
+
+        # 通用：同一帖子的分页链接
+        thread = self._thread_key(url)
+        template = None
+        last_page = current
+        for href in tree.xpath("//a/@href"):
+            link = urljoin(url, href.strip()).split("#", 1)[0]
+            page = self._page_number(link)
+            if page is None or page < 1 or self._thread_key(link) != thread:
+                continue
+            pages.setdefault(page, link)
+            if page > last_page:
+                last_page = page
+                template = link
+        if template is not None:
+            for page in range(1, last_page + 1):
+                pages.setdefault(page, self._with_page(template, page))
+        return current, pages
+
     def _parse_thumpertalk_comments(self, soup: BeautifulSoup) -> List[Dict]:
         """解析ThumperTalk论坛的评论"""
         comments = []
@@ -443,7 +666,8 @@ class ForumCommentParser:
                             'author': author,
                             'content': content,
                             'publish_date': publish_date,
-                            'likes': likes
+                            'likes': likes,
+                            'comment_id': self._extract_comment_id(element)
                         })
 
                 except Exception as e:
@@ -491,7 +715,8 @@ class ForumCommentParser:
                                 'author': author,
                                 'content': content,
                                 'publish_date': None,
-                                'likes': likes
+                                'likes': likes,
+                                'comment_id': self._extract_comment_id(element)
                             })
 
                     if comments:
@@ -502,6 +727,21 @@ class ForumCommentParser:
 
         return comments
 
+    def _extract_comment_id(self, element) -> Optional[str]:
+        """提取评论ID（IPS的 elComment_123 / data-commentid，其他论坛常见的 data-post-id 等）"""
+        for attr in ('data-commentid', 'data-comment-id', 'data-post-id', 'data-postid', 'data-id'):
+            if element.get(attr):
+                return str(element[attr]).strip()
+        inner = element.select_one('[data-commentid]')
+        if inner is not None:
+            return str(inner['data-commentid']).strip()
+
+        element_id = element.get('id') or ''
+        match = re.search(r'(\d+)$', element_id)
+        if match:
+            return match.group(1)
+        return None
+
     def _extract_comment_author(self, element) -> str:
         """提取评论作者"""
         selectors = [
@@ -0,0 +1,168 @@
+"""论坛帖子状态 - 每个帖子已读评论的高水位，用于增量刷新"""
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+from loguru import logger
+
+from config import settings
+from src.models.article import Comment
+
+
+class ThreadMark:
+    """单个帖子的评论高水位：读到的最后一页和最后一条评论"""
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        data = data or {}
+        self.last_page: int = data.get("last_page", 1)
+        self.last_page_url: Optional[str] = data.get("last_page_url")
+        # 最后一页上已读的评论数（评论没有ID和时间时按位置判断新评论）
+        self.last_page_count: int = data.get("last_page_count", 0)
+        self.last_comment_id: Optional[str] = data.get("last_comment_id")
+        value = data.get("last_comment_at")
+        self.last_comment_at: Optional[datetime] = datetime.fromisoformat(value) if value else None
+        self.updated_at: float = data.get("updated_at", 0.0)
+
+    def new_comments(self, comments: List[Comment], page_count: int) -> List[Comment]:
+        """
+        从重新抓取的尾部评论中挑出高水位之后的新评论
+
+        依次按以下方式判断：上次最后一条评论的位置；数字评论ID；评论时间；
+        最后一页上已读的评论数。
+
+        Args:
+            comments: 从 last_page 开始按页码顺序合并的评论
+            page_count: 重新抓取的 last_page 上的评论数（用于按位置判断）
+
+        Returns:
+            新评论
+        """
+        if self.last_comment_id:
+            for index, comment in enumerate(comments):
+                if comment.comment_id == self.last_comment_id:
+                    return comments[index + 1:]
+            if self.last_comment_id.isdigit() and all(c.comment_id and c.comment_id.isdigit() for c in comments):
+                return [c for c in comments if int(c.comment_id) > int(self.last_comment_id)]
+
+        if self.last_comment_at and all(c.publish_date for c in comments):
+            try:
+                return [c for c in comments if c.publish_date > self.last_comment_at]
+            except TypeError:
+                # 时区信息不一致，改为按位置判断
+                pass
+
+        return comments[min(self.last_page_count, page_count):]
+
+    def update(self, page: int, page_url: str, page_count: int, last_comment: Optional[Comment]):
+        """
+        推进高水位
+
+        Args:
+            page: 最后读到的页码
+            page_url: 该页URL
+            page_count: 该页上已读的评论数
+            last_comment: 最后一条已读评论
+        """
+        self.last_page = page
+        self.last_page_url = page_url
+        self.last_page_count = page_count
+        if last_comment is not None:
+            self.last_comment_id = last_comment.comment_id
+            self.last_comment_at = last_comment.publish_date
+        self.updated_at = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可持久化的字典"""
+        return {
+            "last_page": self.last_page,
+            "last_page_url": self.last_page_url,
+            "last_page_count": self.last_page_count,
+            "last_comment_id": self.last_comment_id,
+            "last_comment_at": self.last_comment_at.isoformat() if self.last_comment_at else None,
+            "updated_at": self.updated_at,
+        }
+
+
+class ThreadStateStore:
+    """所有帖子的评论高水位，保存为JSON文件"""
+
+    def __init__(self, state_file: str):
+        """
+        初始化状态存储
+
+        Args:
+            state_file: 状态文件路径
+        """
+        self.state_file = Path(state_file)
+        self._threads: Dict[str, ThreadMark] = {}
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        """加载状态文件"""
+        if not self.state_file.exists():
+            return
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"读取帖子状态失败 {self.state_file}: {e}")
+            return
+        for key, mark in data.get("threads", {}).items():
+            self._threads[key] = ThreadMark(mark)
+        logger.debug(f"已加载帖子状态: {len(self._threads)} 个帖子")
+
+    def get(self, key: str) -> Optional[ThreadMark]:
+        """获取帖子的高水位，没有记录返回None"""
+        return self._threads.get(key)
+
+    def mark(self, key: str) -> ThreadMark:
+        """获取（必要时创建）帖子的高水位，调用方随后更新它"""
+        mark = self._threads.get(key)
+        if mark is None:
+            mark = ThreadMark()
+            self._threads[key] = mark
+        self._dirty = True
+        return mark
+
+    def __len__(self) -> int:
+        return len(self._threads)
+
+    def _write(self, data: Dict[str, Any]):
+        """原子写入状态文件（在线程中执行）"""
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_file.with_name(f"{self.state_file.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.state_file)
+
+    async def save(self):
+        """保存状态（没有变化时不写文件）"""
+        if not self._dirty:
+            return
+        data = {
+            "saved_at": time.time(),
+            "threads": {key: mark.to_dict() for key, mark in self._threads.items()},
+        }
+        self._dirty = False
+        try:
+            await asyncio.to_thread(self._write, data)
+            logger.debug(f"帖子状态已保存: {self.state_file}")
+        except Exception as e:
+            self._dirty = True
+            logger.warning(f"保存帖子状态失败: {e}")
+
+
+# 全局帖子状态
+_thread_state: Optional[ThreadStateStore] = None
+
+
+def get_thread_state() -> ThreadStateStore:
+    """获取全局帖子状态"""
+    global _thread_state
+    if _thread_state is None:
+        _thread_state = ThreadStateStore(settings.forum_thread_state_file)
+    return _thread_state
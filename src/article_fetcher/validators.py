@@ -1,6 +1,8 @@
 """内容验证器 - 验证文章质量和相关性"""
-from typing import List, Tuple
+from typing import List, Tuple, Optional
 from loguru import logger
+import codecs
+import html
 import re
 
 from config import settings
@@ -28,6 +30,32 @@ class ArticleValidator:
         'beta', 'sherco', 'tm', 'husaberg', 'aprilia', 'husqvarna',
     }
 
+    # 页面开头预检时的泛用词（在非摩托车页面中也很常见），只计1分；其余关键词在标题和元数据中计3分
+    _HEAD_GENERIC_KEYWORDS = {
+        'quad', 'trail', 'adventure', 'helm', 'gear', 'protective', 'suspension', 'exhaust', 'engine',
+        'tire', 'wheel', 'brake', 'frame', 'maintenance', 'repair', 'upgrade', 'performance',
+        'modification', 'setup', 'tuning', 'horsepower', 'torque', 'compression', 'fuel injection',
+        'clutch', 'transmission', 'chain', 'beta',
+    }
+
+    # 页面开头预检：<title> 和 <meta>
+    _HEAD_TITLE_RE = re.compile(r"<title[^>]*>(.*?)(?:</title>|$)", re.I | re.S)
+    _HEAD_META_RE = re.compile(r"<meta\b[^>]*>", re.I)
+    _HEAD_ATTR_RE = re.compile(r"""([\w:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""")
+    _HEAD_META_NAMES = {
+        "description", "keywords", "og:title", "og:description", "twitter:title", "twitter:description",
+    }
+    # 整词匹配关键词（允许复数和 dirt bike / dirtbike / dirt-bike 之类的写法），
+    # 避免 'tm'、'mx'、'helm' 等短词命中 "entire"、"overwhelming" 这类普通单词
+    _HEAD_KEYWORD_RE = re.compile(
+        r"(?<![a-z0-9])("
+        + "|".join(
+            re.escape(kw).replace(r"\ ", r"[\s-]?").replace(r"\-", r"[\s-]?")
+            for kw in sorted(OFFROAD_KEYWORDS, key=len, reverse=True)
+        )
+        + r")(?:e?s)?(?![a-z0-9])"
+    )
+
     def __init__(self):
         """初始化验证器"""
         self.min_length = settings.article_min_length
@@ -96,13 +124,13 @@ class ArticleValidator:
         title_keywords = 0
         if article.title:
             title_lower = article.title.lower()
-            title_keywords = sum(1 for kw in self.OFFROAD_KEYWORDS if kw in title_lower)
+            title_keywords = self._count_keywords(title_lower)
 
         # 检查正文中的关键词
         content_keywords = 0
         if article.content:
             content_lower = article.content.lower()
-            content_keywords = sum(1 for kw in self.OFFROAD_KEYWORDS if kw in content_lower)
+            content_keywords = self._count_keywords(content_lower)
 
         # 如果标题或正文包含足够的越野摩托车关键词，则认为相关
         # 标题权重更高
@@ -112,6 +140,77 @@ class ArticleValidator:
         # 例如：标题1个关键词(3分) 或 正文3个关键词(3分)
         return total_score >= 3
 
+    def is_relevant_head(self, head: bytes, encoding: Optional[str] = None) -> bool:
+        """
+        根据页面开头预检是否与越野摩托车相关（在下载过程中调用，不构建DOM）
+
+        只用正则提取 <title>、meta描述/关键词、OpenGraph和Twitter卡片标签，关键词按整词匹配：
+        越野摩托车专有的词（车型、品牌、motocross等）每个计3分，泛用词每个计1分，
+        得分达到 settings.relevance_gate_min_score（默认3，与 _is_relevant 的要求一致）才继续下载。
+        开头没有标题和元数据（如正文由脚本渲染）时不做判断，交给完整解析后的验证。
+
+        Args:
+            head: 页面开头的原始字节（可能在标签中间截断）
+            encoding: 响应头声明的编码
+
+        Returns:
+            是否继续下载和解析
+        """
+        try:
+            codecs.lookup(encoding or "utf-8")
+        except LookupError:
+            encoding = None
+        text = head.decode(encoding or "utf-8", errors="replace")
+
+        metadata = []
+        title = self._HEAD_TITLE_RE.search(text)
+        if title:
+            metadata.append(title.group(1))
+        for tag in self._HEAD_META_RE.findall(text):
+            attrs = {
+                match[0].lower(): match[1] or match[2] or match[3]
+                for match in self._HEAD_ATTR_RE.findall(tag)
+            }
+            name = (attrs.get("name") or attrs.get("property") or "").lower()
+            if name in self._HEAD_META_NAMES and attrs.get("content"):
+                metadata.append(attrs["content"])
+        metadata_text = html.unescape(" ".join(metadata)).lower()
+        if not metadata_text.strip():
+            return True
+
+        score = self._score_head_keywords(metadata_text)
+        if score >= settings.relevance_gate_min_score:
+            return True
+
+        logger.debug(f"页面开头预检不相关 (得分 {score}): {metadata_text[:80]!r}")
+        return False
+
+    def _score_head_keywords(self, text: str) -> int:
+        """
+        页面开头预检的关键词得分（整词匹配，每个关键词只计一次）
+
+        Args:
+            text: 小写的标题和元数据文本
+
+        Returns:
+            得分
+        """
+        found = {re.sub(r"[\s-]", "", match) for match in self._HEAD_KEYWORD_RE.findall(text)}
+        generic = {re.sub(r"[\s-]", "", kw) for kw in self._HEAD_GENERIC_KEYWORDS}
+        return sum(1 if kw in generic else 3 for kw in found)
+
+    def _count_keywords(self, text: str) -> int:
+        """
+        统计文本中出现的不同关键词个数（子串匹配）
+
+        Args:
+            text: 小写文本
+
+        Returns:
+            关键词个数
+        """
+        return sum(1 for kw in self.OFFROAD_KEYWORDS if kw in text)
+
     def _validate_title(self, title: str) -> bool:
         """
         验证标题质量
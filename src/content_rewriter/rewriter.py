@@ -1,4 +1,5 @@
 """内容改写器 - 主逻辑"""
+import asyncio
 from typing import Optional
 from loguru import logger
 
@@ -158,14 +159,18 @@ class ContentRewriter:
 
 # 全局改写器实例
 _rewriter: Optional[ContentRewriter] = None
+_rewriter_lock = asyncio.Lock()
 
 
 async def get_rewriter() -> ContentRewriter:
     """获取全局改写器实例"""
     global _rewriter
     if _rewriter is None:
-        _rewriter = ContentRewriter()
-        await _rewriter.start()
+        async with _rewriter_lock:
+            if _rewriter is None:
+                rewriter = ContentRewriter()
+                await rewriter.start()
+                _rewriter = rewriter
     return _rewriter
 
 
@@ -33,6 +33,7 @@ class ImageInfo(BaseModel):
 
 class Comment(BaseModel):
     """评论信息"""
+    comment_id: Optional[str] = Field(None, description="论坛中的评论ID")
     author: str = Field(..., description="评论作者")
     content: str = Field(..., description="评论内容")
     publish_date: Optional[datetime] = Field(None, description="评论时间")
@@ -66,6 +67,7 @@ class Article(BaseModel):
     # 状态信息
     status: ArticleStatus = Field(default=ArticleStatus.PENDING, description="处理状态")
     error_message: Optional[str] = Field(None, description="错误信息")
+    duplicate_of: Optional[str] = Field(None, description="内容近似重复的已处理文章URL")
 
     # 统计信息
     word_count: int = Field(default=0, description="字数统计")
@@ -152,8 +154,11 @@ class Article(BaseModel):
 class ArticleFetchResult(BaseModel):
     """文章抓取结果"""
     success: bool = Field(..., description="是否成功")
+    url: Optional[str] = Field(None, description="抓取的URL")
     article: Optional[Article] = Field(None, description="文章对象")
     error_message: Optional[str] = Field(None, description="错误信息")
+    duplicate: bool = Field(default=False, description="URL已处理过或内容近似重复而跳过")
+    rejected: bool = Field(default=False, description="页面开头预检与主题不相关，未下载完整页面")
     fetch_time: float = Field(..., description="抓取耗时（秒）")
 
     class Config:
@@ -0,0 +1,57 @@
+"""内容来源相关数据模型"""
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+from pydantic import BaseModel, Field
+
+
+class SourceType(str, Enum):
+    """来源类型枚举"""
+    FEED = "feed"          # RSS / Atom
+    SITEMAP = "sitemap"    # 站点地图（urlset）或站点地图索引（sitemapindex）
+    FORUM = "forum"        # 论坛"新主题"列表页
+
+
+class IngestSource(BaseModel):
+    """轮询的内容来源"""
+    type: SourceType = Field(..., description="来源类型")
+    url: str = Field(..., description="订阅源/站点地图/列表页URL")
+    name: Optional[str] = Field(None, description="来源名称，默认使用URL")
+    interval: Optional[int] = Field(None, description="轮询间隔（秒），默认 settings.ingest_default_interval")
+    backfill: bool = Field(default=True, description="首次轮询时是否把已有条目全部入队")
+    link_pattern: Optional[str] = Field(None, description="论坛列表页中主题链接的正则（forum类型）")
+
+    @property
+    def key(self) -> str:
+        """状态存储中的键"""
+        return self.name or self.url
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "type": "forum",
+                "url": "https://www.thumpertalk.com/discover/",
+                "interval": 600,
+                "link_pattern": r"/topic/\d+"
+            }
+        }
+
+
+class DiscoveredEntry(BaseModel):
+    """从来源中发现的新增或更新条目"""
+    url: str = Field(..., description="条目URL")
+    source: str = Field(..., description="来源名称")
+    title: Optional[str] = Field(None, description="条目标题")
+    updated: Optional[datetime] = Field(None, description="发布/更新/最后回复时间")
+
+
+class BoardTopic(BaseModel):
+    """论坛版块列表页中的主题"""
+    url: str = Field(..., description="主题URL")
+    board: str = Field(..., description="所在版块URL")
+    title: Optional[str] = Field(None, description="主题标题")
+    replies: Optional[int] = Field(None, description="回复数")
+    views: Optional[int] = Field(None, description="浏览数")
+    last_post: Optional[datetime] = Field(None, description="最后回复时间")
+    pinned: bool = Field(default=False, description="是否置顶")
+    reason: Optional[str] = Field(None, description="入队原因: new（活跃度达到阈值）/ updated（上次爬取后有新回复）")
@@ -0,0 +1,474 @@
+"""论坛版块爬取 - 遍历主题列表页，发现活跃或有新回复的帖子"""
+import asyncio
+import json
+import os
+import re
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional, List, Dict, Any, AsyncIterator, Iterable, Tuple
+from urllib.parse import urljoin
+from loguru import logger
+from lxml.html import HtmlElement, HTMLParser, document_fromstring
+
+from config import settings
+from src.models.source import BoardTopic
+from src.article_fetcher.parsers import ForumCommentParser
+from src.source_ingestion.parsers import DEFAULT_TOPIC_PATTERN, parse_date
+from src.utils.http_client import HTTPClient
+from src.utils.resources import get_resources, CRAWL_POOL
+from src.utils.rate_limiter import LANE_CRAWL
+from src.utils.url_canon import canonicalize_url
+
+
+def _has_class(name: str) -> str:
+    """XPath条件：class属性中包含完整的类名"""
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+
+def parse_count(text: Optional[str]) -> Optional[int]:
+    """
+    解析论坛显示的计数（"1,234"、"1.2k"、"3M"）
+
+    Args:
+        text: 计数文本
+
+    Returns:
+        整数，无法解析返回None
+    """
+    if not text:
+        return None
+    match = re.search(r"(\d[\d,]*(?:\.\d+)?)\s*([kKmM]?)", text)
+    if not match:
+        return None
+    value = float(match.group(1).replace(",", ""))
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(match.group(2).lower(), 1)
+    return int(value * multiplier)
+
+
+class BoardAdapter(ABC):
+    """论坛程序适配器：识别列表页并提取主题
+
+    分页由 ForumCommentParser.pages_from_tree 统一处理，适配器只负责主题行。
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def detect(self, tree: HtmlElement) -> bool:
+        """列表页是否属于该论坛程序"""
+        pass
+
+    @abstractmethod
+    def parse_topics(self, tree: HtmlElement, url: str) -> List[BoardTopic]:
+        """
+        提取列表页中的主题
+
+        Args:
+            tree: 列表页lxml文档树
+            url: 列表页URL（版块地址用 BoardTopic.board 表示，由调用方填入）
+
+        Returns:
+            主题列表（按页面顺序）
+        """
+        pass
+
+
+class IPSBoardAdapter(BoardAdapter):
+    """Invision Community（IPS，ThumperTalk）主题列表
+
+    每个主题是 li.ipsDataItem[data-rowid]：标题在 .ipsDataItem_title 中，
+    回复/浏览数在 ul.ipsDataItem_stats，最后回复时间在 .ipsDataItem_lastPoster 的 <time>。
+    """
+
+    name = "ips"
+
+    _ROWS = f'//li[{_has_class("ipsDataItem")}][@data-rowid]'
+
+    def detect(self, tree: HtmlElement) -> bool:
+        return bool(tree.xpath(self._ROWS))
+
+    def parse_topics(self, tree: HtmlElement, url: str) -> List[BoardTopic]:
+        topics = []
+        for row in tree.xpath(self._ROWS):
+            links = row.xpath(f'.//*[{_has_class("ipsDataItem_title")}]//a[@href]')
+            link = next((a for a in links if "/topic/" in a.get("href", "")), links[0] if links else None)
+            if link is None:
+                continue
+
+            replies = views = None
+            for stat in row.xpath(f'.//ul[{_has_class("ipsDataItem_stats")}]/li'):
+                number = stat.xpath(f'.//*[{_has_class("ipsDataItem_stats_number")}]')
+                label = " ".join(stat.xpath(f'.//*[{_has_class("ipsDataItem_stats_type")}]//text()')).lower()
+                value = parse_count(number[0].get("data-ipstooltip") or number[0].text_content()) if number else None
+                if "repl" in label:
+                    replies = value
+                elif "view" in label:
+                    views = value
+
+            times = row.xpath(f'.//*[{_has_class("ipsDataItem_lastPoster")}]//time/@datetime') or row.xpath(".//time/@datetime")
+            dates = [d for d in (parse_date(t) for t in times) if d]
+
+            pinned = "ipsDataItem_pinned" in row.get("class", "") or bool(
+                row.xpath('.//*[contains(@class, "fa-thumb-tack")]')
+            )
+            topics.append(BoardTopic(
+                url=ForumCommentParser.first_page_url(urljoin(url, link.get("href"))),
+                board=url,
+                title=link.text_content().strip() or None,
+                replies=replies,
+                views=views,
+                last_post=max(dates) if dates else None,
+                pinned=pinned,
+            ))
+        return topics
+
+
+class GenericBoardAdapter(BoardAdapter):
+    """通用列表页：按常见论坛程序的主题链接识别，取所在行最新的 <time> 作为最后回复时间
+
+    没有回复/浏览数，只能按最后回复时间判断变化。
+    """
+
+    name = "generic"
+
+    def __init__(self, link_pattern: Optional[str] = None):
+        self.pattern = re.compile(link_pattern or DEFAULT_TOPIC_PATTERN)
+
+    def detect(self, tree: HtmlElement) -> bool:
+        return True
+
+    def parse_topics(self, tree: HtmlElement, url: str) -> List[BoardTopic]:
+        topics: Dict[str, BoardTopic] = {}
+        for link in tree.xpath("//a[@href]"):
+            topic_url = urljoin(url, link.get("href"))
+            if not self.pattern.search(topic_url):
+                continue
+            topic_url = ForumCommentParser.first_page_url(topic_url)
+            row = next((a for a in link.iterancestors() if a.tag in ("li", "tr", "article")), None)
+            dates = [d for d in (parse_date(t) for t in row.xpath(".//time/@datetime"))] if row is not None else []
+            dates = [d for d in dates if d]
+            last_post = max(dates) if dates else None
+
+            existing = topics.get(topic_url)
+            if existing is None:
+                topics[topic_url] = BoardTopic(
+                    url=topic_url, board=url, title=link.text_content().strip() or None, last_post=last_post
+                )
+            elif last_post and (existing.last_post is None or last_post > existing.last_post):
+                existing.last_post = last_post
+        return list(topics.values())
+
+
+# 按顺序尝试，通用适配器兜底
+ADAPTERS: List[BoardAdapter] = [IPSBoardAdapter()]
+
+
+class BoardState:
+    """版块爬取状态：每个版块的最后回复水位和已知主题的计数，保存为JSON文件
+
+    只保留近期活跃的主题（见 prune），状态文件和保存开销随版块的活跃程度而不是总主题数增长。
+    """
+
+    def __init__(self, state_file: str):
+        """
+        初始化状态存储
+
+        Args:
+            state_file: 状态文件路径
+        """
+        self.state_file = Path(state_file)
+        # 版块URL -> {"watermark", "crawled_at",
+        #            "topics": {主题键: [回复数, 浏览数, 最后回复时间, 是否已入队, 最后在列表中看到的时间]}}
+        self._boards: Dict[str, Dict[str, Any]] = {}
+        self._load()
+
+    def _load(self):
+        """加载状态文件"""
+        if not self.state_file.exists():
+            return
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                self._boards = json.load(f).get("boards", {})
+        except Exception as e:
+            logger.warning(f"读取版块爬取状态失败 {self.state_file}: {e}")
+            return
+        logger.debug(f"已加载版块爬取状态: {len(self._boards)} 个版块")
+
+    def board(self, key: str) -> Dict[str, Any]:
+        """获取（必要时创建）版块状态"""
+        return self._boards.setdefault(key, {"watermark": None, "crawled_at": 0.0, "topics": {}})
+
+    def prune(self, key: str, retention: timedelta) -> int:
+        """
+        清理版块中长期没有活动的主题
+
+        最后回复时间早于水位减 retention 的主题被清理（按水位而不是当前时间计算，不受时钟影响）；
+        没有最后回复时间的主题按最后在列表中看到的时间清理。被清理的主题之后再有新回复时
+        会排到列表前面，按新主题重新判断是否入队。
+
+        Args:
+            key: 版块URL
+            retention: 保留时长
+
+        Returns:
+            清理的主题数
+        """
+        board = self.board(key)
+        topics = board["topics"]
+        watermark = datetime.fromisoformat(board["watermark"]) if board["watermark"] else None
+        post_cutoff = (watermark - retention).isoformat() if watermark else None
+        seen_cutoff = time.time() - retention.total_seconds()
+
+        stale = []
+        for topic_key, entry in topics.items():
+            last_post = entry[2]
+            # 旧版状态没有看到时间，按版块上次爬取的时间计
+            seen_at = entry[4] if len(entry) > 4 else board["crawled_at"]
+            if last_post:
+                if post_cutoff and datetime.fromisoformat(last_post) < datetime.fromisoformat(post_cutoff):
+                    stale.append(topic_key)
+            elif seen_at < seen_cutoff:
+                stale.append(topic_key)
+        for topic_key in stale:
+            del topics[topic_key]
+        if stale:
+            logger.debug(f"清理版块状态中的 {len(stale)} 个旧主题 (保留 {len(topics)} 个): {key}")
+        return len(stale)
+
+    def _write(self, data: Dict[str, Any]):
+        """原子写入状态文件（在线程中执行）"""
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_file.with_name(f"{self.state_file.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.state_file)
+
+    async def save(self):
+        """保存状态"""
+        data = {"saved_at": time.time(), "boards": self._boards}
+        try:
+            await asyncio.to_thread(self._write, data)
+            logger.debug(f"版块爬取状态已保存: {self.state_file}")
+        except Exception as e:
+            logger.warning(f"保存版块爬取状态失败: {e}")
+
+
+class BoardCrawler:
+    """论坛版块爬取器
+
+    先抓第一页确定论坛程序和总页数，其余列表页按 settings.board_page_concurrency
+    分批并发抓取，每页解析完立即产出入队的主题，不把整个版块读入内存。
+    列表按最后回复时间倒序排列，某一页的非置顶主题都不晚于上次爬取的水位时停止翻页。
+    请求经过HTTPClient，沿用robots.txt、域名限速和代理等控制。
+
+    入队规则：
+    - new：回复数或浏览数首次达到阈值（列表页没有计数时直接入队）
+    - updated：已入队过的主题回复数增加或最后回复时间更新
+    """
+
+    def __init__(self, http_client: Optional[HTTPClient] = None, state: Optional[BoardState] = None):
+        """
+        初始化爬取器
+
+        Args:
+            http_client: HTTP客户端，默认使用共享资源容器中的抓取连接池
+            state: 爬取状态，默认读取 settings.board_state_file
+        """
+        self.http_client = http_client
+        self.state = state or BoardState(settings.board_state_file)
+        self.min_replies = settings.board_min_replies
+        self.min_views = settings.board_min_views
+        self.max_pages = settings.board_max_pages
+        self.page_concurrency = max(1, settings.board_page_concurrency)
+        self.retention = timedelta(days=settings.board_topic_retention_days)
+        self._pagination = ForumCommentParser()
+
+        self.pages_fetched = 0
+        self.topics_seen = 0
+        self.topics_queued = 0
+
+    async def start(self):
+        """启动爬取器"""
+        if self.http_client is None:
+            self.http_client = await get_resources().http_client(CRAWL_POOL)
+
+    @staticmethod
+    def _parse_html(body: bytes, encoding: Optional[str]) -> Optional[HtmlElement]:
+        """构建lxml文档树"""
+        try:
+            parser = HTMLParser(encoding=encoding, collect_ids=False, remove_comments=True) if encoding else None
+            return document_fromstring(body, parser=parser)
+        except Exception as e:
+            logger.debug(f"列表页解析失败: {e}")
+            return None
+
+    async def _fetch_page(self, url: str) -> Optional[HtmlElement]:
+        """
+        抓取一个列表页
+
+        Args:
+            url: 列表页URL
+
+        Returns:
+            lxml文档树，失败返回None
+        """
+        try:
+            if not await self.http_client.check_robots(url, LANE_CRAWL):
+                logger.warning(f"robots.txt禁止抓取列表页: {url}")
+                return None
+            # 列表页变化频繁，即使仍在HTTP缓存新鲜期内也向源站重新验证
+            response = await self.http_client.get(
+                url,
+                headers={"Cache-Control": "no-cache"},
+                max_bytes=settings.fetch_max_html_mb * 1024 * 1024,
+                priority=LANE_CRAWL
+            )
+        except Exception as e:
+            logger.warning(f"列表页抓取失败 {url}: {e}")
+            return None
+        self.pages_fetched += 1
+        return self._parse_html(response.content, response.charset_encoding)
+
+    def _decide(self, topic: BoardTopic, previous: Optional[list], horizon: Optional[datetime]) -> Optional[str]:
+        """判断主题是否入队，返回入队原因"""
+        if previous is None and horizon and topic.last_post and topic.last_post < horizon:
+            # 早于保留窗口的主题已从状态中清理，没有新回复时不当作新主题
+            return None
+        if topic.replies is None and topic.views is None:
+            active = True
+        else:
+            active = (topic.replies or 0) >= self.min_replies or (topic.views or 0) >= self.min_views
+        if previous is None or not previous[3]:
+            return "new" if active else None
+
+        old_replies, old_last_post = previous[0], previous[2]
+        if topic.replies is not None and old_replies is not None and topic.replies > old_replies:
+            return "updated"
+        if topic.last_post and old_last_post and topic.last_post > datetime.fromisoformat(old_last_post):
+            return "updated"
+        return None
+
+    def _process(self, topics: List[BoardTopic], known: Dict[str, list], horizon: Optional[datetime]) -> List[BoardTopic]:
+        """更新主题状态并返回需要入队的主题（horizon 为状态保留窗口的起点）"""
+        queued = []
+        now = time.time()
+        for topic in topics:
+            self.topics_seen += 1
+            key = canonicalize_url(topic.url, settings.url_tracking_params)
+            previous = known.get(key)
+            topic.reason = self._decide(topic, previous, horizon)
+            was_queued = bool(previous and previous[3])
+            known[key] = [
+                topic.replies,
+                topic.views,
+                topic.last_post.isoformat() if topic.last_post else None,
+                was_queued or topic.reason is not None,
+                now,
+            ]
+            if topic.reason:
+                queued.append(topic)
+        self.topics_queued += len(queued)
+        return queued
+
+    @staticmethod
+    def _is_stale(topics: List[BoardTopic], watermark: Optional[datetime]) -> bool:
+        """该页的非置顶主题是否都不晚于上次的水位（之后的页只会更旧）"""
+        if watermark is None:
+            return False
+        regular = [t for t in topics if not t.pinned]
+        return bool(regular) and all(t.last_post is not None and t.last_post <= watermark for t in regular)
+
+    async def crawl(self, board_url: str, link_pattern: Optional[str] = None) -> AsyncIterator[BoardTopic]:
+        """
+        爬取一个版块，逐页产出需要入队的主题
+
+        Args:
+            board_url: 版块（主题列表）URL
+            link_pattern: 通用适配器使用的主题链接正则
+
+        Yields:
+            入队的主题（reason 为 new 或 updated）
+        """
+        await self.start()
+        start_time = time.time()
+        board = self.state.board(board_url)
+        watermark = datetime.fromisoformat(board["watermark"]) if board["watermark"] else None
+        newest = watermark
+        horizon = watermark - self.retention if watermark else None
+        complete = True
+
+        tree = await self._fetch_page(board_url)
+        if tree is None:
+            return
+        adapter = next((a for a in ADAPTERS if a.detect(tree)), None) or GenericBoardAdapter(link_pattern)
+        current, pages = self._pagination.pages_from_tree(tree, board_url)
+        last_page = min(max(pages), self.max_pages)
+        logger.info(f"爬取版块 ({adapter.name}, 共 {max(pages)} 页): {board_url}")
+
+        page_no = current
+        stale = False
+        try:
+            queue: List[Tuple[int, Optional[HtmlElement]]] = [(current, tree)]
+            while queue:
+                # 按页码顺序处理本批列表页
+                for page_no, page_tree in queue:
+                    if page_tree is None:
+                        complete = False
+                        continue
+                    topics = adapter.parse_topics(page_tree, board_url)
+                    for topic in topics:
+                        if not topic.pinned and topic.last_post and (newest is None or topic.last_post > newest):
+                            newest = topic.last_post
+                    for topic in self._process(topics, board["topics"], horizon):
+                        yield topic
+                    if self._is_stale(topics, watermark):
+                        stale = True
+                        break
+                if stale:
+                    break
+
+                # 下一批列表页并发抓取
+                batch = [n for n in sorted(pages) if page_no < n <= last_page][:self.page_concurrency]
+                trees = await asyncio.gather(*(self._fetch_page(pages[n]) for n in batch))
+                queue = list(zip(batch, trees))
+        finally:
+            # 有列表页失败时不推进水位，下次仍会翻到这些页
+            if complete and newest is not None:
+                board["watermark"] = newest.isoformat()
+            self.state.prune(board_url, self.retention)
+            board["crawled_at"] = time.time()
+            await self.state.save()
+
+        logger.info(
+            f"版块爬取完成: 遍历到第 {page_no} 页{'（之后的主题无变化）' if stale else ''}, "
+            f"耗时 {time.time() - start_time:.2f}秒: {board_url}"
+        )
+
+    async def crawl_many(self, board_urls: Iterable[str]) -> AsyncIterator[BoardTopic]:
+        """
+        依次爬取多个版块
+
+        Args:
+            board_urls: 版块URL列表
+
+        Yields:
+            入队的主题
+        """
+        for board_url in board_urls:
+            async for topic in self.crawl(board_url):
+                yield topic
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取爬取统计
+
+        Returns:
+            {pages_fetched, topics_seen, topics_queued}
+        """
+        return {
+            "pages_fetched": self.pages_fetched,
+            "topics_seen": self.topics_seen,
+            "topics_queued": self.topics_queued,
+        }
@@ -0,0 +1,284 @@
+"""来源解析器 - 流式解析RSS/Atom/站点地图，解析论坛新主题列表"""
+import re
+import zlib
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional, List, Iterator, Union
+from urllib.parse import urljoin, urlsplit, urlunsplit
+from loguru import logger
+from bs4 import BeautifulSoup
+from lxml import etree
+
+
+# 文档类型
+KIND_RSS = "rss"
+KIND_ATOM = "atom"
+KIND_URLSET = "urlset"
+KIND_SITEMAP_INDEX = "sitemapindex"
+
+# 根元素 -> 文档类型
+_ROOT_KINDS = {
+    "rss": KIND_RSS,
+    "RDF": KIND_RSS,
+    "feed": KIND_ATOM,
+    "urlset": KIND_URLSET,
+    "sitemapindex": KIND_SITEMAP_INDEX,
+}
+
+# 文档类型 -> 条目元素
+_ITEM_TAGS = {
+    KIND_RSS: "item",
+    KIND_ATOM: "entry",
+    KIND_URLSET: "url",
+    KIND_SITEMAP_INDEX: "sitemap",
+}
+
+# 常见论坛程序的主题链接（IPS / XenForo / Discourse / phpBB）
+DEFAULT_TOPIC_PATTERN = r"/topic/\d+|/threads/[^/]+\.\d+|/t/[^/]+/\d+|viewtopic\.php\?(?:.*&)?t=\d+"
+
+
+class FeedItem:
+    """解析出的条目（文章，或站点地图索引中的子站点地图）"""
+
+    __slots__ = ("url", "id", "title", "updated", "is_sitemap")
+
+    def __init__(
+        self,
+        url: str,
+        id: Optional[str] = None,
+        title: Optional[str] = None,
+        updated: Optional[datetime] = None,
+        is_sitemap: bool = False
+    ):
+        self.url = url
+        self.id = id or url
+        self.title = title
+        self.updated = updated
+        self.is_sitemap = is_sitemap
+
+
+def parse_date(text: Optional[str]) -> Optional[datetime]:
+    """
+    解析W3C/ISO 8601或RFC 822格式的时间，统一为UTC
+
+    Args:
+        text: 时间字符串
+
+    Returns:
+        带时区的datetime，无法解析返回None
+    """
+    if not text:
+        return None
+    text = text.strip()
+    value = None
+    try:
+        value = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            value = parsedate_to_datetime(text)
+        except (TypeError, ValueError, IndexError):
+            return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _local(tag) -> str:
+    """去掉命名空间的元素名"""
+    if not isinstance(tag, str):
+        return ""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _child_text(elem, *names: str) -> Optional[str]:
+    """按顺序查找第一个存在且有文本的子元素"""
+    for name in names:
+        for child in elem:
+            if _local(child.tag) == name and child.text and child.text.strip():
+                return child.text.strip()
+    return None
+
+
+class StreamingFeedParser:
+    """流式XML解析器
+
+    按块喂入响应体，每解析完一个条目立即产出并释放对应的元素，
+    内存占用与文档大小无关。根据根元素自动识别RSS、Atom、
+    站点地图和站点地图索引；.gz 站点地图会先流式解压。
+    """
+
+    def __init__(self, base_url: str, max_bytes: Optional[int] = None):
+        """
+        初始化解析器
+
+        Args:
+            base_url: 文档URL，用于补全相对链接
+            max_bytes: 解压后的文档大小上限，超过时抛出ValueError
+        """
+        self.base_url = base_url
+        self.max_bytes = max_bytes
+        self.kind: Optional[str] = None
+        self.bytes_parsed = 0
+        self._parser = etree.XMLPullParser(
+            events=("start", "end"),
+            resolve_entities=False,
+            no_network=True,
+            huge_tree=True,
+            recover=True,
+        )
+        self._decompressor = None
+        self._started = False
+
+    def feed(self, data: bytes) -> List[FeedItem]:
+        """
+        喂入一块数据
+
+        Args:
+            data: 响应体数据块
+
+        Returns:
+            这块数据中解析完成的条目
+        """
+        if not data:
+            return []
+        if not self._started:
+            self._started = True
+            # 站点地图常以 .xml.gz 文件提供（不是Content-Encoding）
+            if data[:2] == b"\x1f\x8b":
+                self._decompressor = zlib.decompressobj(wbits=31)
+        if self._decompressor is not None:
+            data = self._decompressor.decompress(data)
+
+        self.bytes_parsed += len(data)
+        if self.max_bytes is not None and self.bytes_parsed > self.max_bytes:
+            raise ValueError(f"文档超过 {self.max_bytes / 1024 / 1024:.0f} MB 上限: {self.base_url}")
+
+        self._parser.feed(data)
+        return list(self._drain())
+
+    def close(self) -> List[FeedItem]:
+        """结束解析，返回剩余条目"""
+        if self._decompressor is not None:
+            tail = self._decompressor.flush()
+            if tail:
+                self._parser.feed(tail)
+        try:
+            self._parser.close()
+        except etree.XMLSyntaxError as e:
+            logger.debug(f"XML结尾不完整: {self.base_url} ({e})")
+        return list(self._drain())
+
+    def _drain(self) -> Iterator[FeedItem]:
+        """取出已解析完成的条目并释放元素"""
+        for event, elem in self._parser.read_events():
+            tag = _local(elem.tag)
+            if event == "start":
+                if self.kind is None:
+                    self.kind = _ROOT_KINDS.get(tag, tag)
+                continue
+            if self.kind not in _ITEM_TAGS or tag != _ITEM_TAGS[self.kind]:
+                continue
+
+            item = self._extract(elem)
+            # 释放已处理的元素，避免整棵树留在内存中
+            elem.clear(keep_tail=True)
+            parent = elem.getparent()
+            if parent is not None:
+                while elem.getprevious() is not None:
+                    del parent[0]
+            if item is not None:
+                yield item
+
+    def _extract(self, elem) -> Optional[FeedItem]:
+        """从条目元素中提取链接、标识、标题和时间"""
+        if self.kind in (KIND_URLSET, KIND_SITEMAP_INDEX):
+            loc = _child_text(elem, "loc")
+            if not loc:
+                return None
+            return FeedItem(
+                url=urljoin(self.base_url, loc),
+                updated=parse_date(_child_text(elem, "lastmod")),
+                is_sitemap=self.kind == KIND_SITEMAP_INDEX,
+            )
+
+        if self.kind == KIND_ATOM:
+            link = None
+            for child in elem:
+                if _local(child.tag) == "link" and child.get("rel", "alternate") == "alternate" and child.get("href"):
+                    link = child.get("href")
+                    break
+            entry_id = _child_text(elem, "id")
+            updated = _child_text(elem, "updated", "published")
+        else:
+            link = _child_text(elem, "link")
+            entry_id = _child_text(elem, "guid")
+            if not link and entry_id and entry_id.startswith("http"):
+                link = entry_id
+            updated = _child_text(elem, "pubDate", "date", "updated")
+
+        if not link:
+            return None
+        return FeedItem(
+            url=urljoin(self.base_url, link),
+            id=entry_id,
+            title=_child_text(elem, "title"),
+            updated=parse_date(updated),
+        )
+
+
+def parse_forum_topics(
+    html: Union[str, bytes],
+    base_url: str,
+    link_pattern: Optional[str] = None,
+    encoding: Optional[str] = None
+) -> List[FeedItem]:
+    """
+    解析论坛"新主题/最新回复"列表页
+
+    每个主题取所在行（li/tr/article）中最新的 <time datetime> 作为最后活动时间，
+    有新回复的旧主题也会被识别为更新。
+
+    Args:
+        html: 列表页HTML
+        base_url: 列表页URL
+        link_pattern: 主题链接正则，默认匹配常见论坛程序
+        encoding: 响应头声明的编码（html为字节时使用）
+
+    Returns:
+        主题列表（同一主题只保留一条）
+    """
+    pattern = re.compile(link_pattern or DEFAULT_TOPIC_PATTERN)
+    if isinstance(html, bytes):
+        soup = BeautifulSoup(html, "lxml", from_encoding=encoding)
+    else:
+        soup = BeautifulSoup(html, "lxml")
+
+    topics: dict = {}
+    for link in soup.find_all("a", href=True):
+        url = urljoin(base_url, link["href"])
+        if not pattern.search(url):
+            continue
+        parts = urlsplit(url)
+        # 去掉跳转到某条回复的参数和锚点，同一主题只保留一个URL
+        query = parts.query if "viewtopic" in parts.path else ""
+        url = urlunsplit((parts.scheme, parts.netloc, parts.path, query, ""))
+
+        row = link.find_parent(["li", "tr", "article"])
+        updated = None
+        if row is not None:
+            for time_elem in row.find_all("time", datetime=True):
+                value = parse_date(time_elem["datetime"])
+                if value and (updated is None or value > updated):
+                    updated = value
+
+        title = link.get_text(strip=True) or None
+        existing = topics.get(url)
+        if existing is None:
+            topics[url] = FeedItem(url=url, title=title, updated=updated)
+        else:
+            if not existing.title and title:
+                existing.title = title
+            if updated and (existing.updated is None or updated > existing.updated):
+                existing.updated = updated
+
+    return list(topics.values())
@@ -0,0 +1,356 @@
+"""来源轮询 - 定时轮询订阅源、站点地图和论坛列表页，只产出新增或更新的条目"""
+import asyncio
+import time
+from typing import Optional, List, Dict, Any, AsyncIterator, Callable
+from loguru import logger
+from pydantic import ValidationError
+
+from config import settings
+from src.models.source import IngestSource, SourceType, DiscoveredEntry
+from src.source_ingestion.parsers import FeedItem, StreamingFeedParser, parse_forum_topics
+from src.source_ingestion.state import IngestState, SourceState, DocumentState
+from src.utils.http_client import HTTPClient
+from src.utils.resources import get_resources, CRAWL_POOL
+from src.utils.rate_limiter import LANE_CRAWL
+
+
+class SourcePoller:
+    """单个来源的增量轮询
+
+    所有文档都带 If-None-Match / If-Modified-Since 请求，304时不解析；
+    站点地图索引中lastmod未变化的子站点地图不再请求；文档本身边下载边解析，
+    不整体读入内存。条目的判断规则：
+
+    - 订阅源/论坛列表：标识没见过，或更新时间晚于水位
+    - 站点地图：lastmod晚于水位；没有lastmod的条目在所在文档变化时入队，由下游去重
+    - 首次轮询时按来源的backfill决定是否把已有条目全部入队
+    """
+
+    # 站点地图索引最大嵌套层数
+    MAX_SITEMAP_DEPTH = 3
+
+    def __init__(self, http_client: HTTPClient, state: IngestState, max_document_bytes: int):
+        """
+        初始化轮询器
+
+        Args:
+            http_client: HTTP客户端
+            state: 轮询状态存储
+            max_document_bytes: 单个文档（解压后）的大小上限
+        """
+        self.http_client = http_client
+        self.state = state
+        self.max_document_bytes = max_document_bytes
+
+        self.documents_fetched = 0
+        self.not_modified = 0
+        self.documents_skipped = 0
+        self.bytes_parsed = 0
+
+    async def poll(self, source: IngestSource) -> List[DiscoveredEntry]:
+        """
+        轮询一个来源
+
+        Args:
+            source: 来源配置
+
+        Returns:
+            新增或更新的条目
+        """
+        source_state = self.state.source(source.key)
+        if source.type == SourceType.SITEMAP:
+            items = await self._poll_sitemap(source, source_state)
+        elif source.type == SourceType.FORUM:
+            items = await self._poll_listing(source, source_state, forum=True)
+        else:
+            items = await self._poll_listing(source, source_state, forum=False)
+
+        source_state.polled_at = time.time()
+        return [
+            DiscoveredEntry(url=item.url, source=source.key, title=item.title, updated=item.updated)
+            for item in items
+        ]
+
+    async def _fetch_document(
+        self,
+        url: str,
+        doc: DocumentState,
+        on_item: Callable[[FeedItem], None],
+        forum: bool = False,
+        link_pattern: Optional[str] = None
+    ) -> bool:
+        """
+        条件请求并流式解析一个文档
+
+        Args:
+            url: 文档URL
+            doc: 文档状态（整个文档处理完后才更新验证器，中途失败下次重新处理）
+            on_item: 每解析出一个条目调用一次
+            forum: 是否是论坛HTML列表页
+            link_pattern: 论坛主题链接正则
+
+        Returns:
+            文档是否有变化（304时为False）
+        """
+        async with self.http_client.stream(url, doc.conditional_headers(), priority=LANE_CRAWL) as response:
+            if response.status_code == 304:
+                self.not_modified += 1
+                logger.debug(f"来源未变化: {url}")
+                return False
+            response.raise_for_status()
+            self.documents_fetched += 1
+
+            if forum:
+                # 列表页只有一屏主题，直接读完再解析
+                body = bytearray()
+                async for chunk in response.aiter_bytes():
+                    body.extend(chunk)
+                    if len(body) > self.max_document_bytes:
+                        raise ValueError(f"列表页超过大小上限: {url}")
+                self.bytes_parsed += len(body)
+                for item in parse_forum_topics(bytes(body), str(response.url), link_pattern, response.charset_encoding):
+                    on_item(item)
+            else:
+                parser = StreamingFeedParser(str(response.url), self.max_document_bytes)
+                async for chunk in response.aiter_bytes():
+                    for item in parser.feed(chunk):
+                        on_item(item)
+                for item in parser.close():
+                    on_item(item)
+                self.bytes_parsed += parser.bytes_parsed
+
+            doc.etag = response.headers.get("ETag")
+            doc.last_modified = response.headers.get("Last-Modified")
+        return True
+
+    async def _poll_listing(self, source: IngestSource, state: SourceState, forum: bool) -> List[FeedItem]:
+        """轮询订阅源或论坛列表页"""
+        doc = state.document(source.url)
+        include_new = source.backfill or not state.first_poll
+        watermark = doc.watermark
+        newest = watermark
+        changed: List[FeedItem] = []
+        # 本次解析出的条目标识，整个文档处理完后才记入状态，中途失败的条目下次仍是新条目
+        ids: Dict[str, None] = {}
+
+        def on_item(item: FeedItem):
+            nonlocal newest
+            is_new = not state.seen(item.id) and item.id not in ids
+            is_updated = item.updated is not None and watermark is not None and item.updated > watermark
+            if (is_new or is_updated) and include_new:
+                changed.append(item)
+            ids[item.id] = None
+            if item.updated and (newest is None or item.updated > newest):
+                newest = item.updated
+
+        if not await self._fetch_document(source.url, doc, on_item, forum=forum, link_pattern=source.link_pattern):
+            return []
+        for item_id in ids:
+            state.remember(item_id)
+        doc.watermark = newest
+        total = len(ids)
+
+        logger.info(f"来源 {source.key}: {total} 个条目, 新增/更新 {len(changed)} 个")
+        return changed
+
+    async def _poll_sitemap(self, source: IngestSource, state: SourceState) -> List[FeedItem]:
+        """轮询站点地图（递归处理站点地图索引）"""
+        changed: List[FeedItem] = []
+        include_existing = source.backfill or not state.first_poll
+        await self._walk_sitemap(source.url, state, include_existing, changed, depth=0)
+        logger.info(f"来源 {source.key}: 新增/更新 {len(changed)} 个条目")
+        return changed
+
+    async def _walk_sitemap(
+        self,
+        url: str,
+        state: SourceState,
+        include_existing: bool,
+        changed: List[FeedItem],
+        depth: int
+    ):
+        """处理一个站点地图文档，变化的条目追加到changed"""
+        doc = state.document(url)
+        watermark = doc.watermark
+        newest = watermark
+        children: List[FeedItem] = []
+
+        def on_item(item: FeedItem):
+            # 边解析边过滤，只保留变化的条目
+            nonlocal newest
+            if item.is_sitemap:
+                children.append(item)
+                return
+            if watermark is None:
+                is_changed = include_existing
+            else:
+                is_changed = item.updated is None or item.updated > watermark
+            if is_changed:
+                changed.append(item)
+            if item.updated and (newest is None or item.updated > newest):
+                newest = item.updated
+
+        if not await self._fetch_document(url, doc, on_item):
+            return
+        doc.watermark = newest
+
+        if depth >= self.MAX_SITEMAP_DEPTH:
+            if children:
+                logger.warning(f"站点地图嵌套过深，忽略 {len(children)} 个子站点地图: {url}")
+            return
+
+        for child in children:
+            child_doc = state.document(child.url)
+            if child.updated and child_doc.lastmod and child.updated <= child_doc.lastmod:
+                self.documents_skipped += 1
+                continue
+            try:
+                await self._walk_sitemap(child.url, state, include_existing, changed, depth + 1)
+            except Exception as e:
+                # 子站点地图失败不影响其他子站点地图，lastmod不更新，下次重试
+                logger.warning(f"子站点地图处理失败 {child.url}: {e}")
+                continue
+            child_doc.lastmod = child.updated
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取轮询统计
+
+        Returns:
+            {documents_fetched, not_modified, documents_skipped, bytes_parsed}
+        """
+        return {
+            "documents_fetched": self.documents_fetched,
+            "not_modified": self.not_modified,
+            "documents_skipped": self.documents_skipped,
+            "bytes_parsed": self.bytes_parsed,
+        }
+
+
+class IngestionService:
+    """来源采集服务
+
+    按各来源的轮询间隔调度轮询（上次轮询时间持久化，重启后沿用），
+    以异步迭代的方式产出新发现的条目，可直接交给 ArticleFetcher.fetch_iter。
+    """
+
+    def __init__(
+        self,
+        sources: List[IngestSource],
+        http_client: Optional[HTTPClient] = None,
+        state: Optional[IngestState] = None
+    ):
+        """
+        初始化采集服务
+
+        Args:
+            sources: 来源列表
+            http_client: HTTP客户端，默认使用共享资源容器中的抓取连接池
+            state: 轮询状态，默认读取 settings.ingest_state_file
+        """
+        self.sources = sources
+        self.http_client = http_client
+        self.state = state or IngestState(settings.ingest_state_file, settings.ingest_recent_ids)
+        self._poller: Optional[SourcePoller] = None
+        # 来源键 -> 最近一次轮询失败的时间（失败后也等一个间隔再试）
+        self._failed_at: Dict[str, float] = {}
+        self.discovered = 0
+
+    @classmethod
+    def from_settings(cls) -> "IngestionService":
+        """按 settings.ingest_sources 创建采集服务（无效的来源配置会被跳过）"""
+        sources = []
+        for raw in settings.ingest_sources:
+            try:
+                sources.append(IngestSource(**raw))
+            except ValidationError as e:
+                logger.warning(f"忽略无效的来源配置 {raw}: {e}")
+        return cls(sources)
+
+    async def start(self):
+        """启动采集服务"""
+        if self.http_client is None:
+            self.http_client = await get_resources().http_client(CRAWL_POOL)
+        if self._poller is None:
+            self._poller = SourcePoller(
+                self.http_client,
+                self.state,
+                settings.ingest_max_document_mb * 1024 * 1024
+            )
+
+    def _interval(self, source: IngestSource) -> float:
+        """来源的轮询间隔（秒）"""
+        return float(source.interval or settings.ingest_default_interval)
+
+    def _next_poll_at(self, source: IngestSource) -> float:
+        """来源下次轮询的时间戳"""
+        last = max(self.state.source(source.key).polled_at, self._failed_at.get(source.key, 0.0))
+        return last + self._interval(source)
+
+    async def _poll_safely(self, source: IngestSource) -> List[DiscoveredEntry]:
+        """轮询一个来源，失败时记录日志并推迟到下个间隔"""
+        try:
+            return await self._poller.poll(source)
+        except Exception as e:
+            self._failed_at[source.key] = time.time()
+            logger.warning(f"轮询来源失败 {source.key}: {e}")
+            return []
+
+    async def poll_once(self, force: bool = False) -> List[DiscoveredEntry]:
+        """
+        并发轮询所有到期的来源
+
+        Args:
+            force: 忽略轮询间隔，轮询全部来源
+
+        Returns:
+            新发现的条目（同一轮中多个来源重复的URL只保留一次）
+        """
+        await self.start()
+        now = time.time()
+        due = [s for s in self.sources if force or self._next_poll_at(s) <= now]
+        if not due:
+            return []
+
+        results = await asyncio.gather(*(self._poll_safely(s) for s in due))
+        await self.state.save()
+
+        entries = []
+        seen = set()
+        for entry in (e for batch in results for e in batch):
+            if entry.url not in seen:
+                seen.add(entry.url)
+                entries.append(entry)
+        self.discovered += len(entries)
+        logger.info(f"轮询 {len(due)} 个来源, 发现 {len(entries)} 个新增/更新条目")
+        return entries
+
+    async def run(self, once: bool = False) -> AsyncIterator[DiscoveredEntry]:
+        """
+        持续轮询并产出新条目
+
+        Args:
+            once: 只轮询一次全部来源后结束
+
+        Yields:
+            新增或更新的条目
+        """
+        if not self.sources:
+            logger.warning("没有配置来源 (INGEST_SOURCES)")
+            return
+
+        while True:
+            for entry in await self.poll_once(force=once):
+                yield entry
+            if once:
+                return
+            wait = max(1.0, min(self._next_poll_at(s) for s in self.sources) - time.time())
+            logger.debug(f"{wait:.0f}秒后轮询下一个来源")
+            await asyncio.sleep(wait)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取采集统计"""
+        stats: Dict[str, Any] = {"sources": len(self.sources), "discovered": self.discovered}
+        if self._poller is not None:
+            stats.update(self._poller.stats())
+        return stats
@@ -0,0 +1,153 @@
+"""来源轮询状态 - 条件请求验证器、lastmod水位和最近条目的持久化"""
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, Any, Deque
+from loguru import logger
+
+
+class DocumentState:
+    """单个文档（订阅源、站点地图、列表页）的轮询状态"""
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        data = data or {}
+        # 条件请求验证器
+        self.etag: Optional[str] = data.get("etag")
+        self.last_modified: Optional[str] = data.get("last_modified")
+        # 站点地图索引中声明的lastmod（子站点地图未变化时不再请求）
+        self.lastmod: Optional[datetime] = self._parse(data.get("lastmod"))
+        # 已处理条目中最新的发布/更新时间
+        self.watermark: Optional[datetime] = self._parse(data.get("watermark"))
+
+    @staticmethod
+    def _parse(value: Optional[str]) -> Optional[datetime]:
+        return datetime.fromisoformat(value) if value else None
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """生成条件请求头"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可持久化的字典"""
+        return {
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "lastmod": self.lastmod.isoformat() if self.lastmod else None,
+            "watermark": self.watermark.isoformat() if self.watermark else None,
+        }
+
+
+class SourceState:
+    """单个来源的轮询状态"""
+
+    def __init__(self, max_recent_ids: int, data: Optional[Dict[str, Any]] = None):
+        data = data or {}
+        self.polled_at: float = data.get("polled_at", 0.0)
+        # 最近见过的条目标识（订阅源和论坛列表按标识判断新条目）
+        self.recent_ids: Deque[str] = deque(data.get("recent_ids", []), maxlen=max_recent_ids)
+        self._recent_set = set(self.recent_ids)
+        self.documents: Dict[str, DocumentState] = {
+            url: DocumentState(doc) for url, doc in data.get("documents", {}).items()
+        }
+
+    @property
+    def first_poll(self) -> bool:
+        """是否从未成功轮询过"""
+        return not self.polled_at
+
+    def document(self, url: str) -> DocumentState:
+        """获取（必要时创建）文档状态"""
+        doc = self.documents.get(url)
+        if doc is None:
+            doc = DocumentState()
+            self.documents[url] = doc
+        return doc
+
+    def seen(self, item_id: str) -> bool:
+        """条目是否见过"""
+        return item_id in self._recent_set
+
+    def remember(self, item_id: str):
+        """记录条目标识（超过上限时淘汰最早的）"""
+        if item_id in self._recent_set:
+            return
+        if len(self.recent_ids) == self.recent_ids.maxlen:
+            self._recent_set.discard(self.recent_ids[0])
+        self.recent_ids.append(item_id)
+        self._recent_set.add(item_id)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可持久化的字典"""
+        return {
+            "polled_at": self.polled_at,
+            "recent_ids": list(self.recent_ids),
+            "documents": {url: doc.to_dict() for url, doc in self.documents.items()},
+        }
+
+
+class IngestState:
+    """所有来源的轮询状态，保存为JSON文件"""
+
+    def __init__(self, state_file: str, max_recent_ids: int = 5000):
+        """
+        初始化状态存储
+
+        Args:
+            state_file: 状态文件路径
+            max_recent_ids: 每个来源保留的最近条目标识数
+        """
+        self.state_file = Path(state_file)
+        self.max_recent_ids = max(1, max_recent_ids)
+        self._sources: Dict[str, SourceState] = {}
+        self._load()
+
+    def _load(self):
+        """加载状态文件"""
+        if not self.state_file.exists():
+            return
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"读取来源轮询状态失败 {self.state_file}: {e}")
+            return
+        for key, source in data.get("sources", {}).items():
+            self._sources[key] = SourceState(self.max_recent_ids, source)
+        logger.debug(f"已加载来源轮询状态: {len(self._sources)} 个来源")
+
+    def source(self, key: str) -> SourceState:
+        """获取（必要时创建）来源状态"""
+        state = self._sources.get(key)
+        if state is None:
+            state = SourceState(self.max_recent_ids)
+            self._sources[key] = state
+        return state
+
+    def _write(self, data: Dict[str, Any]):
+        """原子写入状态文件（在线程中执行）"""
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_file.with_name(f"{self.state_file.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.state_file)
+
+    async def save(self):
+        """保存状态"""
+        data = {
+            "saved_at": time.time(),
+            "sources": {key: state.to_dict() for key, state in self._sources.items()},
+        }
+        try:
+            await asyncio.to_thread(self._write, data)
+            logger.debug(f"来源轮询状态已保存: {self.state_file}")
+        except Exception as e:
+            logger.warning(f"保存来源轮询状态失败: {e}")
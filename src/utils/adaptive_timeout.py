@@ -0,0 +1,254 @@
+"""自适应超时 - 按域名从历史延迟分布学习连接/读取/总耗时超时"""
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from pathlib import Path
+from typing import Optional, Dict, Deque, Tuple
+from loguru import logger
+import httpx
+
+from config import settings
+
+
+class TotalTimeoutError(httpx.TimeoutException):
+    """请求总耗时超过预算"""
+
+
+# 超时阶段
+PHASE_CONNECT = "connect"
+PHASE_READ = "read"
+PHASE_TOTAL = "total"
+PHASES = (PHASE_CONNECT, PHASE_READ, PHASE_TOTAL)
+
+
+class _HostLatency:
+    """单个域名各阶段最近的延迟样本"""
+
+    def __init__(self, max_samples: int):
+        self.samples: Dict[str, Deque[float]] = {phase: deque(maxlen=max_samples) for phase in PHASES}
+        self.updated_at = time.time()
+
+
+class AdaptiveTimeouts:
+    """按域名学习的超时
+
+    每个域名分别保留连接、读取（等待响应头）、总耗时最近的样本，
+    超时 = 百分位延迟 × 系数，并限制在上下限之内。样本不足时使用默认值。
+    发生超时时把当时的超时值记为一个样本，慢但正常的域名会逐渐放宽超时。
+    样本保存到JSON文件，下次运行直接沿用。
+    """
+
+    # 过期不再保存的域名（秒）
+    STALE_SECONDS = 30 * 24 * 3600
+
+    def __init__(
+        self,
+        state_file: str,
+        percentile: float,
+        factor: float,
+        bounds: Dict[str, Tuple[float, float]],
+        defaults: Dict[str, Optional[float]],
+        min_samples: int = 20,
+        max_samples: int = 200
+    ):
+        """
+        初始化自适应超时
+
+        Args:
+            state_file: 样本持久化文件
+            percentile: 使用的百分位（0~1），如0.99
+            factor: 百分位延迟的放大系数
+            bounds: 各阶段超时上下限 {阶段: (下限, 上限)}
+            defaults: 样本不足时各阶段的默认超时，None表示不限制
+            min_samples: 开始使用学习值所需的最少样本数
+            max_samples: 每个阶段保留的最近样本数
+        """
+        self.state_file = Path(state_file)
+        self.percentile = min(max(percentile, 0.5), 1.0)
+        self.factor = max(1.0, factor)
+        self.bounds = bounds
+        self.defaults = defaults
+        self.min_samples = max(1, min_samples)
+        self.max_samples = max(self.min_samples, max_samples)
+
+        self._hosts: Dict[str, _HostLatency] = {}
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        """加载持久化的样本"""
+        if not self.state_file.exists():
+            return
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"读取超时学习数据失败 {self.state_file}: {e}")
+            return
+
+        for host, entry in data.get("hosts", {}).items():
+            latency = _HostLatency(self.max_samples)
+            latency.updated_at = entry.get("updated_at", 0)
+            for phase in PHASES:
+                latency.samples[phase].extend(entry.get(phase, []))
+            self._hosts[host] = latency
+        logger.debug(f"已加载超时学习数据: {len(self._hosts)} 个域名")
+
+    def _host(self, host: str) -> _HostLatency:
+        """获取域名样本"""
+        latency = self._hosts.get(host)
+        if latency is None:
+            latency = _HostLatency(self.max_samples)
+            self._hosts[host] = latency
+        return latency
+
+    def observe(self, host: str, phase: str, seconds: float):
+        """
+        记录一个延迟样本
+
+        Args:
+            host: 域名
+            phase: 阶段（connect / read / total）
+            seconds: 耗时（秒）
+        """
+        latency = self._host(host)
+        latency.samples[phase].append(round(seconds, 4))
+        latency.updated_at = time.time()
+        self._dirty = True
+
+    def observe_timeout(self, host: str, error: httpx.TimeoutException, budget: Optional[httpx.Timeout], total: Optional[float]):
+        """
+        记录一次超时（以当时的超时值作为样本，使学习值逐步放宽）
+
+        Args:
+            host: 域名
+            error: 超时异常
+            budget: 本次请求使用的超时
+            total: 本次请求的总耗时预算
+        """
+        if isinstance(error, TotalTimeoutError) and total:
+            self.observe(host, PHASE_TOTAL, total)
+        elif isinstance(error, httpx.ConnectTimeout) and budget is not None and budget.connect:
+            self.observe(host, PHASE_CONNECT, budget.connect)
+        elif isinstance(error, httpx.ReadTimeout) and budget is not None and budget.read:
+            self.observe(host, PHASE_READ, budget.read)
+
+    def _learned(self, host: str, phase: str) -> Optional[float]:
+        """计算某个阶段的学习超时，样本不足返回None"""
+        latency = self._hosts.get(host)
+        if latency is None:
+            return None
+        samples = latency.samples[phase]
+        if len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        value = ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile))] * self.factor
+        low, high = self.bounds[phase]
+        return min(max(value, low), high)
+
+    def budget(self, host: str, phase: str) -> Optional[float]:
+        """获取某个阶段的超时（样本不足时为默认值）"""
+        learned = self._learned(host, phase)
+        return learned if learned is not None else self.defaults.get(phase)
+
+    def timeout_for(self, host: str) -> httpx.Timeout:
+        """
+        获取域名的httpx超时配置
+
+        Args:
+            host: 域名
+
+        Returns:
+            连接/读取超时按学习值设置的httpx.Timeout
+        """
+        read = self.budget(host, PHASE_READ)
+        return httpx.Timeout(
+            connect=self.budget(host, PHASE_CONNECT),
+            read=read,
+            write=read,
+            pool=self.defaults.get(PHASE_CONNECT),
+        )
+
+    def total_for(self, host: str) -> Optional[float]:
+        """获取域名的总耗时预算（秒），None表示不限制"""
+        return self.budget(host, PHASE_TOTAL)
+
+    def stats(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """
+        获取各域名当前使用的超时
+
+        Returns:
+            {域名: {connect, read, total, samples}}
+        """
+        return {
+            host: {
+                **{phase: self.budget(host, phase) for phase in PHASES},
+                "samples": len(latency.samples[PHASE_TOTAL]),
+            }
+            for host, latency in self._hosts.items()
+        }
+
+    def _snapshot(self) -> Dict[str, Dict]:
+        """生成待保存的数据（跳过长期未访问的域名）"""
+        cutoff = time.time() - self.STALE_SECONDS
+        return {
+            "hosts": {
+                host: {
+                    "updated_at": latency.updated_at,
+                    **{phase: list(latency.samples[phase]) for phase in PHASES},
+                }
+                for host, latency in self._hosts.items()
+                if latency.updated_at >= cutoff
+            }
+        }
+
+    def _write(self, data: Dict[str, Dict]):
+        """原子写入样本文件（在线程中执行）"""
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_file.with_name(f"{self.state_file.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.state_file)
+
+    async def save(self):
+        """保存样本（没有新样本时跳过）"""
+        if not self._dirty:
+            return
+        self._dirty = False
+        data = self._snapshot()
+        try:
+            await asyncio.to_thread(self._write, data)
+            logger.debug(f"超时学习数据已保存: {self.state_file} ({len(data['hosts'])} 个域名)")
+        except Exception as e:
+            self._dirty = True
+            logger.warning(f"保存超时学习数据失败: {e}")
+
+
+# 全局自适应超时实例（所有HTTPClient共享样本）
+_adaptive_timeouts: Optional[AdaptiveTimeouts] = None
+
+
+def get_adaptive_timeouts() -> Optional[AdaptiveTimeouts]:
+    """获取全局自适应超时实例，未启用时返回None"""
+    global _adaptive_timeouts
+    if not settings.http_adaptive_timeouts:
+        return None
+    if _adaptive_timeouts is None:
+        _adaptive_timeouts = AdaptiveTimeouts(
+            state_file=settings.http_timeout_state_file,
+            percentile=settings.http_timeout_percentile,
+            factor=settings.http_timeout_factor,
+            bounds={
+                PHASE_CONNECT: (settings.http_connect_timeout_min, settings.http_connect_timeout_max),
+                PHASE_READ: (settings.http_read_timeout_min, settings.http_read_timeout_max),
+                PHASE_TOTAL: (settings.http_total_timeout_min, settings.http_total_timeout_max),
+            },
+            defaults={
+                PHASE_CONNECT: settings.http_connect_timeout_max,
+                PHASE_READ: 30.0,
+                PHASE_TOTAL: None,
+            },
+        )
+    return _adaptive_timeouts
@@ -0,0 +1,423 @@
+"""HTTP录制/回放 - 将请求响应录制到磁盘，离线可重复地回放"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import Optional, Dict, List, Any, Union, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from loguru import logger
+import httpx
+
+from config import settings
+
+
+class CassetteMissError(Exception):
+    """回放模式下磁带中没有匹配的录制"""
+
+    def __init__(self, method: str, url: str):
+        self.method = method
+        self.url = url
+        super().__init__(f"磁带中没有匹配的录制: {method} {url}")
+
+
+class Cassette:
+    """HTTP磁带
+
+    一个磁带是一个zip文件：index.json 保存请求键和响应元数据，
+    bodies/<sha256> 保存按内容寻址去重后的原始响应体（未解码，
+    与源站返回的Content-Encoding一致）。同一请求键录制多次时按顺序回放，
+    回放到最后一条后重复使用最后一条。
+
+    JSON响应体中的凭据字段（如微信 /cgi-bin/token 返回的 access_token）
+    录制前替换为占位符，这类响应体以解码后的明文JSON保存。
+    """
+
+    # 每次请求都会变化或属于凭据、不参与匹配的查询参数（也不会写入磁带）
+    IGNORED_PARAMS = {"access_token", "secret"}
+
+    # 录制前在JSON响应体中脱敏的字段
+    REDACTED_FIELDS = frozenset({"access_token", "refresh_token", "secret", "appsecret", "ticket"})
+    REDACTED_VALUE = "REDACTED"
+
+    INDEX_NAME = "index.json"
+    FORMAT_VERSION = 1
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        初始化磁带
+
+        Args:
+            path: 磁带文件路径
+        """
+        self.path = Path(path)
+        # 请求键 -> 按录制顺序排列的响应元数据
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        # 新录制、尚未写盘的响应体
+        self._new_bodies: Dict[str, bytes] = {}
+        self._recorded_keys: set = set()
+        self._replay_pos: Dict[str, int] = {}
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._loaded = False
+
+        self.recorded = 0
+        self.replayed = 0
+        self.missed = 0
+
+    @classmethod
+    def make_key(cls, request: httpx.Request, body: Optional[bytes]) -> str:
+        """
+        生成请求键：方法 + 规范化URL（查询参数排序、去掉易变参数）+ 请求体摘要
+
+        Args:
+            request: httpx请求
+            body: 参与匹配的请求体，None表示不参与匹配
+
+        Returns:
+            请求键
+        """
+        parts = urlsplit(str(request.url))
+        query = sorted(
+            (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+            if k not in cls.IGNORED_PARAMS
+        )
+        url = urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+        key = f"{request.method} {url}"
+        if body:
+            key += f" {hashlib.sha256(body).hexdigest()[:16]}"
+        return key
+
+    @staticmethod
+    def matchable_body(request: httpx.Request) -> bool:
+        """请求体是否参与匹配（multipart的boundary每次随机，不参与）"""
+        content_type = request.headers.get("Content-Type", "")
+        return request.method not in ("GET", "HEAD") and not content_type.startswith("multipart/")
+
+    @classmethod
+    def _redact_value(cls, value: Any) -> Tuple[Any, bool]:
+        """递归替换凭据字段，返回 (脱敏后的值, 是否有替换)"""
+        if isinstance(value, dict):
+            changed = False
+            result = {}
+            for k, v in value.items():
+                if isinstance(k, str) and k.lower() in cls.REDACTED_FIELDS:
+                    result[k] = cls.REDACTED_VALUE
+                    changed = True
+                else:
+                    result[k], sub_changed = cls._redact_value(v)
+                    changed = changed or sub_changed
+            return result, changed
+        if isinstance(value, list):
+            items = [cls._redact_value(v) for v in value]
+            return [v for v, _ in items], any(c for _, c in items)
+        return value, False
+
+    @classmethod
+    def redact_body(cls, headers: httpx.Headers, body: bytes) -> Optional[bytes]:
+        """
+        脱敏JSON响应体中的凭据字段
+
+        Args:
+            headers: 响应头（按Content-Encoding解码响应体）
+            body: 原始响应体
+
+        Returns:
+            脱敏后的明文JSON（UTF-8），不是JSON或不含凭据字段时返回None
+        """
+        content_type = headers.get("Content-Type", "").lower()
+        # 微信接口部分返回 text/plain 的JSON
+        if "json" not in content_type and not content_type.startswith("text/plain"):
+            return None
+        try:
+            text = httpx.Response(200, headers=headers, content=body).content
+            data = json.loads(text)
+        except (httpx.DecodingError, ValueError):
+            return None
+        data, changed = cls._redact_value(data)
+        if not changed:
+            return None
+        return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+    def load(self):
+        """加载磁带索引（文件不存在时为空磁带）"""
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if not self.path.exists():
+                return
+            self._zip = zipfile.ZipFile(self.path, "r")
+            index = json.loads(self._zip.read(self.INDEX_NAME))
+            self._entries = index.get("entries", {})
+            count = sum(len(v) for v in self._entries.values())
+        logger.info(f"已加载HTTP磁带: {self.path} ({count} 条录制)")
+
+    def record(self, key: str, response: httpx.Response, body: bytes, elapsed: float):
+        """
+        录制一条响应
+
+        Args:
+            key: 请求键
+            response: 源站响应
+            body: 原始响应体
+            elapsed: 从发出请求到读完响应体的耗时（秒）
+        """
+        headers = [[k, v] for k, v in response.headers.multi_items()]
+        redacted = self.redact_body(response.headers, body)
+        if redacted is not None:
+            # 保存的是解码后的明文，去掉原来的编码和长度头
+            body = redacted
+            headers = [[k, v] for k, v in headers if k.lower() not in ("content-encoding", "content-length")]
+            headers.append(["Content-Length", str(len(body))])
+            logger.debug(f"已脱敏录制的响应体: {key}")
+
+        digest = hashlib.sha256(body).hexdigest()
+        http_version = response.extensions.get("http_version", b"HTTP/1.1")
+        entry = {
+            "status": response.status_code,
+            "headers": headers,
+            "http_version": http_version.decode("ascii", "ignore"),
+            "elapsed": round(elapsed, 4),
+            "body": digest,
+        }
+        with self._lock:
+            # 本次会话第一次录制某个键时，替换磁带里旧的录制
+            if key not in self._recorded_keys:
+                self._recorded_keys.add(key)
+                self._entries[key] = []
+            self._entries[key].append(entry)
+            self._new_bodies.setdefault(digest, body)
+            self._dirty = True
+            self.recorded += 1
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        按顺序取出下一条匹配的录制
+
+        Args:
+            key: 请求键
+
+        Returns:
+            响应元数据，没有录制返回None
+        """
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                self.missed += 1
+                return None
+            pos = self._replay_pos.get(key, 0)
+            self._replay_pos[key] = pos + 1
+            self.replayed += 1
+            return entries[min(pos, len(entries) - 1)]
+
+    def read_body(self, digest: str) -> bytes:
+        """读取响应体"""
+        with self._lock:
+            body = self._new_bodies.get(digest)
+            if body is not None:
+                return body
+            return self._zip.read(f"bodies/{digest}")
+
+    def save(self):
+        """把录制写入磁带文件（先写临时文件再原子替换）"""
+        with self._lock:
+            if not self._dirty:
+                return
+
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            referenced = {e["body"] for entries in self._entries.values() for e in entries}
+            with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+                zf.writestr(
+                    self.INDEX_NAME,
+                    json.dumps({"version": self.FORMAT_VERSION, "entries": self._entries}, ensure_ascii=False)
+                )
+                for digest in sorted(referenced):
+                    body = self._new_bodies.get(digest)
+                    if body is None:
+                        body = self._zip.read(f"bodies/{digest}")
+                    zf.writestr(f"bodies/{digest}", body)
+
+            if self._zip is not None:
+                self._zip.close()
+            os.replace(tmp_path, self.path)
+            self._zip = zipfile.ZipFile(self.path, "r")
+            self._new_bodies.clear()
+            self._dirty = False
+            count = sum(len(v) for v in self._entries.values())
+        logger.info(f"HTTP磁带已保存: {self.path} ({count} 条录制, {len(referenced)} 个响应体)")
+
+    def stats(self) -> Dict[str, int]:
+        """获取录制/回放统计"""
+        with self._lock:
+            return {
+                "entries": sum(len(v) for v in self._entries.values()),
+                "recorded": self.recorded,
+                "replayed": self.replayed,
+                "missed": self.missed,
+            }
+
+
+def _replayed_response(entry: Dict[str, Any], body: bytes) -> httpx.Response:
+    """用录制内容构造响应（以流的形式返回，下载等流式读取路径同样可用）"""
+    return httpx.Response(
+        status_code=entry["status"],
+        headers=entry["headers"],
+        stream=httpx.ByteStream(body),
+        extensions={"http_version": entry["http_version"].encode("ascii"), "from_cassette": True},
+    )
+
+
+class _CassetteTransportBase:
+    """录制/回放传输层的公共逻辑"""
+
+    def __init__(self, cassette: Cassette, mode: str, latency_scale: float):
+        """
+        Args:
+            cassette: 磁带
+            mode: "record" 或 "replay"
+            latency_scale: 回放时按录制耗时的倍数等待，0表示不等待
+        """
+        self.cassette = cassette
+        self.mode = mode
+        self.latency_scale = latency_scale
+
+    def _replay_entry(self, request: httpx.Request, body: Optional[bytes]) -> Dict[str, Any]:
+        """查找回放条目"""
+        entry = self.cassette.lookup(Cassette.make_key(request, body))
+        if entry is None:
+            raise CassetteMissError(request.method, str(request.url))
+        return entry
+
+    def _delay(self, entry: Dict[str, Any]) -> float:
+        """回放时需要注入的延迟（秒）"""
+        return entry.get("elapsed", 0.0) * self.latency_scale
+
+
+class AsyncCassetteTransport(_CassetteTransportBase, httpx.AsyncBaseTransport):
+    """异步录制/回放传输层（包裹原有传输层）"""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, cassette: Cassette, mode: str, latency_scale: float = 0.0):
+        super().__init__(cassette, mode, latency_scale)
+        self._inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread() if Cassette.matchable_body(request) else None
+
+        if self.mode == "replay":
+            entry = self._replay_entry(request, body)
+            delay = self._delay(entry)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            content = await asyncio.to_thread(self.cassette.read_body, entry["body"])
+            return _replayed_response(entry, content)
+
+        start = time.monotonic()
+        response = await self._inner.handle_async_request(request)
+        try:
+            content = b"".join([chunk async for chunk in response.stream])
+        finally:
+            await response.aclose()
+        self.cassette.record(Cassette.make_key(request, body), response, content, time.monotonic() - start)
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=httpx.ByteStream(content),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        await self._inner.aclose()
+        if self.mode == "record":
+            await asyncio.to_thread(self.cassette.save)
+
+
+class SyncCassetteTransport(_CassetteTransportBase, httpx.BaseTransport):
+    """同步录制/回放传输层（微信API、媒体下载）"""
+
+    def __init__(self, inner: httpx.BaseTransport, cassette: Cassette, mode: str, latency_scale: float = 0.0):
+        super().__init__(cassette, mode, latency_scale)
+        self._inner = inner
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        body = request.read() if Cassette.matchable_body(request) else None
+
+        if self.mode == "replay":
+            entry = self._replay_entry(request, body)
+            delay = self._delay(entry)
+            if delay > 0:
+                time.sleep(delay)
+            return _replayed_response(entry, self.cassette.read_body(entry["body"]))
+
+        start = time.monotonic()
+        response = self._inner.handle_request(request)
+        try:
+            content = b"".join(response.stream)
+        finally:
+            response.close()
+        self.cassette.record(Cassette.make_key(request, body), response, content, time.monotonic() - start)
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=httpx.ByteStream(content),
+            extensions=response.extensions,
+        )
+
+    def close(self):
+        self._inner.close()
+        if self.mode == "record":
+            self.cassette.save()
+
+
+# 全局磁带实例（同步和异步客户端共用一盘磁带）
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """获取全局磁带，未启用录制/回放时返回None"""
+    global _cassette
+    if settings.http_cassette_mode not in ("record", "replay"):
+        return None
+    if _cassette is None:
+        with _cassette_lock:
+            if _cassette is None:
+                cassette = Cassette(settings.http_cassette_path)
+                cassette.load()
+                _cassette = cassette
+    return _cassette
+
+
+def install_cassette(client: Union[httpx.AsyncClient, httpx.Client]) -> bool:
+    """
+    为httpx客户端装上录制/回放传输层
+
+    与DNS缓存一样在发出第一个请求前替换客户端的传输层；
+    录制模式下客户端关闭时写入磁带文件。
+
+    Args:
+        client: httpx同步或异步客户端
+
+    Returns:
+        是否安装成功（未启用时返回False）
+    """
+    cassette = get_cassette()
+    if cassette is None:
+        return False
+
+    mode = settings.http_cassette_mode
+    scale = settings.http_cassette_latency_scale
+    transport_cls = AsyncCassetteTransport if isinstance(client, httpx.AsyncClient) else SyncCassetteTransport
+
+    client._transport = transport_cls(client._transport, cassette, mode, scale)
+    client._mounts = {
+        pattern: transport_cls(transport, cassette, mode, scale) if transport is not None else None
+        for pattern, transport in client._mounts.items()
+    }
+    logger.debug(f"HTTP磁带已启用 ({mode}): {cassette.path}")
+    return True
@@ -0,0 +1,313 @@
+"""DNS缓存 - 异步解析缓存、负缓存与批量预解析"""
+import asyncio
+import ipaddress
+import socket
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from loguru import logger
+import httpcore
+import httpx
+
+from config import settings
+
+
+class DNSCache:
+    """进程内共享的DNS解析缓存
+
+    异步路径使用 loop.getaddrinfo，不阻塞事件循环；同步客户端（微信API）
+    走 socket.getaddrinfo 但共享同一份缓存。解析失败的域名会被负缓存一段时间，
+    避免对无法解析的图片CDN反复查询。
+    """
+
+    def __init__(self, ttl: float, negative_ttl: float):
+        """
+        初始化DNS缓存
+
+        Args:
+            ttl: 解析结果缓存秒数
+            negative_ttl: 解析失败结果缓存秒数
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # host -> (过期时间, IP列表；解析失败时为None)
+        self._entries: Dict[str, Tuple[float, Optional[List[str]]]] = {}
+        self._lock = threading.Lock()
+        self._pending: Dict[str, asyncio.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.lookups = 0
+        self.lookup_time_total = 0.0
+        self.lookup_time_max = 0.0
+
+    @staticmethod
+    def _is_ip(host: str) -> bool:
+        """是否已经是IP地址"""
+        try:
+            ipaddress.ip_address(host)
+            return True
+        except ValueError:
+            return False
+
+    def _get_cached(self, host: str) -> Optional[Tuple[float, Optional[List[str]]]]:
+        """读取未过期的缓存条目"""
+        with self._lock:
+            entry = self._entries.get(host)
+            if entry and entry[0] > time.monotonic():
+                if entry[1] is None:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                return entry
+            self.misses += 1
+            return None
+
+    def _store(self, host: str, ips: Optional[List[str]], elapsed: float):
+        """保存解析结果并记录耗时"""
+        ttl = self.ttl if ips else self.negative_ttl
+        with self._lock:
+            self._entries[host] = (time.monotonic() + ttl, ips)
+            self.lookups += 1
+            self.lookup_time_total += elapsed
+            self.lookup_time_max = max(self.lookup_time_max, elapsed)
+
+    @staticmethod
+    def _unique_ips(infos) -> List[str]:
+        """从getaddrinfo结果中提取去重后的IP（保持系统返回顺序）"""
+        ips = []
+        for info in infos:
+            ip = info[4][0]
+            if ip not in ips:
+                ips.append(ip)
+        return ips
+
+    def invalidate(self, host: str):
+        """删除某个域名的缓存（连接失败时调用）"""
+        with self._lock:
+            self._entries.pop(host, None)
+
+    async def resolve(self, host: str, port: int = 443) -> List[str]:
+        """
+        异步解析域名
+
+        同一域名的并发解析只发起一次查询。
+
+        Args:
+            host: 域名
+            port: 端口
+
+        Returns:
+            IP地址列表
+
+        Raises:
+            socket.gaierror: 解析失败（含负缓存命中）
+        """
+        if self._is_ip(host):
+            return [host]
+
+        entry = self._get_cached(host)
+        if entry is not None:
+            if entry[1] is None:
+                raise socket.gaierror(socket.EAI_NONAME, f"DNS解析失败（缓存）: {host}")
+            return entry[1]
+
+        pending = self._pending.get(host)
+        if pending is None:
+            pending = asyncio.ensure_future(self._lookup(host, port))
+            self._pending[host] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(host, None))
+        return await asyncio.shield(pending)
+
+    async def _lookup(self, host: str, port: int) -> List[str]:
+        """执行一次异步DNS查询"""
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        try:
+            infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except socket.gaierror:
+            self._store(host, None, time.monotonic() - start)
+            raise
+
+        ips = self._unique_ips(infos)
+        elapsed = time.monotonic() - start
+        self._store(host, ips, elapsed)
+        logger.debug(f"DNS解析: {host} -> {ips} ({elapsed * 1000:.1f}ms)")
+        return ips
+
+    def resolve_sync(self, host: str, port: int = 443) -> List[str]:
+        """
+        同步解析域名（供同步httpx客户端使用）
+
+        Args:
+            host: 域名
+            port: 端口
+
+        Returns:
+            IP地址列表
+        """
+        if self._is_ip(host):
+            return [host]
+
+        entry = self._get_cached(host)
+        if entry is not None:
+            if entry[1] is None:
+                raise socket.gaierror(socket.EAI_NONAME, f"DNS解析失败（缓存）: {host}")
+            return entry[1]
+
+        start = time.monotonic()
+        try:
+            infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except socket.gaierror:
+            self._store(host, None, time.monotonic() - start)
+            raise
+
+        ips = self._unique_ips(infos)
+        self._store(host, ips, time.monotonic() - start)
+        return ips
+
+    async def prefetch(self, hosts: Iterable[str]):
+        """
+        批量预解析域名（抓取开始前调用）
+
+        Args:
+            hosts: 域名列表，解析失败的会被负缓存，不抛出异常
+        """
+        unique_hosts = {h for h in hosts if h and not self._is_ip(h)}
+        if not unique_hosts:
+            return
+
+        start = time.monotonic()
+        results = await asyncio.gather(*(self.resolve(h) for h in unique_hosts), return_exceptions=True)
+        failed = sum(1 for r in results if isinstance(r, Exception))
+        logger.debug(
+            f"DNS预解析 {len(unique_hosts)} 个域名, 失败 {failed} 个, "
+            f"耗时 {(time.monotonic() - start) * 1000:.1f}ms"
+        )
+
+    def stats(self) -> Dict[str, float]:
+        """
+        获取DNS缓存统计
+
+        Returns:
+            命中/未命中/负缓存命中次数与查询耗时（毫秒）
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "negative_hits": self.negative_hits,
+                "lookups": self.lookups,
+                "avg_lookup_ms": round(self.lookup_time_total / self.lookups * 1000, 2) if self.lookups else 0.0,
+                "max_lookup_ms": round(self.lookup_time_max * 1000, 2),
+            }
+
+
+class CachingAsyncBackend(httpcore.AsyncNetworkBackend):
+    """通过DNS缓存解析后再建立TCP连接的异步网络后端
+
+    只替换TCP连接的目标地址，TLS的SNI和证书校验仍使用原域名。
+    """
+
+    def __init__(self, cache: DNSCache, inner: Optional[httpcore.AsyncNetworkBackend] = None):
+        self._cache = cache
+        self._inner = inner or httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        try:
+            ips = await self._cache.resolve(host, port)
+        except socket.gaierror as e:
+            # 转换为httpcore异常，httpx会映射为ConnectError，重试策略才能正确分类
+            raise httpcore.ConnectError(str(e)) from e
+        last_error: Optional[Exception] = None
+        for ip in ips:
+            try:
+                return await self._inner.connect_tcp(
+                    ip, port, timeout=timeout, local_address=local_address, socket_options=socket_options
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                last_error = e
+        # 所有地址都连不上，可能是缓存过期的IP，下次重新解析
+        self._cache.invalidate(host)
+        raise last_error
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._inner.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds: float):
+        await self._inner.sleep(seconds)
+
+
+class CachingSyncBackend(httpcore.NetworkBackend):
+    """通过DNS缓存解析后再建立TCP连接的同步网络后端"""
+
+    def __init__(self, cache: DNSCache, inner: Optional[httpcore.NetworkBackend] = None):
+        self._cache = cache
+        self._inner = inner or httpcore.SyncBackend()
+
+    def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        try:
+            ips = self._cache.resolve_sync(host, port)
+        except socket.gaierror as e:
+            raise httpcore.ConnectError(str(e)) from e
+        last_error: Optional[Exception] = None
+        for ip in ips:
+            try:
+                return self._inner.connect_tcp(
+                    ip, port, timeout=timeout, local_address=local_address, socket_options=socket_options
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                last_error = e
+        self._cache.invalidate(host)
+        raise last_error
+
+    def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return self._inner.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    def sleep(self, seconds: float):
+        self._inner.sleep(seconds)
+
+
+# 全局DNS缓存实例
+_dns_cache: Optional[DNSCache] = None
+
+
+def get_dns_cache() -> Optional[DNSCache]:
+    """获取全局DNS缓存实例，未启用时返回None"""
+    global _dns_cache
+    if not settings.dns_cache_enabled:
+        return None
+    if _dns_cache is None:
+        _dns_cache = DNSCache(ttl=settings.dns_cache_ttl, negative_ttl=settings.dns_negative_ttl)
+    return _dns_cache
+
+
+def install_dns_cache(client: Union[httpx.AsyncClient, httpx.Client]) -> bool:
+    """
+    为httpx客户端的连接池装上DNS缓存
+
+    httpx没有公开的网络后端配置项，这里在发出第一个请求前替换
+    连接池的网络后端，之后新建的连接都会经过DNS缓存。
+
+    Args:
+        client: httpx同步或异步客户端
+
+    Returns:
+        是否安装成功
+    """
+    cache = get_dns_cache()
+    if cache is None:
+        return False
+
+    is_async = isinstance(client, httpx.AsyncClient)
+    transports = [getattr(client, "_transport", None)] + list(getattr(client, "_mounts", {}).values())
+    installed = False
+    for transport in transports:
+        pool = getattr(transport, "_pool", None)
+        if pool is None or not hasattr(pool, "_network_backend"):
+            continue
+        pool._network_backend = CachingAsyncBackend(cache) if is_async else CachingSyncBackend(cache)
+        installed = True
+    return installed
@@ -0,0 +1,404 @@
+"""HTTP磁盘缓存 - 基于ETag/Last-Modified的条件请求缓存"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Dict, Any, Set
+from loguru import logger
+import httpx
+
+from config import settings
+
+
+# 缓存的是解压后的响应体，这些头部不能原样回放
+_SKIPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+# Vary中允许的请求头：缓存的是解压后的响应体，与Accept-Encoding无关
+_IGNORED_VARY = {"accept-encoding"}
+
+# 命中时更新的访问时间最多每隔多少秒写回一次元数据
+_ACCESS_FLUSH_INTERVAL = 60.0
+
+
+def varies_on_request(headers) -> bool:
+    """
+    响应是否按请求头（Accept-Encoding除外）区分内容
+
+    缓存只按URL取键，请求头每次不同（随机User-Agent等），
+    这类响应无法判断是否适用于下一个请求，不缓存。
+
+    Args:
+        headers: 响应头（httpx.Headers 或缓存元数据中的字典）
+
+    Returns:
+        Vary 中含有 Accept-Encoding 以外的请求头（包括 *）时返回True
+    """
+    values = [v for k, v in headers.items() if k.lower() == "vary"]
+    fields = {f.strip().lower() for value in values for f in value.split(",") if f.strip()}
+    return bool(fields - _IGNORED_VARY)
+
+
+class CacheEntry:
+    """缓存条目"""
+
+    def __init__(self, key: str, meta: Dict[str, Any], body_path: Path):
+        self.key = key
+        self.meta = meta
+        self.body_path = body_path
+
+    @property
+    def url(self) -> str:
+        return self.meta["url"]
+
+    @property
+    def stored_at(self) -> float:
+        return self.meta["stored_at"]
+
+    @property
+    def size(self) -> int:
+        return self.meta["size"]
+
+    @property
+    def etag(self) -> Optional[str]:
+        return self.meta.get("etag")
+
+    @property
+    def last_modified(self) -> Optional[str]:
+        return self.meta.get("last_modified")
+
+    def to_response(self, body: bytes) -> httpx.Response:
+        """
+        用缓存内容构造httpx.Response
+
+        Args:
+            body: 缓存的响应体
+
+        Returns:
+            标记了 extensions["from_cache"] 的响应对象
+        """
+        return httpx.Response(
+            status_code=self.meta["status_code"],
+            headers=self.meta["headers"],
+            content=body,
+            request=httpx.Request("GET", self.url),
+            extensions={"from_cache": True},
+        )
+
+
+class HTTPCache:
+    """HTTP磁盘缓存
+
+    每个URL对应一个 .body 文件和一个 .json 元数据文件，写入时先写临时文件
+    再原子替换，并发读写安全。TTL内直接命中不访问源站；过期后带
+    If-None-Match / If-Modified-Since 重新验证，304时沿用缓存内容。
+    总大小超过上限时按最近访问时间（LRU）淘汰；命中时的访问时间先记在内存中，
+    定期和关闭客户端时写回元数据，重启后LRU顺序不丢失。
+    带 Vary（Accept-Encoding除外）的响应不缓存。
+    """
+
+    def __init__(self, cache_dir: str, ttl: float, max_bytes: int):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 缓存目录
+            ttl: 新鲜期（秒），期内不重新验证
+            max_bytes: 缓存总大小上限（字节）
+        """
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+        self._index: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._total_bytes = 0
+        self._loaded = False
+        self._index_lock = asyncio.Lock()
+        self._key_locks: Dict[str, asyncio.Lock] = {}
+        # 访问时间尚未写回磁盘的缓存键
+        self._touched: Set[str] = set()
+        self._flushed_at = time.monotonic()
+
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(url: str) -> str:
+        """根据URL生成缓存键"""
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str):
+        """获取缓存键对应的元数据和响应体路径"""
+        return self.cache_dir / f"{key}.json", self.cache_dir / f"{key}.body"
+
+    def _lock_for(self, key: str) -> asyncio.Lock:
+        """获取缓存键的写锁"""
+        lock = self._key_locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._key_locks[key] = lock
+        return lock
+
+    def _load_index(self):
+        """扫描缓存目录重建索引（在线程中执行）"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entries = []
+        for meta_path in self.cache_dir.glob("*.json"):
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                entries.append((meta.get("accessed_at", meta["stored_at"]), meta_path.stem, meta))
+            except Exception as e:
+                logger.debug(f"跳过损坏的缓存元数据 {meta_path}: {e}")
+
+        # 按访问时间排序，最久未访问的在前
+        for _, key, meta in sorted(entries):
+            self._index[key] = meta
+            self._total_bytes += meta.get("size", 0)
+
+    async def _ensure_loaded(self):
+        """首次使用时加载索引"""
+        if self._loaded:
+            return
+        async with self._index_lock:
+            if not self._loaded:
+                await asyncio.to_thread(self._load_index)
+                self._loaded = True
+                logger.debug(f"HTTP缓存已加载: {len(self._index)} 条, {self._total_bytes / 1024 / 1024:.1f} MB")
+
+    async def lookup(self, url: str) -> Optional[CacheEntry]:
+        """
+        查找缓存条目
+
+        Args:
+            url: 完整请求URL（含查询参数）
+
+        Returns:
+            缓存条目，不存在返回None
+        """
+        await self._ensure_loaded()
+        key = self.make_key(url)
+        meta = self._index.get(key)
+        if meta is None:
+            self.misses += 1
+            return None
+
+        # 旧版本写入的按请求头区分内容的条目不可回放
+        if varies_on_request(meta.get("headers", {})):
+            self.misses += 1
+            async with self._lock_for(key):
+                await self._remove(key)
+            return None
+
+        self._index.move_to_end(key)
+        meta["accessed_at"] = time.time()
+        self._touched.add(key)
+        if time.monotonic() - self._flushed_at >= _ACCESS_FLUSH_INTERVAL:
+            await self.flush()
+        return CacheEntry(key, meta, self._paths(key)[1])
+
+    async def flush(self):
+        """把内存中更新的访问时间写回元数据文件"""
+        touched, self._touched = self._touched, set()
+        self._flushed_at = time.monotonic()
+        written = 0
+        for key in touched:
+            async with self._lock_for(key):
+                meta = self._index.get(key)
+                if meta is None:
+                    continue
+                try:
+                    await asyncio.to_thread(self._write_entry, key, meta, None)
+                    written += 1
+                except OSError as e:
+                    logger.debug(f"写回缓存访问时间失败 {key}: {e}")
+        if written:
+            logger.debug(f"HTTP缓存访问时间已写回: {written} 条")
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        """检查缓存是否仍在新鲜期内"""
+        return time.time() - entry.stored_at < self.ttl
+
+    @staticmethod
+    def conditional_headers(entry: CacheEntry) -> Dict[str, str]:
+        """生成条件请求头"""
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    async def read(self, entry: CacheEntry, revalidated: bool = False) -> Optional[httpx.Response]:
+        """
+        读取缓存响应
+
+        Args:
+            entry: 缓存条目
+            revalidated: 是否是经源站304确认后读取
+
+        Returns:
+            响应对象，响应体文件丢失时返回None
+        """
+        try:
+            body = await asyncio.to_thread(entry.body_path.read_bytes)
+        except FileNotFoundError:
+            await self._remove(entry.key)
+            return None
+
+        if revalidated:
+            self.revalidated += 1
+        else:
+            self.hits += 1
+        return entry.to_response(body)
+
+    @staticmethod
+    def _atomic_write(path: Path, data: bytes):
+        """先写临时文件再原子替换"""
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _write_entry(self, key: str, meta: Dict[str, Any], body: Optional[bytes]):
+        """写入缓存文件（在线程中执行）"""
+        meta_path, body_path = self._paths(key)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        if body is not None:
+            self._atomic_write(body_path, body)
+        self._atomic_write(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+    async def store(self, url: str, response: httpx.Response) -> bool:
+        """
+        保存响应到缓存
+
+        Args:
+            url: 完整请求URL
+            response: 已读取完响应体的200响应
+
+        Returns:
+            是否已缓存
+        """
+        cache_control = response.headers.get("Cache-Control", "").lower()
+        if response.status_code != 200 or "no-store" in cache_control:
+            return False
+        if varies_on_request(response.headers):
+            return False
+
+        body = response.content
+        # 单个条目不超过缓存总量的1/10，避免一个大页面挤掉整个缓存
+        if len(body) > self.max_bytes // 10:
+            return False
+
+        await self._ensure_loaded()
+        key = self.make_key(url)
+        now = time.time()
+        meta = {
+            "url": url,
+            "status_code": response.status_code,
+            "headers": {k: v for k, v in response.headers.items() if k.lower() not in _SKIPPED_HEADERS},
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "stored_at": now,
+            "accessed_at": now,
+            "size": len(body),
+        }
+
+        async with self._lock_for(key):
+            await asyncio.to_thread(self._write_entry, key, meta, body)
+            self._touched.discard(key)
+            old = self._index.pop(key, None)
+            if old:
+                self._total_bytes -= old.get("size", 0)
+            self._index[key] = meta
+            self._total_bytes += meta["size"]
+
+        await self._evict()
+        return True
+
+    async def refresh(self, entry: CacheEntry, response: httpx.Response) -> CacheEntry:
+        """
+        源站返回304后刷新缓存条目的新鲜期和验证器
+
+        Args:
+            entry: 原缓存条目
+            response: 304响应
+
+        Returns:
+            更新后的缓存条目
+        """
+        meta = dict(entry.meta)
+        meta["stored_at"] = time.time()
+        meta["accessed_at"] = meta["stored_at"]
+        if response.headers.get("ETag"):
+            meta["etag"] = response.headers["ETag"]
+        if response.headers.get("Last-Modified"):
+            meta["last_modified"] = response.headers["Last-Modified"]
+
+        async with self._lock_for(entry.key):
+            await asyncio.to_thread(self._write_entry, entry.key, meta, None)
+            if entry.key in self._index:
+                self._index[entry.key] = meta
+                self._index.move_to_end(entry.key)
+
+        return CacheEntry(entry.key, meta, entry.body_path)
+
+    def _delete_files(self, key: str):
+        """删除缓存文件（在线程中执行）"""
+        for path in self._paths(key):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    async def _remove(self, key: str):
+        """移除缓存条目"""
+        meta = self._index.pop(key, None)
+        self._touched.discard(key)
+        if meta:
+            self._total_bytes -= meta.get("size", 0)
+        await asyncio.to_thread(self._delete_files, key)
+
+    async def _evict(self):
+        """按LRU淘汰直到总大小低于上限"""
+        evicted = 0
+        while self._total_bytes > self.max_bytes and self._index:
+            key = next(iter(self._index))
+            async with self._lock_for(key):
+                await self._remove(key)
+            self._key_locks.pop(key, None)
+            evicted += 1
+
+        if evicted:
+            logger.debug(f"HTTP缓存淘汰 {evicted} 条, 当前 {self._total_bytes / 1024 / 1024:.1f} MB")
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        return {
+            "entries": len(self._index),
+            "size_bytes": self._total_bytes,
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+        }
+
+
+# 全局缓存实例（同一目录共享索引）
+_http_cache: Optional[HTTPCache] = None
+
+
+def get_http_cache() -> Optional[HTTPCache]:
+    """获取全局HTTP缓存实例，未启用缓存时返回None"""
+    global _http_cache
+    if not settings.http_cache_enabled:
+        return None
+    if _http_cache is None:
+        _http_cache = HTTPCache(
+            cache_dir=settings.http_cache_dir,
+            ttl=settings.http_cache_ttl,
+            max_bytes=settings.http_cache_max_mb * 1024 * 1024,
+        )
+    return _http_cache
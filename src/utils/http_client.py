@@ -1,16 +1,54 @@
 """HTTP客户端工具 - 使用httpx实现异步HTTP请求"""
 import asyncio
-from typing import Optional, Dict, Any
+import importlib.util
+import os
+import shutil
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, List, Tuple, Callable
 from loguru import logger
+import aiofiles
 import httpx
-from tenacity import (
-    retry,
-    stop_after_attempt,
-    wait_exponential,
-    retry_if_exception_type
-)
+from tenacity import AsyncRetrying, stop_after_attempt, retry_if_exception
 
 from config import settings
+from src.utils.rate_limiter import HostScheduler, LANE_CRAWL, LANE_PUBLISH, LANE_MEDIA
+from src.utils.http_metrics import PoolTelemetry, HTTPMetrics, RequestTiming, get_http_metrics
+from src.utils.http_cache import HTTPCache, get_http_cache
+from src.utils.single_flight import SingleFlight
+from src.utils.retry_policy import RetryPolicy
+from src.utils.dns_cache import get_dns_cache, install_dns_cache
+from src.utils.cassette import install_cassette
+from src.utils.adaptive_timeout import (
+    TotalTimeoutError, PHASE_CONNECT, PHASE_READ, PHASE_TOTAL, get_adaptive_timeouts
+)
+from src.utils.robots import RobotsCache, get_robots_cache
+from src.utils.proxy_pool import ProxyPool
+
+
+class DownloadIncompleteError(Exception):
+    """下载的字节数与源站声明的长度不一致"""
+
+
+class ResponseTooLargeError(Exception):
+    """响应体超过允许的最大字节数"""
+
+    def __init__(self, url: str, max_bytes: int):
+        self.url = url
+        self.max_bytes = max_bytes
+        super().__init__(f"响应体超过 {max_bytes / 1024 / 1024:.1f} MB 上限: {url}")
+
+
+class ResponseRejectedError(Exception):
+    """响应体开头未通过调用方的预检，下载已中止"""
+
+    def __init__(self, url: str):
+        self.url = url
+        super().__init__(f"响应开头未通过预检，已中止下载: {url}")
+
+
+# 响应体开头预检：(已接收的开头字节, 响应头声明的编码) -> 是否继续下载
+HeadCheck = Callable[[bytes, Optional[str]], bool]
 
 
 class HTTPClient:
@@ -24,10 +62,75 @@ class HTTPClient:
         "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Safari/605.1.15",
     ]
 
-    def __init__(self):
-        """初始化HTTP客户端"""
+    # 下载写盘块大小范围（字节）
+    DOWNLOAD_MIN_CHUNK = 64 * 1024
+    DOWNLOAD_MAX_CHUNK = 1024 * 1024
+
+    # 影响响应内容的请求头，参与请求合并的键
+    COALESCE_HEADERS = ("accept", "accept-language", "authorization", "cookie", "range")
+
+    # 经过代理时视为出口IP被源站封禁的状态码
+    PROXY_BAN_STATUSES = (403, 429)
+
+    def __init__(
+        self,
+        http2: Optional[bool] = None,
+        cache: Optional[HTTPCache] = None,
+        metrics: Optional[HTTPMetrics] = None,
+        proxies: Optional[List[str]] = None
+    ):
+        """
+        初始化HTTP客户端
+
+        Args:
+            http2: 是否启用HTTP/2多路复用，默认读取 settings.http2_enabled
+            cache: HTTP磁盘缓存，默认使用全局缓存（settings.http_cache_enabled为False时不缓存）
+            metrics: 请求指标，默认使用全局指标（main.py运行结束时导出）
+            proxies: 出口代理列表，默认读取 settings.http_proxies，为空时直连
+        """
         self._client: Optional[httpx.AsyncClient] = None
-        self._rate_limit_semaphore = asyncio.Semaphore(settings.api_rate_limit)
+        # 代理URL -> 经过该代理的客户端（每个代理独立的连接池）
+        self._proxy_clients: Dict[str, httpx.AsyncClient] = {}
+        proxies = settings.http_proxies if proxies is None else proxies
+        self._proxy_pool = ProxyPool(
+            proxies,
+            ban_seconds=settings.http_proxy_ban_seconds,
+            eject_seconds=settings.http_proxy_eject_seconds,
+            min_success_rate=settings.http_proxy_min_success_rate,
+            max_bans=settings.http_proxy_max_bans,
+        ) if proxies else None
+        self.metrics = metrics if metrics is not None else get_http_metrics()
+        self._cache = cache if cache is not None else get_http_cache()
+        self.http2 = settings.http2_enabled if http2 is None else http2
+        if self.http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("未安装h2库，HTTP/2模式不可用，回退到HTTP/1.1 (pip install h2)")
+            self.http2 = False
+        self._timeouts = get_adaptive_timeouts()
+        self._robots = get_robots_cache()
+        self._telemetry = PoolTelemetry()
+        self._single_flight = SingleFlight()
+        self._retry_policy = RetryPolicy(
+            max_retries=settings.http_max_retries,
+            base_delay=settings.http_retry_delay,
+            max_delay=settings.http_retry_max_delay,
+            failure_threshold=settings.http_circuit_failure_threshold,
+            recovery_timeout=settings.http_circuit_recovery_seconds,
+        )
+        self._scheduler = HostScheduler(
+            global_concurrency=settings.api_rate_limit,
+            default_rate=settings.http_host_rate,
+            default_burst=settings.http_host_burst,
+            default_concurrency=settings.http_host_concurrency,
+            host_limits=settings.http_host_limits,
+            lane_weights=settings.http_lane_weights,
+            reserved_share=settings.http_reserved_share,
+            adaptive={
+                "min": settings.http_host_min_concurrency,
+                "max": settings.http_host_max_concurrency,
+                "backoff": settings.http_aimd_backoff,
+                "latency_tolerance": settings.http_aimd_latency_tolerance,
+            } if settings.http_adaptive_concurrency else None,
+        )
 
     async def __aenter__(self):
         """异步上下文管理器入口"""
@@ -41,58 +144,563 @@ class HTTPClient:
     async def start(self):
         """启动客户端"""
         if self._client is None or self._client.is_closed:
-            timeout = httpx.Timeout(30.0, connect=10.0)
-            limits = httpx.Limits(max_keepalive_connections=20, max_connections=100)
-
-            self._client = httpx.AsyncClient(
-                timeout=timeout,
-                limits=limits,
-                verify=True,  # SSL验证
-                follow_redirects=True,  # 跟随重定向
-                headers={
-                    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-                    "Accept-Language": "en-US,en;q=0.9,zh-CN;q=0.8,zh;q=0.7",
-                    "Accept-Encoding": "gzip, deflate, br",
-                    "DNT": "1",
-                    "Connection": "keep-alive",
-                    "Upgrade-Insecure-Requests": "1",
-                }
+            self._client = self._create_client()
+            if self._proxy_pool is not None:
+                self._proxy_clients = {proxy: self._create_client(proxy) for proxy in self._proxy_pool.proxies}
+            logger.debug(
+                f"HTTP客户端已启动 ({'HTTP/2' if self.http2 else 'HTTP/1.1'}"
+                + (f", {len(self._proxy_clients)} 个代理" if self._proxy_clients else "") + ")"
             )
-            logger.debug("HTTP客户端已启动")
+
+    def _create_client(self, proxy: Optional[str] = None) -> httpx.AsyncClient:
+        """
+        创建httpx异步客户端
+
+        Args:
+            proxy: 出口代理URL，None表示直连
+
+        Returns:
+            已装好DNS缓存和录制/回放传输层的客户端
+        """
+        timeout = httpx.Timeout(30.0, connect=10.0)
+        limits = httpx.Limits(max_keepalive_connections=20, max_connections=100)
+
+        default_headers = {
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+            "Accept-Language": "en-US,en;q=0.9,zh-CN;q=0.8,zh;q=0.7",
+            "Accept-Encoding": "gzip, deflate, br",
+            "DNT": "1",
+            "Upgrade-Insecure-Requests": "1",
+        }
+        # Connection是HTTP/1.1逐跳头，HTTP/2禁止发送
+        if not self.http2:
+            default_headers["Connection"] = "keep-alive"
+
+        client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=limits,
+            http2=self.http2,
+            verify=True,  # SSL验证
+            follow_redirects=True,  # 跟随重定向
+            headers=default_headers,
+            proxy=proxy
+        )
+        install_dns_cache(client)
+        install_cassette(client)
+        return client
 
     async def close(self):
         """关闭客户端"""
         if self._client and not self._client.is_closed:
             await self._client.aclose()
             logger.debug("HTTP客户端已关闭")
+        for client in self._proxy_clients.values():
+            if not client.is_closed:
+                await client.aclose()
+        if self._timeouts is not None:
+            await self._timeouts.save()
+        if self._cache is not None:
+            await self._cache.flush()
+        if self._robots is not None:
+            await self._robots.save()
 
     def _get_random_user_agent(self) -> str:
         """获取随机User-Agent"""
         import random
         return random.choice(self.USER_AGENTS)
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=1, max=10),
-        retry=retry_if_exception_type((httpx.RequestError, httpx.HTTPStatusError)),
-    )
+    def scheduler_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取各域名的调度统计（并发、排队、请求数）"""
+        return self._scheduler.stats()
+
+    def lane_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取各优先级通道统计（当前占用/排队数与排队时间分布）"""
+        stats = self._scheduler.lane_stats()
+        for lane, queue_wait in self.metrics.lane_snapshot().items():
+            stats.setdefault(lane, {})["queue_wait"] = queue_wait
+        return stats
+
+    def coalesce_stats(self) -> Dict[str, int]:
+        """获取请求合并统计（实际执行数、被合并数、在途数）"""
+        return self._single_flight.stats()
+
+    def _coalesce_key(self, method: str, url: str, headers: Dict[str, str], *extra) -> tuple:
+        """生成请求合并键：方法 + URL + 影响响应的请求头"""
+        relevant = tuple(sorted(
+            (k.lower(), v) for k, v in headers.items() if k.lower() in self.COALESCE_HEADERS
+        ))
+        return (method, url, relevant) + extra
+
+    def dns_stats(self) -> Optional[Dict[str, float]]:
+        """获取DNS缓存统计，未启用时返回None"""
+        cache = get_dns_cache()
+        return cache.stats() if cache else None
+
+    async def prefetch_dns(self, urls: list[str]):
+        """
+        批量预解析URL中的域名
+
+        Args:
+            urls: URL列表
+        """
+        cache = get_dns_cache()
+        if cache:
+            await cache.prefetch(HostScheduler.host_of(url) for url in urls)
+
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        """获取HTTP缓存统计，未启用缓存时返回None"""
+        return self._cache.stats() if self._cache else None
+
+    def _open_connections(self) -> Dict[str, int]:
+        """统计连接池中各域名（经过代理时为代理地址）当前打开的连接数"""
+        counts: Dict[str, int] = {}
+        for client in [self._client, *self._proxy_clients.values()]:
+            if client is None:
+                continue
+            transports = [client._transport] + [t for t in client._mounts.values() if t is not None]
+            for transport in transports:
+                # 启用录制/回放时连接池在被包裹的传输层里
+                transport = getattr(transport, "_inner", transport)
+                pool = getattr(transport, "_pool", None)
+                for conn in getattr(pool, "connections", []):
+                    origin = getattr(conn, "_origin", None)
+                    if origin is None or conn.is_closed():
+                        continue
+                    host = origin.host.decode("ascii")
+                    counts[host] = counts.get(host, 0) + 1
+        return counts
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """
+        获取连接池统计
+
+        Returns:
+            每域名的打开连接数、在途stream数、新建连接数、TLS握手次数和连接复用率
+        """
+        stats = self._telemetry.snapshot(self._open_connections())
+        stats["http2"] = self.http2
+        return stats
+
+    def proxy_stats(self) -> Optional[Dict[str, Any]]:
+        """获取各出口代理的健康度与吞吐统计，未配置代理时返回None"""
+        return self._proxy_pool.stats() if self._proxy_pool else None
+
+    def _client_for(self, host: str) -> Tuple[Optional[str], httpx.AsyncClient]:
+        """
+        选择发送请求的客户端
+
+        Args:
+            host: 目标域名
+
+        Returns:
+            (代理URL或None, httpx客户端) 元组
+        """
+        if self._proxy_pool is None:
+            return None, self._client
+        proxy = self._proxy_pool.assign(host)
+        return proxy, self._proxy_clients[proxy]
+
+    def _record_proxy(
+        self,
+        proxy: Optional[str],
+        host: str,
+        timing: RequestTiming,
+        response: Optional[httpx.Response],
+        error: Optional[BaseException],
+        bytes_received: int
+    ):
+        """把请求结果记入代理健康度（403/429视为出口IP被封禁）
+
+        代理已转发响应、错误由页面本身导致时（响应体超出上限、被调用方拒绝、
+        响应体读取超出总时限）视为代理正常，耗时不计入代理延迟。
+        """
+        if proxy is None:
+            return
+        status = response.status_code if response is not None else None
+        banned = status in self.PROXY_BAN_STATUSES
+        page_error = isinstance(error, (ResponseRejectedError, ResponseTooLargeError)) or (
+            isinstance(error, TotalTimeoutError) and response is not None
+        )
+        success = (error is None or page_error) and status is not None and status < 500 and not banned
+        self._proxy_pool.record(
+            proxy,
+            host,
+            None if page_error else time.monotonic() - timing.start,
+            success,
+            banned=banned,
+            bytes_received=bytes_received
+        )
+
+    def _begin_request(self, host: str) -> RequestTiming:
+        """记录请求开始，返回用于计时的RequestTiming"""
+        self._telemetry.request_started(host)
+        return RequestTiming()
+
+    def _make_trace(self, host: str, timing: RequestTiming):
+        """生成同时服务连接池统计和请求计时的trace回调"""
+        pool_trace = self._telemetry.make_trace(host)
+
+        async def trace(event_name: str, info: Dict[str, Any]):
+            timing.on_event(event_name)
+            await pool_trace(event_name, info)
+
+        return trace
+
+    def _end_request(
+        self,
+        host: str,
+        timing: RequestTiming,
+        response: Optional[httpx.Response],
+        bytes_received: int
+    ):
+        """记录请求结束（无论成功与否）"""
+        self._telemetry.request_finished(host, response.http_version if response else None)
+        self.metrics.record_response(
+            host,
+            timing,
+            response.status_code if response else None,
+            bytes_received
+        )
+
+    def _feedback(
+        self,
+        url: str,
+        timing: RequestTiming,
+        response: Optional[httpx.Response],
+        error: Optional[BaseException]
+    ):
+        """把请求结果反馈给调度器的自适应并发窗口（429/5xx/超时为拥塞信号）"""
+        if response is None and not isinstance(error, httpx.TimeoutException):
+            # 连接失败等没有拿到响应的错误不代表源站过载，交给熔断器处理
+            return
+        congested = isinstance(error, httpx.TimeoutException) or (
+            response is not None and self._retry_policy.is_retryable_status(response.status_code)
+        )
+        # 没有trace事件时（如自定义传输层）用总耗时近似
+        latency = timing.ttfb if timing.ttfb is not None else time.monotonic() - timing.start
+        self._scheduler.record_result(url, latency, congested)
+
+    def _learn_timeouts(
+        self,
+        host: str,
+        timing: RequestTiming,
+        response: Optional[httpx.Response],
+        error: Optional[BaseException],
+        budget: Optional[httpx.Timeout],
+        total: Optional[float],
+        include_total: bool
+    ):
+        """把本次请求的各阶段耗时（或超时）记入自适应超时样本"""
+        if self._timeouts is None:
+            return
+        if isinstance(error, httpx.TimeoutException):
+            self._timeouts.observe_timeout(host, error, budget if isinstance(budget, httpx.Timeout) else None, total)
+            return
+        if response is None or error is not None:
+            return
+
+        connect_time = timing.connect_time
+        if connect_time is not None:
+            self._timeouts.observe(host, PHASE_CONNECT, connect_time)
+        if timing.ttfb is not None:
+            self._timeouts.observe(host, PHASE_READ, timing.ttfb - (connect_time or 0.0))
+        if include_total:
+            self._timeouts.observe(host, PHASE_TOTAL, time.monotonic() - timing.start)
+
+    def timeout_stats(self) -> Optional[Dict[str, Dict[str, Optional[float]]]]:
+        """获取各域名当前使用的超时（秒），未启用自适应超时时返回None"""
+        return self._timeouts.stats() if self._timeouts else None
+
+    async def check_robots(self, url: str, priority: str = LANE_CRAWL) -> bool:
+        """
+        检查robots.txt是否允许抓取URL（在发出页面请求之前调用）
+
+        站点的robots.txt首次检查时获取（并发检查合并为一次请求），之后按TTL复用；
+        其中的Crawl-delay会限制调度器中该域名的请求速率。
+
+        Args:
+            url: 待抓取的URL
+            priority: 获取robots.txt使用的优先级通道
+
+        Returns:
+            是否允许抓取（未启用robots.txt检查时始终为True）
+        """
+        if self._robots is None:
+            return True
+        if self._client is None:
+            await self.start()
+
+        policy = await self._robots.policy(
+            url,
+            lambda robots_url: self.get(
+                robots_url, use_cache=False, max_bytes=RobotsCache.MAX_BYTES, truncate=True, priority=priority
+            )
+        )
+        self._scheduler.set_crawl_delay(HostScheduler.host_of(url), policy.crawl_delay)
+
+        if not policy.allowed(url):
+            self._robots.record_denied(url)
+            return False
+        return True
+
+    def robots_stats(self) -> Optional[Dict[str, int]]:
+        """获取robots.txt缓存统计，未启用时返回None"""
+        return self._robots.stats() if self._robots else None
+
+    def circuit_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取各域名熔断器状态"""
+        return self._retry_policy.stats()
+
+    def _should_retry(self, exc: BaseException) -> bool:
+        """是否重试；使用代理池时403也重试（下一次尝试会分配其他代理）"""
+        if (
+            self._proxy_pool is not None
+            and isinstance(exc, httpx.HTTPStatusError)
+            and exc.response.status_code in self.PROXY_BAN_STATUSES
+        ):
+            return True
+        return self._retry_policy.is_retryable(exc)
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        按重试策略发送请求
+
+        网络错误和408/425/429/5xx会重试（429/503遵守Retry-After，超过等待上限时不重试），
+        使用代理池时403/429换一个代理重试，其他状态码直接返回给调用者处理；
+        域名熔断时立即抛出CircuitOpenError。
+
+        Args:
+            method: 请求方法
+            url: 请求URL
+            **kwargs: 传给httpx的其他参数
+
+        Returns:
+            httpx.Response对象
+
+        Raises:
+            CircuitOpenError: 域名熔断中
+            httpx.HTTPStatusError: 重试耗尽后仍为可重试状态码
+            httpx.TransportError: 重试耗尽后仍为网络错误
+        """
+        host = HostScheduler.host_of(url)
+        breaker = self._retry_policy.breaker(host)
+        # timeout=None 在httpx中表示不限时，未指定时应使用客户端默认超时
+        if kwargs.get("timeout") is None:
+            kwargs.pop("timeout", None)
+
+        async for attempt in AsyncRetrying(
+            stop=stop_after_attempt(self._retry_policy.max_attempts),
+            wait=self._retry_policy.wait,
+            retry=retry_if_exception(self._should_retry),
+            reraise=True,
+        ):
+            with attempt:
+                if attempt.retry_state.attempt_number > 1:
+                    self.metrics.record_retry(host)
+                    logger.debug(f"第 {attempt.retry_state.attempt_number} 次尝试: {method} {url}")
+
+                breaker.before_request()
+                try:
+                    response = await self._send(method, url, **kwargs)
+                except httpx.TransportError:
+                    breaker.record_failure()
+                    raise
+                except (ResponseRejectedError, ResponseTooLargeError):
+                    # 源站正常响应，只是内容超出上限或被调用方拒绝
+                    breaker.record_success()
+                    raise
+
+                if self._proxy_pool is not None and response.status_code in self.PROXY_BAN_STATUSES:
+                    # 出口IP被封禁（包括429）不是源站故障，不计入熔断，下一次尝试换代理
+                    response.raise_for_status()
+                self._retry_policy.record_response(breaker, response)
+                if self._retry_policy.is_retryable_status(response.status_code):
+                    response.raise_for_status()
+                return response
+
+    async def _send(
+        self,
+        method: str,
+        url: str,
+        max_bytes: Optional[int] = None,
+        priority: str = LANE_CRAWL,
+        head_check: Optional[HeadCheck] = None,
+        head_bytes: int = 0,
+        truncate: bool = False,
+        **kwargs
+    ) -> httpx.Response:
+        """
+        经过调度器发送单次请求并记录连接统计
+
+        Args:
+            method: 请求方法
+            url: 请求URL
+            max_bytes: 响应体上限，设置后以流式读取并在超限时中止
+            priority: 优先级通道
+            head_check: 响应体开头预检，设置后以流式读取，未通过时中止
+            head_bytes: 接收到多少字节后执行预检
+            truncate: 响应体超过max_bytes时保留开头部分而不是抛出异常
+            **kwargs: 传给httpx的其他参数
+
+        Returns:
+            httpx.Response对象（响应体已读取）
+
+        Raises:
+            ResponseTooLargeError: 响应体超过max_bytes
+            ResponseRejectedError: 响应体开头未通过head_check
+            TotalTimeoutError: 请求总耗时超过该域名的学习预算
+        """
+        host = HostScheduler.host_of(url)
+        # 未指定超时时使用按域名学习的超时
+        budget = kwargs.get("timeout")
+        total = None
+        if budget is None and self._timeouts is not None:
+            budget = kwargs["timeout"] = self._timeouts.timeout_for(host)
+            total = self._timeouts.total_for(host)
+
+        async with self._scheduler.slot(url, priority) as queue_wait:
+            self.metrics.record_queue_wait(host, queue_wait, priority)
+            logger.debug(f"{method}请求: {url}")
+            timing = self._begin_request(host)
+            proxy, client = self._client_for(host)
+            response = None
+            error = None
+
+            async def perform():
+                nonlocal response
+                if max_bytes is None and head_check is None:
+                    response = await client.request(
+                        method,
+                        url,
+                        extensions={"trace": self._make_trace(host, timing)},
+                        **kwargs
+                    )
+                else:
+                    follow_redirects = kwargs.pop("follow_redirects", True)
+                    request = client.build_request(
+                        method,
+                        url,
+                        extensions={"trace": self._make_trace(host, timing)},
+                        **kwargs
+                    )
+                    response = await client.send(request, stream=True, follow_redirects=follow_redirects)
+                    try:
+                        await self._read_capped(response, max_bytes, head_check, head_bytes, truncate)
+                    finally:
+                        await response.aclose()
+
+            try:
+                if total is None:
+                    await perform()
+                else:
+                    try:
+                        await asyncio.wait_for(perform(), total)
+                    except asyncio.TimeoutError:
+                        raise TotalTimeoutError(f"请求总耗时超过 {total:.1f} 秒: {url}") from None
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                bytes_received = response.num_bytes_downloaded if response else 0
+                self._end_request(host, timing, response, bytes_received)
+                self._record_proxy(proxy, host, timing, response, error, bytes_received)
+                self._feedback(url, timing, response, error)
+                self._learn_timeouts(host, timing, response, error, budget, total, include_total=True)
+
+            logger.debug(f"响应状态: {response.status_code} - {url}")
+            return response
+
+    @staticmethod
+    async def _read_capped(
+        response: httpx.Response,
+        max_bytes: Optional[int],
+        head_check: Optional[HeadCheck] = None,
+        head_bytes: int = 0,
+        truncate: bool = False
+    ):
+        """
+        流式读取响应体，超过上限或开头未通过预检时立即中止
+
+        Args:
+            response: 以stream=True发送得到的响应
+            max_bytes: 响应体上限（解压后字节数），None表示不限
+            head_check: 响应体开头预检，接收到head_bytes字节（或响应体更短时读完）后执行一次
+            head_bytes: 执行预检前接收的字节数
+            truncate: 超过上限时保留前max_bytes字节并停止读取，
+                      response.extensions["truncated"] 标记为True
+
+        Raises:
+            ResponseTooLargeError: 声明或实际长度超过上限（truncate=False时）
+            ResponseRejectedError: 响应体开头未通过预检
+        """
+        url = str(response.request.url)
+        content_length = response.headers.get("Content-Length")
+        if (
+            max_bytes is not None and not truncate
+            and content_length and content_length.isdigit() and int(content_length) > max_bytes
+        ):
+            raise ResponseTooLargeError(url, max_bytes)
+
+        chunks = []
+        received = 0
+        async for chunk in response.aiter_bytes():
+            received += len(chunk)
+            if max_bytes is not None and received > max_bytes:
+                if not truncate:
+                    raise ResponseTooLargeError(url, max_bytes)
+                chunks.append(chunk[:len(chunk) - (received - max_bytes)])
+                response.extensions["truncated"] = True
+                break
+            chunks.append(chunk)
+            if head_check is not None and received >= head_bytes:
+                if not head_check(b"".join(chunks), response.charset_encoding):
+                    raise ResponseRejectedError(url)
+                head_check = None
+
+        if head_check is not None and not head_check(b"".join(chunks), response.charset_encoding):
+            raise ResponseRejectedError(url)
+
+        # 与 httpx Response.aread() 的做法一致，读取后的内容可通过 response.content 访问
+        response._content = b"".join(chunks)
+
     async def get(
         self,
         url: str,
         headers: Optional[Dict[str, str]] = None,
         params: Optional[Dict[str, Any]] = None,
         timeout: Optional[float] = None,
-        follow_redirects: bool = True
+        follow_redirects: bool = True,
+        use_cache: bool = True,
+        max_bytes: Optional[int] = None,
+        priority: str = LANE_CRAWL,
+        head_check: Optional[HeadCheck] = None,
+        head_bytes: int = 32 * 1024,
+        truncate: bool = False
     ) -> httpx.Response:
         """
         发送GET请求
 
+        相同URL和请求头的并发GET会被合并为一次网络请求。启用缓存时，
+        新鲜期内的缓存直接返回；过期缓存带条件请求头重新验证，
+        源站返回304时使用缓存内容。请求头带 Cache-Control: no-cache 时
+        即使缓存仍在新鲜期也重新验证。设置 head_check 时，接收到响应体
+        开头 head_bytes 字节即执行预检，未通过则中止下载（命中缓存时对
+        缓存内容的开头执行同样的预检）。
+
         Args:
             url: 请求URL
             headers: 请求头
             params: 查询参数
             timeout: 超时时间
             follow_redirects: 是否跟随重定向
+            use_cache: 是否使用HTTP磁盘缓存
+            max_bytes: 响应体上限（字节），超过时中止下载并抛出ResponseTooLargeError
+            priority: 优先级通道（interactive / publish / crawl / media），
+                      合并请求时沿用先发起者的通道
+            head_check: 响应体开头预检 (开头字节, 声明的编码) -> 是否继续下载
+            head_bytes: 接收到多少字节后执行预检
+            truncate: 响应体超过max_bytes时只保留开头部分（response.extensions["truncated"]为True，
+                      不写入缓存），而不是抛出ResponseTooLargeError
 
         Returns:
             httpx.Response对象
@@ -100,6 +708,8 @@ class HTTPClient:
         Raises:
             httpx.RequestError: 请求错误
             httpx.HTTPStatusError: HTTP状态错误
+            ResponseTooLargeError: 响应体超过max_bytes（truncate=False时）
+            ResponseRejectedError: 响应体开头未通过head_check
         """
         if self._client is None:
             await self.start()
@@ -113,37 +723,111 @@ class HTTPClient:
         if "User-Agent" not in request_headers:
             request_headers["User-Agent"] = self._get_random_user_agent()
 
-        # 速率限制
-        async with self._rate_limit_semaphore:
-            logger.debug(f"GET请求: {url}")
-            response = await self._client.get(
+        # httpx.URL(url, params=...) 会替换URL中原有的查询串，这里与发送请求时一样合并
+        full_url = str(httpx.URL(url).copy_merge_params(params)) if params else url
+        # 带预检的请求可能被中止，不与普通请求合并
+        key = self._coalesce_key(
+            "GET", full_url, request_headers, follow_redirects, use_cache, max_bytes, head_check, head_bytes, truncate
+        )
+        return await self._single_flight.do(
+            key,
+            lambda: self._get(
+                url, full_url, request_headers, params, timeout, follow_redirects, use_cache, max_bytes, priority,
+                head_check, head_bytes, truncate
+            )
+        )
+
+    async def _get(
+        self,
+        url: str,
+        cache_url: str,
+        request_headers: Dict[str, str],
+        params: Optional[Dict[str, Any]],
+        timeout: Optional[float],
+        follow_redirects: bool,
+        use_cache: bool,
+        max_bytes: Optional[int],
+        priority: str,
+        head_check: Optional[HeadCheck] = None,
+        head_bytes: int = 0,
+        truncate: bool = False
+    ) -> httpx.Response:
+        """执行GET请求（含缓存），由get()合并后调用"""
+        request_headers = dict(request_headers)
+
+        # 查找缓存（Range请求不走缓存）
+        cache = self._cache if use_cache and "Range" not in request_headers else None
+        entry = await cache.lookup(cache_url) if cache else None
+        conditional: Dict[str, str] = {}
+        if entry is not None:
+            if cache.is_fresh(entry) and "no-cache" not in request_headers.get("Cache-Control", ""):
+                cached = await cache.read(entry)
+                if cached is not None:
+                    logger.debug(f"命中HTTP缓存: {url}")
+                    self._check_cached_head(url, cached, head_check, head_bytes)
+                    return cached
+            conditional = cache.conditional_headers(entry)
+            request_headers.update(conditional)
+
+        async def send() -> httpx.Response:
+            return await self._request(
+                "GET",
                 url,
                 headers=request_headers,
                 params=params,
                 timeout=timeout,
-                follow_redirects=follow_redirects
+                follow_redirects=follow_redirects,
+                max_bytes=max_bytes,
+                priority=priority,
+                head_check=head_check,
+                head_bytes=head_bytes,
+                truncate=truncate
             )
 
-            # 记录响应状态
-            logger.debug(f"响应状态: {response.status_code} - {url}")
+        response = await send()
 
-            # 如果状态码不是2xx，抛出异常
-            response.raise_for_status()
+        # 源站确认内容未变化
+        if entry is not None and response.status_code == 304:
+            entry = await cache.refresh(entry, response)
+            cached = await cache.read(entry, revalidated=True)
+            if cached is not None:
+                logger.debug(f"HTTP缓存重新验证通过: {url}")
+                self._check_cached_head(url, cached, head_check, head_bytes)
+                return cached
+            # 缓存的响应体已丢失（read 已移除该条目），去掉条件头重新请求完整内容
+            logger.debug(f"HTTP缓存响应体丢失，重新请求: {url}")
+            for name in conditional:
+                request_headers.pop(name, None)
+            response = await send()
 
-            return response
+        # 如果状态码不是2xx，抛出异常
+        response.raise_for_status()
+
+        # 截断的响应体不完整，不写入缓存
+        if cache and not response.extensions.get("truncated"):
+            await cache.store(cache_url, response)
+
+        return response
+
+    @staticmethod
+    def _check_cached_head(
+        url: str,
+        response: httpx.Response,
+        head_check: Optional[HeadCheck],
+        head_bytes: int
+    ):
+        """对缓存的响应体开头执行预检，未通过时抛出ResponseRejectedError"""
+        if head_check is not None and not head_check(response.content[:head_bytes], response.charset_encoding):
+            raise ResponseRejectedError(url)
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=1, max=10),
-        retry=retry_if_exception_type((httpx.RequestError, httpx.HTTPStatusError)),
-    )
     async def post(
         self,
         url: str,
         data: Optional[Dict[str, Any]] = None,
         json: Optional[Dict[str, Any]] = None,
         headers: Optional[Dict[str, str]] = None,
-        timeout: Optional[float] = None
+        timeout: Optional[float] = None,
+        priority: str = LANE_PUBLISH
     ) -> httpx.Response:
         """
         发送POST请求
@@ -154,6 +838,7 @@ class HTTPClient:
             json: JSON数据
             headers: 请求头
             timeout: 超时时间
+            priority: 优先级通道
 
         Returns:
             httpx.Response对象
@@ -172,35 +857,111 @@ class HTTPClient:
         if "User-Agent" not in request_headers:
             request_headers["User-Agent"] = self._get_random_user_agent()
 
-        # 速率限制
-        async with self._rate_limit_semaphore:
-            logger.debug(f"POST请求: {url}")
-            response = await self._client.post(
-                url,
-                data=data,
-                json=json,
-                headers=request_headers,
-                timeout=timeout
-            )
+        # 按域名限速
+        response = await self._request(
+            "POST",
+            url,
+            data=data,
+            json=json,
+            headers=request_headers,
+            timeout=timeout,
+            priority=priority
+        )
+        response.raise_for_status()
 
-            logger.debug(f"响应状态: {response.status_code} - {url}")
-            response.raise_for_status()
+        return response
 
-            return response
+    @asynccontextmanager
+    async def stream(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        priority: str = LANE_CRAWL
+    ):
+        """
+        流式GET请求（大文件边下载边处理，不把响应体读入内存）
+
+        与其他请求一样经过调度器、熔断器和代理池，使用学习的连接/读取超时，
+        但不重试、不走HTTP缓存，状态码由调用者处理（如条件请求的304）。
+
+        用法:
+            async with client.stream(url, headers) as response:
+                async for chunk in response.aiter_bytes():
+                    ...
+
+        Args:
+            url: 请求URL
+            headers: 请求头
+            priority: 优先级通道
+
+        Yields:
+            未读取响应体的httpx.Response
+
+        Raises:
+            CircuitOpenError: 域名熔断中
+            httpx.TransportError: 网络错误
+        """
+        if self._client is None:
+            await self.start()
+
+        request_headers = dict(headers or {})
+        if "User-Agent" not in request_headers:
+            request_headers["User-Agent"] = self._get_random_user_agent()
+
+        host = HostScheduler.host_of(url)
+        breaker = self._retry_policy.breaker(host)
+        breaker.before_request()
+
+        async with self._scheduler.slot(url, priority) as queue_wait:
+            self.metrics.record_queue_wait(host, queue_wait, priority)
+            logger.debug(f"流式请求: {url}")
+
+            timing = self._begin_request(host)
+            proxy, client = self._client_for(host)
+            response = None
+            error = None
+            budget = self._timeouts.timeout_for(host) if self._timeouts else httpx.USE_CLIENT_DEFAULT
+            try:
+                async with client.stream(
+                    "GET",
+                    url,
+                    headers=request_headers,
+                    timeout=budget,
+                    extensions={"trace": self._make_trace(host, timing)}
+                ) as response:
+                    self._retry_policy.record_response(breaker, response)
+                    yield response
+            except httpx.TransportError as e:
+                error = e
+                breaker.record_failure()
+                raise
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                bytes_received = response.num_bytes_downloaded if response else 0
+                self._end_request(host, timing, response, bytes_received)
+                self._record_proxy(proxy, host, timing, response, error, bytes_received)
+                self._feedback(url, timing, response, error)
+                self._learn_timeouts(host, timing, response, error, budget, None, include_total=False)
 
     async def download_file(
         self,
         url: str,
         save_path: str,
-        headers: Optional[Dict[str, str]] = None
+        headers: Optional[Dict[str, str]] = None,
+        priority: str = LANE_MEDIA
     ) -> str:
         """
         下载文件
 
+        同一URL的并发下载只请求一次，其他调用者在完成后复制到各自的保存路径。
+
         Args:
             url: 文件URL
             save_path: 保存路径
             headers: 请求头
+            priority: 优先级通道
 
         Returns:
             保存的文件路径
@@ -215,41 +976,206 @@ class HTTPClient:
         if "User-Agent" not in request_headers:
             request_headers["User-Agent"] = self._get_random_user_agent()
 
-        async with self._rate_limit_semaphore:
-            logger.debug(f"下载文件: {url} -> {save_path}")
+        key = self._coalesce_key("DOWNLOAD", url, request_headers)
+        downloaded_path = await self._single_flight.do(
+            key,
+            lambda: self._download(url, save_path, request_headers, priority)
+        )
+
+        if os.path.abspath(downloaded_path) != os.path.abspath(save_path):
+            os.makedirs(os.path.dirname(save_path) or ".", exist_ok=True)
+            await asyncio.to_thread(shutil.copyfile, downloaded_path, save_path)
+            logger.debug(f"复用合并下载结果: {downloaded_path} -> {save_path}")
+
+        return save_path
+
+    async def _download(self, url: str, save_path: str, request_headers: Dict[str, str], priority: str) -> str:
+        """
+        执行文件下载，由download_file()合并后调用
+
+        数据先写入 save_path + ".part"，连接中断时用Range请求从已下载的位置续传，
+        完整下载并校验长度后原子重命名为目标文件。
+
+        Args:
+            url: 文件URL
+            save_path: 保存路径
+            request_headers: 请求头
+            priority: 优先级通道
+
+        Returns:
+            保存的文件路径
+        """
+        part_path = f"{save_path}.part"
+        os.makedirs(os.path.dirname(save_path) or ".", exist_ok=True)
+
+        attempts = self._retry_policy.max_attempts
+        for attempt in range(1, attempts + 1):
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            try:
+                await self._download_part(url, part_path, offset, request_headers, priority)
+                break
+            except (httpx.TransportError, DownloadIncompleteError) as e:
+                if attempt >= attempts:
+                    raise
+                delay = min(settings.http_retry_delay * (2 ** (attempt - 1)), settings.http_retry_max_delay)
+                self.metrics.record_retry(HostScheduler.host_of(url))
+                resumed_at = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+                logger.warning(f"下载中断 ({e})，{delay}秒后从 {resumed_at} 字节处续传: {url}")
+                await asyncio.sleep(delay)
+
+        os.replace(part_path, save_path)
+        logger.debug(f"文件下载完成: {save_path}")
+        return save_path
+
+    async def _download_part(
+        self,
+        url: str,
+        part_path: str,
+        offset: int,
+        request_headers: Dict[str, str],
+        priority: str
+    ):
+        """
+        下载（或续传）到 .part 文件
+
+        Args:
+            url: 文件URL
+            part_path: 临时文件路径
+            offset: 已下载的字节数，大于0时发送Range请求
+            request_headers: 请求头
+            priority: 优先级通道
+
+        Raises:
+            DownloadIncompleteError: 写入字节数与Content-Length不一致
+        """
+        headers = dict(request_headers)
+        # 续传和长度校验都基于原始字节，要求源站不压缩
+        headers["Accept-Encoding"] = "identity"
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+
+        host = HostScheduler.host_of(url)
+        breaker = self._retry_policy.breaker(host)
+        breaker.before_request()
+        try:
+            expected, written = await self._stream_to_part(url, part_path, offset, headers, host, priority)
+        except httpx.TransportError:
+            breaker.record_failure()
+            raise
+        except httpx.HTTPStatusError as e:
+            self._retry_policy.record_response(breaker, e.response)
+            raise
+        breaker.record_success()
+
+        if expected is not None and written != expected:
+            raise DownloadIncompleteError(f"已写入 {written} 字节，预期 {expected} 字节")
+
+    async def _stream_to_part(
+        self,
+        url: str,
+        part_path: str,
+        offset: int,
+        headers: Dict[str, str],
+        host: str,
+        priority: str
+    ):
+        """
+        在调度器名额内发起下载请求并写入 .part 文件
+
+        Returns:
+            (预期总字节数或None, 实际文件字节数) 的元组
+        """
+        async with self._scheduler.slot(url, priority) as queue_wait:
+            self.metrics.record_queue_wait(host, queue_wait, priority)
+            logger.debug(f"下载文件: {url} -> {part_path} (偏移 {offset})")
+
+            timing = self._begin_request(host)
+            proxy, client = self._client_for(host)
+            response = None
+            error = None
+            written = offset
+            # 大文件下载只使用学习的连接/读取超时，不限制总耗时
+            budget = self._timeouts.timeout_for(host) if self._timeouts else httpx.USE_CLIENT_DEFAULT
+            try:
+                async with client.stream(
+                    "GET",
+                    url,
+                    headers=headers,
+                    timeout=budget,
+                    extensions={"trace": self._make_trace(host, timing)}
+                ) as response:
+
+                    if response.status_code == 416 and offset:
+                        # Range超出文件长度：.part已完整则直接完成，否则重新下载
+                        total = self._parse_content_range_total(response.headers.get("Content-Range"))
+                        if total == offset:
+                            return total, offset
+                        os.remove(part_path)
+                        raise DownloadIncompleteError(f"续传位置无效 ({offset}/{total})，重新下载")
 
-            async with self._client.stream("GET", url, headers=request_headers) as response:
-                response.raise_for_status()
+                    response.raise_for_status()
 
-                # 确保目录存在
-                import os
-                os.makedirs(os.path.dirname(save_path), exist_ok=True)
+                    if response.status_code == 206:
+                        expected = self._parse_content_range_total(response.headers.get("Content-Range"))
+                        mode = "ab"
+                    else:
+                        # 源站不支持Range，从头下载
+                        content_length = response.headers.get("Content-Length")
+                        expected = int(content_length) if content_length and content_length.isdigit() else None
+                        offset = 0
+                        mode = "wb"
 
-                # 写入文件
-                with open(save_path, 'wb') as f:
-                    async for chunk in response.aiter_bytes(8192):
-                        f.write(chunk)
+                    written = offset
+                    chunk_size = self._initial_chunk_size(expected)
+                    buffer = bytearray()
+                    async with aiofiles.open(part_path, mode) as f:
+                        try:
+                            async for chunk in response.aiter_raw():
+                                buffer.extend(chunk)
+                                if len(buffer) >= chunk_size:
+                                    await f.write(bytes(buffer))
+                                    written += len(buffer)
+                                    buffer.clear()
+                                    # 块写满说明数据来得快，逐步增大写入块以减少磁盘调用次数
+                                    chunk_size = min(chunk_size * 2, self.DOWNLOAD_MAX_CHUNK)
+                        finally:
+                            # 连接中断时也把已收到的数据落盘，续传时不必重下
+                            if buffer:
+                                await f.write(bytes(buffer))
+                                written += len(buffer)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self._end_request(host, timing, response, written - offset)
+                self._record_proxy(proxy, host, timing, response, error, written - offset)
+                self._feedback(url, timing, response, error)
+                self._learn_timeouts(host, timing, response, error, budget, None, include_total=False)
 
-            logger.debug(f"文件下载完成: {save_path}")
-            return save_path
+        return expected, written
 
+    def _initial_chunk_size(self, expected: Optional[int]) -> int:
+        """根据文件大小确定初始写入块大小"""
+        if not expected:
+            return self.DOWNLOAD_MIN_CHUNK
+        return max(self.DOWNLOAD_MIN_CHUNK, min(expected // 16, self.DOWNLOAD_MAX_CHUNK))
 
-# 全局HTTP客户端实例
-_http_client: Optional[HTTPClient] = None
+    @staticmethod
+    def _parse_content_range_total(content_range: Optional[str]) -> Optional[int]:
+        """解析 Content-Range 头中的文件总长度，如 "bytes 100-999/1000" -> 1000"""
+        if not content_range or "/" not in content_range:
+            return None
+        total = content_range.rsplit("/", 1)[1].strip()
+        return int(total) if total.isdigit() else None
 
 
 async def get_http_client() -> HTTPClient:
-    """获取全局HTTP客户端实例"""
-    global _http_client
-    if _http_client is None:
-        _http_client = HTTPClient()
-        await _http_client.start()
-    return _http_client
+    """获取全局HTTP客户端实例（共享资源容器中的抓取连接池）"""
+    from src.utils.resources import get_resources, CRAWL_POOL
+    return await get_resources().http_client(CRAWL_POOL)
 
 
 async def close_http_client():
-    """关闭全局HTTP客户端"""
-    global _http_client
-    if _http_client is not None:
-        await _http_client.close()
-        _http_client = None
+    """关闭全局资源容器中的所有连接池"""
+    from src.utils.resources import close_resources
+    await close_resources()
@@ -0,0 +1,373 @@
+"""HTTP监控统计 - 连接池复用、延迟直方图与吞吐指标"""
+import json
+import time
+from pathlib import Path
+from typing import Dict, Any, Callable, Awaitable, Optional, Union
+
+
+class _HostPoolCounters:
+    """单个域名的连接统计"""
+
+    def __init__(self):
+        self.requests = 0
+        self.responses = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+        self.streams_in_flight = 0
+        self.max_streams_in_flight = 0
+        self.http_versions: Dict[str, int] = {}
+
+
+class PoolTelemetry:
+    """连接池统计
+
+    通过httpcore的trace扩展统计每个域名新建的TCP连接数、TLS握手次数
+    和同时在途的请求数（HTTP/2下即并发stream数），用于对比HTTP/1.1与HTTP/2。
+    """
+
+    def __init__(self):
+        """初始化统计"""
+        self._hosts: Dict[str, _HostPoolCounters] = {}
+
+    def _host(self, host: str) -> _HostPoolCounters:
+        """获取域名统计"""
+        counters = self._hosts.get(host)
+        if counters is None:
+            counters = _HostPoolCounters()
+            self._hosts[host] = counters
+        return counters
+
+    def make_trace(self, host: str) -> Callable[[str, Dict[str, Any]], Awaitable[None]]:
+        """
+        为单次请求创建trace回调（通过 extensions={"trace": ...} 传给httpx）
+
+        Args:
+            host: 请求域名
+
+        Returns:
+            异步trace回调函数
+        """
+        counters = self._host(host)
+
+        async def trace(event_name: str, info: Dict[str, Any]):
+            if event_name == "connection.connect_tcp.complete":
+                counters.new_connections += 1
+            elif event_name == "connection.start_tls.complete":
+                counters.tls_handshakes += 1
+
+        return trace
+
+    def request_started(self, host: str):
+        """记录请求开始"""
+        counters = self._host(host)
+        counters.requests += 1
+        counters.streams_in_flight += 1
+        counters.max_streams_in_flight = max(counters.max_streams_in_flight, counters.streams_in_flight)
+
+    def request_finished(self, host: str, http_version: Optional[str] = None):
+        """记录请求结束"""
+        counters = self._host(host)
+        counters.streams_in_flight = max(0, counters.streams_in_flight - 1)
+        if http_version:
+            counters.responses += 1
+            counters.http_versions[http_version] = counters.http_versions.get(http_version, 0) + 1
+
+    def snapshot(self, open_connections: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        """
+        生成统计快照
+
+        Args:
+            open_connections: 各域名当前打开的连接数（由连接池提供）
+
+        Returns:
+            包含每域名统计和汇总的字典
+        """
+        open_connections = open_connections or {}
+        hosts = {}
+        total_requests = 0
+        total_responses = 0
+        total_connections = 0
+        total_handshakes = 0
+
+        for host, c in self._hosts.items():
+            # 复用率 = 未新建连接的响应数 / 完成的响应数
+            reuse_ratio = (c.responses - c.new_connections) / c.responses if c.responses else 0.0
+            hosts[host] = {
+                "open_connections": open_connections.get(host, 0),
+                "requests": c.requests,
+                "responses": c.responses,
+                "new_connections": c.new_connections,
+                "tls_handshakes": c.tls_handshakes,
+                "streams_in_flight": c.streams_in_flight,
+                "max_streams_in_flight": c.max_streams_in_flight,
+                "reuse_ratio": round(max(0.0, reuse_ratio), 3),
+                "http_versions": dict(c.http_versions),
+            }
+            total_requests += c.requests
+            total_responses += c.responses
+            total_connections += c.new_connections
+            total_handshakes += c.tls_handshakes
+
+        total_reuse = (total_responses - total_connections) / total_responses if total_responses else 0.0
+        return {
+            "hosts": hosts,
+            "total": {
+                "open_connections": sum(open_connections.values()),
+                "requests": total_requests,
+                "responses": total_responses,
+                "new_connections": total_connections,
+                "tls_handshakes": total_handshakes,
+                "reuse_ratio": round(max(0.0, total_reuse), 3),
+            },
+        }
+
+
+class LatencyHistogram:
+    """固定分桶的延迟直方图（毫秒）"""
+
+    BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms: Optional[float] = None
+        self.max_ms = 0.0
+
+    def observe(self, seconds: float):
+        """记录一次耗时"""
+        ms = seconds * 1000
+        index = len(self.BUCKETS_MS)
+        for i, bound in enumerate(self.BUCKETS_MS):
+            if ms <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.min_ms = ms if self.min_ms is None else min(self.min_ms, ms)
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, p: float) -> float:
+        """按分桶上界估算百分位数（毫秒）"""
+        if not self.count:
+            return 0.0
+        target = self.count * p
+        cumulative = 0
+        for i, c in enumerate(self.counts):
+            cumulative += c
+            if cumulative >= target:
+                bound = self.BUCKETS_MS[i] if i < len(self.BUCKETS_MS) else self.max_ms
+                return round(min(float(bound), self.max_ms), 2)
+        return self.max_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        """导出为字典"""
+        buckets = {f"<={b}ms": c for b, c in zip(self.BUCKETS_MS, self.counts)}
+        buckets[f">{self.BUCKETS_MS[-1]}ms"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "min_ms": round(self.min_ms or 0.0, 2),
+            "max_ms": round(self.max_ms, 2),
+            "p50_ms": self.percentile(0.5),
+            "p90_ms": self.percentile(0.9),
+            "p99_ms": self.percentile(0.99),
+            "buckets": buckets,
+        }
+
+
+class RequestTiming:
+    """单次请求的时间点，由trace回调填充"""
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.connect_start: Optional[float] = None
+        self.connect_end: Optional[float] = None
+        self.headers_received: Optional[float] = None
+
+    def on_event(self, event_name: str):
+        """处理httpcore trace事件"""
+        now = time.monotonic()
+        if event_name == "connection.connect_tcp.started":
+            self.connect_start = now
+        elif event_name in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            # 有TLS时以握手完成为连接结束
+            self.connect_end = now
+        elif event_name in ("http11.receive_response_headers.complete", "http2.receive_response_headers.complete"):
+            self.headers_received = now
+
+    @property
+    def connect_time(self) -> Optional[float]:
+        """建立连接耗时（复用连接时为None）"""
+        if self.connect_start is None or self.connect_end is None:
+            return None
+        return self.connect_end - self.connect_start
+
+    @property
+    def ttfb(self) -> Optional[float]:
+        """首字节耗时（从发起请求到收到响应头）"""
+        if self.headers_received is None:
+            return None
+        return self.headers_received - self.start
+
+
+class _HostMetrics:
+    """单个域名的请求指标"""
+
+    def __init__(self):
+        self.connect = LatencyHistogram()
+        self.ttfb = LatencyHistogram()
+        self.total = LatencyHistogram()
+        self.queue_wait = LatencyHistogram()
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes_received = 0
+        self.status_codes: Dict[str, int] = {}
+
+
+class HTTPMetrics:
+    """HTTP请求指标
+
+    按域名统计连接/首字节/总耗时直方图、接收字节数、状态码分布、
+    重试次数和在限速队列中的等待时间（另按优先级通道统计排队时间），
+    可在代码中查询或导出为JSON。
+    """
+
+    def __init__(self):
+        """初始化指标"""
+        self._hosts: Dict[str, _HostMetrics] = {}
+        self._lane_waits: Dict[str, LatencyHistogram] = {}
+        self.started_at = time.time()
+
+    def _host(self, host: str) -> _HostMetrics:
+        """获取域名指标"""
+        metrics = self._hosts.get(host)
+        if metrics is None:
+            metrics = _HostMetrics()
+            self._hosts[host] = metrics
+        return metrics
+
+    def record_queue_wait(self, host: str, seconds: float, lane: Optional[str] = None):
+        """记录在限速队列中的等待时间"""
+        self._host(host).queue_wait.observe(seconds)
+        if lane is not None:
+            histogram = self._lane_waits.get(lane)
+            if histogram is None:
+                histogram = LatencyHistogram()
+                self._lane_waits[lane] = histogram
+            histogram.observe(seconds)
+
+    def lane_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """获取各优先级通道的排队时间分布"""
+        return {lane: histogram.to_dict() for lane, histogram in self._lane_waits.items()}
+
+    def record_retry(self, host: str):
+        """记录一次重试"""
+        self._host(host).retries += 1
+
+    def record_response(
+        self,
+        host: str,
+        timing: RequestTiming,
+        status_code: Optional[int],
+        bytes_received: int = 0
+    ):
+        """
+        记录一次请求结果
+
+        Args:
+            host: 域名
+            timing: 请求时间点
+            status_code: 状态码，请求失败时为None
+            bytes_received: 接收的字节数
+        """
+        metrics = self._host(host)
+        metrics.requests += 1
+        metrics.total.observe(time.monotonic() - timing.start)
+        if timing.connect_time is not None:
+            metrics.connect.observe(timing.connect_time)
+        if timing.ttfb is not None:
+            metrics.ttfb.observe(timing.ttfb)
+        metrics.bytes_received += bytes_received
+
+        key = str(status_code) if status_code is not None else "error"
+        if status_code is None:
+            metrics.errors += 1
+        metrics.status_codes[key] = metrics.status_codes.get(key, 0) + 1
+
+    def has_data(self) -> bool:
+        """是否记录过请求"""
+        return bool(self._hosts)
+
+    def host_snapshot(self, host: str) -> Optional[Dict[str, Any]]:
+        """获取单个域名的指标"""
+        metrics = self._hosts.get(host)
+        if metrics is None:
+            return None
+        return {
+            "requests": metrics.requests,
+            "errors": metrics.errors,
+            "retries": metrics.retries,
+            "bytes_received": metrics.bytes_received,
+            "status_codes": dict(metrics.status_codes),
+            "connect": metrics.connect.to_dict(),
+            "ttfb": metrics.ttfb.to_dict(),
+            "total": metrics.total.to_dict(),
+            "queue_wait": metrics.queue_wait.to_dict(),
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        获取全部指标
+
+        Returns:
+            {"hosts": {域名: 指标}, "summary": 汇总}
+        """
+        hosts = {host: self.host_snapshot(host) for host in self._hosts}
+        return {
+            "started_at": self.started_at,
+            "duration_seconds": round(time.time() - self.started_at, 2),
+            "hosts": hosts,
+            "lane_queue_wait": self.lane_snapshot(),
+            "summary": {
+                "requests": sum(h["requests"] for h in hosts.values()),
+                "errors": sum(h["errors"] for h in hosts.values()),
+                "retries": sum(h["retries"] for h in hosts.values()),
+                "bytes_received": sum(h["bytes_received"] for h in hosts.values()),
+            },
+        }
+
+    def dump_json(self, path: Union[str, Path], extra: Optional[Dict[str, Any]] = None) -> Path:
+        """
+        导出指标为JSON文件
+
+        Args:
+            path: 输出文件路径
+            extra: 附加到输出中的其他统计（如DNS、缓存）
+
+        Returns:
+            输出文件路径
+        """
+        data = self.snapshot()
+        if extra:
+            data.update(extra)
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        return path
+
+
+# 全局HTTP指标实例
+_http_metrics: Optional[HTTPMetrics] = None
+
+
+def get_http_metrics() -> HTTPMetrics:
+    """获取全局HTTP指标实例"""
+    global _http_metrics
+    if _http_metrics is None:
+        _http_metrics = HTTPMetrics()
+    return _http_metrics
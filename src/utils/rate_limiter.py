@@ -0,0 +1,671 @@
+"""请求调度器 - 按域名的令牌桶限速 + 按优先级通道加权公平排队的并发上限"""
+import asyncio
+import heapq
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, Deque, Iterable, List, Tuple
+from urllib.parse import urlparse
+from loguru import logger
+
+
+# 优先级通道
+LANE_INTERACTIVE = "interactive"  # 交互式单篇抓取
+LANE_PUBLISH = "publish"  # 发布流程（封面、API调用）
+LANE_CRAWL = "crawl"  # 批量抓取
+LANE_MEDIA = "media"  # 图片等大文件下载
+
+# 默认权重：排队时按权重分配空出的名额
+DEFAULT_LANE_WEIGHTS = {
+    LANE_INTERACTIVE: 8.0,
+    LANE_PUBLISH: 4.0,
+    LANE_CRAWL: 2.0,
+    LANE_MEDIA: 1.0,
+}
+
+# 高优先级通道可以使用预留名额
+HIGH_PRIORITY_LANES = frozenset({LANE_INTERACTIVE, LANE_PUBLISH})
+
+
+class TokenBucket:
+    """令牌桶 - 控制每秒请求数并允许一定突发
+
+    令牌不足时请求挂起排队（不持锁睡眠），由定时器在令牌补足时放行：
+    优先级高的先拿到令牌，同优先级先到先得。
+    """
+
+    def __init__(self, rate: float, burst: int):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数（<=0 表示不限速）
+            burst: 桶容量，即允许的最大突发请求数
+        """
+        self.rate = rate
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        # 排队的请求: [(-优先级, 序号, future)]
+        self._waiters: List[Tuple[float, int, asyncio.Future]] = []
+        self._seq = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def _refill(self, now: float):
+        """按流逝时间补充令牌"""
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+
+    def _dispatch(self):
+        """把补足的令牌按优先级分给排队的请求，还有请求排队时安排下一次放行"""
+        self._timer = None
+        self._refill(time.monotonic())
+        while self._waiters and (self.rate <= 0 or self._tokens >= 1):
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            if self.rate > 0:
+                self._tokens -= 1
+            future.set_result(None)
+
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+        if self._waiters:
+            delay = (1 - self._tokens) / self.rate
+            self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    async def acquire(self, priority: float = 0.0) -> float:
+        """
+        获取一个令牌，不足时排队等待
+
+        Args:
+            priority: 优先级，越大越先拿到令牌
+
+        Returns:
+            等待的秒数
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        self._refill(time.monotonic())
+        if not self._waiters and self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+
+        start = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self._seq += 1
+        heapq.heappush(self._waiters, (-priority, self._seq, future))
+        if self._timer is None:
+            self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 令牌已分配但调用者被取消，归还令牌
+                self._tokens = min(self.burst, self._tokens + 1)
+            raise
+        return time.monotonic() - start
+
+    def configure(self, rate: float, burst: int):
+        """
+        调整速率和容量（已积攒的令牌不超过新容量）
+
+        Args:
+            rate: 每秒补充的令牌数（<=0 表示不限速）
+            burst: 桶容量
+        """
+        self._refill(time.monotonic())
+        self.rate = rate
+        self.burst = max(1, int(burst))
+        self._tokens = min(self._tokens, float(self.burst))
+        # 按新速率重新安排排队请求的放行时间
+        if self._timer is not None:
+            self._timer.cancel()
+            self._dispatch()
+
+
+class _Lane:
+    """优先级通道的排队状态"""
+
+    def __init__(self, name: str, weight: float):
+        self.name = name
+        self.weight = max(0.01, float(weight))
+        self.queue: Deque[asyncio.Future] = deque()
+        # 加权公平排队的虚拟完成时间
+        self.finish_tag = 0.0
+        self.in_flight = 0
+        self.granted = 0
+
+
+class PriorityGate:
+    """按优先级通道加权公平排队的并发闸门
+
+    替代 asyncio.Semaphore：名额空出时，在有请求排队的通道中选择虚拟完成
+    时间最小的通道放行（加权公平排队，权重越大分到的名额越多，低权重通道
+    也不会饿死）。capacity 中预留 reserved 个名额只给高优先级通道使用，
+    批量流量再多也不会占满全部并发。capacity 可在运行时调整。
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        weights: Optional[Dict[str, float]] = None,
+        reserved: int = 0,
+        high_priority: Iterable[str] = HIGH_PRIORITY_LANES
+    ):
+        """
+        初始化闸门
+
+        Args:
+            capacity: 并发上限
+            weights: 各通道权重，未列出的通道权重为1
+            reserved: 只给高优先级通道使用的名额数
+            high_priority: 高优先级通道名称
+        """
+        self.capacity = max(1, int(capacity))
+        self.reserved = max(0, int(reserved))
+        self.high_priority = frozenset(high_priority)
+        self._weights = dict(weights or DEFAULT_LANE_WEIGHTS)
+        self._lanes: Dict[str, _Lane] = {}
+        self._virtual_time = 0.0
+        self.in_use = 0
+        self.low_in_use = 0
+
+    def _lane(self, name: str) -> _Lane:
+        """获取（必要时创建）通道"""
+        lane = self._lanes.get(name)
+        if lane is None:
+            lane = _Lane(name, self._weights.get(name, 1.0))
+            self._lanes[name] = lane
+        return lane
+
+    def _can_grant(self, lane: _Lane) -> bool:
+        """是否还有该通道可用的名额"""
+        if self.in_use >= self.capacity:
+            return False
+        if lane.name in self.high_priority:
+            return True
+        # 低优先级通道不能占用预留名额（预留数不超过总容量-1，保证低优先级至少有1个名额）
+        reserved = min(self.reserved, self.capacity - 1)
+        return self.low_in_use < self.capacity - reserved
+
+    def _activate(self, lane: _Lane):
+        """空闲通道重新开始排队时，把它的虚拟时间追到当前，避免攒下的额度一次性插队"""
+        lane.finish_tag = max(lane.finish_tag, self._virtual_time)
+
+    def _grant(self, lane: _Lane):
+        """为通道占用一个名额并推进虚拟时间（按开始时间公平排队）"""
+        self._virtual_time = max(self._virtual_time, lane.finish_tag)
+        lane.finish_tag += 1.0 / lane.weight
+        lane.in_flight += 1
+        lane.granted += 1
+        self.in_use += 1
+        if lane.name not in self.high_priority:
+            self.low_in_use += 1
+
+    def _dispatch(self):
+        """把空出的名额按加权公平顺序分给排队的请求"""
+        while self.in_use < self.capacity:
+            best: Optional[_Lane] = None
+            best_tag = 0.0
+            for lane in self._lanes.values():
+                while lane.queue and lane.queue[0].done():
+                    lane.queue.popleft()
+                if not lane.queue or not self._can_grant(lane):
+                    continue
+                tag = lane.finish_tag + 1.0 / lane.weight
+                if best is None or tag < best_tag:
+                    best, best_tag = lane, tag
+            if best is None:
+                return
+            self._grant(best)
+            best.queue.popleft().set_result(None)
+
+    async def acquire(self, lane_name: str = LANE_CRAWL):
+        """
+        占用一个名额，没有可用名额时按通道排队
+
+        Args:
+            lane_name: 优先级通道
+        """
+        lane = self._lane(lane_name)
+        if not lane.queue:
+            self._activate(lane)
+            if self._can_grant(lane):
+                self._grant(lane)
+                return
+
+        future = asyncio.get_running_loop().create_future()
+        lane.queue.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 名额已分配但调用者被取消，归还名额
+                self.release(lane_name)
+            else:
+                try:
+                    lane.queue.remove(future)
+                except ValueError:
+                    pass
+            raise
+
+    def release(self, lane_name: str = LANE_CRAWL):
+        """
+        归还一个名额
+
+        Args:
+            lane_name: 占用名额时的优先级通道
+        """
+        lane = self._lane(lane_name)
+        lane.in_flight -= 1
+        self.in_use -= 1
+        if lane.name not in self.high_priority:
+            self.low_in_use -= 1
+        self._dispatch()
+
+    def set_capacity(self, capacity: int):
+        """调整并发上限（调大时立即放行排队的请求）"""
+        self.capacity = max(1, int(capacity))
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, lane_name: str = LANE_CRAWL):
+        """占用名额的上下文管理器"""
+        await self.acquire(lane_name)
+        try:
+            yield
+        finally:
+            self.release(lane_name)
+
+    def waiting(self) -> int:
+        """排队中的请求数"""
+        return sum(
+            sum(1 for f in lane.queue if not f.done()) for lane in self._lanes.values()
+        )
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取各通道统计
+
+        Returns:
+            {通道: {weight, in_flight, waiting, granted}}
+        """
+        return {
+            name: {
+                "weight": lane.weight,
+                "in_flight": lane.in_flight,
+                "waiting": sum(1 for f in lane.queue if not f.done()),
+                "granted": lane.granted,
+            }
+            for name, lane in self._lanes.items()
+        }
+
+
+class AIMDWindow:
+    """加性增、乘性减（AIMD）的并发窗口
+
+    窗口被用满且延迟正常时，每收到一个窗口数量的成功响应窗口加1；
+    遇到429/5xx/超时或延迟明显高于基线时窗口乘以回退系数。
+    两次收缩之间至少间隔一个平滑延迟（约一个往返），
+    避免同一批并发失败把窗口连续砍到底。
+    """
+
+    # 延迟平滑系数
+    EWMA_ALPHA = 0.2
+    # 基线延迟向当前延迟漂移的半衰期（秒），源站整体变慢后基线能慢慢跟上；
+    # 按时间而不是按样本数漂移，请求越多基线不会漂得越快
+    BASELINE_HALF_LIFE = 120.0
+
+    def __init__(
+        self,
+        initial: float,
+        min_limit: int,
+        max_limit: int,
+        backoff: float = 0.5,
+        latency_tolerance: float = 2.0
+    ):
+        """
+        初始化并发窗口
+
+        Args:
+            initial: 初始窗口
+            min_limit: 窗口下限
+            max_limit: 窗口上限
+            backoff: 收缩时的乘数（0~1）
+            latency_tolerance: 平滑延迟超过基线的多少倍视为拥塞
+        """
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.window = float(min(max(initial, self.min_limit), self.max_limit))
+        self.backoff = min(max(backoff, 0.1), 0.95)
+        self.latency_tolerance = max(1.0, latency_tolerance)
+
+        self.latency_ewma: Optional[float] = None
+        self.baseline: Optional[float] = None
+        self._last_sample = 0.0
+        self._last_decrease = 0.0
+        self.increases = 0
+        self.decreases = 0
+
+    @property
+    def limit(self) -> int:
+        """当前并发上限"""
+        return int(self.window)
+
+    def _observe_latency(self, latency: float):
+        """更新平滑延迟和基线延迟"""
+        now = time.monotonic()
+        elapsed, self._last_sample = now - self._last_sample, now
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+            self.baseline = latency
+            return
+        self.latency_ewma += self.EWMA_ALPHA * (latency - self.latency_ewma)
+        if self.latency_ewma < self.baseline:
+            self.baseline = self.latency_ewma
+        else:
+            drift = 1 - 0.5 ** (elapsed / self.BASELINE_HALF_LIFE)
+            self.baseline += drift * (self.latency_ewma - self.baseline)
+
+    def on_success(self, latency: Optional[float], saturated: bool) -> bool:
+        """
+        记录一次成功响应
+
+        Args:
+            latency: 首字节延迟（秒），未知时为None
+            saturated: 发出请求时窗口是否已被用满
+
+        Returns:
+            窗口是否变化
+        """
+        if latency is not None:
+            self._observe_latency(latency)
+            if self.latency_ewma > self.baseline * self.latency_tolerance:
+                return self.on_congestion()
+
+        # 没用满窗口时增大窗口没有意义，只会在流量突增时压垮源站
+        if not saturated or self.window >= self.max_limit:
+            return False
+        before = self.limit
+        self.window = min(self.max_limit, self.window + 1.0 / self.window)
+        if self.limit != before:
+            self.increases += 1
+            return True
+        return False
+
+    def on_congestion(self) -> bool:
+        """
+        记录一次拥塞信号（429/5xx/超时/延迟升高）
+
+        Returns:
+            窗口是否变化
+        """
+        now = time.monotonic()
+        if now - self._last_decrease < (self.latency_ewma or 0.0):
+            return False
+        self._last_decrease = now
+
+        before = self.limit
+        self.window = max(float(self.min_limit), self.window * self.backoff)
+        if self.limit != before:
+            self.decreases += 1
+            return True
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        """获取窗口状态"""
+        return {
+            "window": round(self.window, 2),
+            "limit": self.limit,
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 2) if self.latency_ewma is not None else None,
+            "baseline_ms": round(self.baseline * 1000, 2) if self.baseline is not None else None,
+            "increases": self.increases,
+            "decreases": self.decreases,
+        }
+
+
+class _HostState:
+    """单个域名的调度状态"""
+
+    def __init__(
+        self,
+        host: str,
+        rate: float,
+        burst: int,
+        max_concurrent: int,
+        weights: Dict[str, float],
+        window: Optional[AIMDWindow] = None
+    ):
+        self.host = host
+        self.bucket = TokenBucket(rate, burst)
+        # 配置的速率，robots.txt的Crawl-delay只会在此基础上降低
+        self.base_rate = rate
+        self.base_burst = burst
+        self.crawl_delay: Optional[float] = None
+        self.window = window
+        self.max_concurrent = window.limit if window else max(1, int(max_concurrent))
+        # 同一域名内也按通道排队，交互式请求不用排在批量抓取后面
+        self.gate = PriorityGate(self.max_concurrent, weights)
+        self.in_flight = 0
+        self.waiting = 0
+        self.total_requests = 0
+        # 最近一次放行时窗口是否已用满（用满时才允许增大窗口）
+        self.saturated = False
+
+
+class HostScheduler:
+    """按域名调度请求
+
+    每个域名拥有独立的令牌桶（每秒请求数 + 突发）和并发上限，
+    所有域名再共享一个全局并发上限。慢域名只会占满自己的名额，
+    不会阻塞其他域名的请求。域名和全局两级名额都按优先级通道
+    加权公平排队，全局名额中预留一部分给高优先级通道。
+    启用自适应并发时，每个域名的并发上限由AIMD窗口根据响应情况调整。
+    """
+
+    def __init__(
+        self,
+        global_concurrency: int,
+        default_rate: float,
+        default_burst: int,
+        default_concurrency: int,
+        host_limits: Optional[Dict[str, Dict[str, Any]]] = None,
+        lane_weights: Optional[Dict[str, float]] = None,
+        reserved_share: float = 0.0,
+        adaptive: Optional[Dict[str, float]] = None
+    ):
+        """
+        初始化调度器
+
+        Args:
+            global_concurrency: 全局最大并发请求数
+            default_rate: 默认每域名每秒请求数
+            default_burst: 默认每域名突发请求数
+            default_concurrency: 默认每域名最大并发数
+            host_limits: 按域名覆盖的配置，如 {"thumpertalk.com": {"rate": 1, "burst": 2, "concurrency": 2}}
+            lane_weights: 优先级通道权重，默认 DEFAULT_LANE_WEIGHTS
+            reserved_share: 全局并发中只给高优先级通道使用的比例（0~1）
+            adaptive: 自适应并发配置 {min, max, backoff, latency_tolerance}，None表示固定并发
+        """
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self.default_concurrency = default_concurrency
+        self.host_limits = {k.lower(): v for k, v in (host_limits or {}).items()}
+        self.lane_weights = {**DEFAULT_LANE_WEIGHTS, **(lane_weights or {})}
+        self.adaptive = adaptive
+
+        global_concurrency = max(1, int(global_concurrency))
+        self._global_gate = PriorityGate(
+            global_concurrency,
+            self.lane_weights,
+            reserved=round(global_concurrency * min(max(reserved_share, 0.0), 1.0)),
+        )
+        self._hosts: Dict[str, _HostState] = {}
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        """提取URL中的域名（小写）"""
+        return (urlparse(url).hostname or "").lower()
+
+    def _resolve_limits(self, host: str) -> Dict[str, Any]:
+        """查找域名配置，支持父域名匹配（thumpertalk.com 匹配 www.thumpertalk.com）"""
+        parts = host.split(".")
+        for i in range(len(parts)):
+            candidate = ".".join(parts[i:])
+            if candidate in self.host_limits:
+                return self.host_limits[candidate]
+        return {}
+
+    def _get_host(self, host: str) -> _HostState:
+        """获取（必要时创建）域名调度状态"""
+        state = self._hosts.get(host)
+        if state is None:
+            limits = self._resolve_limits(host)
+            concurrency = int(limits.get("concurrency", self.default_concurrency))
+            window = None
+            if self.adaptive:
+                # 配置的并发数作为初始窗口
+                window = AIMDWindow(
+                    initial=concurrency,
+                    min_limit=int(self.adaptive.get("min", 1)),
+                    max_limit=int(self.adaptive.get("max", concurrency)),
+                    backoff=float(self.adaptive.get("backoff", 0.5)),
+                    latency_tolerance=float(self.adaptive.get("latency_tolerance", 2.0)),
+                )
+            state = _HostState(
+                host,
+                rate=float(limits.get("rate", self.default_rate)),
+                burst=int(limits.get("burst", self.default_burst)),
+                max_concurrent=concurrency,
+                weights=self.lane_weights,
+                window=window,
+            )
+            self._hosts[host] = state
+            logger.debug(
+                f"域名调度配置: {host} - {state.bucket.rate}次/秒, "
+                f"突发 {state.bucket.burst}, 并发 {state.max_concurrent}"
+            )
+        return state
+
+    @asynccontextmanager
+    async def slot(self, url: str, lane: str = LANE_CRAWL):
+        """
+        为一次请求占用调度名额
+
+        先占用域名并发名额并等待令牌，最后才占用全局名额，
+        避免等待限速的请求占住全局并发。
+
+        Args:
+            url: 请求URL
+            lane: 优先级通道
+
+        Yields:
+            在队列中等待的秒数
+        """
+        state = self._get_host(self.host_of(url))
+        start = time.monotonic()
+
+        acquired = False
+        state.waiting += 1
+        try:
+            async with state.gate.slot(lane):
+                # 令牌不足时高优先级通道先拿到令牌，不排在批量请求后面
+                await state.bucket.acquire(self.lane_weights.get(lane, 1.0))
+                async with self._global_gate.slot(lane):
+                    state.waiting -= 1
+                    acquired = True
+                    state.in_flight += 1
+                    state.total_requests += 1
+                    state.saturated = state.in_flight >= state.max_concurrent
+                    try:
+                        yield time.monotonic() - start
+                    finally:
+                        state.in_flight -= 1
+        finally:
+            # 等待期间被取消时回收等待计数
+            if not acquired:
+                state.waiting -= 1
+
+    def record_result(self, url: str, latency: Optional[float], congested: bool):
+        """
+        把请求结果反馈给域名的自适应并发窗口
+
+        Args:
+            url: 请求URL
+            latency: 首字节延迟（秒），未知时为None
+            congested: 是否是拥塞信号（429/5xx/超时）
+        """
+        state = self._hosts.get(self.host_of(url))
+        if state is None or state.window is None:
+            return
+
+        window = state.window
+        if congested:
+            changed = window.on_congestion()
+        else:
+            changed = window.on_success(latency, state.saturated)
+        if changed:
+            state.max_concurrent = window.limit
+            state.gate.set_capacity(window.limit)
+            logger.debug(f"域名并发窗口调整: {state.host} -> {window.limit} ({'收缩' if congested else '调整'})")
+
+    def set_crawl_delay(self, host: str, delay: Optional[float]):
+        """
+        按robots.txt的Crawl-delay限制域名请求速率
+
+        速率取配置值与 1/delay 中较小者，突发降为1；delay为None时恢复配置值。
+
+        Args:
+            host: 域名
+            delay: 两次请求之间的最小间隔（秒），None表示没有要求
+        """
+        state = self._get_host(host)
+        if delay is not None and delay <= 0:
+            delay = None
+        if state.crawl_delay == delay:
+            return
+        state.crawl_delay = delay
+
+        if delay is None:
+            state.bucket.configure(state.base_rate, state.base_burst)
+        else:
+            rate = 1.0 / delay
+            if state.base_rate > 0:
+                rate = min(rate, state.base_rate)
+            state.bucket.configure(rate, 1)
+        logger.debug(f"域名Crawl-delay: {host} -> {delay}秒 ({state.bucket.rate:.3f}次/秒)")
+
+    def lane_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取全局名额上各优先级通道的统计
+
+        Returns:
+            {通道: {weight, in_flight, waiting, granted}}
+        """
+        return self._global_gate.stats()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取各域名调度统计
+
+        Returns:
+            {域名: {rate, burst, max_concurrent, in_flight, waiting, total_requests[, crawl_delay, adaptive]}}
+        """
+        result = {}
+        for host, state in self._hosts.items():
+            result[host] = {
+                "rate": state.bucket.rate,
+                "burst": state.bucket.burst,
+                "max_concurrent": state.max_concurrent,
+                "in_flight": state.in_flight,
+                "waiting": state.waiting,
+                "total_requests": state.total_requests,
+            }
+            if state.crawl_delay is not None:
+                result[host]["crawl_delay"] = state.crawl_delay
+            if state.window is not None:
+                result[host]["adaptive"] = state.window.stats()
+        return result
@@ -0,0 +1,169 @@
+"""共享资源容器 - 进程级命名HTTP连接池的生命周期管理"""
+import asyncio
+import threading
+from typing import Optional, Dict, Any
+from loguru import logger
+import httpx
+
+from src.utils.http_client import HTTPClient
+from src.utils.dns_cache import install_dns_cache
+from src.utils.cassette import install_cassette
+
+
+# 连接池名称
+CRAWL_POOL = "crawl"  # 文章抓取（异步，带限速/缓存/重试）
+WECHAT_API_POOL = "wechat-api"  # 微信公众号API（同步）
+MEDIA_POOL = "media"  # 封面图等媒体文件下载（同步）
+
+ASYNC_POOLS = (CRAWL_POOL,)
+SYNC_POOLS = (WECHAT_API_POOL, MEDIA_POOL)
+
+
+class ResourceManager:
+    """进程级共享资源容器
+
+    按名称持有共享的HTTP连接池，首次使用时才创建（异步池用asyncio锁、
+    同步池用线程锁保证只创建一次），整个流水线复用同一批连接，
+    运行结束时由 close() 统一关闭。使用方不应自行关闭取得的连接池。
+    """
+
+    def __init__(self):
+        """初始化资源容器"""
+        self._async_pools: Dict[str, HTTPClient] = {}
+        self._sync_pools: Dict[str, httpx.Client] = {}
+        self._async_lock = asyncio.Lock()
+        self._sync_lock = threading.Lock()
+
+    async def http_client(self, name: str = CRAWL_POOL) -> HTTPClient:
+        """
+        获取共享的异步HTTP客户端
+
+        Args:
+            name: 连接池名称
+
+        Returns:
+            已启动的HTTPClient
+
+        Raises:
+            ValueError: 未知的连接池名称
+        """
+        if name not in ASYNC_POOLS:
+            raise ValueError(f"未知的异步连接池: {name}")
+
+        client = self._async_pools.get(name)
+        if client is not None:
+            return client
+
+        async with self._async_lock:
+            client = self._async_pools.get(name)
+            if client is None:
+                client = HTTPClient()
+                await client.start()
+                self._async_pools[name] = client
+                logger.debug(f"共享连接池已创建: {name}")
+        return client
+
+    def sync_client(self, name: str) -> httpx.Client:
+        """
+        获取共享的同步httpx客户端
+
+        Args:
+            name: 连接池名称
+
+        Returns:
+            httpx.Client
+
+        Raises:
+            ValueError: 未知的连接池名称
+        """
+        if name not in SYNC_POOLS:
+            raise ValueError(f"未知的同步连接池: {name}")
+
+        client = self._sync_pools.get(name)
+        if client is not None and not client.is_closed:
+            return client
+
+        with self._sync_lock:
+            client = self._sync_pools.get(name)
+            if client is None or client.is_closed:
+                client = self._create_sync_client(name)
+                self._sync_pools[name] = client
+                logger.debug(f"共享连接池已创建: {name}")
+        return client
+
+    @staticmethod
+    def _create_sync_client(name: str) -> httpx.Client:
+        """按连接池名称创建同步客户端"""
+        if name == MEDIA_POOL:
+            # 图片CDN经常重定向
+            client = httpx.Client(
+                timeout=httpx.Timeout(30.0, connect=10.0),
+                limits=httpx.Limits(max_keepalive_connections=10, max_connections=20),
+                follow_redirects=True,
+            )
+        else:
+            client = httpx.Client(
+                timeout=30.0,
+                limits=httpx.Limits(max_keepalive_connections=5, max_connections=10),
+            )
+        install_dns_cache(client)
+        install_cassette(client)
+        return client
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取各连接池状态
+
+        Returns:
+            {池名称: 状态}，异步池包含连接池统计
+        """
+        result: Dict[str, Any] = {}
+        for name, client in self._async_pools.items():
+            result[name] = {"type": "async", **client.pool_stats()}
+        for name, client in self._sync_pools.items():
+            result[name] = {"type": "sync", "closed": client.is_closed}
+        return result
+
+    async def close(self):
+        """关闭所有连接池（之后再次获取会重新创建）"""
+        async with self._async_lock:
+            pools = list(self._async_pools.items())
+            self._async_pools.clear()
+        for name, client in pools:
+            try:
+                await client.close()
+            except Exception as e:
+                logger.warning(f"关闭连接池失败 {name}: {e}")
+
+        with self._sync_lock:
+            sync_pools = list(self._sync_pools.items())
+            self._sync_pools.clear()
+        for name, client in sync_pools:
+            try:
+                client.close()
+            except Exception as e:
+                logger.warning(f"关闭连接池失败 {name}: {e}")
+
+        if pools or sync_pools:
+            logger.debug(f"共享连接池已关闭: {', '.join(name for name, _ in pools + sync_pools)}")
+
+
+# 全局资源容器实例
+_resources: Optional[ResourceManager] = None
+_resources_lock = threading.Lock()
+
+
+def get_resources() -> ResourceManager:
+    """获取全局资源容器（同步和异步代码都可调用）"""
+    global _resources
+    if _resources is None:
+        with _resources_lock:
+            if _resources is None:
+                _resources = ResourceManager()
+    return _resources
+
+
+async def close_resources():
+    """关闭全局资源容器持有的所有连接池"""
+    if _resources is not None:
+        await _resources.close()
@@ -0,0 +1,238 @@
+"""重试策略 - 错误分类、Retry-After退避与按域名熔断"""
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional, Dict, Any
+from loguru import logger
+import httpx
+from tenacity import RetryCallState
+
+
+class CircuitOpenError(Exception):
+    """域名熔断中，请求被快速拒绝"""
+
+    def __init__(self, host: str, retry_in: float):
+        self.host = host
+        self.retry_in = retry_in
+        super().__init__(f"{host} 已熔断，{retry_in:.0f}秒后重试")
+
+
+class CircuitBreaker:
+    """单个域名的熔断器
+
+    - closed: 正常放行，连续失败达到阈值后转为 open
+    - open: 直接拒绝请求，冷却时间过后转为 half-open
+    - half-open: 只放行一个探测请求，成功则恢复 closed，失败则重新 open
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, host: str, failure_threshold: int, recovery_timeout: float):
+        """
+        初始化熔断器
+
+        Args:
+            host: 域名
+            failure_threshold: 连续失败多少次后熔断
+            recovery_timeout: 熔断后多少秒进入半开状态
+        """
+        self.host = host
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_started_at: Optional[float] = None
+
+    def before_request(self):
+        """
+        请求前检查是否放行
+
+        Raises:
+            CircuitOpenError: 熔断中
+        """
+        if self.state == self.CLOSED:
+            return
+
+        if self.state == self.OPEN:
+            elapsed = time.monotonic() - self.opened_at
+            if elapsed < self.recovery_timeout:
+                raise CircuitOpenError(self.host, self.recovery_timeout - elapsed)
+            self.state = self.HALF_OPEN
+            logger.info(f"熔断器半开，尝试探测: {self.host}")
+
+        # 半开状态只允许一个探测请求（探测请求被取消未回报时，超过冷却时间后允许新探测）
+        now = time.monotonic()
+        if self._probe_started_at is not None and now - self._probe_started_at < self.recovery_timeout:
+            raise CircuitOpenError(self.host, self.recovery_timeout - (now - self._probe_started_at))
+        self._probe_started_at = now
+
+    def record_success(self):
+        """记录成功请求"""
+        if self.state != self.CLOSED:
+            logger.info(f"熔断器恢复: {self.host}")
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probe_started_at = None
+
+    def record_throttled(self):
+        """记录被源站限流的请求：主机可达，不计入连续失败，半开状态下允许下一次探测"""
+        self._probe_started_at = None
+
+    def record_failure(self):
+        """记录失败请求"""
+        self.consecutive_failures += 1
+        self._probe_started_at = None
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(
+                    f"域名熔断: {self.host} (连续失败 {self.consecutive_failures} 次, "
+                    f"{self.recovery_timeout:.0f}秒后重试)"
+                )
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class RetryPolicy:
+    """由配置驱动的重试策略
+
+    只重试网络错误和可恢复的状态码（408/425/429/5xx），4xx直接失败；
+    429/503带 Retry-After 时按源站要求等待，否则指数退避加随机抖动。
+    Retry-After 超过 max_delay 时不再重试，直接把响应交给调用方，不会提前打扰源站。
+    限流响应（429、带 Retry-After 的503）说明主机可达，不计入熔断。
+    """
+
+    RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        max_retries: int,
+        base_delay: float,
+        max_delay: float,
+        failure_threshold: int,
+        recovery_timeout: float
+    ):
+        """
+        初始化重试策略
+
+        Args:
+            max_retries: 最大重试次数（总尝试次数 = max_retries + 1）
+            base_delay: 指数退避的基础等待秒数
+            max_delay: 单次等待上限（秒），Retry-After超过该值时放弃重试
+            failure_threshold: 熔断阈值（连续失败次数）
+            recovery_timeout: 熔断冷却时间（秒）
+        """
+        self.max_attempts = max(0, max_retries) + 1
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        """获取域名熔断器"""
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(host, self.failure_threshold, self.recovery_timeout)
+            self._breakers[host] = breaker
+        return breaker
+
+    def is_retryable_status(self, status_code: int) -> bool:
+        """状态码是否值得重试"""
+        return status_code in self.RETRYABLE_STATUS
+
+    def is_retryable(self, exc: BaseException) -> bool:
+        """
+        判断异常是否可以重试
+
+        Args:
+            exc: 请求抛出的异常
+
+        Returns:
+            是否重试
+        """
+        if isinstance(exc, httpx.HTTPStatusError):
+            if not self.is_retryable_status(exc.response.status_code):
+                return False
+            delay = self.retry_after(exc)
+            if delay is not None and delay > self.max_delay:
+                logger.warning(
+                    f"源站要求 {delay:.0f}秒后重试，超过等待上限 {self.max_delay:.0f}秒，放弃重试: {exc.request.url}"
+                )
+                return False
+            return True
+        # 超时、连接失败、协议错误等传输层错误
+        return isinstance(exc, httpx.TransportError)
+
+    @staticmethod
+    def retry_after(exc: Optional[BaseException]) -> Optional[float]:
+        """
+        解析 Retry-After 头（秒数或HTTP日期）
+
+        Args:
+            exc: HTTPStatusError异常
+
+        Returns:
+            需要等待的秒数，没有该头返回None
+        """
+        if not isinstance(exc, httpx.HTTPStatusError):
+            return None
+        value = exc.response.headers.get("Retry-After")
+        if not value:
+            return None
+
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def is_throttled(response: httpx.Response) -> bool:
+        """响应是否是源站限流（429，或带 Retry-After 的503）"""
+        return response.status_code == 429 or (
+            response.status_code == 503 and "Retry-After" in response.headers
+        )
+
+    def record_response(self, breaker: CircuitBreaker, response: httpx.Response):
+        """
+        按响应状态更新熔断器：限流不计入失败，其他可重试状态码计为失败，其余计为成功
+
+        Args:
+            breaker: 域名熔断器
+            response: 响应
+        """
+        if self.is_throttled(response):
+            breaker.record_throttled()
+        elif self.is_retryable_status(response.status_code):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+    def wait(self, retry_state: RetryCallState) -> float:
+        """
+        tenacity等待函数：优先使用 Retry-After（超过上限的已在 is_retryable 中放弃重试），否则指数退避
+
+        Args:
+            retry_state: tenacity重试状态
+
+        Returns:
+            等待秒数
+        """
+        exc = retry_state.outcome.exception() if retry_state.outcome else None
+        delay = self.retry_after(exc)
+        if delay is None:
+            delay = self.base_delay * (2 ** (retry_state.attempt_number - 1))
+            delay += random.uniform(0, self.base_delay)
+        return min(delay, self.max_delay)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取各域名熔断器状态"""
+        return {
+            host: {"state": b.state, "consecutive_failures": b.consecutive_failures}
+            for host, b in self._breakers.items()
+        }
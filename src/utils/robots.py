@@ -0,0 +1,333 @@
+"""robots.txt缓存 - 按站点缓存抓取规则与Crawl-delay"""
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any, Awaitable, Callable
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+from loguru import logger
+import httpx
+
+from config import settings
+from src.utils.single_flight import SingleFlight
+
+
+# robots.txt 获取结果
+RULES = "rules"  # 正常获取，按规则判断
+ALLOW_ALL = "allow"  # 4xx（文件不存在等），视为全部允许
+DISALLOW_ALL = "disallow"  # 5xx或网络错误，暂时视为全部禁止（RFC 9309）
+
+
+class RobotsPolicy:
+    """单个站点（scheme://host[:port]）的robots.txt规则"""
+
+    def __init__(
+        self,
+        origin: str,
+        kind: str,
+        body: str,
+        fetched_at: float,
+        expires_at: float,
+        user_agent: str,
+        max_crawl_delay: float
+    ):
+        """
+        初始化站点规则
+
+        Args:
+            origin: 站点
+            kind: 获取结果（rules / allow / disallow）
+            body: robots.txt内容（kind为rules时有效）
+            fetched_at: 获取时间（时间戳）
+            expires_at: 过期时间（时间戳）
+            user_agent: 匹配规则时使用的爬虫名
+            max_crawl_delay: Crawl-delay上限（秒）
+        """
+        self.origin = origin
+        self.kind = kind
+        self.body = body
+        self.fetched_at = fetched_at
+        self.expires_at = expires_at
+        self.user_agent = user_agent
+
+        self._parser = RobotFileParser()
+        if kind == RULES:
+            self._parser.parse(body.splitlines())
+        elif kind == ALLOW_ALL:
+            self._parser.allow_all = True
+        else:
+            self._parser.disallow_all = True
+
+        self.crawl_delay = self._parse_crawl_delay(max_crawl_delay)
+
+    def _parse_crawl_delay(self, max_crawl_delay: float) -> Optional[float]:
+        """读取Crawl-delay（没有时用Request-rate换算），限制在上限内"""
+        if self.kind != RULES:
+            return None
+        # urllib.robotparser只识别整数的Crawl-delay，小数（如0.5）由这里补充解析
+        delay = self._parser.crawl_delay(self.user_agent)
+        if delay is None:
+            delay = self._fractional_crawl_delay()
+        if delay is None:
+            rate = self._parser.request_rate(self.user_agent)
+            if rate is not None and rate.requests > 0:
+                delay = rate.seconds / rate.requests
+        try:
+            delay = float(delay) if delay is not None else None
+        except (TypeError, ValueError):
+            return None
+        if not delay or delay <= 0:
+            return None
+        return min(delay, max_crawl_delay)
+
+    def _fractional_crawl_delay(self) -> Optional[float]:
+        """按User-agent分组查找Crawl-delay（精确匹配的分组优先于 *）"""
+        agent = self.user_agent.split("/")[0].lower()
+        delays: Dict[str, float] = {}
+        group: list = []
+        in_rules = False
+        for line in self.body.splitlines():
+            line = line.split("#", 1)[0].strip()
+            if ":" not in line:
+                continue
+            field, value = (part.strip() for part in line.split(":", 1))
+            field = field.lower()
+            if field == "user-agent":
+                # 规则行之后出现的User-agent开始新的分组
+                if in_rules:
+                    group, in_rules = [], False
+                group.append(value.lower())
+            else:
+                in_rules = True
+                if field == "crawl-delay":
+                    try:
+                        delay = float(value)
+                    except ValueError:
+                        continue
+                    for name in group:
+                        delays.setdefault(name, delay)
+
+        if agent != "*":
+            for name, delay in delays.items():
+                if name != "*" and name in agent:
+                    return delay
+        return delays.get("*")
+
+    @property
+    def expired(self) -> bool:
+        """是否已过期"""
+        return time.time() >= self.expires_at
+
+    def allowed(self, url: str) -> bool:
+        """URL是否允许抓取"""
+        return self._parser.can_fetch(self.user_agent, url)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可持久化的字典"""
+        return {
+            "kind": self.kind,
+            "body": self.body,
+            "fetched_at": self.fetched_at,
+            "expires_at": self.expires_at,
+        }
+
+
+class RobotsCache:
+    """robots.txt缓存
+
+    每个站点的robots.txt只获取一次，同一站点的并发检查合并为一次请求，
+    结果在TTL内复用并保存到JSON文件，下次运行直接沿用。
+    按RFC 9309：4xx视为没有限制；5xx或网络错误时暂时视为全部禁止，
+    较短时间（error_ttl）后重新获取。
+    """
+
+    # robots.txt 读取上限（RFC 9309 要求至少解析前500 KiB，更大的文件只解析开头部分）
+    MAX_BYTES = 500 * 1024
+
+    def __init__(
+        self,
+        cache_file: str,
+        user_agent: str,
+        ttl: float,
+        error_ttl: float,
+        max_crawl_delay: float
+    ):
+        """
+        初始化robots.txt缓存
+
+        Args:
+            cache_file: 持久化文件
+            user_agent: 匹配规则时使用的爬虫名
+            ttl: 规则缓存秒数
+            error_ttl: 获取失败时的缓存秒数
+            max_crawl_delay: Crawl-delay上限（秒）
+        """
+        self.cache_file = Path(cache_file)
+        self.user_agent = user_agent or "*"
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.max_crawl_delay = max_crawl_delay
+
+        self._policies: Dict[str, RobotsPolicy] = {}
+        self._single_flight = SingleFlight()
+        self._dirty = False
+
+        self.hits = 0
+        self.fetches = 0
+        self.errors = 0
+        self.denied = 0
+        self._load()
+
+    @staticmethod
+    def origin_of(url: str) -> str:
+        """提取URL的站点（scheme://host[:port]，小写）"""
+        parts = urlsplit(url)
+        return f"{parts.scheme.lower()}://{parts.netloc.lower()}"
+
+    def _make_policy(self, origin: str, kind: str, body: str, fetched_at: float, expires_at: float) -> RobotsPolicy:
+        """创建站点规则"""
+        return RobotsPolicy(origin, kind, body, fetched_at, expires_at, self.user_agent, self.max_crawl_delay)
+
+    def _load(self):
+        """加载持久化的规则（跳过已过期的站点）"""
+        if not self.cache_file.exists():
+            return
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"读取robots.txt缓存失败 {self.cache_file}: {e}")
+            return
+
+        now = time.time()
+        for origin, entry in data.get("origins", {}).items():
+            if entry.get("expires_at", 0) <= now:
+                continue
+            self._policies[origin] = self._make_policy(
+                origin, entry.get("kind", ALLOW_ALL), entry.get("body", ""),
+                entry.get("fetched_at", 0), entry["expires_at"]
+            )
+        logger.debug(f"已加载robots.txt缓存: {len(self._policies)} 个站点")
+
+    async def policy(self, url: str, fetch: Callable[[str], Awaitable[httpx.Response]]) -> RobotsPolicy:
+        """
+        获取URL所在站点的规则
+
+        Args:
+            url: 待抓取的URL
+            fetch: 获取robots.txt的协程函数，参数为robots.txt的URL
+
+        Returns:
+            站点规则
+        """
+        origin = self.origin_of(url)
+        policy = self._policies.get(origin)
+        if policy is not None and not policy.expired:
+            self.hits += 1
+            return policy
+        return await self._single_flight.do(origin, lambda: self._fetch(origin, fetch))
+
+    async def _fetch(self, origin: str, fetch: Callable[[str], Awaitable[httpx.Response]]) -> RobotsPolicy:
+        """获取并解析站点的robots.txt，由policy()合并后调用"""
+        robots_url = f"{origin}/robots.txt"
+        self.fetches += 1
+        body = ""
+        try:
+            response = await fetch(robots_url)
+            kind, ttl = RULES, self.ttl
+            body = response.content.decode("utf-8", errors="replace")
+            if response.extensions.get("truncated"):
+                # 超出上限的文件按RFC 9309只解析开头部分，丢弃被截断的最后一行
+                body = body.rsplit("\n", 1)[0]
+                logger.info(f"robots.txt超过 {self.MAX_BYTES // 1024} KiB，只解析开头部分: {origin}")
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
+            if 400 <= status < 500 and status != 429:
+                kind, ttl = ALLOW_ALL, self.ttl
+            else:
+                self.errors += 1
+                kind, ttl = DISALLOW_ALL, self.error_ttl
+                logger.warning(f"获取robots.txt失败 ({status})，{ttl:.0f}秒内暂停抓取: {origin}")
+        except Exception as e:
+            self.errors += 1
+            kind, ttl = DISALLOW_ALL, self.error_ttl
+            logger.warning(f"获取robots.txt失败 ({e})，{ttl:.0f}秒内暂停抓取: {origin}")
+
+        now = time.time()
+        policy = self._make_policy(origin, kind, body, now, now + ttl)
+        self._policies[origin] = policy
+        self._dirty = True
+        logger.debug(
+            f"robots.txt: {origin} - {kind}"
+            + (f", Crawl-delay {policy.crawl_delay}秒" if policy.crawl_delay else "")
+        )
+        return policy
+
+    def record_denied(self, url: str):
+        """记录一次被robots.txt拒绝的URL"""
+        self.denied += 1
+        logger.info(f"robots.txt禁止抓取: {url}")
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取robots.txt缓存统计
+
+        Returns:
+            {origins, hits, fetches, errors, denied}
+        """
+        return {
+            "origins": len(self._policies),
+            "hits": self.hits,
+            "fetches": self.fetches,
+            "errors": self.errors,
+            "denied": self.denied,
+        }
+
+    def _write(self, data: Dict[str, Any]):
+        """原子写入缓存文件（在线程中执行）"""
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_file.with_name(f"{self.cache_file.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_file)
+
+    async def save(self):
+        """保存未过期的规则（没有新获取的规则时跳过）"""
+        if not self._dirty:
+            return
+        self._dirty = False
+        data = {
+            "origins": {
+                origin: policy.to_dict()
+                for origin, policy in self._policies.items()
+                if not policy.expired
+            }
+        }
+        try:
+            await asyncio.to_thread(self._write, data)
+            logger.debug(f"robots.txt缓存已保存: {self.cache_file} ({len(data['origins'])} 个站点)")
+        except Exception as e:
+            self._dirty = True
+            logger.warning(f"保存robots.txt缓存失败: {e}")
+
+
+# 全局robots.txt缓存实例（所有HTTPClient共享）
+_robots_cache: Optional[RobotsCache] = None
+
+
+def get_robots_cache() -> Optional[RobotsCache]:
+    """获取全局robots.txt缓存，未启用时返回None"""
+    global _robots_cache
+    if not settings.robots_enabled:
+        return None
+    if _robots_cache is None:
+        _robots_cache = RobotsCache(
+            cache_file=settings.robots_cache_file,
+            user_agent=settings.robots_user_agent,
+            ttl=settings.robots_ttl,
+            error_ttl=settings.robots_error_ttl,
+            max_crawl_delay=settings.robots_max_crawl_delay,
+        )
+    return _robots_cache
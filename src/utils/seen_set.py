@@ -0,0 +1,424 @@
+"""已处理URL集合 - 磁盘布隆过滤器快速排除新URL，SQLite精确确认"""
+import array
+import asyncio
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import time
+from hashlib import blake2b
+from pathlib import Path
+from typing import Optional, List, Iterable, Set, Dict, Any, Tuple
+from loguru import logger
+
+from config import settings
+from src.utils.url_canon import canonicalize_url
+
+
+# 每个条目置位数（分块布隆过滤器中每个64位块内的位数）
+BITS_PER_KEY = 6
+
+# 键哈希的低 _PATTERN_BITS 位选置位模式，其余位选块
+_PATTERN_BITS = 16
+_PATTERN_COUNT = 1 << _PATTERN_BITS
+_patterns: Optional[List[int]] = None
+
+
+def _bit_patterns() -> List[int]:
+    """预计算的64位置位模式（每个模式恰好 BITS_PER_KEY 位，由固定种子生成，跨进程一致）"""
+    global _patterns
+    if _patterns is None:
+        patterns = []
+        for i in range(_PATTERN_COUNT):
+            digest = blake2b(i.to_bytes(4, "little"), digest_size=32, person=b"seen-set").digest()
+            mask = 0
+            for byte in digest:
+                mask |= 1 << (byte & 63)
+                if bin(mask).count("1") == BITS_PER_KEY:
+                    break
+            patterns.append(mask)
+        _patterns = patterns
+    return _patterns
+
+
+def _key_hashes(keys: List[bytes]) -> List[int]:
+    """每个键一个64位 blake2b 哈希，块和置位模式都从中切取，相互独立且分布均匀"""
+    return [int.from_bytes(blake2b(k, digest_size=8).digest(), "little") for k in keys]
+
+
+class BloomFilter:
+    """分块布隆过滤器
+
+    每个键只落在一个64位块里：键的64位 blake2b 哈希低16位选一个预计算的置位模式，
+    其余48位选块，判断是否存在只需一次数组读取和一次按位与。
+    每键16位时误判率约0.3%，误判由精确存储兜底。
+    """
+
+    # 哈希方式变化时更新，旧文件加载失败后从数据库重建
+    MAGIC = b"BLM2"
+    # magic, 每键位数, 块数, 已加入的键数
+    HEADER = struct.Struct("<4sIQQ")
+
+    def __init__(self, capacity: int, bits_per_item: int = 16):
+        """
+        初始化布隆过滤器
+
+        Args:
+            capacity: 预计键数
+            bits_per_item: 每键分配的位数
+        """
+        self.capacity = max(1024, capacity)
+        self.bits_per_item = bits_per_item
+        self.nblocks = max(1, self.capacity * bits_per_item // 64)
+        self.blocks = array.array("Q", bytes(8 * self.nblocks))
+        self.count = 0
+
+    def add_many(self, keys: List[bytes]):
+        """
+        批量加入键
+
+        Args:
+            keys: 键（字节串）列表
+        """
+        blocks, nblocks, patterns = self.blocks, self.nblocks, _bit_patterns()
+        for h in _key_hashes(keys):
+            blocks[(h >> _PATTERN_BITS) % nblocks] |= patterns[h & (_PATTERN_COUNT - 1)]
+
+    def contains_many(self, keys: List[bytes]) -> List[bool]:
+        """
+        批量判断键是否可能存在
+
+        Args:
+            keys: 键（字节串）列表
+
+        Returns:
+            与输入对应的列表，False表示一定不存在，True表示可能存在
+        """
+        blocks, nblocks, patterns = self.blocks, self.nblocks, _bit_patterns()
+        return [
+            (blocks[(h >> _PATTERN_BITS) % nblocks] & (m := patterns[h & (_PATTERN_COUNT - 1)])) == m
+            for h in _key_hashes(keys)
+        ]
+
+    def to_bytes(self) -> bytes:
+        """序列化（块按小端序存储）"""
+        blocks = self.blocks
+        if sys.byteorder != "little":
+            blocks = array.array("Q", blocks)
+            blocks.byteswap()
+        return self.HEADER.pack(self.MAGIC, self.bits_per_item, self.nblocks, self.count) + blocks.tobytes()
+
+    @classmethod
+    def from_file(cls, path: Path) -> Optional["BloomFilter"]:
+        """
+        从文件加载
+
+        Args:
+            path: 过滤器文件路径
+
+        Returns:
+            BloomFilter对象，文件不存在或格式不对时返回None
+        """
+        try:
+            with open(path, "rb") as f:
+                header = f.read(cls.HEADER.size)
+                if len(header) != cls.HEADER.size:
+                    return None
+                magic, bits_per_item, nblocks, count = cls.HEADER.unpack(header)
+                if magic != cls.MAGIC or not bits_per_item or not nblocks:
+                    return None
+                blocks = array.array("Q")
+                blocks.fromfile(f, nblocks)
+        except (OSError, EOFError):
+            return None
+        if sys.byteorder != "little":
+            blocks.byteswap()
+
+        bloom = cls.__new__(cls)
+        bloom.bits_per_item = bits_per_item
+        bloom.nblocks = nblocks
+        bloom.capacity = nblocks * 64 // bits_per_item
+        bloom.blocks = blocks
+        bloom.count = count
+        return bloom
+
+
+class SeenSet:
+    """持久化的已处理URL集合
+
+    URL先规范化再判断。布隆过滤器说"不存在"的URL直接判定为新URL，
+    不查数据库；只有布隆过滤器命中的URL才到SQLite精确确认，
+    因此批量判断的耗时几乎全在布隆过滤器上。
+
+    SQLite每次写入都提交；布隆过滤器只在 save() 时落盘，
+    启动时如果过滤器文件缺失或与数据库条数不一致，则从数据库重建。
+    异步代码使用 lookup() / record()，SQLite读写在线程中执行，不阻塞事件循环。
+    """
+
+    # 一次IN查询的最大参数数（SQLite默认上限999）
+    LOOKUP_CHUNK = 500
+
+    def __init__(
+        self,
+        db_file: str,
+        bloom_file: str,
+        capacity: int = 1_000_000,
+        extra_tracking_params: Optional[Iterable[str]] = None
+    ):
+        """
+        初始化已处理URL集合
+
+        Args:
+            db_file: SQLite数据库文件路径（精确存储）
+            bloom_file: 布隆过滤器文件路径
+            capacity: 布隆过滤器预计容量，超过后自动扩容重建
+            extra_tracking_params: 规范化时额外去掉的参数名
+        """
+        self.db_file = Path(db_file)
+        self.bloom_file = Path(bloom_file)
+        self.capacity = capacity
+        self.extra_tracking_params = list(extra_tracking_params or [])
+        self._lock = threading.Lock()
+        self._dirty = False
+
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.db_file), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS seen_urls ("
+            "url TEXT PRIMARY KEY, seen_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self._db.commit()
+        self._count = self._db.execute("SELECT COUNT(*) FROM seen_urls").fetchone()[0]
+        self._bloom = self._load_bloom()
+
+        self.checks = 0
+        self.bloom_negatives = 0
+        self.exact_hits = 0
+        self.false_positives = 0
+
+    def _load_bloom(self) -> BloomFilter:
+        """加载布隆过滤器，与数据库不一致时重建"""
+        bloom = BloomFilter.from_file(self.bloom_file)
+        if bloom is not None and bloom.count == self._count and self._count <= bloom.capacity:
+            logger.debug(f"已加载URL布隆过滤器: {self._count} 个URL")
+            return bloom
+        if self._count:
+            logger.info(f"重建URL布隆过滤器: {self._count} 个URL")
+        return self._rebuild(max(self.capacity, self._count * 2))
+
+    def _rebuild(self, capacity: int) -> BloomFilter:
+        """按指定容量从数据库重建布隆过滤器"""
+        bloom = BloomFilter(capacity)
+        cursor = self._db.execute("SELECT url FROM seen_urls")
+        while True:
+            rows = cursor.fetchmany(100_000)
+            if not rows:
+                break
+            bloom.add_many([row[0].encode() for row in rows])
+        bloom.count = self._count
+        self._dirty = True
+        return bloom
+
+    def canonical(self, url: str) -> str:
+        """规范化URL"""
+        return canonicalize_url(url, self.extra_tracking_params)
+
+    def _lookup(self, urls: List[str]) -> Set[str]:
+        """在精确存储中查询，返回存在的URL"""
+        found: Set[str] = set()
+        with self._lock:
+            for i in range(0, len(urls), self.LOOKUP_CHUNK):
+                chunk = urls[i:i + self.LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._db.execute(f"SELECT url FROM seen_urls WHERE url IN ({placeholders})", chunk)
+                found.update(row[0] for row in rows)
+        return found
+
+    def contains_many(self, urls: List[str], canonical: bool = False) -> List[bool]:
+        """
+        批量判断URL是否已处理过
+
+        Args:
+            urls: URL列表
+            canonical: 输入是否已经是规范化的URL（跳过规范化）
+
+        Returns:
+            与输入对应的布尔列表
+        """
+        keys = urls if canonical else [self.canonical(u) for u in urls]
+        maybe, candidates = self._bloom_check(keys)
+        if not candidates:
+            return maybe
+        return self._confirm(keys, maybe, candidates, self._lookup(candidates))
+
+    async def lookup(self, urls: List[str], canonical: bool = False) -> List[bool]:
+        """
+        批量判断URL是否已处理过（异步版本，SQLite查询在线程中执行）
+
+        布隆过滤器判定为新URL的直接返回，不切换线程。
+
+        Args:
+            urls: URL列表
+            canonical: 输入是否已经是规范化的URL（跳过规范化）
+
+        Returns:
+            与输入对应的布尔列表
+        """
+        keys = urls if canonical else [self.canonical(u) for u in urls]
+        maybe, candidates = self._bloom_check(keys)
+        if not candidates:
+            return maybe
+        found = await asyncio.to_thread(self._lookup, candidates)
+        return self._confirm(keys, maybe, candidates, found)
+
+    def _bloom_check(self, keys: List[str]) -> Tuple[List[bool], List[str]]:
+        """布隆过滤器初筛，返回 (是否可能存在, 需要精确确认的URL)"""
+        maybe = self._bloom.contains_many([k.encode() for k in keys])
+        candidates = [k for k, hit in zip(keys, maybe) if hit]
+        self.checks += len(keys)
+        self.bloom_negatives += len(keys) - len(candidates)
+        return maybe, candidates
+
+    def _confirm(self, keys: List[str], maybe: List[bool], candidates: List[str], found: Set[str]) -> List[bool]:
+        """合并精确确认的结果"""
+        self.exact_hits += sum(1 for k in candidates if k in found)
+        self.false_positives += sum(1 for k in candidates if k not in found)
+        return [hit and k in found for k, hit in zip(keys, maybe)]
+
+    def contains(self, url: str, canonical: bool = False) -> bool:
+        """URL是否已处理过"""
+        return self.contains_many([url], canonical)[0]
+
+    def filter_new(self, urls: Iterable[str]) -> List[str]:
+        """
+        过滤出未处理过的URL
+
+        Args:
+            urls: URL列表
+
+        Returns:
+            未处理过的URL（保持原样和输入顺序，规范化后相同的只保留第一个）
+        """
+        urls = list(urls)
+        keys = [self.canonical(u) for u in urls]
+        seen = self.contains_many(keys, canonical=True)
+        result = []
+        batch: Set[str] = set()
+        for url, key, is_seen in zip(urls, keys, seen):
+            if not is_seen and key not in batch:
+                batch.add(key)
+                result.append(url)
+        return result
+
+    def add_many(self, urls: Iterable[str], canonical: bool = False) -> int:
+        """
+        批量记录已处理的URL
+
+        Args:
+            urls: URL列表
+            canonical: 输入是否已经是规范化的URL
+
+        Returns:
+            新增的URL数
+        """
+        keys = list(urls) if canonical else [self.canonical(u) for u in urls]
+        if not keys:
+            return 0
+        now = time.time()
+        with self._lock:
+            cursor = self._db.executemany(
+                "INSERT OR IGNORE INTO seen_urls (url, seen_at) VALUES (?, ?)",
+                ((k, now) for k in keys)
+            )
+            added = max(0, cursor.rowcount)
+            self._db.commit()
+            self._count += added
+            self._bloom.add_many([k.encode() for k in keys])
+            self._bloom.count = self._count
+            self._dirty = True
+            if self._count > self._bloom.capacity:
+                logger.info(f"URL布隆过滤器已满 ({self._count} 个URL)，扩容重建")
+                self._bloom = self._rebuild(self._count * 2)
+        return added
+
+    def add(self, url: str, canonical: bool = False) -> bool:
+        """记录已处理的URL，返回是否是新URL"""
+        return self.add_many([url], canonical) > 0
+
+    async def record(self, urls: List[str], canonical: bool = False) -> int:
+        """
+        批量记录已处理的URL（异步版本，SQLite写入在线程中执行）
+
+        Args:
+            urls: URL列表
+            canonical: 输入是否已经是规范化的URL
+
+        Returns:
+            新增的URL数
+        """
+        return await asyncio.to_thread(self.add_many, urls, canonical)
+
+    def _write_bloom(self):
+        """原子写入布隆过滤器文件（在线程中执行）"""
+        with self._lock:
+            data = self._bloom.to_bytes()
+            self._dirty = False
+        self.bloom_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.bloom_file.with_name(f"{self.bloom_file.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self.bloom_file)
+
+    async def save(self):
+        """保存布隆过滤器（数据库已实时提交）"""
+        if not self._dirty:
+            return
+        try:
+            await asyncio.to_thread(self._write_bloom)
+            logger.debug(f"URL布隆过滤器已保存: {self.bloom_file} ({self._count} 个URL)")
+        except Exception as e:
+            self._dirty = True
+            logger.warning(f"保存URL布隆过滤器失败: {e}")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取统计信息
+
+        Returns:
+            {urls, bloom_capacity, bloom_mb, checks, bloom_negatives, exact_hits, false_positives}
+        """
+        return {
+            "urls": self._count,
+            "bloom_capacity": self._bloom.capacity,
+            "bloom_mb": round(self._bloom.nblocks * 8 / 1024 / 1024, 2),
+            "checks": self.checks,
+            "bloom_negatives": self.bloom_negatives,
+            "exact_hits": self.exact_hits,
+            "false_positives": self.false_positives,
+        }
+
+
+# 全局已处理URL集合
+_seen_set: Optional[SeenSet] = None
+
+
+def get_seen_set() -> Optional[SeenSet]:
+    """获取全局已处理URL集合，未启用时返回None"""
+    global _seen_set
+    if not settings.seen_set_enabled:
+        return None
+    if _seen_set is None:
+        _seen_set = SeenSet(
+            db_file=settings.seen_set_db_file,
+            bloom_file=settings.seen_set_bloom_file,
+            capacity=settings.seen_set_capacity,
+            extra_tracking_params=settings.url_tracking_params,
+        )
+    return _seen_set
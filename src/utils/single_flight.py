@@ -0,0 +1,86 @@
+"""请求合并 - 相同的并发请求只执行一次"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """单飞（single-flight）请求合并
+
+    同一个键的请求在执行期间，后续调用者不再发起新请求，而是等待
+    第一个调用者的结果。执行在独立Task中进行，某个调用者被取消不会
+    影响其他等待者；最后一个等待者被取消时取消执行中的请求，释放其
+    占用的调度槽位和连接。
+    """
+
+    def __init__(self):
+        """初始化请求合并器"""
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        # 执行中的Task -> 仍在等待结果的调用者数
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self.executed = 0
+        self.deduplicated = 0
+        self.cancelled = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行（或加入正在执行的）请求
+
+        Args:
+            key: 请求键，相同键的并发调用会被合并
+            func: 无参协程函数，仅在没有同键请求在途时调用
+
+        Returns:
+            请求结果（所有等待者共享同一结果或异常）
+
+        Raises:
+            asyncio.CancelledError: 调用者被取消（没有其他等待者时请求同时被取消）
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            self.executed += 1
+            task.add_done_callback(lambda t: self._finished(key, t))
+        else:
+            self.deduplicated += 1
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters.get(task) == 1 and not task.done():
+                # 没有其他调用者等待结果，取消执行中的请求；新的同键调用重新发起
+                task.cancel()
+                self.cancelled += 1
+                if self._in_flight.get(key) is task:
+                    del self._in_flight[key]
+            raise
+        finally:
+            remaining = self._waiters.get(task, 1) - 1
+            if remaining > 0:
+                self._waiters[task] = remaining
+            else:
+                self._waiters.pop(task, None)
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        """请求完成后移除在途记录"""
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # 所有等待者都已取消时，避免出现 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取合并统计
+
+        Returns:
+            {executed: 实际执行次数, deduplicated: 被合并的调用次数,
+             cancelled: 因等待者全部取消而取消的次数, in_flight: 当前在途数}
+        """
+        return {
+            "executed": self.executed,
+            "deduplicated": self.deduplicated,
+            "cancelled": self.cancelled,
+            "in_flight": len(self._in_flight),
+        }
@@ -0,0 +1,77 @@
+"""存储工具 - 抓取结果的增量持久化"""
+import asyncio
+import json
+from pathlib import Path
+from typing import Union, Dict, Any
+from loguru import logger
+import aiofiles
+from pydantic import BaseModel
+
+
+class JSONLSink:
+    """JSONL追加写入器
+
+    每条记录序列化为一行JSON并立即写入文件，记录到达即落盘，
+    不在内存中积攒；进程中断时已写入的行都是完整可读的。
+    多个协程并发写入时按到达顺序逐行写入，行与行不会交错。
+    """
+
+    def __init__(self, path: Union[str, Path], append: bool = True):
+        """
+        初始化写入器
+
+        Args:
+            path: 输出文件路径
+            append: 是否追加到已有文件，False时覆盖
+        """
+        self.path = Path(path)
+        self.append = append
+        self.count = 0
+        self._file = None
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        """异步上下文管理器入口"""
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """异步上下文管理器出口"""
+        await self.close()
+
+    async def open(self):
+        """打开输出文件"""
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = await aiofiles.open(self.path, "a" if self.append else "w", encoding="utf-8")
+            logger.debug(f"JSONL输出已打开: {self.path}")
+
+    @staticmethod
+    def _serialize(record: Union[BaseModel, Dict[str, Any]]) -> str:
+        """把记录序列化为一行JSON"""
+        if isinstance(record, BaseModel):
+            record = record.model_dump(mode="json")
+        return json.dumps(record, ensure_ascii=False, default=str)
+
+    async def write(self, record: Union[BaseModel, Dict[str, Any]]):
+        """
+        写入一条记录
+
+        Args:
+            record: Pydantic模型或可JSON序列化的字典
+        """
+        if self._file is None:
+            await self.open()
+        line = self._serialize(record) + "\n"
+        async with self._lock:
+            await self._file.write(line)
+            await self._file.flush()
+            self.count += 1
+
+    async def close(self):
+        """关闭输出文件"""
+        if self._file is not None:
+            await self._file.close()
+            self._file = None
+            logger.debug(f"JSONL输出已关闭: {self.path} ({self.count} 条记录)")
+
@@ -0,0 +1,72 @@
+"""URL规范化 - 把同一篇文章的不同URL写法归一为同一个键"""
+from typing import Iterable, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+
+# 常见的跟踪/来源参数（不影响页面内容）
+TRACKING_PARAMS = frozenset({
+    "fbclid", "gclid", "gclsrc", "dclid", "msclkid", "yclid", "igshid", "twclid", "ttclid",
+    "mc_cid", "mc_eid", "_ga", "_gl", "_hsenc", "_hsmi", "mkt_tok", "oly_anon_id", "oly_enc_id",
+    "ref", "ref_src", "ref_url", "spm", "cmpid", "vero_id", "wickedid", "s_cid", "ncid", "sr_share",
+})
+
+# 以这些前缀开头的参数一律视为跟踪参数
+TRACKING_PREFIXES = ("utm_", "hsa_", "pk_", "mtm_")
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def _is_tracking(key: str, extra: frozenset) -> bool:
+    """参数是否是跟踪参数"""
+    key = key.lower()
+    return key in TRACKING_PARAMS or key in extra or key.startswith(TRACKING_PREFIXES)
+
+
+def canonicalize_url(url: str, extra_tracking_params: Optional[Iterable[str]] = None) -> str:
+    """
+    规范化URL，用作去重键
+
+    - scheme、域名转小写，http 统一为 https，去掉默认端口
+    - 去掉 #锚点 和跟踪参数，其余参数按名称排序
+    - 合并路径中的重复斜杠，去掉末尾斜杠（根路径除外）
+
+    Args:
+        url: 原始URL
+        extra_tracking_params: 额外要去掉的参数名（不区分大小写）
+
+    Returns:
+        规范化后的URL；无法解析的URL原样返回（去掉首尾空白）
+    """
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS or not parts.hostname:
+        return url
+
+    host = parts.hostname.lower().rstrip(".")
+    if ":" in host:
+        host = f"[{host}]"
+    if port is not None and port != _DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else "")
+        host = f"{userinfo}@{host}"
+
+    path = parts.path or "/"
+    while "//" in path:
+        path = path.replace("//", "/")
+    if len(path) > 1:
+        path = path.rstrip("/") or "/"
+
+    query = ""
+    if parts.query:
+        extra = frozenset(p.lower() for p in extra_tracking_params or ())
+        params = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not _is_tracking(k, extra)]
+        params.sort()
+        query = urlencode(params)
+
+    return urlunsplit(("https", host, path, query, ""))
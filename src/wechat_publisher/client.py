@@ -3,6 +3,7 @@ import httpx
 from typing import Optional, Dict, Any
 from loguru import logger
 from config import settings
+from src.utils.resources import get_resources, WECHAT_API_POOL
 
 
 class WeChatClient:
@@ -18,8 +19,8 @@ class WeChatClient:
         # API 基础地址
         self.api_base = "https://api.weixin.qq.com/cgi-bin"
 
-        # HTTP客户端
-        self.http_client = httpx.Client(timeout=30.0)
+        # HTTP客户端（进程内共享的微信API连接池）
+        self.http_client: httpx.Client = get_resources().sync_client(WECHAT_API_POOL)
 
     def get_access_token(self) -> str:
         """
@@ -245,6 +246,5 @@ class WeChatClient:
             raise
 
     def close(self):
-        """关闭客户端"""
-        if self.http_client:
-            self.http_client.close()
+        """关闭客户端（共享连接池由资源容器负责关闭）"""
+        self.http_client = None
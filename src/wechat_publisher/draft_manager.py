@@ -2,6 +2,7 @@
 from typing import Optional
 from loguru import logger
 from src.models.article import Article
+from src.utils.resources import get_resources, MEDIA_POOL
 from .client import WeChatClient
 
 
@@ -157,15 +158,14 @@ class DraftManager:
         Returns:
             素材的media_id
         """
-        import httpx
         import tempfile
         import os
 
         try:
             logger.info(f"下载封面图: {image_url}")
 
-            # 下载图片
-            response = httpx.get(image_url, timeout=30.0)
+            # 下载图片（复用共享的媒体连接池）
+            response = get_resources().sync_client(MEDIA_POOL).get(image_url)
             if response.status_code != 200:
                 logger.error(f"下载图片失败: HTTP {response.status_code}")
                 return None
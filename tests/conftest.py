@@ -0,0 +1,69 @@
+"""测试公共配置 - 隔离的配置环境和模拟传输层的HTTPClient"""
+import inspect
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Callable, Optional
+
+import httpx
+import pytest
+
+# 导入config之前准备环境：必填的微信配置，状态文件写到临时目录，关闭依赖外部环境的功能
+_STATE_DIR = Path(tempfile.mkdtemp(prefix="wechat-bot-tests-"))
+os.environ.setdefault("WECHAT_APP_ID", "test-app-id")
+os.environ.setdefault("WECHAT_APP_SECRET", "test-app-secret")
+for name, value in {
+    "HTTP_CACHE_ENABLED": "false",
+    "HTTP_CACHE_DIR": str(_STATE_DIR / "http"),
+    "HTTP_TIMEOUT_STATE_FILE": str(_STATE_DIR / "http_timeouts.json"),
+    "ROBOTS_ENABLED": "false",
+    "ROBOTS_CACHE_FILE": str(_STATE_DIR / "robots.json"),
+    "DNS_CACHE_ENABLED": "false",
+    "SEEN_SET_ENABLED": "false",
+    "SEEN_SET_DB_FILE": str(_STATE_DIR / "seen_urls.db"),
+    "SEEN_SET_BLOOM_FILE": str(_STATE_DIR / "seen_urls.bloom"),
+    "NEAR_DUP_ENABLED": "false",
+    "NEAR_DUP_DB_FILE": str(_STATE_DIR / "near_duplicates.db"),
+    "FORUM_THREAD_STATE_FILE": str(_STATE_DIR / "forum_threads.json"),
+    "INGEST_STATE_FILE": str(_STATE_DIR / "ingest_state.json"),
+    "BOARD_STATE_FILE": str(_STATE_DIR / "board_state.json"),
+    "HTTP_PROXIES": "[]",
+    "HTTP_RETRY_DELAY": "0",
+    "HTTP_HOST_RATE": "1000",
+    "HTTP_HOST_BURST": "1000",
+    "HTTP_CASSETTE_MODE": "off",
+    "LOG_DIR": str(_STATE_DIR / "logs"),
+}.items():
+    os.environ[name] = value
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.utils.http_client import HTTPClient  # noqa: E402
+
+
+@pytest.fixture
+def make_client():
+    """
+    创建使用模拟传输层的HTTPClient
+
+    handler 接收 (request, proxy)，proxy 为该请求经过的代理URL（直连为None），
+    可以是普通函数或协程函数。
+    """
+    def factory(handler: Callable[[httpx.Request, Optional[str]], object], **kwargs) -> HTTPClient:
+        kwargs.setdefault("proxies", [])
+        client = HTTPClient(**kwargs)
+
+        def create(proxy: Optional[str] = None) -> httpx.AsyncClient:
+            async def dispatch(request: httpx.Request) -> httpx.Response:
+                response = handler(request, proxy)
+                if inspect.isawaitable(response):
+                    response = await response
+                return response
+
+            return httpx.AsyncClient(transport=httpx.MockTransport(dispatch), follow_redirects=True)
+
+        client._create_client = create
+        return client
+
+    return factory
@@ -0,0 +1,97 @@
+"""自适应超时测试"""
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from src.utils.adaptive_timeout import (
+    PHASE_CONNECT, PHASE_READ, PHASE_TOTAL, AdaptiveTimeouts, TotalTimeoutError
+)
+
+
+def make_timeouts(path, **kwargs) -> AdaptiveTimeouts:
+    options = dict(
+        percentile=0.9,
+        factor=2.0,
+        bounds={PHASE_CONNECT: (1.0, 10.0), PHASE_READ: (2.0, 60.0), PHASE_TOTAL: (5.0, 120.0)},
+        defaults={PHASE_CONNECT: 10.0, PHASE_READ: 30.0, PHASE_TOTAL: None},
+        min_samples=10,
+    )
+    options.update(kwargs)
+    return AdaptiveTimeouts(str(path), **options)
+
+
+def test_defaults_until_enough_samples(tmp_path):
+    timeouts = make_timeouts(tmp_path / "t.json")
+    for _ in range(9):
+        timeouts.observe("site.test", PHASE_READ, 1.0)
+
+    assert timeouts.budget("site.test", PHASE_READ) == 30.0
+    assert timeouts.total_for("site.test") is None
+
+    timeouts.observe("site.test", PHASE_READ, 1.0)
+    assert timeouts.budget("site.test", PHASE_READ) == 2.0
+
+
+def test_learned_value_is_percentile_times_factor_within_bounds(tmp_path):
+    timeouts = make_timeouts(tmp_path / "t.json")
+    for i in range(100):
+        timeouts.observe("slow.test", PHASE_READ, 5.0 if i < 95 else 40.0)
+        timeouts.observe("fast.test", PHASE_CONNECT, 0.01)
+        timeouts.observe("huge.test", PHASE_TOTAL, 500.0)
+
+    assert timeouts.budget("slow.test", PHASE_READ) == 10.0
+    assert timeouts.budget("fast.test", PHASE_CONNECT) == 1.0
+    assert timeouts.total_for("huge.test") == 120.0
+    timeout = timeouts.timeout_for("slow.test")
+    assert timeout.read == timeout.write == 10.0
+    assert timeout.connect == 10.0
+
+
+def test_timeouts_widen_a_slow_host(tmp_path):
+    timeouts = make_timeouts(tmp_path / "t.json", percentile=0.5)
+    for _ in range(10):
+        timeouts.observe("site.test", PHASE_READ, 2.0)
+    before = timeouts.budget("site.test", PHASE_READ)
+
+    for _ in range(10):
+        timeouts.observe_timeout("site.test", httpx.ReadTimeout("slow"), timeouts.timeout_for("site.test"), None)
+
+    assert timeouts.budget("site.test", PHASE_READ) > before
+
+
+@pytest.mark.asyncio
+async def test_samples_persist_and_stale_hosts_are_dropped(tmp_path):
+    path = tmp_path / "t.json"
+    timeouts = make_timeouts(path)
+    for _ in range(10):
+        timeouts.observe("site.test", PHASE_TOTAL, 3.0)
+        timeouts.observe("old.test", PHASE_TOTAL, 3.0)
+    timeouts._hosts["old.test"].updated_at = time.time() - AdaptiveTimeouts.STALE_SECONDS - 1
+    await timeouts.save()
+
+    assert set(json.loads(path.read_text())["hosts"]) == {"site.test"}
+    assert make_timeouts(path).total_for("site.test") == 6.0
+
+
+@pytest.mark.asyncio
+async def test_request_over_total_budget_raises_and_is_learned(make_client, tmp_path):
+    async def handler(request, proxy):
+        await asyncio.sleep(1)
+        return httpx.Response(200, text="late")
+
+    client = make_client(handler)
+    client._timeouts = make_timeouts(
+        tmp_path / "t.json",
+        bounds={PHASE_CONNECT: (0.01, 10.0), PHASE_READ: (0.01, 60.0), PHASE_TOTAL: (0.05, 120.0)},
+        defaults={PHASE_CONNECT: 10.0, PHASE_READ: 30.0, PHASE_TOTAL: 0.05},
+    )
+    client._retry_policy.max_attempts = 1
+
+    with pytest.raises(TotalTimeoutError):
+        await client.get("http://slow.test/", use_cache=False)
+
+    assert list(client._timeouts._hosts["slow.test"].samples[PHASE_TOTAL]) == [0.05]
+    await client.close()
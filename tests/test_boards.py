@@ -0,0 +1,224 @@
+"""论坛版块爬取测试"""
+import re
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from lxml.html import document_fromstring
+
+from src.source_ingestion.boards import (
+    BoardAdapter,
+    BoardCrawler,
+    BoardState,
+    GenericBoardAdapter,
+    IPSBoardAdapter,
+    parse_count,
+)
+
+
+BOARD_URL = "http://forum.test/forums/forum/5-dirt-bikes/"
+BASE = datetime(2026, 10, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def ips_row(topic: dict) -> str:
+    pinned = " ipsDataItem_pinned" if topic.get("pinned") else ""
+    return (
+        f'<li class="ipsDataItem{pinned}" data-rowid="{topic["id"]}">'
+        f'<h4 class="ipsDataItem_title"><a href="/topic/{topic["id"]}-ride/#comments">Topic {topic["id"]}</a></h4>'
+        '<ul class="ipsDataItem_stats">'
+        f'<li><span class="ipsDataItem_stats_number">{topic["replies"]}</span>'
+        '<span class="ipsDataItem_stats_type">replies</span></li>'
+        f'<li><span class="ipsDataItem_stats_number">{topic["views"]}</span>'
+        '<span class="ipsDataItem_stats_type">views</span></li></ul>'
+        f'<ul class="ipsDataItem_lastPoster"><li><time datetime="{topic["last_post"].isoformat()}">x</time></li></ul>'
+        "</li>"
+    )
+
+
+class BoardServer:
+    """IPS版块模拟服务器：置顶主题在前，其余按最后回复时间倒序，每页 per_page 个主题"""
+
+    def __init__(self, topics: list, per_page: int = 3):
+        self.topics = {t["id"]: t for t in topics}
+        self.per_page = per_page
+        self.failing: set = set()
+        self.requested: list = []
+
+    def listing(self) -> list:
+        return sorted(self.topics.values(), key=lambda t: (not t.get("pinned"), -t["last_post"].timestamp()))
+
+    def __call__(self, request, proxy):
+        match = re.search(r"/page/(\d+)/", request.url.path)
+        page = int(match.group(1)) if match else 1
+        self.requested.append(page)
+        if page in self.failing:
+            return httpx.Response(503, text="busy")
+        topics = self.listing()
+        total = -(-len(topics) // self.per_page)
+        rows = "".join(ips_row(t) for t in topics[(page - 1) * self.per_page:page * self.per_page])
+        pagination = (
+            f'<ul class="ipsPagination" data-pages="{total}" data-baseurl="{BOARD_URL}">'
+            f'<li class="ipsPagination_page ipsPagination_active"><a data-page="{page}" href="#">{page}</a></li></ul>'
+        )
+        return httpx.Response(200, text=f"<html><body><ol>{rows}</ol>{pagination}</body></html>")
+
+
+def board_topics() -> list:
+    return [
+        {"id": 1, "replies": 50, "views": 9000, "last_post": BASE - timedelta(hours=100), "pinned": True},
+        {"id": 2, "replies": 10, "views": 300, "last_post": BASE - timedelta(hours=2)},
+        {"id": 3, "replies": 2, "views": 40, "last_post": BASE - timedelta(hours=3)},
+        {"id": 4, "replies": 8, "views": 200, "last_post": BASE - timedelta(hours=4)},
+        {"id": 5, "replies": 6, "views": 100, "last_post": BASE - timedelta(hours=5)},
+        {"id": 6, "replies": 1, "views": 50, "last_post": BASE - timedelta(hours=6)},
+        {"id": 7, "replies": 0, "views": "1.2k", "last_post": BASE - timedelta(hours=7)},
+    ]
+
+
+def make_crawler(make_client, server, state_file) -> BoardCrawler:
+    crawler = BoardCrawler(http_client=make_client(server), state=BoardState(str(state_file)))
+    crawler.min_replies, crawler.min_views = 5, 1000
+    crawler.page_concurrency = 1
+    return crawler
+
+
+def topic_id(topic) -> int:
+    return int(re.search(r"/topic/(\d+)", topic.url).group(1))
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1,234", 1234),
+    ("1.2k", 1200),
+    (" 3M views", 3_000_000),
+    ("17", 17),
+    ("replies", None),
+    ("", None),
+    (None, None),
+])
+def test_parse_count(text, expected):
+    assert parse_count(text) == expected
+
+
+def test_adapter_interface_is_abstract():
+    class DetectOnly(BoardAdapter):
+        def detect(self, tree):
+            return True
+
+    with pytest.raises(TypeError):
+        BoardAdapter()
+    with pytest.raises(TypeError):
+        DetectOnly()
+
+
+def test_ips_adapter_reads_counts_times_and_pinned():
+    topics = [
+        {"id": 11, "replies": "1,234", "views": "1.2k", "last_post": BASE, "pinned": True},
+        {"id": 12, "replies": 0, "views": 3, "last_post": BASE - timedelta(days=1)},
+    ]
+    tree = document_fromstring(f"<html><body><ol>{''.join(ips_row(t) for t in topics)}</ol></body></html>")
+    adapter = IPSBoardAdapter()
+
+    parsed = adapter.parse_topics(tree, BOARD_URL)
+
+    assert adapter.detect(tree)
+    assert [t.url for t in parsed] == ["http://forum.test/topic/11-ride/", "http://forum.test/topic/12-ride/"]
+    assert (parsed[0].replies, parsed[0].views, parsed[0].pinned) == (1234, 1200, True)
+    assert (parsed[1].last_post, parsed[1].pinned) == (BASE - timedelta(days=1), False)
+
+
+def test_generic_adapter_merges_links_and_keeps_newest_time():
+    html = (
+        "<html><body><table>"
+        '<tr><td><a href="/viewtopic.php?f=2&t=31">Carb icing</a> <a href="/viewtopic.php?f=2&t=31&page=3">3</a></td>'
+        '<td><time datetime="2026-09-30T10:00:00Z"></time><time datetime="2026-10-01T09:00:00Z"></time></td></tr>'
+        '<tr><td><a href="/viewtopic.php?f=2&t=32">Chain slack</a></td></tr>'
+        '<tr><td><a href="/memberlist.php">Members</a></td></tr>'
+        "</table></body></html>"
+    )
+    tree = document_fromstring(html)
+
+    parsed = GenericBoardAdapter().parse_topics(tree, "http://forum.test/viewforum.php?f=2")
+
+    assert not IPSBoardAdapter().detect(tree)
+    assert [t.url for t in parsed] == ["http://forum.test/viewtopic.php?f=2&t=31", "http://forum.test/viewtopic.php?f=2&t=32"]
+    assert parsed[0].last_post == datetime(2026, 10, 1, 9, 0, tzinfo=timezone.utc)
+    assert parsed[1].last_post is None
+
+
+@pytest.mark.asyncio
+async def test_incremental_crawl_queues_new_and_updated_topics(make_client, tmp_path):
+    server = BoardServer(board_topics())
+    state_file = tmp_path / "boards.json"
+
+    first = [t async for t in make_crawler(make_client, server, state_file).crawl(BOARD_URL)]
+
+    # 回复数或浏览数达到阈值的主题入队，置顶主题也计入
+    assert {topic_id(t): t.reason for t in first} == {1: "new", 2: "new", 4: "new", 5: "new", 7: "new"}
+    assert server.requested == [1, 2, 3]
+
+    # 主题2有新回复；主题3的回复数达到阈值
+    server.topics[2].update(replies=11, last_post=BASE + timedelta(hours=2))
+    server.topics[3].update(replies=6, last_post=BASE + timedelta(hours=1))
+    server.requested.clear()
+    crawler = make_crawler(make_client, server, state_file)
+
+    second = [t async for t in crawler.crawl(BOARD_URL)]
+
+    assert {topic_id(t): t.reason for t in second} == {2: "updated", 3: "new"}
+    # 第2页的主题都不晚于上次的水位，不再翻到第3页
+    assert server.requested == [1, 2]
+    assert crawler.stats() == {"pages_fetched": 2, "topics_seen": 6, "topics_queued": 2}
+
+
+@pytest.mark.asyncio
+async def test_failed_list_page_keeps_watermark(make_client, tmp_path):
+    server = BoardServer(board_topics())
+    server.failing.add(2)
+    state_file = tmp_path / "boards.json"
+
+    queued = [t async for t in make_crawler(make_client, server, state_file).crawl(BOARD_URL)]
+
+    assert sorted(topic_id(t) for t in queued) == [1, 2, 7]
+    assert BoardState(str(state_file)).board(BOARD_URL)["watermark"] is None
+
+    server.failing.clear()
+    server.requested.clear()
+    retried = [t async for t in make_crawler(make_client, server, state_file).crawl(BOARD_URL)]
+
+    # 水位没有推进，失败页上的主题下次仍会被读到
+    assert server.requested == [1, 2, 3]
+    assert sorted(topic_id(t) for t in retried) == [4, 5]
+    assert BoardState(str(state_file)).board(BOARD_URL)["watermark"] == (BASE - timedelta(hours=2)).isoformat()
+
+
+@pytest.mark.asyncio
+async def test_topics_older_than_retention_are_pruned(make_client, tmp_path):
+    server = BoardServer(board_topics())
+    state_file = tmp_path / "boards.json"
+    crawler = make_crawler(make_client, server, state_file)
+    crawler.retention = timedelta(hours=3)
+    # 旧版状态中没有看到时间、也没有最后回复时间的主题按上次爬取时间清理
+    crawler.state.board(BOARD_URL)["topics"]["http://forum.test/topic/99-old/"] = [3, 10, None, False]
+
+    [t async for t in crawler.crawl(BOARD_URL)]
+
+    known = BoardState(str(state_file)).board(BOARD_URL)["topics"]
+    # 水位是主题2的最后回复时间，早于它3小时以上的主题不再保留
+    assert sorted(int(re.search(r"/topic/(\d+)", key).group(1)) for key in known) == [2, 3, 4, 5]
+
+
+@pytest.mark.asyncio
+async def test_pruned_topic_with_new_reply_is_queued_again(make_client, tmp_path):
+    server = BoardServer(board_topics())
+    state_file = tmp_path / "boards.json"
+    crawler = make_crawler(make_client, server, state_file)
+    crawler.retention = timedelta(hours=1)
+    [t async for t in crawler.crawl(BOARD_URL)]
+
+    server.topics[5].update(replies=7, last_post=BASE + timedelta(hours=1))
+    crawler = make_crawler(make_client, server, state_file)
+    crawler.retention = timedelta(hours=1)
+    again = [t async for t in crawler.crawl(BOARD_URL)]
+
+    # 置顶的旧主题和第2页上已清理的主题没有新回复，不会重新入队
+    assert {topic_id(t): t.reason for t in again} == {5: "new"}
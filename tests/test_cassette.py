@@ -0,0 +1,74 @@
+"""HTTP录制/回放测试"""
+import gzip
+import json
+import zipfile
+
+import httpx
+import pytest
+
+from src.utils.cassette import AsyncCassetteTransport, Cassette, CassetteMissError
+
+
+TOKEN_URL = "https://api.weixin.qq.com/cgi-bin/token?grant_type=client_credential&appid=wx1&secret=s3cr3t"
+
+
+def token_handler(request):
+    if request.url.path == "/cgi-bin/token":
+        body = gzip.compress(json.dumps({"access_token": "real-token-value", "expires_in": 7200}).encode())
+        return httpx.Response(200, content=body, headers={"Content-Type": "application/json", "Content-Encoding": "gzip"})
+    return httpx.Response(200, json={"errcode": 0, "media_id": request.url.params.get("n")})
+
+
+async def record(path, urls):
+    cassette = Cassette(path)
+    cassette.load()
+    transport = AsyncCassetteTransport(httpx.MockTransport(token_handler), cassette, "record")
+    async with httpx.AsyncClient(transport=transport) as client:
+        responses = [await client.get(url) for url in urls]
+    return responses
+
+
+@pytest.mark.asyncio
+async def test_recorded_token_is_redacted_but_live_response_is_not(tmp_path):
+    path = tmp_path / "tape.zip"
+
+    responses = await record(path, [TOKEN_URL])
+
+    assert responses[0].json()["access_token"] == "real-token-value"
+    with zipfile.ZipFile(path) as zf:
+        archive = b"".join(zf.read(name) for name in zf.namelist())
+    assert b"real-token-value" not in archive
+    assert b"s3cr3t" not in archive
+
+
+@pytest.mark.asyncio
+async def test_replay_returns_redacted_token_and_matches_without_credentials(tmp_path):
+    path = tmp_path / "tape.zip"
+    await record(path, [TOKEN_URL, "https://api.weixin.qq.com/cgi-bin/material?access_token=real-token-value&n=1"])
+
+    cassette = Cassette(path)
+    cassette.load()
+
+    def offline(request):
+        raise AssertionError("回放时不应访问网络")
+
+    transport = AsyncCassetteTransport(httpx.MockTransport(offline), cassette, "replay")
+    async with httpx.AsyncClient(transport=transport) as client:
+        token = await client.get(TOKEN_URL.replace("s3cr3t", "other"))
+        material = await client.get("https://api.weixin.qq.com/cgi-bin/material?access_token=REDACTED&n=1")
+        with pytest.raises(CassetteMissError):
+            await client.get("https://api.weixin.qq.com/cgi-bin/material?access_token=REDACTED&n=2")
+
+    assert token.json() == {"access_token": Cassette.REDACTED_VALUE, "expires_in": 7200}
+    assert material.json() == {"errcode": 0, "media_id": "1"}
+
+
+@pytest.mark.parametrize("content_type, body, expected", [
+    ("application/json", b'{"data": [{"ticket": "t", "id": 1}]}', {"data": [{"ticket": "REDACTED", "id": 1}]}),
+    ("application/json", b'{"errcode": 0}', None),
+    ("text/html", b'{"access_token": "x"}', None),
+    ("application/json", b"not json", None),
+])
+def test_redact_body(content_type, body, expected):
+    result = Cassette.redact_body(httpx.Headers({"Content-Type": content_type}), body)
+    assert (json.loads(result) if result is not None else None) == expected
@@ -0,0 +1,128 @@
+"""DNS缓存测试"""
+import asyncio
+import socket
+
+import httpcore
+import pytest
+
+from src.utils.dns_cache import CachingAsyncBackend, DNSCache
+
+
+class FakeResolver:
+    """替换 socket.getaddrinfo，记录查询次数"""
+
+    def __init__(self, table):
+        self.table = table
+        self.calls = []
+
+    def __call__(self, host, port, *args, **kwargs):
+        self.calls.append(host)
+        ips = self.table.get(host)
+        if ips is None:
+            raise socket.gaierror(socket.EAI_NONAME, "not found")
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (ip, port)) for ip in ips]
+
+
+@pytest.fixture
+def resolver(monkeypatch):
+    fake = FakeResolver({"site.test": ["10.0.0.1", "10.0.0.2", "10.0.0.1"]})
+    monkeypatch.setattr(socket, "getaddrinfo", fake)
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_concurrent_resolves_share_one_lookup(resolver):
+    cache = DNSCache(ttl=300, negative_ttl=30)
+
+    results = await asyncio.gather(*(cache.resolve("site.test") for _ in range(5)))
+    again = await cache.resolve("site.test")
+
+    assert results == [["10.0.0.1", "10.0.0.2"]] * 5
+    assert again == ["10.0.0.1", "10.0.0.2"]
+    assert resolver.calls == ["site.test"]
+    assert cache.stats()["hits"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_failures_are_negatively_cached(resolver):
+    cache = DNSCache(ttl=300, negative_ttl=30)
+
+    for _ in range(3):
+        with pytest.raises(socket.gaierror):
+            await cache.resolve("missing.test")
+
+    assert resolver.calls == ["missing.test"]
+    assert cache.stats()["negative_hits"] == 2
+    with pytest.raises(socket.gaierror):
+        cache.resolve_sync("missing.test")
+    assert resolver.calls == ["missing.test"]
+
+
+@pytest.mark.asyncio
+async def test_expired_entries_are_resolved_again(resolver):
+    cache = DNSCache(ttl=0, negative_ttl=0)
+
+    await cache.resolve("site.test")
+    cache.resolve_sync("site.test")
+
+    assert resolver.calls == ["site.test", "site.test"]
+
+
+@pytest.mark.asyncio
+async def test_ip_addresses_skip_lookup(resolver):
+    cache = DNSCache(ttl=300, negative_ttl=30)
+    assert await cache.resolve("127.0.0.1") == ["127.0.0.1"]
+    assert cache.resolve_sync("::1") == ["::1"]
+    assert resolver.calls == []
+
+
+@pytest.mark.asyncio
+async def test_prefetch_swallows_failures(resolver):
+    cache = DNSCache(ttl=300, negative_ttl=30)
+    await cache.prefetch(["site.test", "missing.test", "site.test", "", "10.1.1.1"])
+    assert sorted(resolver.calls) == ["missing.test", "site.test"]
+
+
+class FakeBackend:
+    """记录连接尝试，指定的IP连接失败"""
+
+    def __init__(self, failing):
+        self.failing = set(failing)
+        self.attempts = []
+
+    async def connect_tcp(self, host, port, **kwargs):
+        self.attempts.append(host)
+        if host in self.failing:
+            raise httpcore.ConnectError(f"refused {host}")
+        return f"stream-{host}"
+
+
+@pytest.mark.asyncio
+async def test_backend_falls_through_to_next_address(resolver):
+    cache = DNSCache(ttl=300, negative_ttl=30)
+    inner = FakeBackend(failing={"10.0.0.1"})
+
+    stream = await CachingAsyncBackend(cache, inner).connect_tcp("site.test", 443)
+
+    assert stream == "stream-10.0.0.2"
+    assert inner.attempts == ["10.0.0.1", "10.0.0.2"]
+
+
+@pytest.mark.asyncio
+async def test_backend_invalidates_when_all_addresses_fail(resolver):
+    cache = DNSCache(ttl=300, negative_ttl=30)
+    backend = CachingAsyncBackend(cache, FakeBackend(failing={"10.0.0.1", "10.0.0.2"}))
+
+    with pytest.raises(httpcore.ConnectError):
+        await backend.connect_tcp("site.test", 443)
+    with pytest.raises(httpcore.ConnectError):
+        await backend.connect_tcp("site.test", 443)
+
+    assert resolver.calls == ["site.test", "site.test"]
+
+
+@pytest.mark.asyncio
+async def test_backend_maps_resolution_failure_to_connect_error(resolver):
+    backend = CachingAsyncBackend(DNSCache(ttl=300, negative_ttl=30), FakeBackend(failing=()))
+    with pytest.raises(httpcore.ConnectError):
+        await backend.connect_tcp("missing.test", 443)
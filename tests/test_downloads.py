@@ -0,0 +1,119 @@
+"""断点续传下载测试"""
+import os
+
+import httpx
+import pytest
+
+from src.utils.http_client import DownloadIncompleteError
+
+
+DATA = bytes(range(256)) * 1024
+
+
+class BrokenStream(httpx.AsyncByteStream):
+    """发送一部分数据后连接中断"""
+
+    def __init__(self, data: bytes, cut: int):
+        self.data = data
+        self.cut = cut
+
+    async def __aiter__(self):
+        yield self.data[:self.cut]
+        raise httpx.ReadError("connection reset")
+
+
+def ranged_response(request, data=DATA):
+    """按Range头返回206或完整的200响应"""
+    range_header = request.headers.get("Range")
+    if not range_header:
+        return httpx.Response(200, headers={"Content-Length": str(len(data))}, stream=httpx.ByteStream(data))
+    start = int(range_header.split("=")[1].rstrip("-"))
+    if start >= len(data):
+        return httpx.Response(416, headers={"Content-Range": f"bytes */{len(data)}"})
+    body = data[start:]
+    return httpx.Response(
+        206,
+        headers={"Content-Range": f"bytes {start}-{len(data) - 1}/{len(data)}", "Content-Length": str(len(body))},
+        stream=httpx.ByteStream(body),
+    )
+
+
+@pytest.mark.asyncio
+async def test_interrupted_download_resumes_with_range(make_client, tmp_path):
+    ranges = []
+
+    def handler(request, proxy):
+        ranges.append(request.headers.get("Range"))
+        assert request.headers["Accept-Encoding"] == "identity"
+        if len(ranges) == 1:
+            return httpx.Response(200, headers={"Content-Length": str(len(DATA))}, stream=BrokenStream(DATA, 100_000))
+        return ranged_response(request)
+
+    client = make_client(handler)
+    path = str(tmp_path / "img.jpg")
+
+    await client.download_file("http://img.test/img.jpg", path)
+
+    assert ranges == [None, "bytes=100000-"]
+    assert open(path, "rb").read() == DATA
+    assert not os.path.exists(path + ".part")
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_server_ignoring_range_restarts_from_zero(make_client, tmp_path):
+    path = tmp_path / "img.jpg"
+    (tmp_path / "img.jpg.part").write_bytes(b"stale partial data")
+
+    def handler(request, proxy):
+        return httpx.Response(200, headers={"Content-Length": str(len(DATA))}, stream=httpx.ByteStream(DATA))
+
+    client = make_client(handler)
+    await client.download_file("http://img.test/img.jpg", str(path))
+
+    assert path.read_bytes() == DATA
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_complete_part_file_finishes_on_416(make_client, tmp_path):
+    path = tmp_path / "img.jpg"
+    (tmp_path / "img.jpg.part").write_bytes(DATA)
+    requests = []
+
+    def handler(request, proxy):
+        requests.append(request.headers.get("Range"))
+        return ranged_response(request)
+
+    client = make_client(handler)
+    await client.download_file("http://img.test/img.jpg", str(path))
+
+    assert requests == [f"bytes={len(DATA)}-"]
+    assert path.read_bytes() == DATA
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_short_body_is_retried_then_reported(make_client, tmp_path):
+    def handler(request, proxy):
+        # 声明的长度比实际发送的多，且不支持续传
+        return httpx.Response(200, headers={"Content-Length": str(len(DATA) + 10)}, stream=httpx.ByteStream(DATA))
+
+    client = make_client(handler)
+    path = tmp_path / "img.jpg"
+
+    with pytest.raises(DownloadIncompleteError):
+        await client.download_file("http://img.test/img.jpg", str(path))
+
+    assert not path.exists()
+    await client.close()
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes 100-999/1000", 1000),
+    ("bytes */5000", 5000),
+    ("bytes 0-99/*", None),
+    (None, None),
+])
+def test_parse_content_range_total(make_client, header, expected):
+    assert make_client(lambda request, proxy: None)._parse_content_range_total(header) == expected
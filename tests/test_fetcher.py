@@ -0,0 +1,215 @@
+"""文章抓取器测试"""
+import asyncio
+from contextlib import aclosing
+
+import httpx
+import pytest
+
+from src.article_fetcher.fetcher import ArticleFetcher
+
+
+ARTICLE_HTML = (
+    "<html><head><title>KTM 300 XC enduro long term review</title></head><body><article>"
+    + "<p>The KTM 300 XC two-stroke enduro bike handled the rocky trail with ease, "
+      "and the suspension soaked up every root on the motocross track.</p>" * 20
+    + "</article></body></html>"
+)
+
+
+class SlowServer:
+    """每个请求都挂起直到被取消，记录在途和被取消的请求数"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.cancelled = 0
+
+    async def __call__(self, request, proxy):
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        return httpx.Response(200, text=ARTICLE_HTML)
+
+
+@pytest.mark.asyncio
+async def test_deadline_cancels_request_and_releases_slot(make_client):
+    server = SlowServer()
+    client = make_client(server)
+    fetcher = ArticleFetcher(http_client=client)
+
+    result = await fetcher._fetch_with_deadline("http://slow.test/article", deadline=0.1)
+
+    assert not result.success
+    assert "超时" in result.error_message
+    await asyncio.sleep(0.01)
+    assert server.cancelled == 1
+    assert server.in_flight == 0
+    assert client.scheduler_stats()["slow.test"]["in_flight"] == 0
+    await fetcher.close()
+
+
+@pytest.mark.asyncio
+async def test_breaking_out_of_fetch_iter_stops_in_flight_requests(make_client):
+    server = SlowServer()
+
+    async def handler(request, proxy):
+        if request.url.path == "/fast":
+            return httpx.Response(200, text=ARTICLE_HTML)
+        return await server(request, proxy)
+
+    client = make_client(handler)
+    fetcher = ArticleFetcher(http_client=client)
+    urls = ["http://site.test/fast"] + [f"http://site.test/slow{i}" for i in range(3)]
+
+    async with aclosing(fetcher.fetch_iter(urls, concurrency=4, deadline=0)) as results:
+        async for result in results:
+            assert result.url == "http://site.test/fast"
+            break
+
+    assert server.cancelled == 3
+    assert server.in_flight == 0
+    assert client.scheduler_stats()["site.test"]["in_flight"] == 0
+    await fetcher.close()
+
+
+@pytest.mark.asyncio
+async def test_head_gate_rejection_is_not_recorded_as_seen(make_client, tmp_path):
+    from src.utils.seen_set import SeenSet
+
+    def handler(request, proxy):
+        body = "<html><head><title>Best sourdough bread recipe</title></head><body>" + (
+            "<p>Flour water salt yeast. Knead the dough and let it rise overnight.</p>" * 600
+        )
+        return httpx.Response(200, text=body)
+
+    fetcher = ArticleFetcher(http_client=make_client(handler))
+    fetcher.seen_set = SeenSet(str(tmp_path / "seen.db"), str(tmp_path / "seen.bloom"), capacity=1000)
+
+    result = await fetcher.fetch("http://site.test/bread")
+
+    assert result.rejected and not result.success
+    assert not fetcher.seen_set.contains("http://site.test/bread")
+    await fetcher.close()
+
+
+@pytest.mark.asyncio
+async def test_fetch_without_dedupe_does_not_touch_seen_set(make_client, tmp_path):
+    from src.utils.seen_set import SeenSet
+
+    requests = []
+
+    def handler(request, proxy):
+        requests.append(str(request.url))
+        return httpx.Response(200, text=ARTICLE_HTML)
+
+    fetcher = ArticleFetcher(http_client=make_client(handler))
+    fetcher.seen_set = SeenSet(str(tmp_path / "seen.db"), str(tmp_path / "seen.bloom"), capacity=1000)
+
+    result = await fetcher.fetch("http://site.test/ktm", dedupe=False)
+
+    assert result.article is not None
+    assert len(fetcher.seen_set) == 0
+
+    first = await fetcher.fetch("http://site.test/ktm")
+    second = await fetcher.fetch("https://site.test/ktm?utm_source=rss")
+
+    assert first.article is not None and not first.duplicate
+    assert second.duplicate
+    assert len(requests) == 2
+    await fetcher.close()
+
+
+@pytest.mark.asyncio
+async def test_fetch_batch_skips_seen_and_repeated_urls(make_client, tmp_path):
+    from src.utils.seen_set import SeenSet
+
+    requests = []
+
+    def handler(request, proxy):
+        requests.append(request.url.path)
+        return httpx.Response(200, text=ARTICLE_HTML)
+
+    fetcher = ArticleFetcher(http_client=make_client(handler))
+    fetcher.seen_set = SeenSet(str(tmp_path / "seen.db"), str(tmp_path / "seen.bloom"), capacity=1000)
+    await fetcher.seen_set.record(["http://site.test/old"])
+
+    urls = ["http://site.test/old", "http://site.test/new", "http://site.test/new/?utm_campaign=x"]
+    results = await fetcher.fetch_batch(urls)
+
+    assert [r.duplicate for r in results] == [True, False, True]
+    assert requests == ["/new"]
+    assert fetcher.seen_set.contains("http://site.test/new")
+    await fetcher.close()
+
+
+@pytest.mark.asyncio
+async def test_article_failing_validation_is_not_recorded(make_client, tmp_path):
+    from src.utils.seen_set import SeenSet
+
+    requests = []
+
+    def handler(request, proxy):
+        requests.append(request.url.path)
+        return httpx.Response(200, text=(
+            "<html><head><title>KTM 300 XC enduro first ride</title></head><body><article>"
+            "<p>Short enduro teaser about the KTM.</p></article></body></html>"
+        ))
+
+    fetcher = ArticleFetcher(http_client=make_client(handler))
+    fetcher.seen_set = SeenSet(str(tmp_path / "seen.db"), str(tmp_path / "seen.bloom"), capacity=1000)
+
+    first = await fetcher.fetch("http://site.test/teaser")
+    second = await fetcher.fetch("http://site.test/teaser")
+
+    assert not first.success and not first.duplicate
+    assert not second.duplicate
+    assert requests == ["/teaser", "/teaser"]
+    await fetcher.close()
+
+
+@pytest.mark.asyncio
+async def test_fetch_without_record_waits_for_mark_processed(make_client, tmp_path):
+    from src.utils.seen_set import SeenSet
+
+    def handler(request, proxy):
+        return httpx.Response(200, text=ARTICLE_HTML)
+
+    fetcher = ArticleFetcher(http_client=make_client(handler))
+    fetcher.seen_set = SeenSet(str(tmp_path / "seen.db"), str(tmp_path / "seen.bloom"), capacity=1000)
+
+    result = await fetcher.fetch("http://site.test/ktm", record=False)
+    # 改写失败时不调用 mark_processed，下次仍会处理
+    assert result.success
+    assert not (await fetcher.fetch("http://site.test/ktm", record=False)).duplicate
+
+    await fetcher.mark_processed(result)
+
+    assert (await fetcher.fetch("http://site.test/ktm?utm_source=x")).duplicate
+    await fetcher.close()
+
+
+@pytest.mark.asyncio
+async def test_near_duplicate_fingerprint_is_added_only_when_processed(make_client, tmp_path):
+    from src.article_fetcher.near_duplicates import NearDuplicateIndex
+
+    def handler(request, proxy):
+        return httpx.Response(200, text=ARTICLE_HTML)
+
+    fetcher = ArticleFetcher(http_client=make_client(handler))
+    fetcher.near_duplicates = NearDuplicateIndex(str(tmp_path / "near.db"))
+
+    original = await fetcher.fetch("http://a.test/ktm", record=False)
+    # 原文没有处理成功，转载不算重复
+    copy = await fetcher.fetch("http://b.test/ktm-copy", record=False)
+    assert original.success and copy.article.duplicate_of is None
+
+    await fetcher.mark_processed(original)
+    again = await fetcher.fetch("http://c.test/ktm-again")
+
+    assert again.article.duplicate_of == "http://a.test/ktm"
+    fetcher.near_duplicates._db.close()
+    await fetcher.close()
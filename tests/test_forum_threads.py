@@ -0,0 +1,147 @@
+"""论坛帖子分页发现和并发抓取测试"""
+import asyncio
+
+import httpx
+import pytest
+
+from config import settings
+from src.article_fetcher.fetcher import ArticleFetcher
+from src.article_fetcher.parsers import ForumCommentParser, ips_page_url
+from src.article_fetcher.thread_state import ThreadStateStore
+
+
+THREAD_URL = "http://forum.test/t/jetting?page=1"
+PER_PAGE = 5
+
+
+def comment_ids(page: int, count: int = PER_PAGE) -> list[str]:
+    """第page页上的评论ID（每页 PER_PAGE 条，ID连续递增）"""
+    start = (page - 1) * PER_PAGE + 101
+    return [str(start + i) for i in range(count)]
+
+
+def thread_page(page: int, links: list[int], count: int = PER_PAGE) -> str:
+    """通用论坛帖子的一页：count 条评论和指向 links 各页的分页链接"""
+    posts = "".join(
+        f'<div class="post" id="post-{cid}"><span class="author">rider{cid}</span>'
+        f"<p>Comment {cid} about jetting the carburetor for cold mornings on the trail.</p></div>"
+        for cid in comment_ids(page, count)
+    )
+    nav = "".join(f'<a href="/t/jetting?page={n}">{n}</a>' for n in links)
+    return f"<html><body>{posts}<div class='pagination'>{nav}</div></body></html>"
+
+
+def make_fetcher(make_client, handler, tmp_path) -> ArticleFetcher:
+    fetcher = ArticleFetcher(http_client=make_client(handler))
+    fetcher.thread_state = ThreadStateStore(str(tmp_path / "threads.json"))
+    return fetcher
+
+
+def test_ips_pagination_uses_data_pages_and_active_page():
+    html = (
+        '<html><body><ul class="ipsPagination" data-pages="5" '
+        'data-baseurl="https://www.thumpertalk.com/forums/topic/123-jetting/">'
+        '<li class="ipsPagination_page ipsPagination_active"><a data-page="3" href="#">3</a></li>'
+        "</ul></body></html>"
+    )
+    url = "https://www.thumpertalk.com/forums/topic/123-jetting/page/3/#comments"
+
+    current, pages = ForumCommentParser().find_thread_pages(html, url)
+
+    assert current == 3
+    assert sorted(pages) == [1, 2, 3, 4, 5]
+    assert pages[3] == url
+    assert pages[1] == "https://www.thumpertalk.com/forums/topic/123-jetting/"
+    assert pages[5] == "https://www.thumpertalk.com/forums/topic/123-jetting/page/5/"
+
+
+def test_ips_page_url_with_query_string():
+    assert ips_page_url("https://forum.test/index.php?/topic/9/", 1) == "https://forum.test/index.php?/topic/9/"
+    assert ips_page_url("https://forum.test/index.php?/topic/9/", 4) == "https://forum.test/index.php?/topic/9/&page=4"
+    assert ips_page_url("https://forum.test/index.php?", 2) == "https://forum.test/index.php?page=2"
+
+
+def test_generic_links_fill_gap_and_ignore_other_threads():
+    html = (
+        '<html><body><a href="/t/jetting?page=2">2</a><span>...</span>'
+        '<a href="/t/jetting?page=6#last">6</a>'
+        '<a href="/t/other-thread?page=9">9</a>'
+        '<a href="http://other.test/t/jetting?page=12">12</a></body></html>'
+    )
+
+    current, pages = ForumCommentParser().find_thread_pages(html, THREAD_URL)
+
+    assert current == 1
+    assert sorted(pages) == [1, 2, 3, 4, 5, 6]
+    assert pages[4] == "http://forum.test/t/jetting?page=4"
+    assert pages[6] == "http://forum.test/t/jetting?page=6"
+
+
+def test_path_style_page_links():
+    html = '<html><body><a href="/topic/77-ride/page/4/">4</a></body></html>'
+
+    current, pages = ForumCommentParser().find_thread_pages(html, "http://forum.test/topic/77-ride/page/2/")
+
+    assert current == 2
+    assert sorted(pages) == [1, 2, 3, 4]
+    assert pages[3] == "http://forum.test/topic/77-ride/page/3/"
+
+
+def test_page_without_pagination_has_only_current_page():
+    current, pages = ForumCommentParser().find_thread_pages("<html><body><p>hi</p></body></html>", THREAD_URL)
+
+    assert (current, pages) == (1, {1: THREAD_URL})
+
+
+@pytest.mark.asyncio
+async def test_remaining_pages_are_fetched_concurrently_and_merged_in_order(make_client, tmp_path):
+    active = 0
+    peak = 0
+
+    async def handler(request, proxy):
+        nonlocal active, peak
+        page = int(request.url.params["page"])
+        active += 1
+        peak = max(peak, active)
+        # 后面的页先返回，合并结果仍按页码顺序
+        await asyncio.sleep(0.02 * (5 - page))
+        active -= 1
+        return httpx.Response(200, text=thread_page(page, [1, 2, 3, 4]))
+
+    fetcher = make_fetcher(make_client, handler, tmp_path)
+    first = thread_page(1, [2, 3, 4]).encode()
+    first_comments = await fetcher.parser.comment_parser.parse_comments(first, THREAD_URL)
+
+    merged = await fetcher._collect_thread_comments(first, THREAD_URL, None, first_comments, "crawl")
+
+    assert [c["comment_id"] for c in merged] == [cid for page in range(1, 5) for cid in comment_ids(page)]
+    assert peak > 1
+    mark = fetcher.thread_state.get(fetcher._thread_key(THREAD_URL))
+    assert (mark.last_page, mark.last_page_count, mark.last_comment_id) == (4, PER_PAGE, comment_ids(4)[-1])
+    await fetcher.close()
+
+
+@pytest.mark.asyncio
+async def test_max_pages_and_max_comments_cap_the_thread(make_client, tmp_path, monkeypatch):
+    requested = []
+
+    def handler(request, proxy):
+        page = int(request.url.params["page"])
+        requested.append(page)
+        return httpx.Response(200, text=thread_page(page, list(range(1, 11))))
+
+    monkeypatch.setattr(settings, "forum_max_pages", 3)
+    monkeypatch.setattr(settings, "forum_max_comments", 12)
+    fetcher = make_fetcher(make_client, handler, tmp_path)
+    first = thread_page(1, list(range(2, 11))).encode()
+    first_comments = await fetcher.parser.comment_parser.parse_comments(first, THREAD_URL)
+
+    merged = await fetcher._collect_thread_comments(first, THREAD_URL, None, first_comments, "crawl")
+
+    assert sorted(requested) == [2, 3]
+    assert len(merged) == 12
+    assert merged[-1]["comment_id"] == comment_ids(3)[1]
+    mark = fetcher.thread_state.get(fetcher._thread_key(THREAD_URL))
+    # 上限截断的页只记录已读的部分，剩下的评论下次刷新时读取
+    assert (mark.last_page, mark.last_page_count) == (3, 2)
+    await fetcher.close()
@@ -0,0 +1,140 @@
+"""HTTP磁盘缓存测试"""
+import httpx
+import pytest
+
+from src.utils.http_cache import HTTPCache, varies_on_request
+
+
+class Origin:
+    """带ETag的源站，记录收到的条件请求头"""
+
+    def __init__(self, headers=None):
+        self.headers = headers or {}
+        self.requests = []
+
+    def __call__(self, request, proxy):
+        self.requests.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"'})
+        return httpx.Response(200, text="page body", headers={"ETag": '"v1"', **self.headers})
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return HTTPCache(str(tmp_path / "http"), ttl=3600, max_bytes=10 * 1024 * 1024)
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({}, False),
+    ({"Vary": "Accept-Encoding"}, False),
+    ({"vary": "accept-encoding, User-Agent"}, True),
+    ({"Vary": "*"}, True),
+    ({"Vary": "Cookie"}, True),
+])
+def test_varies_on_request(headers, expected):
+    assert varies_on_request(httpx.Headers(headers)) is expected
+
+
+@pytest.mark.asyncio
+async def test_fresh_entry_is_served_without_request(make_client, cache):
+    origin = Origin()
+    client = make_client(origin, cache=cache)
+
+    first = await client.get("http://site.test/page")
+    second = await client.get("http://site.test/page")
+
+    assert first.text == second.text == "page body"
+    assert second.extensions.get("from_cache")
+    assert origin.requests == [None]
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_stale_entry_is_revalidated_with_etag(make_client, cache):
+    origin = Origin()
+    client = make_client(origin, cache=cache)
+    await client.get("http://site.test/page")
+    cache.ttl = 0
+
+    response = await client.get("http://site.test/page")
+
+    assert response.status_code == 200 and response.text == "page body"
+    assert origin.requests == [None, '"v1"']
+    assert cache.stats()["revalidated"] == 1
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_304_with_missing_body_refetches_unconditionally(make_client, cache):
+    origin = Origin()
+    client = make_client(origin, cache=cache)
+    await client.get("http://site.test/page")
+    cache.ttl = 0
+    for body in (cache.cache_dir).glob("*.body"):
+        body.unlink()
+
+    response = await client.get("http://site.test/page")
+
+    assert response.status_code == 200 and response.text == "page body"
+    assert origin.requests == [None, '"v1"', None]
+    # 重新请求的完整响应再次写入缓存
+    assert cache.stats()["entries"] == 1
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_responses_varying_on_request_headers_are_not_cached(make_client, cache):
+    origin = Origin({"Vary": "User-Agent"})
+    client = make_client(origin, cache=cache)
+
+    await client.get("http://site.test/page")
+    await client.get("http://site.test/page")
+
+    assert origin.requests == [None, None]
+    assert cache.stats()["entries"] == 0
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_accept_encoding_vary_is_still_cached(make_client, cache):
+    origin = Origin({"Vary": "Accept-Encoding"})
+    client = make_client(origin, cache=cache)
+
+    await client.get("http://site.test/page")
+    await client.get("http://site.test/page")
+
+    assert origin.requests == [None]
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_keeps_total_under_limit(tmp_path):
+    cache = HTTPCache(str(tmp_path / "http"), ttl=3600, max_bytes=2000)
+    for i in range(10):
+        response = httpx.Response(200, content=b"x" * 200, request=httpx.Request("GET", f"http://site.test/{i}"))
+        await cache.store(f"http://site.test/{i}", response)
+    await cache.lookup("http://site.test/0")
+    response = httpx.Response(200, content=b"x" * 200, request=httpx.Request("GET", "http://site.test/10"))
+    await cache.store("http://site.test/10", response)
+
+    assert cache.stats()["size_bytes"] <= 2000
+    assert await cache.lookup("http://site.test/0") is not None
+    assert await cache.lookup("http://site.test/1") is None
+
+
+@pytest.mark.asyncio
+async def test_access_order_survives_reload(tmp_path):
+    cache = HTTPCache(str(tmp_path / "http"), ttl=3600, max_bytes=2000)
+    for i in range(10):
+        response = httpx.Response(200, content=b"x" * 200, request=httpx.Request("GET", f"http://site.test/{i}"))
+        await cache.store(f"http://site.test/{i}", response)
+    await cache.lookup("http://site.test/0")
+    await cache.flush()
+
+    # 重启后条目0仍是最近访问的，先淘汰条目1
+    reloaded = HTTPCache(str(tmp_path / "http"), ttl=3600, max_bytes=2000)
+    response = httpx.Response(200, content=b"x" * 200, request=httpx.Request("GET", "http://site.test/10"))
+    await reloaded.store("http://site.test/10", response)
+
+    assert await reloaded.lookup("http://site.test/0") is not None
+    assert await reloaded.lookup("http://site.test/1") is None
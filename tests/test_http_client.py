@@ -0,0 +1,181 @@
+"""HTTPClient测试"""
+import httpx
+import pytest
+
+from src.utils.http_client import ResponseRejectedError, ResponseTooLargeError
+
+
+def _streamed(chunks, counter):
+    async def body():
+        for chunk in chunks:
+            counter.append(len(chunk))
+            yield chunk
+    return body()
+
+
+@pytest.mark.asyncio
+async def test_head_check_aborts_stream_before_body_completes(make_client):
+    sent = []
+    chunks = [b"<html><head><title>off topic</title>"] + [b"x" * 8192] * 200
+
+    def handler(request, proxy):
+        return httpx.Response(200, headers={"Content-Type": "text/html"}, content=_streamed(chunks, sent))
+
+    client = make_client(handler)
+    seen_heads = []
+
+    def check(head, encoding):
+        seen_heads.append(len(head))
+        return False
+
+    with pytest.raises(ResponseRejectedError):
+        await client.get("http://site.test/page", use_cache=False, max_bytes=10 * 1024 * 1024,
+                         head_check=check, head_bytes=16 * 1024)
+
+    assert len(seen_heads) == 1 and seen_heads[0] >= 16 * 1024
+    assert sum(sent) < 64 * 1024
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_head_check_runs_at_end_of_short_body(make_client):
+    calls = []
+
+    def handler(request, proxy):
+        return httpx.Response(200, content=b"<title>short</title>")
+
+    client = make_client(handler)
+    response = await client.get("http://site.test/short", use_cache=False,
+                                head_check=lambda head, enc: calls.append(head) or True, head_bytes=32 * 1024)
+
+    assert response.content == b"<title>short</title>"
+    assert calls == [b"<title>short</title>"]
+    await client.close()
+
+
+PROXIES = ["http://proxy-a.test:8080", "http://proxy-b.test:8080"]
+
+
+@pytest.mark.asyncio
+async def test_proxy_429_does_not_trip_host_breaker(make_client):
+    def handler(request, proxy):
+        return httpx.Response(429)
+
+    client = make_client(handler, proxies=PROXIES)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.get("http://banned.test/page", use_cache=False)
+
+    breaker = client._retry_policy.breaker("banned.test")
+    assert breaker.consecutive_failures == 0
+    assert breaker.state == breaker.CLOSED
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_direct_429_is_retried_but_does_not_count_against_host_breaker(make_client):
+    calls = 0
+
+    def handler(request, proxy):
+        nonlocal calls
+        calls += 1
+        return httpx.Response(429)
+
+    client = make_client(handler)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.get("http://busy.test/page", use_cache=False)
+
+    assert calls == client._retry_policy.max_attempts
+    # 限流说明主机可达，不计入熔断
+    assert client._retry_policy.breaker("busy.test").consecutive_failures == 0
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_proxy_ban_fails_over_to_another_proxy(make_client):
+    def handler(request, proxy):
+        return httpx.Response(403) if proxy == PROXIES[0] else httpx.Response(200, text="ok")
+
+    client = make_client(handler, proxies=PROXIES)
+    client._proxy_pool._assignments["site.test"] = PROXIES[0]
+
+    response = await client.get("http://site.test/page", use_cache=False)
+
+    assert response.text == "ok"
+    assert client._retry_policy.breaker("site.test").consecutive_failures == 0
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_size_cap_and_rejection_are_neutral_for_proxy_health(make_client):
+    def handler(request, proxy):
+        return httpx.Response(200, content=b"x" * 4096)
+
+    client = make_client(handler, proxies=PROXIES[:1])
+
+    with pytest.raises(ResponseTooLargeError):
+        await client.get("http://big.test/page", use_cache=False, max_bytes=1024)
+    with pytest.raises(ResponseRejectedError):
+        await client.get("http://big.test/other", use_cache=False,
+                         head_check=lambda head, enc: False, head_bytes=1024)
+
+    health = client._proxy_pool._proxies[PROXIES[0]]
+    assert health.failures == 0
+    assert health.latency_ewma is None
+    assert client._retry_policy.breaker("big.test").consecutive_failures == 0
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_declared_length_over_cap_is_rejected_before_reading(make_client):
+    sent = []
+
+    def handler(request, proxy):
+        return httpx.Response(200, headers={"Content-Length": str(10 * 1024 * 1024)},
+                              content=_streamed([b"x" * 8192] * 10, sent))
+
+    client = make_client(handler)
+    with pytest.raises(ResponseTooLargeError):
+        await client.get("http://site.test/huge", use_cache=False, max_bytes=1024 * 1024)
+
+    assert sent == []
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_streamed_body_over_cap_is_aborted(make_client):
+    sent = []
+
+    def handler(request, proxy):
+        return httpx.Response(200, content=_streamed([b"x" * 8192] * 1000, sent))
+
+    client = make_client(handler)
+    with pytest.raises(ResponseTooLargeError):
+        await client.get("http://site.test/huge", use_cache=False, max_bytes=64 * 1024)
+
+    # 大小超限不重试，超过上限后立即停止读取
+    assert sum(sent) <= 64 * 1024 + 8192
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_truncate_keeps_prefix_and_is_not_cached(make_client, tmp_path):
+    from src.utils.http_cache import HTTPCache
+
+    requests = []
+
+    def handler(request, proxy):
+        requests.append(request.url.path)
+        return httpx.Response(200, content=_streamed([b"a" * 600, b"b" * 600], []))
+
+    cache = HTTPCache(str(tmp_path / "http"), ttl=3600, max_bytes=10 * 1024 * 1024)
+    client = make_client(handler, cache=cache)
+
+    response = await client.get("http://site.test/big", max_bytes=1000, truncate=True)
+    await client.get("http://site.test/big", max_bytes=1000, truncate=True)
+
+    assert response.content == b"a" * 600 + b"b" * 400
+    assert response.extensions["truncated"] is True
+    assert requests == ["/big", "/big"]
+    await client.close()
@@ -0,0 +1,134 @@
+"""连接池统计和请求指标测试"""
+import asyncio
+import importlib.util
+import json
+
+import httpx
+import pytest
+
+from src.utils.http_client import HTTPClient
+from src.utils.http_metrics import HTTPMetrics, LatencyHistogram, PoolTelemetry
+
+
+@pytest.mark.asyncio
+async def test_pool_telemetry_counts_connections_and_reuse():
+    telemetry = PoolTelemetry()
+    trace = telemetry.make_trace("site.test")
+
+    await trace("connection.connect_tcp.complete", {})
+    await trace("connection.start_tls.complete", {})
+    for _ in range(3):
+        telemetry.request_started("site.test")
+    for _ in range(3):
+        telemetry.request_finished("site.test", "HTTP/2")
+
+    host = telemetry.snapshot({"site.test": 1})["hosts"]["site.test"]
+    assert host["new_connections"] == 1
+    assert host["tls_handshakes"] == 1
+    assert host["max_streams_in_flight"] == 3
+    assert host["streams_in_flight"] == 0
+    assert host["reuse_ratio"] == pytest.approx(0.667, abs=0.001)
+    assert host["http_versions"] == {"HTTP/2": 3}
+
+
+def test_failed_request_is_not_counted_as_response():
+    telemetry = PoolTelemetry()
+    telemetry.request_started("site.test")
+    telemetry.request_finished("site.test")
+
+    total = telemetry.snapshot()["total"]
+    assert total["requests"] == 1
+    assert total["responses"] == 0
+    assert total["reuse_ratio"] == 0.0
+
+
+@pytest.mark.asyncio
+async def test_client_pool_stats_track_concurrent_streams(make_client):
+    async def handler(request, proxy):
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, text="ok")
+
+    client = make_client(handler)
+    await asyncio.gather(*(client.get(f"http://site.test/{i}", use_cache=False) for i in range(4)))
+
+    stats = client.pool_stats()
+    host = stats["hosts"]["site.test"]
+    assert host["requests"] == host["responses"] == 4
+    assert host["max_streams_in_flight"] >= 2
+    assert host["streams_in_flight"] == 0
+    await client.close()
+
+
+def test_http2_falls_back_without_h2(monkeypatch):
+    original = importlib.util.find_spec
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name: None if name == "h2" else original(name))
+
+    assert HTTPClient(http2=True, proxies=[]).http2 is False
+
+
+def test_latency_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for ms in [3] * 50 + [40] * 40 + [2000] * 10:
+        histogram.observe(ms / 1000)
+
+    data = histogram.to_dict()
+    assert data["count"] == 100
+    assert data["p50_ms"] == 5
+    assert data["p90_ms"] == 50
+    assert data["p99_ms"] == 2000
+    assert data["min_ms"] == 3 and data["max_ms"] == 2000
+    assert data["buckets"]["<=2500ms"] == 10
+
+
+def test_percentile_never_exceeds_max():
+    histogram = LatencyHistogram()
+    histogram.observe(0.012)
+    assert histogram.percentile(0.99) == 12.0
+
+
+@pytest.mark.asyncio
+async def test_client_records_status_bytes_and_retries(make_client, tmp_path):
+    calls = 0
+
+    def handler(request, proxy):
+        nonlocal calls
+        calls += 1
+        if request.url.path == "/flaky" and calls == 1:
+            return httpx.Response(503)
+        if request.url.path == "/missing":
+            return httpx.Response(404)
+        return httpx.Response(200, stream=httpx.ByteStream(b"x" * 1000))
+
+    client = make_client(handler, metrics=HTTPMetrics())
+    await client.get("http://site.test/flaky", use_cache=False)
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.get("http://site.test/missing", use_cache=False)
+
+    host = client.metrics.host_snapshot("site.test")
+    assert host["requests"] == 3
+    assert host["status_codes"] == {"503": 1, "200": 1, "404": 1}
+    assert host["retries"] == 1
+    assert host["bytes_received"] == 1000
+    assert host["total"]["count"] == 3
+    assert host["queue_wait"]["count"] == 3
+
+    path = client.metrics.dump_json(tmp_path / "metrics.json", extra={"dns": None})
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert data["summary"]["requests"] == 3
+    assert "dns" in data
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_transport_errors_are_counted(make_client):
+    def handler(request, proxy):
+        raise httpx.ConnectError("refused")
+
+    client = make_client(handler, metrics=HTTPMetrics())
+    with pytest.raises(httpx.ConnectError):
+        await client.get("http://down.test/", use_cache=False)
+
+    host = client.metrics.host_snapshot("down.test")
+    assert host["errors"] == host["requests"] >= 1
+    assert host["status_codes"] == {"error": host["requests"]}
+    await client.close()
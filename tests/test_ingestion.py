@@ -0,0 +1,234 @@
+"""来源解析与增量轮询测试"""
+import gzip
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+
+from src.models.source import IngestSource, SourceType
+from src.source_ingestion.parsers import StreamingFeedParser, parse_date, parse_forum_topics
+from src.source_ingestion.poller import IngestionService, SourcePoller
+from src.source_ingestion.state import IngestState
+
+
+def rss(*items):
+    body = "".join(
+        f"<item><title>{title}</title><link>{link}</link><guid>{link}</guid><pubDate>{date}</pubDate></item>"
+        for title, link, date in items
+    )
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>t</title>{body}</channel></rss>'.encode()
+
+
+def urlset(*entries):
+    body = "".join(f"<url><loc>{loc}</loc><lastmod>{mod}</lastmod></url>" for loc, mod in entries)
+    return f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{body}</urlset>'.encode()
+
+
+def parse_all(data: bytes, base_url="https://site.test/feed", chunk=7):
+    parser = StreamingFeedParser(base_url)
+    items = []
+    for i in range(0, len(data), chunk):
+        items += parser.feed(data[i:i + chunk])
+    return parser, items + parser.close()
+
+
+def test_rss_items_parse_across_tiny_chunks():
+    parser, items = parse_all(rss(
+        ("First", "https://site.test/a", "Mon, 05 Oct 2026 10:00:00 GMT"),
+        ("Second", "/b", "Tue, 06 Oct 2026 10:00:00 +0200"),
+    ))
+
+    assert parser.kind == "rss"
+    assert [i.url for i in items] == ["https://site.test/a", "https://site.test/b"]
+    assert items[1].updated == datetime(2026, 10, 6, 8, tzinfo=timezone.utc)
+
+
+def test_atom_uses_alternate_link_and_entry_id():
+    data = (
+        b'<feed xmlns="http://www.w3.org/2005/Atom"><entry><id>tag:site,1</id><title>A</title>'
+        b'<link rel="self" href="https://site.test/self"/><link href="https://site.test/a"/>'
+        b'<updated>2026-10-05T10:00:00Z</updated></entry></feed>'
+    )
+    parser, items = parse_all(data)
+
+    assert parser.kind == "atom"
+    assert items[0].url == "https://site.test/a"
+    assert items[0].id == "tag:site,1"
+
+
+def test_gzipped_sitemap_index_and_size_cap():
+    index = (
+        b'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+        b'<sitemap><loc>https://site.test/s1.xml</loc><lastmod>2026-10-01</lastmod></sitemap></sitemapindex>'
+    )
+    parser, items = parse_all(gzip.compress(index))
+    assert parser.kind == "sitemapindex"
+    assert items[0].is_sitemap and items[0].url == "https://site.test/s1.xml"
+
+    capped = StreamingFeedParser("https://site.test/big.xml", max_bytes=100)
+    with pytest.raises(ValueError):
+        capped.feed(urlset(*[(f"https://site.test/{i}", "2026-10-01") for i in range(10)]))
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2026-10-05", datetime(2026, 10, 5, tzinfo=timezone.utc)),
+    ("2026-10-05T12:00:00+02:00", datetime(2026, 10, 5, 10, tzinfo=timezone.utc)),
+    ("Mon, 05 Oct 2026 10:00:00 GMT", datetime(2026, 10, 5, 10, tzinfo=timezone.utc)),
+    ("yesterday", None),
+    (None, None),
+])
+def test_parse_date(text, expected):
+    assert parse_date(text) == expected
+
+
+def test_forum_topics_are_deduplicated_with_latest_activity():
+    html = """
+    <ul>
+      <li><a href="/topic/12-ktm-300/">KTM 300</a><time datetime="2026-10-01T10:00:00Z"></time>
+          <a href="/topic/12-ktm-300/?do=getNewComment#comment-9"></a><time datetime="2026-10-05T10:00:00Z"></time></li>
+      <li><a href="/viewtopic.php?f=2&t=77#p5">phpBB topic</a></li>
+      <li><a href="/profile/3-rider/">not a topic</a></li>
+    </ul>
+    """
+    topics = parse_forum_topics(html, "https://forum.test/discover/")
+
+    assert [(t.url, t.title) for t in topics] == [
+        ("https://forum.test/topic/12-ktm-300/", "KTM 300"),
+        ("https://forum.test/viewtopic.php?f=2&t=77", "phpBB topic"),
+    ]
+    assert topics[0].updated == datetime(2026, 10, 5, 10, tzinfo=timezone.utc)
+
+
+class FeedServer:
+    """可修改内容的订阅源，支持ETag条件请求"""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.requests = []
+
+    def __call__(self, request, proxy):
+        url = str(request.url)
+        self.requests.append((url, request.headers.get("If-None-Match")))
+        body = self.documents.get(url)
+        if body is None:
+            return httpx.Response(404)
+        if isinstance(body, int):
+            return httpx.Response(body)
+        etag = f'"{hash(body)}"'
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304)
+        return httpx.Response(200, content=body, headers={"ETag": etag})
+
+
+FEED_URL = "https://site.test/feed"
+OLD = ("Old", "https://site.test/old", "Mon, 05 Oct 2026 10:00:00 GMT")
+NEW = ("New", "https://site.test/new", "Wed, 07 Oct 2026 10:00:00 GMT")
+
+
+@pytest.mark.asyncio
+async def test_feed_poll_without_backfill_then_only_new_items(make_client, tmp_path):
+    server = FeedServer({FEED_URL: rss(OLD)})
+    poller = SourcePoller(make_client(server), IngestState(str(tmp_path / "state.json")), 1024 * 1024)
+    source = IngestSource(type=SourceType.FEED, url=FEED_URL, backfill=False)
+
+    assert await poller.poll(source) == []
+    assert await poller.poll(source) == []
+    server.documents[FEED_URL] = rss(NEW, OLD)
+    entries = await poller.poll(source)
+
+    assert [e.url for e in entries] == ["https://site.test/new"]
+    # 第二次轮询带上ETag并得到304
+    assert server.requests[1][1] is not None
+    assert poller.stats()["not_modified"] == 1
+
+
+@pytest.mark.asyncio
+async def test_sitemap_index_skips_unchanged_children_and_survives_failures(make_client, tmp_path):
+    def index(mod1, mod2):
+        return (
+            '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            f'<sitemap><loc>https://site.test/s1.xml</loc><lastmod>{mod1}</lastmod></sitemap>'
+            f'<sitemap><loc>https://site.test/s2.xml</loc><lastmod>{mod2}</lastmod></sitemap>'
+            '</sitemapindex>'
+        ).encode()
+
+    server = FeedServer({
+        "https://site.test/index.xml": index("2026-10-01", "2026-10-01"),
+        "https://site.test/s1.xml": urlset(("https://site.test/a", "2026-10-01")),
+        "https://site.test/s2.xml": 500,
+    })
+    poller = SourcePoller(make_client(server), IngestState(str(tmp_path / "state.json")), 1024 * 1024)
+    source = IngestSource(type=SourceType.SITEMAP, url="https://site.test/index.xml")
+
+    first = await poller.poll(source)
+    assert [e.url for e in first] == ["https://site.test/a"]
+
+    server.documents["https://site.test/index.xml"] = index("2026-10-01", "2026-10-02")
+    server.documents["https://site.test/s2.xml"] = urlset(("https://site.test/b", "2026-10-02"))
+    server.requests.clear()
+    second = await poller.poll(source)
+
+    assert [e.url for e in second] == ["https://site.test/b"]
+    # s1 的lastmod未变化，不再请求；上次失败的 s2 重试
+    assert [url for url, _ in server.requests] == ["https://site.test/index.xml", "https://site.test/s2.xml"]
+    assert poller.stats()["documents_skipped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_service_deduplicates_across_sources_and_respects_intervals(make_client, tmp_path):
+    server = FeedServer({
+        FEED_URL: rss(OLD),
+        "https://mirror.test/feed": rss(OLD),
+        "https://down.test/feed": 503,
+    })
+    service = IngestionService(
+        [
+            IngestSource(type=SourceType.FEED, url=FEED_URL, interval=3600),
+            IngestSource(type=SourceType.FEED, url="https://mirror.test/feed", interval=3600),
+            IngestSource(type=SourceType.FEED, url="https://down.test/feed", interval=3600),
+        ],
+        http_client=make_client(server),
+        state=IngestState(str(tmp_path / "state.json")),
+    )
+
+    entries = await service.poll_once()
+    assert [e.url for e in entries] == ["https://site.test/old"]
+
+    server.requests.clear()
+    assert await service.poll_once() == []
+    # 失败的来源同样等一个间隔再试
+    assert server.requests == []
+    assert (tmp_path / "state.json").exists()
+
+
+@pytest.mark.asyncio
+async def test_items_from_a_partly_parsed_feed_stay_new(make_client, tmp_path):
+    undated = "".join(f"<item><title>T{i}</title><link>https://site.test/u{i}</link></item>" for i in range(3))
+    head = f'<?xml version="1.0"?><rss version="2.0"><channel><title>t</title>{undated}'.encode()
+    broken = True
+
+    async def chunks():
+        yield head
+        yield b"<item><title>" + b"x" * 4096 + b"</title></item></channel></rss>"
+
+    def handler(request, proxy):
+        if broken:
+            # 第二个数据块超过文档大小上限，解析中途失败
+            return httpx.Response(200, content=chunks())
+        return httpx.Response(200, content=head + b"</channel></rss>")
+
+    state_file = str(tmp_path / "state.json")
+    service = IngestionService(
+        [IngestSource(type=SourceType.FEED, url=FEED_URL, backfill=True)],
+        http_client=make_client(handler),
+        state=IngestState(state_file),
+    )
+    service._poller = SourcePoller(service.http_client, service.state, 2048)
+
+    assert await service.poll_once(force=True) == []
+
+    broken = False
+    entries = await service.poll_once(force=True)
+
+    assert [e.url for e in entries] == [f"https://site.test/u{i}" for i in range(3)]
+    assert await service.poll_once(force=True) == []
@@ -0,0 +1,100 @@
+"""近似重复检测测试"""
+import asyncio
+import threading
+
+import pytest
+
+from src.article_fetcher.near_duplicates import NearDuplicateIndex, simhash
+from src.models.article import Article
+
+
+TEXT = " ".join(
+    f"Day {i}: the KTM enduro climbed the rocky hill section, the rear tyre found grip on wet roots "
+    f"and the rider kept the revs up through the creek crossing number {i}."
+    for i in range(12)
+)
+
+
+def make_article(url: str, content: str = TEXT) -> Article:
+    return Article(url=url, title="Enduro ride report", content=content, source_domain="example.com")
+
+
+@pytest.fixture
+def index(tmp_path):
+    near_duplicates = NearDuplicateIndex(str(tmp_path / "near.db"), max_distance=3)
+    yield near_duplicates
+    near_duplicates._db.close()
+
+
+def test_simhash_is_stable_under_small_edits():
+    edited = TEXT.replace("rocky", "stony", 1).replace("creek", "river", 1) + " Photos by the author."
+    unrelated = " ".join(f"Knead the sourdough for {i} minutes then let it proof overnight in the fridge." for i in range(12))
+
+    original = simhash(TEXT)
+    assert (original ^ simhash(edited)).bit_count() <= 8
+    assert (original ^ simhash(unrelated)).bit_count() > 16
+
+
+def test_simhash_returns_none_for_short_text():
+    assert simhash("too short to fingerprint") is None
+
+
+def test_lookup_flags_repost_only_after_add(index):
+    original = make_article("https://a.example.com/ride")
+
+    # 查询不记录指纹：原文处理失败时，之后的转载不会被误判
+    assert index.lookup(original) is None
+    assert index.lookup(make_article("https://b.example.com/copy")) is None
+    assert len(index) == 0
+
+    assert index.add(original) is True
+    assert index.lookup(original) is None
+    assert index.lookup(make_article("https://b.example.com/copy")) == "https://a.example.com/ride"
+    assert index.stats()["duplicates_found"] == 1
+
+
+def test_add_skips_short_text_and_existing_copies(index):
+    assert index.add(make_article("https://a.example.com/ride")) is True
+    assert index.add(make_article("https://a.example.com/ride")) is False
+    assert index.add(make_article("https://b.example.com/copy")) is False
+    assert index.add(make_article("https://c.example.com/short", "too short to fingerprint")) is False
+    assert len(index) == 1
+
+
+def test_fingerprints_persist(tmp_path):
+    db_file = str(tmp_path / "near.db")
+    first = NearDuplicateIndex(db_file)
+    first.add(make_article("https://a.example.com/ride"))
+    first._db.close()
+
+    reloaded = NearDuplicateIndex(db_file)
+    assert reloaded.lookup(make_article("https://b.example.com/copy")) == "https://a.example.com/ride"
+    reloaded._db.close()
+
+
+@pytest.mark.asyncio
+async def test_async_variants_run_off_the_event_loop(index, monkeypatch):
+    import src.article_fetcher.near_duplicates as module
+
+    threads = []
+    original = module.simhash
+
+    def tracked(text):
+        threads.append(threading.get_ident())
+        return original(text)
+
+    monkeypatch.setattr(module, "simhash", tracked)
+
+    assert await index.lookup_async(make_article("https://a.example.com/ride")) is None
+    assert await index.add_async(make_article("https://a.example.com/ride")) is True
+    assert len(threads) == 2 and threading.get_ident() not in threads
+
+
+@pytest.mark.asyncio
+async def test_concurrent_adds_record_only_one_copy(index):
+    articles = [make_article(f"https://site{i}.example.com/ride") for i in range(5)]
+
+    results = await asyncio.gather(*(index.add_async(article) for article in articles))
+
+    assert results.count(True) == 1
+    assert len(index) == 1
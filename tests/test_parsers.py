@@ -0,0 +1,41 @@
+"""HTML解析器测试"""
+import pytest
+
+from src.article_fetcher.parsers import ArticleParser, _build_tree
+
+
+PARAGRAPH = (
+    "<p>Der Fahrer über die Strecke: Geröll, Wurzeln und ein steiler Anstieg, "
+    "den die Enduro-Maschine ohne Mühe bewältigte. Äußerst beeindruckend.</p>"
+)
+PAGE = (
+    "<html><head><title>Enduro-Test: Große Tour</title></head><body><article>"
+    "<h1>Enduro-Test: Große Tour</h1>" + PARAGRAPH * 8
+    + '<img src="/img/bike.jpg" alt="bike"></article></body></html>'
+)
+
+
+@pytest.mark.asyncio
+async def test_bytes_with_declared_encoding_are_decoded_once():
+    html = PAGE.encode("iso-8859-1")
+
+    title, content, author, images, comments = await ArticleParser().parse(html, "https://site.test/a", "iso-8859-1")
+
+    assert "Große Tour" in title
+    assert "über" in content and "Äußerst" in content
+
+
+@pytest.mark.asyncio
+async def test_bytes_without_declared_encoding_use_detection():
+    html = PAGE.replace("<head>", '<head><meta charset="utf-8">').encode("utf-8")
+
+    title, content, *_ = await ArticleParser().parse(html, "https://site.test/a")
+
+    assert "Große Tour" in title
+    assert "Geröll" in content
+
+
+def test_unknown_declared_encoding_falls_back_to_detection():
+    tree = _build_tree(PAGE.encode("utf-8"), "x-no-such-charset")
+    assert tree is not None
+    assert "Große" in tree.findtext(".//title")
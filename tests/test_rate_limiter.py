@@ -0,0 +1,305 @@
+"""请求调度器测试"""
+import asyncio
+import time
+
+import pytest
+
+from src.utils.rate_limiter import (
+    LANE_CRAWL, LANE_INTERACTIVE, LANE_MEDIA, AIMDWindow, HostScheduler, PriorityGate, TokenBucket
+)
+
+
+def make_scheduler(**kwargs) -> HostScheduler:
+    options = dict(global_concurrency=10, default_rate=0, default_burst=1, default_concurrency=2)
+    options.update(kwargs)
+    return HostScheduler(**options)
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_allows_burst_then_limits_rate():
+    bucket = TokenBucket(rate=50, burst=3)
+
+    start = time.monotonic()
+    waits = [await bucket.acquire() for _ in range(6)]
+    elapsed = time.monotonic() - start
+
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    # 突发用完后每个令牌约 1/50 秒
+    assert 0.05 <= elapsed < 0.2
+
+
+@pytest.mark.asyncio
+async def test_unlimited_bucket_never_waits():
+    bucket = TokenBucket(rate=0, burst=1)
+    assert [await bucket.acquire() for _ in range(100)] == [0.0] * 100
+
+
+@pytest.mark.asyncio
+async def test_higher_priority_waiter_gets_next_token():
+    bucket = TokenBucket(rate=50, burst=1)
+    await bucket.acquire()
+    order = []
+
+    async def take(name, priority):
+        await bucket.acquire(priority)
+        order.append(name)
+
+    crawls = [asyncio.ensure_future(take(f"crawl-{i}", 2.0)) for i in range(3)]
+    await asyncio.sleep(0)
+    interactive = asyncio.ensure_future(take("interactive", 8.0))
+    await asyncio.gather(interactive, *crawls)
+
+    # 后到的高优先级请求不用等先到的批量请求依次拿到令牌
+    assert order == ["interactive", "crawl-0", "crawl-1", "crawl-2"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_bucket_waiter_does_not_take_a_token():
+    bucket = TokenBucket(rate=50, burst=1)
+    await bucket.acquire()
+
+    cancelled = asyncio.ensure_future(bucket.acquire())
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    waited = await bucket.acquire()
+
+    assert cancelled.cancelled()
+    assert waited < 0.04
+
+
+def test_configure_caps_saved_tokens_to_new_burst():
+    bucket = TokenBucket(rate=1, burst=10)
+    bucket.configure(rate=1, burst=2)
+    assert bucket._tokens <= 2
+
+
+def test_host_limits_match_parent_domain():
+    scheduler = make_scheduler(host_limits={"ThumperTalk.com": {"rate": 1, "burst": 2, "concurrency": 1}})
+    scheduler._get_host("www.thumpertalk.com")
+    scheduler._get_host("example.com")
+
+    stats = scheduler.stats()
+    assert stats["www.thumpertalk.com"]["rate"] == 1.0
+    assert stats["www.thumpertalk.com"]["max_concurrent"] == 1
+    assert stats["example.com"]["max_concurrent"] == 2
+
+
+@pytest.mark.asyncio
+async def test_slow_host_does_not_block_other_hosts():
+    scheduler = make_scheduler()
+    release = asyncio.Event()
+
+    async def hold(url):
+        async with scheduler.slot(url):
+            await release.wait()
+
+    holders = [asyncio.ensure_future(hold(f"http://slow.test/{i}")) for i in range(3)]
+    await asyncio.sleep(0.01)
+
+    async with scheduler.slot("http://fast.test/a"):
+        stats = scheduler.stats()
+        assert stats["slow.test"]["in_flight"] == 2
+        assert stats["slow.test"]["waiting"] == 1
+        assert stats["fast.test"]["in_flight"] == 1
+
+    release.set()
+    await asyncio.gather(*holders)
+    assert scheduler.stats()["slow.test"]["total_requests"] == 3
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_is_not_counted():
+    scheduler = make_scheduler(default_concurrency=1)
+    release = asyncio.Event()
+
+    async def hold():
+        async with scheduler.slot("http://site.test/a"):
+            await release.wait()
+
+    holder = asyncio.ensure_future(hold())
+    await asyncio.sleep(0)
+    waiter = asyncio.ensure_future(hold())
+    await asyncio.sleep(0.01)
+    assert scheduler.stats()["site.test"]["waiting"] == 1
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    release.set()
+    await holder
+
+    stats = scheduler.stats()["site.test"]
+    assert stats["waiting"] == 0 and stats["in_flight"] == 0 and stats["total_requests"] == 1
+
+
+@pytest.mark.asyncio
+async def test_crawl_delay_lowers_rate_and_can_be_cleared():
+    scheduler = make_scheduler(default_rate=5, default_burst=4)
+
+    scheduler.set_crawl_delay("site.test", 10)
+    assert scheduler.stats()["site.test"]["rate"] == pytest.approx(0.1)
+    assert scheduler.stats()["site.test"]["burst"] == 1
+
+    scheduler.set_crawl_delay("site.test", None)
+    assert scheduler.stats()["site.test"]["rate"] == 5
+    assert scheduler.stats()["site.test"]["burst"] == 4
+
+
+@pytest.mark.asyncio
+async def test_reserved_slots_only_go_to_high_priority_lanes():
+    gate = PriorityGate(3, reserved=1)
+
+    await gate.acquire(LANE_CRAWL)
+    await gate.acquire(LANE_MEDIA)
+    blocked = asyncio.ensure_future(gate.acquire(LANE_CRAWL))
+    await asyncio.sleep(0)
+    assert not blocked.done()
+
+    # 预留名额立即分给交互式请求，批量请求继续排队
+    await asyncio.wait_for(gate.acquire(LANE_INTERACTIVE), 0.1)
+    assert not blocked.done()
+
+    gate.release(LANE_MEDIA)
+    await asyncio.wait_for(blocked, 0.1)
+    assert gate.stats()[LANE_CRAWL]["in_flight"] == 2
+
+
+@pytest.mark.asyncio
+async def test_waiting_lanes_share_slots_by_weight():
+    gate = PriorityGate(1, weights={LANE_INTERACTIVE: 3.0, LANE_CRAWL: 1.0})
+    order = []
+    await gate.acquire(LANE_CRAWL)
+
+    async def worker(lane):
+        async with gate.slot(lane):
+            order.append(lane)
+
+    tasks = [asyncio.ensure_future(worker(LANE_CRAWL)) for _ in range(8)]
+    tasks += [asyncio.ensure_future(worker(LANE_INTERACTIVE)) for _ in range(8)]
+    await asyncio.sleep(0)
+    gate.release(LANE_CRAWL)
+    await asyncio.gather(*tasks)
+
+    # 权重3:1（批量通道刚用过一个名额），前8个名额大部分给交互式，批量通道不会饿死
+    first = order[:8]
+    assert first.count(LANE_INTERACTIVE) >= 6
+    assert first.count(LANE_CRAWL) >= 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_queue_and_granted_slot_returns():
+    gate = PriorityGate(1)
+    await gate.acquire(LANE_CRAWL)
+
+    waiter = asyncio.ensure_future(gate.acquire(LANE_CRAWL))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert gate.waiting() == 0
+
+    # 名额已分配但调用者同时被取消：名额归还
+    granted = asyncio.ensure_future(gate.acquire(LANE_CRAWL))
+    await asyncio.sleep(0)
+    gate.release(LANE_CRAWL)
+    granted.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await granted
+    assert gate.in_use == 0
+
+
+@pytest.mark.asyncio
+async def test_interactive_request_skips_crawl_queue_on_same_host():
+    scheduler = make_scheduler(default_concurrency=1)
+    release = asyncio.Event()
+    order = []
+
+    async def request(lane, name):
+        async with scheduler.slot("http://site.test/", lane):
+            order.append(name)
+            await release.wait()
+
+    first = asyncio.ensure_future(request(LANE_CRAWL, "crawl-0"))
+    await asyncio.sleep(0)
+    crawls = [asyncio.ensure_future(request(LANE_CRAWL, f"crawl-{i}")) for i in range(1, 4)]
+    await asyncio.sleep(0)
+    interactive = asyncio.ensure_future(request(LANE_INTERACTIVE, "interactive"))
+    await asyncio.sleep(0)
+
+    release.set()
+    await asyncio.gather(first, interactive, *crawls)
+
+    assert order[:2] == ["crawl-0", "interactive"]
+
+
+def test_aimd_grows_additively_only_when_saturated():
+    window = AIMDWindow(initial=2, min_limit=1, max_limit=4)
+
+    for _ in range(10):
+        window.on_success(0.1, saturated=False)
+    assert window.limit == 2
+
+    for _ in range(2):
+        window.on_success(0.1, saturated=True)
+    assert window.limit == 2
+    for _ in range(3):
+        window.on_success(0.1, saturated=True)
+    assert window.limit == 3
+
+    for _ in range(100):
+        window.on_success(0.1, saturated=True)
+    assert window.limit == 4
+
+
+def test_aimd_backs_off_multiplicatively_with_cooldown():
+    window = AIMDWindow(initial=16, min_limit=2, max_limit=32, backoff=0.5)
+    window.latency_ewma = 10.0
+
+    assert window.on_congestion()
+    # 一个平滑延迟内的后续失败属于同一次拥塞
+    assert not window.on_congestion()
+    assert window.limit == 8
+
+    window._last_decrease -= 11
+    window.on_congestion()
+    window._last_decrease -= 11
+    window.on_congestion()
+    window._last_decrease -= 11
+    window.on_congestion()
+    assert window.limit == 2
+    assert window.decreases == 3
+
+
+def test_aimd_treats_latency_spike_as_congestion():
+    window = AIMDWindow(initial=8, min_limit=1, max_limit=16, latency_tolerance=2.0)
+    window.on_success(0.05, saturated=True)
+
+    for _ in range(20):
+        window.on_success(0.5, saturated=True)
+
+    assert window.limit < 8
+    assert window.baseline < 0.2
+
+
+@pytest.mark.asyncio
+async def test_scheduler_applies_window_to_host_concurrency():
+    scheduler = make_scheduler(default_concurrency=8, adaptive={"min": 1, "max": 16, "backoff": 0.5})
+    async with scheduler.slot("http://site.test/"):
+        pass
+
+    scheduler.record_result("http://site.test/a", None, congested=True)
+
+    stats = scheduler.stats()["site.test"]
+    assert stats["max_concurrent"] == 4
+    assert scheduler._hosts["site.test"].gate.capacity == 4
+    assert stats["adaptive"]["decreases"] == 1
+
+
+def test_fixed_concurrency_ignores_feedback():
+    scheduler = make_scheduler(default_concurrency=8)
+    scheduler._get_host("site.test")
+
+    scheduler.record_result("http://site.test/a", None, congested=True)
+
+    assert scheduler.stats()["site.test"]["max_concurrent"] == 8
+    assert "adaptive" not in scheduler.stats()["site.test"]
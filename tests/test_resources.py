@@ -0,0 +1,69 @@
+"""共享资源容器测试"""
+import asyncio
+import threading
+
+import pytest
+
+from src.utils.resources import CRAWL_POOL, MEDIA_POOL, WECHAT_API_POOL, ResourceManager
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_async_pool():
+    resources = ResourceManager()
+
+    clients = await asyncio.gather(*(resources.http_client(CRAWL_POOL) for _ in range(5)))
+
+    assert all(client is clients[0] for client in clients)
+    assert resources.stats()[CRAWL_POOL]["type"] == "async"
+    await resources.close()
+
+
+def test_sync_pools_are_shared_across_threads():
+    resources = ResourceManager()
+    clients = []
+
+    def worker():
+        clients.append(resources.sync_client(WECHAT_API_POOL))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(client) for client in clients}) == 1
+    assert resources.sync_client(MEDIA_POOL).follow_redirects
+    assert not resources.sync_client(WECHAT_API_POOL).follow_redirects
+    asyncio.run(resources.close())
+
+
+def test_unknown_pool_names_are_rejected():
+    resources = ResourceManager()
+    with pytest.raises(ValueError):
+        resources.sync_client(CRAWL_POOL)
+    with pytest.raises(ValueError):
+        asyncio.run(resources.http_client(MEDIA_POOL))
+
+
+@pytest.mark.asyncio
+async def test_close_releases_pools_and_next_use_recreates():
+    resources = ResourceManager()
+    crawl = await resources.http_client(CRAWL_POOL)
+    media = resources.sync_client(MEDIA_POOL)
+
+    await resources.close()
+
+    assert media.is_closed
+    assert resources.stats() == {}
+    assert await resources.http_client(CRAWL_POOL) is not crawl
+    assert resources.sync_client(MEDIA_POOL) is not media
+    await resources.close()
+
+
+def test_closed_sync_client_is_replaced():
+    resources = ResourceManager()
+    client = resources.sync_client(WECHAT_API_POOL)
+    client.close()
+
+    assert resources.sync_client(WECHAT_API_POOL) is not client
+    asyncio.run(resources.close())
@@ -0,0 +1,174 @@
+"""重试策略与熔断器测试"""
+import time
+from email.utils import formatdate
+
+import httpx
+import pytest
+
+from src.utils.retry_policy import CircuitBreaker, CircuitOpenError, RetryPolicy
+
+
+def status_error(status: int, headers=None) -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", "http://site.test/")
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError("error", request=request, response=response)
+
+
+def make_policy(**kwargs) -> RetryPolicy:
+    options = dict(max_retries=2, base_delay=1.0, max_delay=30.0, failure_threshold=3, recovery_timeout=60.0)
+    options.update(kwargs)
+    return RetryPolicy(**options)
+
+
+@pytest.mark.parametrize("exc, expected", [
+    (status_error(503), True),
+    (status_error(429), True),
+    (status_error(404), False),
+    (status_error(403), False),
+    (httpx.ConnectTimeout("timeout"), True),
+    (httpx.RemoteProtocolError("eof"), True),
+    (ValueError("parse"), False),
+])
+def test_only_transient_errors_are_retried(exc, expected):
+    assert make_policy().is_retryable(exc) is expected
+
+
+def test_retry_after_seconds_and_http_date():
+    policy = make_policy()
+    assert policy.retry_after(status_error(429, {"Retry-After": "7"})) == 7.0
+    future = formatdate(time.time() + 20, usegmt=True)
+    assert 15 < policy.retry_after(status_error(503, {"Retry-After": future})) <= 20
+    assert policy.retry_after(status_error(503, {"Retry-After": "soon"})) is None
+    assert policy.retry_after(httpx.ConnectError("x")) is None
+
+
+def test_breaker_opens_after_threshold_and_rejects_fast():
+    breaker = CircuitBreaker("site.test", failure_threshold=2, recovery_timeout=60)
+    breaker.record_failure()
+    breaker.before_request()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+
+def test_half_open_allows_single_probe_and_recovers():
+    breaker = CircuitBreaker("site.test", failure_threshold=1, recovery_timeout=60)
+    breaker.record_failure()
+    breaker.opened_at -= 61
+
+    breaker.before_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_request()
+
+
+def test_failed_probe_reopens():
+    breaker = CircuitBreaker("site.test", failure_threshold=5, recovery_timeout=60)
+    for _ in range(5):
+        breaker.record_failure()
+    breaker.opened_at -= 61
+    breaker.before_request()
+
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+
+@pytest.mark.asyncio
+async def test_client_retries_5xx_but_not_404(make_client):
+    calls = {"/flaky": 0, "/missing": 0}
+
+    def handler(request, proxy):
+        calls[request.url.path] += 1
+        if request.url.path == "/flaky" and calls["/flaky"] < 3:
+            return httpx.Response(503)
+        if request.url.path == "/missing":
+            return httpx.Response(404)
+        return httpx.Response(200, text="ok")
+
+    client = make_client(handler)
+
+    assert (await client.get("http://site.test/flaky", use_cache=False)).text == "ok"
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.get("http://site.test/missing", use_cache=False)
+
+    assert calls == {"/flaky": 3, "/missing": 1}
+    assert client._retry_policy.breaker("site.test").state == CircuitBreaker.CLOSED
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_client_fails_fast_while_circuit_is_open(make_client):
+    calls = 0
+
+    def handler(request, proxy):
+        nonlocal calls
+        calls += 1
+        return httpx.Response(502)
+
+    client = make_client(handler)
+    client._retry_policy = make_policy(max_retries=0, base_delay=0, failure_threshold=2)
+
+    for _ in range(2):
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.get("http://down.test/", use_cache=False)
+    with pytest.raises(CircuitOpenError):
+        await client.get("http://down.test/", use_cache=False)
+
+    assert calls == 2
+    await client.close()
+
+
+def test_retry_after_beyond_max_delay_is_not_retried():
+    policy = make_policy(max_delay=30.0)
+
+    assert policy.is_retryable(status_error(429, {"Retry-After": "10"})) is True
+    assert policy.is_retryable(status_error(429, {"Retry-After": "120"})) is False
+    assert policy.is_retryable(status_error(503, {"Retry-After": formatdate(time.time() + 600, usegmt=True)})) is False
+
+
+@pytest.mark.parametrize("status, headers, failures", [
+    (429, {}, 0),
+    (503, {"Retry-After": "1"}, 0),
+    (503, {}, 1),
+    (502, {}, 1),
+    (404, {}, 0),
+])
+def test_throttling_responses_do_not_count_as_host_failures(status, headers, failures):
+    policy = make_policy()
+    breaker = policy.breaker("site.test")
+
+    policy.record_response(breaker, httpx.Response(status, headers=headers))
+
+    assert breaker.consecutive_failures == failures
+
+
+@pytest.mark.asyncio
+async def test_client_gives_up_when_retry_after_exceeds_cap(make_client):
+    calls = 0
+
+    def handler(request, proxy):
+        nonlocal calls
+        calls += 1
+        return httpx.Response(429, headers={"Retry-After": "120"})
+
+    client = make_client(handler)
+    client._retry_policy = make_policy(max_delay=30.0, failure_threshold=1)
+
+    for _ in range(3):
+        with pytest.raises(httpx.HTTPStatusError) as excinfo:
+            await client.get("http://busy.test/", use_cache=False)
+        assert excinfo.value.response.status_code == 429
+
+    # 不提前重试，一阵限流也不会触发熔断
+    assert calls == 3
+    assert client._retry_policy.breaker("busy.test").state == CircuitBreaker.CLOSED
+    await client.close()
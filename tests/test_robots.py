@@ -0,0 +1,89 @@
+"""robots.txt缓存测试"""
+import httpx
+import pytest
+
+from src.utils.robots import RobotsCache, DISALLOW_ALL, ALLOW_ALL, RULES
+
+
+@pytest.fixture
+def robots(tmp_path):
+    return RobotsCache(
+        cache_file=str(tmp_path / "robots.json"),
+        user_agent="testbot",
+        ttl=3600,
+        error_ttl=60,
+        max_crawl_delay=30,
+    )
+
+
+def _client_with_robots(make_client, robots, handler):
+    client = make_client(handler)
+    client._robots = robots
+    return client
+
+
+@pytest.mark.asyncio
+async def test_rules_are_applied_and_cached(make_client, robots):
+    requests = []
+
+    def handler(request, proxy):
+        requests.append(request.url.path)
+        return httpx.Response(200, text="User-agent: *\nDisallow: /private\nCrawl-delay: 2\n")
+
+    client = _client_with_robots(make_client, robots, handler)
+
+    assert await client.check_robots("http://site.test/public/page")
+    assert not await client.check_robots("http://site.test/private/page")
+    assert requests == ["/robots.txt"]
+    assert client.scheduler_stats()["site.test"]["rate"] == pytest.approx(0.5)
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_oversized_robots_is_parsed_from_truncated_prefix(make_client, robots):
+    body = "User-agent: *\nDisallow: /private\n" + "# padding line\n" * 60000 + "Disallow: /late\n"
+    assert len(body) > RobotsCache.MAX_BYTES
+
+    client = _client_with_robots(make_client, robots, lambda request, proxy: httpx.Response(200, text=body))
+
+    assert await client.check_robots("http://big.test/public")
+    assert not await client.check_robots("http://big.test/private/x")
+    # 超出读取上限的规则不生效
+    assert await client.check_robots("http://big.test/late")
+    policy = robots._policies["http://big.test"]
+    assert policy.kind == RULES
+    assert robots.errors == 0
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_missing_robots_allows_everything(make_client, robots):
+    client = _client_with_robots(make_client, robots, lambda request, proxy: httpx.Response(404))
+
+    assert await client.check_robots("http://open.test/anything")
+    assert robots._policies["http://open.test"].kind == ALLOW_ALL
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_server_error_disallows_temporarily(make_client, robots):
+    client = _client_with_robots(make_client, robots, lambda request, proxy: httpx.Response(503))
+
+    assert not await client.check_robots("http://down.test/page")
+    policy = robots._policies["http://down.test"]
+    assert policy.kind == DISALLOW_ALL
+    assert policy.expires_at - policy.fetched_at == pytest.approx(60)
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_policies_persist_across_instances(make_client, robots, tmp_path):
+    client = _client_with_robots(
+        make_client, robots, lambda request, proxy: httpx.Response(200, text="User-agent: *\nDisallow: /x\n")
+    )
+    await client.check_robots("http://persist.test/")
+    await robots.save()
+
+    reloaded = RobotsCache(str(tmp_path / "robots.json"), "testbot", 3600, 60, 30)
+    assert not reloaded._policies["http://persist.test"].allowed("http://persist.test/x/1")
+    await client.close()
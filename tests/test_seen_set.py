@@ -0,0 +1,133 @@
+"""已处理URL集合和URL规范化测试"""
+import threading
+
+import pytest
+
+from src.utils.seen_set import BloomFilter, SeenSet
+from src.utils.url_canon import canonicalize_url
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("HTTP://WWW.Example.COM:80/a//b/?utm_source=x&b=2&a=1#top", "https://www.example.com/a/b?a=1&b=2"),
+    ("https://example.com:8443/", "https://example.com:8443/"),
+    ("https://example.com", "https://example.com/"),
+    ("https://example.com/p?fbclid=1&gclid=2", "https://example.com/p"),
+    ("  https://example.com/p/  ", "https://example.com/p"),
+    ("mailto:someone@example.com", "mailto:someone@example.com"),
+    ("not a url", "not a url"),
+])
+def test_canonicalize_url(url, expected):
+    assert canonicalize_url(url) == expected
+
+
+def test_extra_tracking_params_are_removed():
+    assert canonicalize_url("https://example.com/p?From=feed&id=3", ["from"]) == "https://example.com/p?id=3"
+
+
+@pytest.fixture
+def seen(tmp_path):
+    seen_set = SeenSet(str(tmp_path / "seen.db"), str(tmp_path / "seen.bloom"), capacity=1000)
+    yield seen_set
+    seen_set._db.close()
+
+
+@pytest.mark.asyncio
+async def test_record_and_lookup_match_canonical_variants(seen):
+    assert await seen.record(["http://example.com/a?utm_medium=rss", "https://example.com/b"]) == 2
+    assert await seen.record(["https://example.com/a"]) == 0
+
+    result = await seen.lookup(["https://EXAMPLE.com/a/#c", "https://example.com/b", "https://example.com/c"])
+
+    assert result == [True, True, False]
+    assert len(seen) == 2
+    assert seen.stats()["exact_hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_lookup_and_record_run_sqlite_off_the_event_loop(seen, monkeypatch):
+    loop_thread = threading.get_ident()
+    threads = []
+    original_lookup, original_add_many = seen._lookup, seen.add_many
+
+    def lookup(urls):
+        threads.append(threading.get_ident())
+        return original_lookup(urls)
+
+    def add_many(urls, canonical=False):
+        threads.append(threading.get_ident())
+        return original_add_many(urls, canonical)
+
+    monkeypatch.setattr(seen, "_lookup", lookup)
+    monkeypatch.setattr(seen, "add_many", add_many)
+
+    await seen.record(["https://example.com/a"])
+    await seen.lookup(["https://example.com/a"])
+
+    assert len(threads) == 2
+    assert loop_thread not in threads
+
+
+@pytest.mark.asyncio
+async def test_bloom_negative_skips_database(seen, monkeypatch):
+    def fail(urls):
+        raise AssertionError("布隆过滤器判定为新URL时不应查询数据库")
+
+    monkeypatch.setattr(seen, "_lookup", fail)
+
+    assert await seen.lookup(["https://example.com/new"]) == [False]
+    assert seen.stats()["bloom_negatives"] == 1
+
+
+def test_filter_new_keeps_first_of_canonical_duplicates(seen):
+    seen.add("https://example.com/old")
+
+    urls = ["https://example.com/old", "http://example.com/x?utm_source=a", "https://example.com/x", "https://example.com/y"]
+
+    assert seen.filter_new(urls) == ["http://example.com/x?utm_source=a", "https://example.com/y"]
+
+
+@pytest.mark.asyncio
+async def test_bloom_filter_persists_and_rebuilds(tmp_path):
+    db_file, bloom_file = str(tmp_path / "seen.db"), tmp_path / "seen.bloom"
+    first = SeenSet(db_file, str(bloom_file), capacity=10)
+    await first.record([f"https://example.com/{i}" for i in range(25)])
+    assert first.stats()["bloom_capacity"] >= 25
+    await first.save()
+    first._db.close()
+
+    reloaded = SeenSet(db_file, str(bloom_file), capacity=10)
+    assert len(reloaded) == 25
+    assert await reloaded.lookup(["https://example.com/0", "https://example.com/24"]) == [True, True]
+    reloaded._db.close()
+
+    bloom_file.unlink()
+    rebuilt = SeenSet(db_file, str(bloom_file), capacity=10)
+    assert rebuilt.contains("https://example.com/7")
+    rebuilt._db.close()
+
+
+def test_bloom_false_positive_rate_on_similar_urls():
+    bloom = BloomFilter(capacity=10_000)
+    # 只差几个字符的URL：弱哈希在这类键上容易扎堆
+    bloom.add_many([f"https://forum.test/topic/{i}-ride/".encode() for i in range(10_000)])
+
+    hits = bloom.contains_many([f"https://forum.test/topic/{i}-ride/".encode() for i in range(10_000, 40_000)])
+
+    assert sum(hits) / len(hits) < 0.01
+
+
+@pytest.mark.asyncio
+async def test_bloom_file_with_old_hash_format_is_rebuilt(tmp_path):
+    db_file, bloom_file = str(tmp_path / "seen.db"), tmp_path / "seen.bloom"
+    first = SeenSet(db_file, str(bloom_file), capacity=10)
+    await first.record([f"https://example.com/{i}" for i in range(5)])
+    first._db.close()
+    # 旧版过滤器文件：条数一致但位的含义不同
+    old = BloomFilter(capacity=10)
+    old.count = 5
+    bloom_file.write_bytes(b"BLM1" + old.to_bytes()[4:])
+
+    reloaded = SeenSet(db_file, str(bloom_file), capacity=10)
+
+    assert all(reloaded.contains(f"https://example.com/{i}") for i in range(5))
+    reloaded._db.close()
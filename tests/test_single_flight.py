@@ -0,0 +1,183 @@
+"""请求合并测试"""
+import asyncio
+
+import httpx
+import pytest
+
+from src.utils.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "result"
+
+    results = await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+
+    assert results == ["result"] * 5
+    assert calls == 1
+    assert flight.stats() == {"executed": 1, "deduplicated": 4, "cancelled": 0, "in_flight": 0}
+
+
+@pytest.mark.asyncio
+async def test_cancelling_last_waiter_cancels_shared_task():
+    flight = SingleFlight()
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def work():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(flight.do("key", work), 0.05)
+
+    await asyncio.wait_for(cancelled.wait(), 1)
+    assert started.is_set()
+    assert flight.stats()["cancelled"] == 1
+    assert flight.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelling_one_of_several_waiters_keeps_task_running():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def work():
+        await release.wait()
+        return 42
+
+    first = asyncio.ensure_future(flight.do("key", work))
+    second = asyncio.ensure_future(flight.do("key", work))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await second == 42
+    assert first.cancelled()
+    assert flight.stats()["cancelled"] == 0
+
+
+@pytest.mark.asyncio
+async def test_new_call_after_cancellation_starts_fresh_request():
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(10)
+        return calls
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(flight.do("key", work), 0.05)
+
+    assert await flight.do("key", work) == 2
+
+
+@pytest.mark.asyncio
+async def test_timed_out_get_releases_scheduler_slot(make_client):
+    server_cancelled = asyncio.Event()
+
+    async def handler(request, proxy):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            server_cancelled.set()
+            raise
+        return httpx.Response(200, text="late")
+
+    client = make_client(handler)
+    await client.start()
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(client.get("http://slow.test/page", use_cache=False), 0.1)
+
+    await asyncio.wait_for(server_cancelled.wait(), 1)
+    await asyncio.sleep(0)
+    assert client.scheduler_stats()["slow.test"]["in_flight"] == 0
+    assert client.coalesce_stats()["in_flight"] == 0
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_identical_gets_send_one_request(make_client):
+    requests = []
+
+    async def handler(request, proxy):
+        requests.append(request.headers.get("Accept"))
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, text="shared")
+
+    client = make_client(handler)
+    url = "http://site.test/page"
+
+    same = await asyncio.gather(*(client.get(url, use_cache=False) for _ in range(3)))
+    different = await asyncio.gather(
+        client.get(url, use_cache=False, headers={"Accept": "application/json"}),
+        client.get(url, use_cache=False, headers={"Accept": "text/plain"}),
+    )
+
+    assert [r.text for r in same + different] == ["shared"] * 5
+    # 影响响应内容的请求头不同时不合并
+    assert len(requests) == 3
+    assert client.coalesce_stats()["deduplicated"] == 2
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_downloads_share_one_request(make_client, tmp_path):
+    requests = 0
+
+    async def handler(request, proxy):
+        nonlocal requests
+        requests += 1
+        await asyncio.sleep(0.01)
+        # 下载读取原始字节流，模拟传输层返回未读取的流
+        return httpx.Response(200, stream=httpx.ByteStream(b"image-bytes"))
+
+    client = make_client(handler)
+    paths = [str(tmp_path / "a" / "cover.jpg"), str(tmp_path / "b" / "cover.jpg")]
+
+    results = await asyncio.gather(*(client.download_file("http://img.test/cover.jpg", p) for p in paths))
+
+    assert results == paths
+    assert requests == 1
+    assert all(open(p, "rb").read() == b"image-bytes" for p in paths)
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_gets_differing_only_in_query_are_not_merged(make_client):
+    async def handler(request, proxy):
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, text=str(request.url))
+
+    client = make_client(handler)
+
+    responses = await asyncio.gather(
+        client.get("http://site.test/thread?page=2", use_cache=False),
+        client.get("http://site.test/thread?page=3", use_cache=False),
+        client.get("http://site.test/thread?page=3", params={"sort": "new"}, use_cache=False),
+    )
+
+    assert [r.text for r in responses] == [
+        "http://site.test/thread?page=2",
+        "http://site.test/thread?page=3",
+        "http://site.test/thread?page=3&sort=new",
+    ]
+    assert client.coalesce_stats()["deduplicated"] == 0
+    await client.close()
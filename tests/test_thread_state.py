@@ -0,0 +1,146 @@
+"""论坛帖子高水位和增量刷新测试"""
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from bs4 import BeautifulSoup
+
+from src.article_fetcher.fetcher import ArticleFetcher
+from src.article_fetcher.parsers import ForumCommentParser
+from src.article_fetcher.thread_state import ThreadMark, ThreadStateStore
+from src.models.article import Comment
+from tests.test_forum_threads import PER_PAGE, THREAD_URL, comment_ids, thread_page
+
+
+def comments(*ids, dates=None) -> list[Comment]:
+    dates = dates or [None] * len(ids)
+    return [Comment(comment_id=cid, author="rider", content="text", publish_date=d) for cid, d in zip(ids, dates)]
+
+
+@pytest.mark.parametrize("markup, expected", [
+    ('<article data-commentid="901" id="elComment_5">', "901"),
+    ('<div class="post" data-post-id=" 77 ">', "77"),
+    ('<article id="elComment_123"><div data-commentid="456"></div>', "456"),
+    ('<div class="post" id="post-3141">', "3141"),
+    ('<div class="post" id="intro">', None),
+])
+def test_extract_comment_id(markup, expected):
+    element = BeautifulSoup(markup, "lxml").find(["article", "div"])
+
+    assert ForumCommentParser()._extract_comment_id(element) == expected
+
+
+def test_new_comments_after_last_seen_id():
+    mark = ThreadMark({"last_comment_id": "b", "last_page_count": 1})
+
+    assert [c.comment_id for c in mark.new_comments(comments("a", "b", "c", "d"), 4)] == ["c", "d"]
+
+
+def test_new_comments_by_numeric_id_when_last_comment_was_deleted():
+    mark = ThreadMark({"last_comment_id": "105"})
+
+    assert [c.comment_id for c in mark.new_comments(comments("103", "104", "107", "110"), 4)] == ["107", "110"]
+
+
+def test_new_comments_by_time_then_by_position():
+    seen_at = datetime(2026, 5, 1, 12, 0)
+    mark = ThreadMark({"last_comment_at": seen_at.isoformat(), "last_page_count": 3})
+    dated = comments(None, None, None, dates=[seen_at - timedelta(hours=1), seen_at, seen_at + timedelta(hours=1)])
+
+    assert mark.new_comments(dated, 3) == dated[2:]
+    # 缺少时间时按最后一页上已读的评论数判断；最后一页变短时不跳过评论
+    undated = comments(None, None, None, None)
+    assert mark.new_comments(undated, 4) == undated[3:]
+    assert mark.new_comments(undated, 2) == undated[2:]
+
+
+@pytest.mark.asyncio
+async def test_marks_persist_across_stores(tmp_path):
+    path = tmp_path / "threads.json"
+    store = ThreadStateStore(str(path))
+    last = Comment(comment_id="42", author="rider", content="text", publish_date=datetime(2026, 5, 1, 8, 30))
+    store.mark("http://forum.test/t/1").update(3, "http://forum.test/t/1?page=3", 7, last)
+    await store.save()
+
+    mark = ThreadStateStore(str(path)).get("http://forum.test/t/1")
+
+    assert (mark.last_page, mark.last_page_url, mark.last_page_count) == (3, "http://forum.test/t/1?page=3", 7)
+    assert (mark.last_comment_id, mark.last_comment_at) == ("42", datetime(2026, 5, 1, 8, 30))
+
+
+@pytest.mark.asyncio
+async def test_save_without_changes_does_not_write(tmp_path):
+    path = tmp_path / "threads.json"
+
+    await ThreadStateStore(str(path)).save()
+
+    assert not path.exists()
+
+
+class GrowingThread:
+    """帖子模拟服务器：pages 为 {页码: 评论数}，failing 中的页返回404"""
+
+    def __init__(self, pages: dict):
+        self.pages = dict(pages)
+        self.failing: set = set()
+        self.requests: list = []
+
+    def __call__(self, request, proxy):
+        page = int(request.url.params["page"])
+        self.requests.append((page, request.headers.get("Cache-Control")))
+        if page in self.failing or page not in self.pages:
+            return httpx.Response(404, text="not found")
+        return httpx.Response(200, text=thread_page(page, list(self.pages), self.pages[page]))
+
+
+async def seeded_fetcher(make_client, server: GrowingThread, tmp_path) -> ArticleFetcher:
+    """完整抓取一次帖子，记录高水位"""
+    fetcher = ArticleFetcher(http_client=make_client(server))
+    fetcher.thread_state = ThreadStateStore(str(tmp_path / "threads.json"))
+    first = thread_page(1, list(server.pages), server.pages[1]).encode()
+    first_comments = await fetcher.parser.comment_parser.parse_comments(first, THREAD_URL)
+    await fetcher._collect_thread_comments(first, THREAD_URL, None, first_comments, "crawl")
+    server.requests.clear()
+    return fetcher
+
+
+@pytest.mark.asyncio
+async def test_refresh_returns_only_comments_past_the_mark(make_client, tmp_path):
+    server = GrowingThread({1: PER_PAGE, 2: 4})
+    fetcher = await seeded_fetcher(make_client, server, tmp_path)
+
+    # 第2页补满，新增第3页
+    server.pages.update({2: PER_PAGE, 3: 4})
+    new = await fetcher.refresh_thread("http://forum.test/t/jetting?page=2#reply")
+
+    assert [c.comment_id for c in new] == comment_ids(2)[4:] + comment_ids(3, 4)
+    # 从记录的最后一页开始抓取，并绕过HTTP缓存的新鲜期
+    assert sorted(server.requests) == [(2, "no-cache"), (3, "no-cache")]
+
+    server.requests.clear()
+    assert await fetcher.refresh_thread(THREAD_URL) == []
+    assert [page for page, _ in server.requests] == [3]
+    await fetcher.close()
+
+
+@pytest.mark.asyncio
+async def test_mark_stops_before_a_failed_page(make_client, tmp_path):
+    server = GrowingThread({1: PER_PAGE})
+    fetcher = await seeded_fetcher(make_client, server, tmp_path)
+
+    server.pages.update({1: PER_PAGE, 2: PER_PAGE, 3: PER_PAGE})
+    server.failing.add(2)
+    new = await fetcher.refresh_thread(THREAD_URL)
+
+    assert [c.comment_id for c in new] == comment_ids(3)
+    mark = fetcher.thread_state.get(fetcher._thread_key(THREAD_URL))
+    assert (mark.last_page, mark.last_comment_id) == (1, comment_ids(1)[-1])
+
+    # 失败页恢复后，下次刷新从高水位继续读取
+    server.failing.clear()
+    again = await fetcher.refresh_thread(THREAD_URL)
+
+    assert [c.comment_id for c in again] == comment_ids(2) + comment_ids(3)
+    mark = ThreadStateStore(str(tmp_path / "threads.json")).get(fetcher._thread_key(THREAD_URL))
+    assert (mark.last_page, mark.last_comment_id) == (3, comment_ids(3)[-1])
+    await fetcher.close()
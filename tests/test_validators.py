@@ -0,0 +1,89 @@
+"""内容验证器测试"""
+import pytest
+
+from src.article_fetcher.validators import ArticleValidator
+from src.models.article import Article
+
+
+@pytest.fixture
+def validator():
+    return ArticleValidator()
+
+
+def _head(title: str, description: str = "", filler: bytes = b"") -> bytes:
+    meta = f'<meta name="description" content="{description}">' if description else ""
+    return f"<html><head><title>{title}</title>{meta}".encode() + filler
+
+
+def test_head_gate_rejects_clearly_unrelated_page(validator):
+    head = _head("Best sourdough bread recipe", "Bake bread at home") + (
+        b"<body>" + b"<p>Flour water salt yeast. Knead the dough and let it rise overnight.</p>" * 40
+    )
+    assert validator.is_relevant_head(head) is False
+
+
+def test_head_gate_accepts_plural_keyword_in_title_before_large_script(validator):
+    # 预检按整词匹配但允许复数，"Motorcycles" 命中 motorcycle，与完整验证一致
+    script = b"<script>" + b"var x = 1;" * 3300 + b"</script>"
+    head = _head(
+        "Best Motorcycles of 2024: Buyer's Guide",
+        "Our picks of new motorcycles and dirtbikes",
+        script,
+    )[:32 * 1024]
+
+    assert validator.is_relevant_head(head) is True
+    article = Article(
+        url="https://example.com/best-motorcycles",
+        title="Best Motorcycles of 2024: Buyer's Guide",
+        content="x" * 600,
+        source_domain="example.com",
+    )
+    assert validator._is_relevant(article) is True
+
+
+@pytest.mark.parametrize("title", [
+    "Dirtbikes for beginners",
+    "Motocross season preview",
+    "Enduros and trail-bikes compared",
+    "Rebuilding old carburetors",
+    "Off road riding with a dirt-bike",
+])
+def test_head_gate_accepts_inflected_keywords_in_title(validator, title):
+    assert validator.is_relevant_head(_head(title, filler=b"<body>" + b"<p>lorem ipsum dolor</p>" * 200))
+
+
+@pytest.mark.parametrize("title, description", [
+    # 短关键词不能命中普通单词："entire" 含 tire，"overwhelming" 含 helm
+    ("Senate passes entire budget bill", "An overwhelming majority voted for the measure"),
+    ("Customs atmosphere at the summit", "Diplomats met to discuss tariffs and the item list"),
+    # 单个泛用词不足以通过
+    ("Stock market performance in the third quarter", "Shares rallied as investors weighed earnings"),
+])
+def test_head_gate_rejects_off_topic_metadata(validator, title, description):
+    assert validator.is_relevant_head(_head(title, description)) is False
+
+
+def test_head_gate_ignores_body_text(validator):
+    head = _head("Quarterly earnings call transcript", "Company results") + (
+        b"<body><p>Our fleet of KTM and Yamaha motocross bikes</p>"
+    )
+    assert validator.is_relevant_head(head) is False
+
+
+def test_head_gate_adds_up_generic_keywords(validator):
+    assert validator.is_relevant_head(_head("Chain, brake and tire maintenance checklist")) is True
+
+
+def test_head_gate_reads_opengraph_tags(validator):
+    head = b'<html><head><meta property="og:title" content="Rebuilding a carburetor &amp; jetting">'
+    head += b"<body>" + b"<p>Some unrelated filler text about nothing in particular.</p>" * 40
+    assert validator.is_relevant_head(head) is True
+
+
+def test_head_gate_defers_when_head_has_too_little_information(validator):
+    head = b"<html><head><script>" + b"a" * 30000
+    assert validator.is_relevant_head(head) is True
+
+
+def test_head_gate_tolerates_unknown_encoding(validator):
+    assert validator.is_relevant_head(_head("KTM 300 XC review"), "x-unknown-charset") is True